@@ -1,19 +1,32 @@
 """
 Additional API endpoints for snapshots, subscriptions, and enhanced build management.
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query, Response
+from starlette.convertors import StringConvertor, register_url_convertor
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+import hashlib
 import os
-import json
+import re
 import shutil
 from pathlib import Path
 
 from auth import get_current_user, get_current_user_optional
+from build_query import parse_filter, query_page_sql
+from component_schemas import validate_component
+from component_store import (
+    COMPONENT_COLUMN_MAP,
+    read_component_path,
+    read_components,
+    update_build
+)
+from concurrency import parse_if_match, raise_version_conflict
 from db import get_db_cursor, row_to_dict
+from json_diff import parse_pointer
 from snapshot_utils import (
     create_snapshot,
+    write_snapshot,
     get_snapshot_diff,
     restore_snapshot,
     get_build_snapshot_history,
@@ -31,6 +44,15 @@ from subscription import (
 
 router = APIRouter()
 
+
+class ComponentConvertor(StringConvertor):
+    """Path segment matching only component names, so /api/builds/{id}/{component}
+    does not shadow other /api/builds/{id}/... routes"""
+    regex = '|'.join(re.escape(component) for component in COMPONENT_COLUMN_MAP)
+
+
+register_url_convertor('component', ComponentConvertor())
+
 # ============= Pydantic Models =============
 
 class MaintenanceRecordCreate(BaseModel):
@@ -70,11 +92,15 @@ async def get_snapshot(snapshot_id: int, current_user: dict = Depends(get_curren
 async def get_snapshot_comparison(
     snapshot_id: int,
     compare_to_id: int,
+    format: str = 'paths',
     current_user: dict = Depends(get_current_user)
 ):
-    """Compare two snapshots and show what changed"""
+    """Compare two snapshots and show the changed paths ('paths' or RFC 6902 'patch' format)"""
+    if format not in ('paths', 'patch'):
+        raise HTTPException(status_code=400, detail=f"Invalid diff format: {format}")
+
     try:
-        changes = get_snapshot_diff(compare_to_id, snapshot_id)
+        changes = get_snapshot_diff(compare_to_id, snapshot_id, format)
         return changes
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -230,23 +256,26 @@ async def stripe_webhook(request):
 async def update_engine_internals(
     build_id: int,
     data: Dict[str, Any],
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
     """Update engine_internals_json with automatic snapshot"""
+    expected_version = parse_if_match(if_match)
+    validate_component('engine-internals', data)
     try:
-        # Create "before" snapshot
-        create_snapshot(build_id, current_user['id'], 'before_change', 'Before engine internals update')
-
-        with get_db_cursor() as cursor:
-            cursor.execute("""
-                UPDATE builds SET engine_internals_json = %s
-                WHERE id = %s AND user_id = %s
-            """, (json.dumps(data), build_id, current_user['id']))
+        version = update_component_data(
+            build_id, 'engine-internals', current_user['id'], data, expected_version,
+            before_snapshot='Before engine internals update'
+        )
+        if version is None:
+            raise_component_write_failure(build_id, 'engine-internals', current_user['id'], data, expected_version)
 
         # Create "after" snapshot
         create_snapshot(build_id, current_user['id'], 'manual_edit', 'Updated engine internals')
 
-        return {'success': True, 'message': 'Engine internals updated'}
+        return {'success': True, 'message': 'Engine internals updated', 'version': version}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -255,20 +284,25 @@ async def update_engine_internals(
 async def update_suspension(
     build_id: int,
     data: Dict[str, Any],
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
     """Update suspension_json with automatic snapshot"""
+    expected_version = parse_if_match(if_match)
+    validate_component('suspension', data)
     try:
-        create_snapshot(build_id, current_user['id'], 'before_change', 'Before suspension update')
-
-        with get_db_cursor() as cursor:
-            cursor.execute("""
-                UPDATE builds SET suspension_json = %s
-                WHERE id = %s AND user_id = %s
-            """, (json.dumps(data), build_id, current_user['id']))
+        version = update_component_data(
+            build_id, 'suspension', current_user['id'], data, expected_version,
+            before_snapshot='Before suspension update'
+        )
+        if version is None:
+            raise_component_write_failure(build_id, 'suspension', current_user['id'], data, expected_version)
 
         create_snapshot(build_id, current_user['id'], 'manual_edit', 'Updated suspension')
-        return {'success': True, 'message': 'Suspension updated'}
+
+        return {'success': True, 'message': 'Suspension updated', 'version': version}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -277,20 +311,25 @@ async def update_suspension(
 async def update_rear_differential(
     build_id: int,
     data: Dict[str, Any],
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
     """Update rear_differential_json with automatic snapshot"""
+    expected_version = parse_if_match(if_match)
+    validate_component('rear-differential', data)
     try:
-        create_snapshot(build_id, current_user['id'], 'before_change', 'Before differential update')
-
-        with get_db_cursor() as cursor:
-            cursor.execute("""
-                UPDATE builds SET rear_differential_json = %s
-                WHERE id = %s AND user_id = %s
-            """, (json.dumps(data), build_id, current_user['id']))
+        version = update_component_data(
+            build_id, 'rear-differential', current_user['id'], data, expected_version,
+            before_snapshot='Before differential update'
+        )
+        if version is None:
+            raise_component_write_failure(build_id, 'rear-differential', current_user['id'], data, expected_version)
 
         create_snapshot(build_id, current_user['id'], 'manual_edit', 'Updated rear differential')
-        return {'success': True, 'message': 'Rear differential updated'}
+
+        return {'success': True, 'message': 'Rear differential updated', 'version': version}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -299,20 +338,25 @@ async def update_rear_differential(
 async def update_transmission(
     build_id: int,
     data: Dict[str, Any],
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
     """Update transmission_json with automatic snapshot"""
+    expected_version = parse_if_match(if_match)
+    validate_component('transmission', data)
     try:
-        create_snapshot(build_id, current_user['id'], 'before_change', 'Before transmission update')
-
-        with get_db_cursor() as cursor:
-            cursor.execute("""
-                UPDATE builds SET transmission_json = %s
-                WHERE id = %s AND user_id = %s
-            """, (json.dumps(data), build_id, current_user['id']))
+        version = update_component_data(
+            build_id, 'transmission', current_user['id'], data, expected_version,
+            before_snapshot='Before transmission update'
+        )
+        if version is None:
+            raise_component_write_failure(build_id, 'transmission', current_user['id'], data, expected_version)
 
         create_snapshot(build_id, current_user['id'], 'manual_edit', 'Updated transmission')
-        return {'success': True, 'message': 'Transmission updated'}
+
+        return {'success': True, 'message': 'Transmission updated', 'version': version}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -321,20 +365,25 @@ async def update_transmission(
 async def update_frame(
     build_id: int,
     data: Dict[str, Any],
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
     """Update frame_json with automatic snapshot"""
+    expected_version = parse_if_match(if_match)
+    validate_component('frame', data)
     try:
-        create_snapshot(build_id, current_user['id'], 'before_change', 'Before frame update')
-
-        with get_db_cursor() as cursor:
-            cursor.execute("""
-                UPDATE builds SET frame_json = %s
-                WHERE id = %s AND user_id = %s
-            """, (json.dumps(data), build_id, current_user['id']))
+        version = update_component_data(
+            build_id, 'frame', current_user['id'], data, expected_version,
+            before_snapshot='Before frame update'
+        )
+        if version is None:
+            raise_component_write_failure(build_id, 'frame', current_user['id'], data, expected_version)
 
         create_snapshot(build_id, current_user['id'], 'manual_edit', 'Updated frame')
-        return {'success': True, 'message': 'Frame updated'}
+
+        return {'success': True, 'message': 'Frame updated', 'version': version}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -343,20 +392,25 @@ async def update_frame(
 async def update_cab_interior(
     build_id: int,
     data: Dict[str, Any],
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
     """Update cab_interior_json with automatic snapshot"""
+    expected_version = parse_if_match(if_match)
+    validate_component('cab-interior', data)
     try:
-        create_snapshot(build_id, current_user['id'], 'before_change', 'Before cab/interior update')
-
-        with get_db_cursor() as cursor:
-            cursor.execute("""
-                UPDATE builds SET cab_interior_json = %s
-                WHERE id = %s AND user_id = %s
-            """, (json.dumps(data), build_id, current_user['id']))
+        version = update_component_data(
+            build_id, 'cab-interior', current_user['id'], data, expected_version,
+            before_snapshot='Before cab/interior update'
+        )
+        if version is None:
+            raise_component_write_failure(build_id, 'cab-interior', current_user['id'], data, expected_version)
 
         create_snapshot(build_id, current_user['id'], 'manual_edit', 'Updated cab/interior')
-        return {'success': True, 'message': 'Cab/interior updated'}
+
+        return {'success': True, 'message': 'Cab/interior updated', 'version': version}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -365,20 +419,76 @@ async def update_cab_interior(
 async def update_tires_wheels(
     build_id: int,
     data: Dict[str, Any],
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
     """Update tires_wheels_json with automatic snapshot"""
+    expected_version = parse_if_match(if_match)
+    validate_component('tires-wheels', data)
+    try:
+        version = update_component_data(
+            build_id, 'tires-wheels', current_user['id'], data, expected_version,
+            before_snapshot='Before tires/wheels update'
+        )
+        if version is None:
+            raise_component_write_failure(build_id, 'tires-wheels', current_user['id'], data, expected_version)
+
+        create_snapshot(build_id, current_user['id'], 'manual_edit', 'Updated tires/wheels')
+
+        return {'success': True, 'message': 'Tires/wheels updated', 'version': version}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/builds/{build_id}/{component:component}")
+async def get_component_path(
+    build_id: int,
+    component: str,
+    path: str = '',
+    if_none_match: Optional[str] = Header(None),
+    current_user: Optional[dict] = Depends(get_current_user_optional)
+):
+    """
+    Read one subtree of a component document (public read access).
+
+    `path` is a JSON Pointer into the document, e.g. /connecting_rods/bolts
+    (empty for the whole document). The subtree is extracted in Postgres and
+    only its JSON is sent. The ETag is a hash of those bytes, so it changes
+    only when that subtree does; send it in If-None-Match to get 304.
+    X-Build-Version carries the build version for a following If-Match write.
+    """
     try:
-        create_snapshot(build_id, current_user['id'], 'before_change', 'Before tires/wheels update')
+        try:
+            tokens = parse_pointer(path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         with get_db_cursor() as cursor:
-            cursor.execute("""
-                UPDATE builds SET tires_wheels_json = %s
-                WHERE id = %s AND user_id = %s
-            """, (json.dumps(data), build_id, current_user['id']))
+            row = read_component_path(cursor, build_id, COMPONENT_COLUMN_MAP[component], tokens)
 
-        create_snapshot(build_id, current_user['id'], 'manual_edit', 'Updated tires/wheels')
-        return {'success': True, 'message': 'Tires/wheels updated'}
+        if not row:
+            raise HTTPException(status_code=404, detail="Build not found")
+
+        body = row['subtree']
+        if body is None:
+            if tokens:
+                raise HTTPException(status_code=404, detail=f"Path not found in {component}: {path}")
+            body = 'null'
+
+        etag = f'"{hashlib.md5(body.encode()).hexdigest()}"'
+        headers = {'ETag': etag, 'X-Build-Version': str(row['version'])}
+
+        if if_none_match:
+            candidates = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            if etag in candidates or '*' in candidates:
+                return Response(status_code=304, headers=headers)
+
+        return Response(content=body, media_type='application/json', headers=headers)
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -665,57 +775,99 @@ class ComponentNoteUpdate(BaseModel):
     content: str
 
 
-# Map component names to database columns
-COMPONENT_COLUMN_MAP = {
-    'engine-internals': 'engine_internals_json',
-    'suspension': 'suspension_json',
-    'tires-wheels': 'tires_wheels_json',
-    'rear-differential': 'rear_differential_json',
-    'transmission': 'transmission_json',
-    'frame': 'frame_json',
-    'cab-interior': 'cab_interior_json',
-    'brakes': 'brakes_json',
-    'additional-components': 'additional_components_json'
-}
-
-
-def get_component_data(build_id: int, component: str, user_id: int) -> dict:
-    """Helper to fetch component JSON data from database"""
+def update_component_data(
+    build_id: int,
+    component: str,
+    user_id: int,
+    data: dict,
+    expected_version: Optional[int] = None,
+    before_snapshot: Optional[str] = None
+) -> Optional[int]:
+    """
+    Helper to update component JSON data in database
+
+    Args:
+        expected_version: Only write if the build is still at this version
+        before_snapshot: Description for a 'before_change' snapshot, taken in
+            the same transaction once ownership and the version check pass
+
+    Returns:
+        The build's new version, or None if no row matched (missing build,
+        wrong owner or a failed version precondition)
+    """
     column = COMPONENT_COLUMN_MAP.get(component)
     if not column:
         raise ValueError(f"Invalid component: {component}")
 
+    # Notes live in component_notes; never write a stale copy into the document
+    data = {key: value for key, value in data.items() if key != 'notes_array'}
+
     with get_db_cursor() as cursor:
-        cursor.execute(f"""
-            SELECT {column}, user_id
-            FROM builds
-            WHERE id = %s
-        """, (build_id,))
-        result = cursor.fetchone()
+        if before_snapshot:
+            # Lock the build so the snapshot is exactly the state being replaced
+            cursor.execute("""
+                SELECT version FROM builds
+                WHERE id = %s AND user_id = %s
+                FOR UPDATE
+            """, (build_id, user_id))
+            build = cursor.fetchone()
+            if not build or (expected_version is not None and build['version'] != expected_version):
+                return None
+            write_snapshot(cursor, build_id, user_id, 'before_change', before_snapshot)
+
+        return update_build(
+            cursor, build_id,
+            documents={column: data},
+            user_id=user_id,
+            expected_version=expected_version
+        )
 
-        if not result:
-            raise ValueError("Build not found")
 
-        # Check ownership
-        if result['user_id'] != user_id:
-            raise ValueError("Not authorized")
+def raise_component_write_failure(
+    build_id: int,
+    component: str,
+    user_id: int,
+    data: dict,
+    expected_version: Optional[int]
+):
+    """Turn a zero-row component UPDATE into the matching 404/403/409"""
+    column = COMPONENT_COLUMN_MAP[component]
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT user_id, version FROM builds WHERE id = %s", (build_id,))
+        current = cursor.fetchone()
+        if current:
+            current.update(read_components(cursor, build_id, [column]))
 
-        data = result[column] or {}
-        return data
+    if not current:
+        raise HTTPException(status_code=404, detail="Build not found")
+    if current['user_id'] != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
 
+    raise_version_conflict(current, expected_version, {column: data}, replace=True)
 
-def update_component_data(build_id: int, component: str, user_id: int, data: dict):
-    """Helper to update component JSON data in database"""
-    column = COMPONENT_COLUMN_MAP.get(component)
-    if not column:
-        raise ValueError(f"Invalid component: {component}")
 
-    with get_db_cursor() as cursor:
-        cursor.execute(f"""
-            UPDATE builds
-            SET {column} = %s
-            WHERE id = %s AND user_id = %s
-        """, (json.dumps(data), build_id, user_id))
+def bump_build_version(cursor, build_id: int) -> int:
+    """Bump builds.version after a note write so the build's ETag changes with its notes"""
+    cursor.execute("UPDATE builds SET version = version WHERE id = %s RETURNING version", (build_id,))
+    return cursor.fetchone()['version']
+
+
+def raise_note_write_failure(cursor, build_id: int, component: str, note_id: str, user_id: int):
+    """Turn a zero-row note UPDATE/DELETE into the matching 404/403"""
+    cursor.execute("SELECT user_id FROM builds WHERE id = %s", (build_id,))
+    build = cursor.fetchone()
+    if not build:
+        raise HTTPException(status_code=404, detail="Build not found")
+    if build['user_id'] != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    cursor.execute("""
+        SELECT 1 FROM component_notes
+        WHERE build_id = %s AND component = %s AND note_key = %s
+    """, (build_id, component, note_id))
+    if not cursor.fetchone():
+        raise HTTPException(status_code=404, detail="Note not found")
+    raise HTTPException(status_code=403, detail="Not authorized to modify this note")
 
 
 @router.post("/api/builds/{build_id}/{component}/notes")
@@ -725,52 +877,45 @@ async def add_component_note(
     note_data: ComponentNoteCreate,
     current_user: dict = Depends(get_current_user)
 ):
-    """Add a note to a component with audit trail"""
+    """Add a note to a component (single-row insert, owner only)"""
     try:
         # Validate component name
         if component not in COMPONENT_COLUMN_MAP:
             raise HTTPException(status_code=400, detail=f"Invalid component: {component}")
 
-        # Create "before" snapshot
-        create_snapshot(build_id, current_user['id'], 'before_change', f'Before adding note to {component}')
-
-        # Get current component data
-        data = get_component_data(build_id, component, current_user['id'])
-
-        # Initialize notes_array if it doesn't exist
-        if 'notes_array' not in data:
-            data['notes_array'] = []
-
-        # Create new note
-        timestamp = datetime.utcnow().isoformat() + 'Z'
-        note_id = f"note_{int(datetime.utcnow().timestamp() * 1000)}"
-
-        new_note = {
-            'id': note_id,
-            'timestamp': timestamp,
-            'user_id': current_user['id'],
-            'user_name': f"{current_user.get('first_name', '')} {current_user.get('last_name', '')}".strip() or current_user.get('email', 'Unknown'),
-            'content': note_data.content,
-            'action_type': 'add'
-        }
+        user_name = f"{current_user.get('first_name', '')} {current_user.get('last_name', '')}".strip() or current_user.get('email', 'Unknown')
 
-        # Add note to array
-        data['notes_array'].append(new_note)
+        with get_db_cursor() as cursor:
+            # Ownership check and insert in one statement
+            cursor.execute("""
+                WITH new_id AS (SELECT nextval('component_notes_id_seq') AS id)
+                INSERT INTO component_notes (id, build_id, component, note_key, user_id, user_name, content)
+                SELECT new_id.id, b.id, %s, 'note_' || new_id.id, %s, %s, %s
+                FROM builds b, new_id
+                WHERE b.id = %s AND b.user_id = %s
+                RETURNING id
+            """, (component, current_user['id'], user_name, note_data.content, build_id, current_user['id']))
+            inserted = cursor.fetchone()
 
-        # Update database
-        update_component_data(build_id, component, current_user['id'], data)
+            if not inserted:
+                cursor.execute("SELECT 1 FROM builds WHERE id = %s", (build_id,))
+                if not cursor.fetchone():
+                    raise HTTPException(status_code=404, detail="Build not found")
+                raise HTTPException(status_code=403, detail="Not authorized")
 
-        # Create "after" snapshot
-        create_snapshot(build_id, current_user['id'], 'note_add', f'Added note to {component}')
+            cursor.execute("SELECT note FROM component_note_documents WHERE id = %s", (inserted['id'],))
+            new_note = cursor.fetchone()['note']
+            version = bump_build_version(cursor, build_id)
 
         return {
             'success': True,
             'note': new_note,
+            'version': version,
             'message': 'Note added successfully'
         }
 
-    except ValueError as e:
-        raise HTTPException(status_code=403, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -783,56 +928,42 @@ async def update_component_note(
     note_data: ComponentNoteUpdate,
     current_user: dict = Depends(get_current_user)
 ):
-    """Edit a note in a component with audit trail"""
+    """Edit a note in a component (single-row update, note author only)"""
     try:
         # Validate component name
         if component not in COMPONENT_COLUMN_MAP:
             raise HTTPException(status_code=400, detail=f"Invalid component: {component}")
 
-        # Create "before" snapshot
-        create_snapshot(build_id, current_user['id'], 'before_change', f'Before editing note in {component}')
-
-        # Get current component data
-        data = get_component_data(build_id, component, current_user['id'])
-
-        # Find and update the note
-        if 'notes_array' not in data:
-            raise HTTPException(status_code=404, detail="No notes found")
-
-        note_found = False
-        for note in data['notes_array']:
-            if note['id'] == note_id:
-                # Check if user owns the note
-                if note['user_id'] != current_user['id']:
-                    raise HTTPException(status_code=403, detail="Not authorized to edit this note")
-
-                # Update note content and metadata
-                note['content'] = note_data.content
-                note['last_edited'] = datetime.utcnow().isoformat() + 'Z'
-                note['action_type'] = 'edit'
-                note_found = True
-                updated_note = note
-                break
-
-        if not note_found:
-            raise HTTPException(status_code=404, detail="Note not found")
-
-        # Update database
-        update_component_data(build_id, component, current_user['id'], data)
-
-        # Create "after" snapshot
-        create_snapshot(build_id, current_user['id'], 'note_edit', f'Edited note in {component}')
+        with get_db_cursor() as cursor:
+            cursor.execute("""
+                UPDATE component_notes n SET
+                    content = %s,
+                    last_edited = NOW() AT TIME ZONE 'utc',
+                    action_type = 'edit'
+                FROM builds b
+                WHERE n.build_id = %s AND n.component = %s AND n.note_key = %s
+                  AND n.user_id = %s
+                  AND b.id = n.build_id AND b.user_id = %s
+                RETURNING n.id
+            """, (note_data.content, build_id, component, note_id, current_user['id'], current_user['id']))
+            updated = cursor.fetchone()
+
+            if not updated:
+                raise_note_write_failure(cursor, build_id, component, note_id, current_user['id'])
+
+            cursor.execute("SELECT note FROM component_note_documents WHERE id = %s", (updated['id'],))
+            updated_note = cursor.fetchone()['note']
+            version = bump_build_version(cursor, build_id)
 
         return {
             'success': True,
             'note': updated_note,
+            'version': version,
             'message': 'Note updated successfully'
         }
 
     except HTTPException:
         raise
-    except ValueError as e:
-        raise HTTPException(status_code=403, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -844,46 +975,34 @@ async def delete_component_note(
     note_id: str,
     current_user: dict = Depends(get_current_user)
 ):
-    """Delete a note from a component with audit trail"""
+    """Delete a note from a component (single-row delete, note author only)"""
     try:
         # Validate component name
         if component not in COMPONENT_COLUMN_MAP:
             raise HTTPException(status_code=400, detail=f"Invalid component: {component}")
 
-        # Create "before" snapshot
-        create_snapshot(build_id, current_user['id'], 'before_change', f'Before deleting note from {component}')
-
-        # Get current component data
-        data = get_component_data(build_id, component, current_user['id'])
-
-        # Find and remove the note
-        if 'notes_array' not in data:
-            raise HTTPException(status_code=404, detail="No notes found")
-
-        original_length = len(data['notes_array'])
-        data['notes_array'] = [
-            note for note in data['notes_array']
-            if not (note['id'] == note_id and note['user_id'] == current_user['id'])
-        ]
-
-        if len(data['notes_array']) == original_length:
-            raise HTTPException(status_code=404, detail="Note not found or not authorized")
-
-        # Update database
-        update_component_data(build_id, component, current_user['id'], data)
-
-        # Create "after" snapshot
-        create_snapshot(build_id, current_user['id'], 'note_delete', f'Deleted note from {component}')
+        with get_db_cursor() as cursor:
+            cursor.execute("""
+                DELETE FROM component_notes n
+                USING builds b
+                WHERE n.build_id = %s AND n.component = %s AND n.note_key = %s
+                  AND n.user_id = %s
+                  AND b.id = n.build_id AND b.user_id = %s
+                RETURNING n.id
+            """, (build_id, component, note_id, current_user['id'], current_user['id']))
+
+            if not cursor.fetchone():
+                raise_note_write_failure(cursor, build_id, component, note_id, current_user['id'])
+            version = bump_build_version(cursor, build_id)
 
         return {
             'success': True,
+            'version': version,
             'message': 'Note deleted successfully'
         }
 
     except HTTPException:
         raise
-    except ValueError as e:
-        raise HTTPException(status_code=403, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -892,34 +1011,100 @@ async def delete_component_note(
 async def get_component_notes(
     build_id: int,
     component: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
     current_user: Optional[dict] = Depends(get_current_user)
 ):
-    """Get all notes for a component (public read access)"""
+    """
+    Get a component's notes, oldest first (public read access).
+
+    Paginated by keyset: pass the returned next_cursor to get the next page.
+    next_cursor is null on the last page.
+    """
     try:
         # Validate component name
         if component not in COMPONENT_COLUMN_MAP:
             raise HTTPException(status_code=400, detail=f"Invalid component: {component}")
 
-        column = COMPONENT_COLUMN_MAP[component]
-
-        with get_db_cursor() as cursor:
-            cursor.execute(f"""
-                SELECT {column}
-                FROM builds
-                WHERE id = %s
-            """, (build_id,))
-            result = cursor.fetchone()
+        limit = max(1, min(limit, 200))
+        try:
+            after_id = int(cursor) if cursor else 0
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
 
-            if not result:
+        with get_db_cursor() as db_cursor:
+            db_cursor.execute("SELECT 1 FROM builds WHERE id = %s", (build_id,))
+            if not db_cursor.fetchone():
                 raise HTTPException(status_code=404, detail="Build not found")
 
-            data = result[column] or {}
-            notes = data.get('notes_array', [])
+            # Fetch one extra row to know whether another page exists
+            db_cursor.execute("""
+                SELECT id, note FROM component_note_documents
+                WHERE build_id = %s AND component = %s AND id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (build_id, component, after_id, limit + 1))
+            rows = db_cursor.fetchall()
+
+        page = rows[:limit]
+        return {
+            'success': True,
+            'notes': [row['note'] for row in page],
+            'next_cursor': str(page[-1]['id']) if len(rows) > limit else None
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============= Build Query Endpoints =============
+
+MAX_QUERY_FILTERS = 20
+
+
+@router.get("/api/builds/query")
+async def query_builds(
+    filters: List[str] = Query(..., alias='filter'),
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Find builds by values inside their component documents.
+
+    Each `filter` is `<column>.<path><op><value>`, for example
+    `engine_internals_json.pistons.manufacturer=Wiseco` or
+    `engine_internals_json.crankshaft.stroke_in>=3.4` (operators: = != > >= < <= ~).
+    Repeated filters are ANDed. See build_query.py for how each operator is
+    indexed.
+
+    Paginated by keyset: pass the returned next_cursor to get the next page.
+    next_cursor is null on the last page.
+    """
+    try:
+        if len(filters) > MAX_QUERY_FILTERS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_QUERY_FILTERS} filters per query")
+        parsed = [parse_filter(expression) for expression in filters]
+
+        limit = max(1, min(limit, 200))
+        try:
+            after_id = int(cursor) if cursor else 0
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+
+        with get_db_cursor() as db_cursor:
+            # Fetch one extra row to know whether another page exists
+            db_cursor.execute(*query_page_sql(parsed, after_id, limit + 1))
+            rows = db_cursor.fetchall()
 
-            return {
-                'success': True,
-                'notes': notes
-            }
+        page = rows[:limit]
+        return {
+            'success': True,
+            'builds': [row_to_dict(row) for row in page],
+            'next_cursor': str(page[-1]['id']) if len(rows) > limit else None
+        }
 
     except HTTPException:
         raise
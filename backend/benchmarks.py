@@ -0,0 +1,817 @@
+"""
+Performance benchmarks for storage and compute paths.
+
+Usage:
+    python benchmarks.py snapshot-archive [--builds 50] [--snapshots 200]
+    python benchmarks.py concurrency-stress [--threads 8] [--writes 25]
+    python benchmarks.py component-wal [--edits 200]
+    python benchmarks.py query-plan [--builds 20000]
+    python benchmarks.py parts-suggest [--parts 100000] [--queries 20000]
+    python benchmarks.py geometry [--builds 100000]
+    python benchmarks.py similar-builds [--builds 100000] [--queries 2000]
+    python benchmarks.py dyno-curves [--pulls 12] [--samples 2000]
+    python benchmarks.py datalog [--minutes 30] [--rate 500] [--channels 12]
+
+Benchmarks that only exercise in-process code use synthetic data and need no
+database. Database benchmarks create their own user and build, connect via
+DATABASE_URL and remove what they created. Each prints its throughput figures
+on completion.
+"""
+import argparse
+import copy
+import io
+import itertools
+import json
+import random
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+
+def _synthetic_engine_internals(rng: random.Random) -> dict:
+    """A realistic engine_internals_json document"""
+    return {
+        'block': {
+            'manufacturer': 'Ford Racing',
+            'part_number': 'M-6010-BOSS302',
+            'bore_size': round(4.000 + rng.choice([0, 0.020, 0.030, 0.040]), 3),
+            'deck_height_in': 8.200,
+            'main_caps': '4-bolt splayed'
+        },
+        'crankshaft': {'manufacturer': 'SCAT', 'part_number': '4-302-3400-5400', 'stroke_in': 3.400},
+        'connecting_rods': {
+            'type': 'I-Beam', 'length_in': 5.400,
+            'bolts': {'type': 'ARP 8740', 'size': '5/16"', 'torque_spec': '45 ft-lbs'}
+        },
+        'pistons': {'manufacturer': 'Mahle', 'design': 'flat-top', 'dome_cc': -5.0},
+        'camshaft': {'manufacturer': 'COMP Cams', 'model': 'XR282HR', 'duration_050_int': 230, 'lsa': 110},
+        'notes_array': [
+            {'id': f'note_{i}', 'timestamp': '2025-01-01T00:00:00Z', 'user_id': 1,
+             'user_name': 'Builder', 'content': f'Checked clearance #{i}', 'action_type': 'add'}
+            for i in range(rng.randint(0, 12))
+        ]
+    }
+
+
+def bench_snapshot_archive(args):
+    """Measure segment write (archive) and random frame read (restore) throughput"""
+    from snapshot_archive import write_segment, read_segment_frame, _encode_snapshot, _segment_decompressor
+
+    rng = random.Random(42)
+    snapshot_id = 0
+    segments = []
+    for _ in range(args.builds):
+        doc = _synthetic_engine_internals(rng)
+        snapshots = []
+        for _ in range(args.snapshots):
+            snapshot_id += 1
+            doc = copy.deepcopy(doc)
+            doc['block']['bore_size'] = round(doc['block']['bore_size'] + rng.choice([0, 0.001]), 3)
+            doc['notes_array'].append({'id': f'note_s{snapshot_id}', 'content': 'edit', 'user_id': 1})
+            snapshots.append({'id': snapshot_id, 'engine_internals_json': doc})
+        segments.append(snapshots)
+
+    raw_bytes = sum(len(_encode_snapshot(s)) for snapshots in segments for s in snapshots)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        written = []
+        for index, snapshots in enumerate(segments):
+            path = Path(tmp) / f'build_{index}' / 'segment.zst'
+            written.append((path, write_segment(path, snapshots)))
+        archive_seconds = time.perf_counter() - started
+        compressed_bytes = sum(path.stat().st_size for path, _ in written)
+
+        _segment_decompressor.cache_clear()
+        reads = [(path, loc) for path, locations in written for loc in locations]
+        rng.shuffle(reads)
+        started = time.perf_counter()
+        for path, (offset, length) in reads:
+            read_segment_frame(path, offset, length)
+        restore_seconds = time.perf_counter() - started
+
+    total = snapshot_id
+    print(f"Snapshots:        {total} ({args.builds} builds x {args.snapshots})")
+    print(f"Raw JSON:         {raw_bytes / 1024 / 1024:.2f} MB")
+    print(f"Compressed:       {compressed_bytes / 1024 / 1024:.2f} MB ({raw_bytes / compressed_bytes:.1f}x)")
+    print(f"Archive:          {total / archive_seconds:,.0f} snapshots/s, "
+          f"{raw_bytes / 1024 / 1024 / archive_seconds:.1f} MB/s")
+    print(f"Restore (random): {total / restore_seconds:,.0f} snapshots/s, "
+          f"{raw_bytes / 1024 / 1024 / restore_seconds:.1f} MB/s")
+
+
+@contextmanager
+def _benchmark_build(documents: Optional[dict] = None):
+    """Create a throwaway user and build (with component documents) for a database benchmark"""
+    from component_store import update_build
+    from db import get_db_cursor
+
+    with get_db_cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO users (email, first_name, last_name)
+            VALUES (%s, 'Bench', 'Mark') RETURNING id
+        """, (f"bench-{uuid.uuid4().hex}@example.com",))
+        user_id = cursor.fetchone()['id']
+        cursor.execute("""
+            INSERT INTO builds (user_id, name, slug)
+            VALUES (%s, 'Benchmark build', %s) RETURNING id
+        """, (user_id, f"benchmark-{uuid.uuid4().hex}"))
+        build_id = cursor.fetchone()['id']
+        if documents:
+            update_build(cursor, build_id, documents=documents)
+
+    try:
+        yield user_id, build_id
+    finally:
+        with get_db_cursor() as cursor:
+            cursor.execute("DELETE FROM builds WHERE id = %s", (build_id,))
+            cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+
+
+def _api_client(user_id: int):
+    """In-process API client authenticated as `user_id`"""
+    from fastapi.testclient import TestClient
+    from auth import create_access_token
+    from main import app
+
+    async def with_client_address(scope, receive, send):
+        # TestClient reports its host as 'testclient', which the INET
+        # ip_address column of build_change_events rejects
+        if scope['type'] == 'http':
+            scope['client'] = ('127.0.0.1', 0)
+        await app(scope, receive, send)
+
+    client = TestClient(with_client_address)
+    client.headers['Authorization'] = f"Bearer {create_access_token({'sub': str(user_id)})}"
+    return client
+
+
+def _run_threads(count: int, target) -> float:
+    """Run target(index) on `count` threads at once; returns elapsed seconds"""
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def run(index):
+        barrier.wait()
+        try:
+            target(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return time.perf_counter() - started
+
+
+def bench_concurrency_stress(args):
+    """
+    Hammer one build from many threads and check that no write is lost
+    (exits non-zero if any phase lost one).
+
+    counter:  read-increment-write with If-Match, retrying on 409
+    merge:    PATCHes of disjoint keys with no precondition
+    notes:    concurrent note inserts
+    """
+    from component_store import read_components
+    from concurrency import write_retry_delay
+    from db import get_db_cursor
+
+    with _benchmark_build({'additional_components_json': {'counter': 0}}) as (user_id, build_id):
+        client = _api_client(user_id)
+        url = f"/api/builds/{build_id}"
+        total = args.threads * args.writes
+        conflicts = [0] * args.threads
+
+        def increment(index):
+            for _ in range(args.writes):
+                for attempt in itertools.count():
+                    current = client.get(url)
+                    counter = current.json()['additional_components_json']['counter']
+                    response = client.patch(
+                        url,
+                        json={'additional_components_json': {'counter': counter + 1}},
+                        headers={'If-Match': current.headers['ETag']}
+                    )
+                    if response.status_code == 409:
+                        conflicts[index] += 1
+                        time.sleep(write_retry_delay(min(attempt, 7)))
+                        continue
+                    response.raise_for_status()
+                    break
+
+        def merge(index):
+            for write in range(args.writes):
+                response = client.patch(url, json={
+                    'engine_internals_json': {f'thread_{index}': {f'write_{write}': write}}
+                })
+                response.raise_for_status()
+
+        def add_notes(index):
+            for write in range(args.writes):
+                response = client.post(f"{url}/engine-internals/notes", json={
+                    'content': f'thread {index} note {write}'
+                })
+                response.raise_for_status()
+
+        results = []
+        for name, target in (('counter', increment), ('merge', merge), ('notes', add_notes)):
+            elapsed = _run_threads(args.threads, target)
+            results.append((name, elapsed))
+
+        with get_db_cursor() as cursor:
+            cursor.execute("SELECT version FROM builds WHERE id = %s", (build_id,))
+            final = cursor.fetchone()
+            final.update(read_components(cursor, build_id))
+            cursor.execute("SELECT COUNT(*) AS notes FROM component_notes WHERE build_id = %s", (build_id,))
+            notes = cursor.fetchone()['notes']
+
+    merged_keys = sum(
+        len(value) for key, value in final['engine_internals_json'].items() if key.startswith('thread_')
+    )
+    observed = {
+        'counter': final['additional_components_json']['counter'],
+        'merge': merged_keys,
+        'notes': notes
+    }
+
+    print(f"Threads x writes: {args.threads} x {args.writes} = {total} per phase")
+    failures = []
+    for name, elapsed in results:
+        lost = total - observed[name]
+        if lost:
+            failures.append((name, lost))
+        print(f"{name:8s} {total / elapsed:8,.0f} writes/s   lost updates: {lost}")
+    print(f"If-Match conflicts retried: {sum(conflicts)}")
+    print(f"Final build version: {final['version']}")
+
+    if failures:
+        for name, lost in failures:
+            print(f"{name}: {lost} of {total} writes lost")
+        raise SystemExit(1)
+
+
+def _synthetic_component(rng: random.Random, name: str) -> dict:
+    """A component document of realistic size (~1-2 KB of spec fields)"""
+    return {
+        section: {
+            'manufacturer': rng.choice(['Moser', 'Strange', 'QA1', 'Wilwood', 'Tremec', 'Baer']),
+            'part_number': f"{name[:3].upper()}-{rng.randint(10000, 99999)}",
+            'spec_value': round(rng.uniform(0.5, 500), 3),
+            'install_date': f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'notes': f"{section} measured and verified at install ({rng.random():.6f})"
+        }
+        for section in ('primary', 'secondary', 'hardware', 'fluids', 'service', 'options')
+    }
+
+
+def bench_component_wal(args):
+    """
+    WAL bytes written per edit with component documents stored as builds
+    columns vs. build_components rows.
+    """
+    import component_store
+    from component_store import COMPONENT_COLUMN_MAP, update_build
+    from db import get_db_cursor
+
+    rng = random.Random(7)
+    documents = {
+        column: _synthetic_component(rng, component) for component, column in COMPONENT_COLUMN_MAP.items()
+    }
+    documents['engine_internals_json'] = _synthetic_engine_internals(rng)
+
+    def wal_per_edit(build_id, edit):
+        with get_db_cursor() as cursor:
+            edit(cursor, 0)  # warm-up: first write after a checkpoint carries full-page images
+            cursor.execute("SELECT pg_current_wal_insert_lsn() AS lsn")
+            start = cursor.fetchone()['lsn']
+
+        for i in range(1, args.edits + 1):
+            with get_db_cursor() as cursor:
+                edit(cursor, i)
+
+        with get_db_cursor() as cursor:
+            cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), %s) AS bytes", (start,))
+            return float(cursor.fetchone()['bytes']) / args.edits
+
+    def scalar_edit(build_id):
+        return lambda cursor, i: update_build(cursor, build_id, values={'name': f'Benchmark build {i}'})
+
+    def component_edit(build_id):
+        return lambda cursor, i: update_build(cursor, build_id, patches={
+            'suspension_json': [{'op': 'set', 'path': ('primary', 'spec_value'), 'value': i}]
+        })
+
+    results = {}
+    original_mode = component_store.STORAGE_MODE
+    try:
+        for mode in component_store.STORAGE_MODES:
+            component_store.STORAGE_MODE = mode
+            with _benchmark_build(documents) as (_, build_id):
+                with get_db_cursor() as cursor:
+                    cursor.execute("SELECT pg_column_size(b.*) AS row_bytes FROM builds b WHERE id = %s", (build_id,))
+                    row_bytes = cursor.fetchone()['row_bytes']
+
+                results[mode] = (
+                    row_bytes,
+                    wal_per_edit(build_id, scalar_edit(build_id)),
+                    wal_per_edit(build_id, component_edit(build_id))
+                )
+    finally:
+        component_store.STORAGE_MODE = original_mode
+
+    print(f"Edits per measurement: {args.edits}")
+    print(f"{'layout':10s} {'builds row':>12s} {'scalar edit':>14s} {'component edit':>16s}")
+    for mode, (row_bytes, scalar, component) in results.items():
+        print(f"{mode:10s} {row_bytes:>10,d} B {scalar:>12,.0f} B {component:>14,.0f} B")
+
+    columns, table = results['columns'], results['table']
+    print(f"WAL reduction: scalar edits {columns[1] / table[1]:.1f}x, component edits {columns[2] / table[2]:.1f}x")
+
+
+def _plan_indexes(plan: dict) -> set:
+    """Names of all indexes an EXPLAIN (FORMAT JSON) plan reads"""
+    names = {plan['Index Name']} if 'Index Name' in plan else set()
+    for child in plan.get('Plans', []):
+        names |= _plan_indexes(child)
+    return names
+
+
+def bench_query_plan(args):
+    """
+    EXPLAIN-check that attribute queries are served by the component indexes
+    (migration 013) in both storage layouts, and time them against a
+    sequential scan. Exits non-zero if an expected index is not used.
+    """
+    from psycopg2.extras import execute_values
+    import component_store
+    from build_query import parse_filter, query_page_sql
+    from db import get_db_cursor
+
+    rng = random.Random(34)
+    manufacturers = ['Wiseco', 'Mahle', 'JE', 'Diamond', 'CP', 'Ross', 'Probe', 'Icon', 'KB', 'Speed Pro',
+                     'Arias', 'Venolia', 'Keith Black', 'Sealed Power', 'Silvolite', 'TRW', 'Ford Racing',
+                     'Manley', 'SRP', 'Eagle'] + [f'Shop {i}' for i in range(80)]
+    transmissions = ['T56', 'TKX', 'TKO 600', '4L80E', 'C4', 'AOD', '4R70W', 'Powerglide', 'TH400', 'T5'] + \
+        [f'Custom {i}' for i in range(290)]
+
+    # (filter, index that must appear in the plan in columns / table layout).
+    # Each matches well under 1% of builds; for common values, walking the
+    # primary key for one page is cheaper and the planner rightly does that.
+    checks = [
+        ('engine_internals_json.pistons.manufacturer=Wiseco',
+         'idx_builds_engine_internals_json_path_ops', 'idx_build_components_doc_path_ops'),
+        ('engine_internals_json.crankshaft.stroke_in>=4.497',
+         'idx_builds_crank_stroke', 'idx_build_components_crank_stroke'),
+        ('transmission_json.type=TKX',
+         'idx_builds_transmission_json_path_ops', 'idx_build_components_doc_path_ops'),
+    ]
+
+    def engine(i):
+        document = _synthetic_engine_internals(rng)
+        document.pop('notes_array')
+        document['pistons']['manufacturer'] = rng.choice(manufacturers)
+        document['crankshaft']['stroke_in'] = round(rng.uniform(3.0, 4.5), 3)
+        return document
+
+    with get_db_cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO users (email, first_name, last_name)
+            VALUES (%s, 'Bench', 'Mark') RETURNING id
+        """, (f"bench-{uuid.uuid4().hex}@example.com",))
+        user_id = cursor.fetchone()['id']
+
+    original_mode = component_store.STORAGE_MODE
+    failures = []
+    try:
+        started = time.perf_counter()
+        with get_db_cursor() as cursor:
+            execute_values(cursor, """
+                INSERT INTO builds (user_id, name, slug, engine_internals_json, transmission_json) VALUES %s
+            """, [
+                (user_id, f'Query benchmark {i}', f'query-benchmark-{uuid.uuid4().hex}',
+                 json.dumps(engine(i)), json.dumps({'type': rng.choice(transmissions)}))
+                for i in range(args.builds)
+            ], page_size=1000)
+            # The same documents in the build_components layout
+            for component, column in (('engine-internals', 'engine_internals_json'),
+                                      ('transmission', 'transmission_json')):
+                cursor.execute(f"""
+                    INSERT INTO build_components (build_id, component, doc)
+                    SELECT id, %s, {column} FROM builds WHERE user_id = %s
+                """, (component, user_id))
+        with get_db_cursor() as cursor:
+            cursor.execute("ANALYZE builds")
+            cursor.execute("ANALYZE build_components")
+        print(f"Seeded {args.builds:,} builds in {time.perf_counter() - started:.1f}s")
+
+        for mode in component_store.STORAGE_MODES:
+            component_store.STORAGE_MODE = mode
+            print(f"\n[{mode}]")
+            for expression, columns_index, table_index in checks:
+                expected = columns_index if mode == 'columns' else table_index
+                sql, params = query_page_sql([parse_filter(expression)], 0, 51)
+
+                with get_db_cursor() as cursor:
+                    cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                    used = _plan_indexes(cursor.fetchone()['QUERY PLAN'][0]['Plan'])
+
+                    timings = []
+                    for scans in ('on', 'off'):
+                        cursor.execute(f"SET LOCAL enable_indexscan = {scans}")
+                        cursor.execute(f"SET LOCAL enable_bitmapscan = {scans}")
+                        t = time.perf_counter()
+                        for _ in range(args.repeat):
+                            cursor.execute(sql, params)
+                            rows = cursor.fetchall()
+                        timings.append((time.perf_counter() - t) / args.repeat * 1000)
+
+                ok = expected in used
+                if not ok:
+                    failures.append((mode, expression, expected, used))
+                print(f"{'OK  ' if ok else 'FAIL'} {expression:50s} {len(rows):3d} rows "
+                      f"{timings[0]:7.2f} ms indexed, {timings[1]:7.2f} ms seq scan  ({expected})")
+    finally:
+        component_store.STORAGE_MODE = original_mode
+        with get_db_cursor() as cursor:
+            cursor.execute("DELETE FROM builds WHERE user_id = %s", (user_id,))
+            cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+
+    if failures:
+        for mode, expression, expected, used in failures:
+            print(f"{mode}: {expression} did not use {expected} (plan used: {sorted(used) or 'no index'})")
+        raise SystemExit(1)
+
+
+def bench_parts_suggest(args):
+    """
+    Typeahead latency of the in-process parts prefix index over a synthetic
+    catalog, plus the cost of incremental updates. The database is not queried.
+    """
+    from parts_index import PartsPrefixIndex
+
+    rng = random.Random(37)
+    brands = ['Wiseco', 'Mahle', 'JE', 'COMP Cams', 'Howards', 'Lunati', 'ARP', 'Scat', 'Eagle', 'Callies',
+              'Edelbrock', 'Holley', 'Tremec', 'Moser', 'Strange', 'Wilwood', 'Baer', 'QA1', 'Fel-Pro', 'Clevite']
+    nouns = ['piston', 'ring set', 'rod', 'crankshaft', 'camshaft', 'lifter', 'pushrod', 'rocker arm',
+             'head gasket', 'bearing', 'intake manifold', 'carburetor', 'clutch', 'axle', 'caliper', 'rotor']
+    adjectives = ['forged', 'billet', 'cast', 'hydraulic roller', 'solid', 'stainless', 'chromoly', 'HD', 'street', 'race']
+    categories = ['engine', 'drivetrain', 'brakes', 'suspension', 'fuel']
+
+    def part(part_id):
+        brand = rng.choice(brands)
+        return {
+            'id': part_id,
+            'part_number': f"{brand[:2].upper()}{rng.randint(100, 99999)}-{rng.choice('ABCDEFX')}{rng.randint(10, 99)}",
+            'brand': brand,
+            'name': f"{rng.choice(adjectives)} {rng.choice(nouns)} {rng.choice(['', '.020', '.030', '4.030', 'kit', 'set'])}".strip(),
+            'category': rng.choice(categories)
+        }
+
+    parts = [part(i) for i in range(1, args.parts + 1)]
+    index = PartsPrefixIndex()
+    started = time.perf_counter()
+    index.load(parts)
+    load_seconds = time.perf_counter() - started
+
+    def query():
+        sample = rng.choice(parts)
+        kind = rng.random()
+        if kind < 0.5:
+            return sample['part_number'][:rng.randint(1, 8)]
+        if kind < 0.8:
+            return sample['name'][:rng.randint(1, 12)]
+        return f"{sample['brand'].lower()} {sample['name'].split()[0][:rng.randint(1, 5)]}"
+
+    queries = [query() for _ in range(args.queries)]
+    latencies = []
+    for q in queries:
+        started = time.perf_counter()
+        index.suggest(q, 10)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    updates = [part(rng.randint(1, args.parts)) for _ in range(1000)]
+    started = time.perf_counter()
+    for changed in updates:
+        index.upsert(changed)
+    upsert_ms = (time.perf_counter() - started) / len(updates) * 1000
+
+    print(f"Catalog: {args.parts:,} parts, loaded in {load_seconds:.2f}s")
+    print(f"Lookups: {args.queries:,}  p50 {percentile(0.50):.3f} ms  p99 {percentile(0.99):.3f} ms  "
+          f"max {latencies[-1] * 1000:.3f} ms")
+    print(f"Incremental update: {upsert_ms:.3f} ms per changed part")
+
+
+def bench_geometry(args):
+    """
+    Engine geometry for a synthetic builds table: one vectorized pass over
+    every build against computing builds one at a time, as the computed
+    endpoint does. The database is not queried.
+    """
+    import numpy as np
+    from engine_geometry import compute_builds, compute_geometry, computed_rows, input_arrays
+
+    rng = random.Random(41)
+    firing_orders = ['1-8-4-3-6-5-7-2', '1-5-4-8-6-3-7-2', '1-5-3-6-2-4', '1-3-4-2', None]
+
+    def build(build_id):
+        bore = 4.000 + rng.choice([0, 0.020, 0.030, 0.040, 0.060])
+        return {
+            'id': build_id,
+            'firing_order': rng.choice(firing_orders),
+            'bore_in': bore,
+            'stroke_in': rng.choice([3.000, 3.250, 3.400, 3.480, 3.750, 4.000]),
+            'rod_len_in': rng.choice([5.400, 5.700, 6.000, 6.125, 6.200]),
+            'deck_clear_in': rng.choice([-0.005, 0.000, 0.005, 0.010, 0.025]),
+            'piston_cc': rng.choice([-12.0, -5.0, 0.0, 4.0, 6.5, 18.0]),
+            'chamber_cc': rng.choice([58.0, 61.0, 64.0, 70.0, 72.0]),
+            'gasket_bore_in': rng.choice([None, bore + 0.030, bore + 0.060]),
+            'gasket_thickness_in': rng.choice([None, 0.027, 0.040, 0.051]),
+            'rev_limit_rpm': rng.choice([None, 6000, 6500, 7200, 8000]),
+        }
+
+    builds = [build(i) for i in range(1, args.builds + 1)]
+
+    started = time.perf_counter()
+    results = compute_builds(builds)
+    vectorized_seconds = time.perf_counter() - started
+
+    a = input_arrays(builds)
+    started = time.perf_counter()
+    compute_geometry(a['bore_in'], a['stroke_in'], a['rod_len_in'], a['deck_clear_in'], a['piston_cc'],
+                     a['chamber_cc'], a['gasket_bore_in'], a['gasket_thickness_in'], a['rev_limit_rpm'],
+                     a['cylinders'])
+    arrays_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rows = computed_rows(results)
+    rows_seconds = time.perf_counter() - started
+
+    sample = builds[:min(len(builds), args.sample)]
+    started = time.perf_counter()
+    single = [computed_rows(compute_builds([b]))[0] for b in sample]
+    single_seconds = (time.perf_counter() - started) / len(sample) * len(builds)
+
+    mismatches = sum(1 for a, b in zip(rows, single) if a != b)
+    computed_cr = np.count_nonzero(np.isfinite(results['static_cr']))
+
+    print(f"Builds: {len(builds):,} ({computed_cr:,} with a computable static CR)")
+    print(f"Vectorized pass: {vectorized_seconds * 1000:.1f} ms from rows "
+          f"({len(builds) / vectorized_seconds:,.0f} builds/s), {arrays_seconds * 1000:.1f} ms of it NumPy; "
+          f"rounding to rows {rows_seconds * 1000:.1f} ms")
+    print(f"One build at a time: {single_seconds:.2f} s extrapolated from {len(sample):,} "
+          f"({single_seconds / vectorized_seconds:.0f}x slower)")
+    if mismatches:
+        print(f"WARNING: {mismatches} builds differ between the two paths")
+
+
+def bench_similar_builds(args):
+    """
+    Lookup latency of the in-process similar builds index over a synthetic
+    builds table, plus the cost of incremental updates. The database is not
+    queried.
+    """
+    from build_similarity import BuildSimilarityIndex
+
+    rng = random.Random(43)
+    firing_orders = ['1-8-4-3-6-5-7-2', '1-5-4-8-6-3-7-2', '1-5-3-6-2-4', '1-3-4-2', None]
+    durations = [None, '204', '218', '224@.050', '230', '236 @ .050', '270 adv', '282 adv / 230 @ .050']
+
+    def build(build_id):
+        bore = 4.000 + rng.choice([0, 0.020, 0.030, 0.040, 0.060])
+        stroke = rng.choice([3.000, 3.250, 3.400, 3.480, 3.750, 4.000])
+        return {
+            'id': build_id,
+            'firing_order': rng.choice(firing_orders),
+            'bore_in': bore,
+            'stroke_in': stroke,
+            'rod_len_in': rng.choice([None, 5.400, 5.700, 6.000, 6.125, 6.200]),
+            'displacement_ci': rng.choice([None, round(bore * bore * stroke * 6.2832, 1)]),
+            'static_cr': rng.choice([None, 9.5, 10.0, 10.5, 11.0, 11.5, 12.5]),
+            'camshaft_duration_int': rng.choice(durations),
+            'camshaft_duration_exh': rng.choice(durations),
+            'camshaft_lift_int': rng.choice([None, 0.480, 0.512, 0.550, 0.600]),
+            'camshaft_lift_exh': rng.choice([None, 0.488, 0.520, 0.558, 0.610]),
+            'camshaft_lsa': rng.choice([None, 108, 110, 112, 114]),
+            'rev_limit_rpm': rng.choice([None, 6000, 6500, 7200, 8000]),
+        }
+
+    builds = [build(i) for i in range(1, args.builds + 1)]
+    index = BuildSimilarityIndex()
+    started = time.perf_counter()
+    index.load(builds)
+    load_seconds = time.perf_counter() - started
+
+    latencies = []
+    for _ in range(args.queries):
+        build_id = rng.randint(1, args.builds)
+        started = time.perf_counter()
+        index.similar(build_id, 10)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    updates = [build(rng.randint(1, args.builds + 1000)) for _ in range(1000)]
+    started = time.perf_counter()
+    for changed in updates:
+        index.upsert([changed])
+    upsert_ms = (time.perf_counter() - started) / len(updates) * 1000
+
+    print(f"Builds: {args.builds:,}, loaded in {load_seconds:.2f}s")
+    print(f"Top-10 lookups: {args.queries:,}  p50 {percentile(0.50):.3f} ms  p99 {percentile(0.99):.3f} ms  "
+          f"max {latencies[-1] * 1000:.3f} ms")
+    print(f"Incremental update: {upsert_ms:.3f} ms per changed build")
+
+
+def bench_dyno_curves(args):
+    """
+    Dyno CSV parsing, float32 storage and overlay resampling for synthetic
+    pulls: one interpolation over every pull against np.interp per pull.
+    The database is not queried.
+    """
+    import numpy as np
+    from dyno_curves import from_bytes, parse_dyno_csv, peaks, resample, rpm_grid, to_bytes
+
+    rng = np.random.default_rng(47)
+    lines = ['Run,Engine Speed (RPM),Power (HP),Torque (lb-ft),AFR']
+    for run in range(1, args.pulls + 1):
+        rpm = np.linspace(2000 + rng.integers(0, 500), 6500 + rng.integers(0, 1000), args.samples)
+        torque = 420 + 10 * run - 0.00002 * (rpm - 4500) ** 2 + rng.normal(0, 2, len(rpm))
+        afr = 12.8 + rng.normal(0, 0.1, len(rpm))
+        lines += [f"{run},{r:.0f},{t * r / 5252:.2f},{t:.2f},{a:.2f}" for r, t, a in zip(rpm, torque, afr)]
+    text = '\n'.join(lines)
+
+    started = time.perf_counter()
+    pulls = parse_dyno_csv(text)
+    parse_seconds = time.perf_counter() - started
+
+    stored = [{channel: to_bytes(pull[channel]) for channel in ('rpm', 'hp', 'torque', 'afr')} for pull in pulls]
+    csv_bytes = len(text.encode())
+    stored_bytes = sum(len(data) for pull in stored for data in pull.values())
+    curves = [{channel: from_bytes(data) for channel, data in pull.items()} for pull in stored]
+
+    grid = rpm_grid(curves, 50)
+    repeat = 200
+    started = time.perf_counter()
+    for _ in range(repeat):
+        values = resample(curves, grid, ('hp', 'torque', 'afr'))
+        peaks(grid, values['hp'], values['torque'])
+    overlay_ms = (time.perf_counter() - started) / repeat * 1000
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for curve in curves:
+            for channel in ('hp', 'torque', 'afr'):
+                inside = (grid >= curve['rpm'][0]) & (grid <= curve['rpm'][-1])
+                np.where(inside, np.interp(grid, curve['rpm'], curve[channel]), np.nan)
+    per_pull_ms = (time.perf_counter() - started) / repeat * 1000
+
+    samples = sum(len(pull['rpm']) for pull in pulls)
+    print(f"Pulls: {len(pulls)} x {args.samples:,} samples, CSV parsed in {parse_seconds * 1000:.1f} ms "
+          f"({samples / parse_seconds:,.0f} samples/s)")
+    print(f"Storage: {stored_bytes:,} bytes as float32 against {csv_bytes:,} bytes of CSV")
+    print(f"Overlay on {len(grid)} RPM points: {overlay_ms:.3f} ms with peaks; "
+          f"np.interp per pull and channel {per_pull_ms:.3f} ms")
+
+
+def bench_datalog(args):
+    """
+    Datalog ingest throughput, compressed size and time range reads for a
+    synthetic ECU log: parsing the CSV in upload-sized pieces and encoding
+    its chunks, then decoding the chunks a 10 second window touches against
+    decoding every chunk. The database is not queried.
+    """
+    import numpy as np
+    from datalog_store import TIME_CHANNEL, DatalogParser, chunk_rows, decode_chunk
+
+    rng = np.random.default_rng(50)
+    samples = int(args.minutes * 60 * args.rate)
+    time_ms = np.arange(samples) * 1000.0 / args.rate
+    rpm = 850 + 2800 * (1 + np.sin(time_ms / 9000.0)) + rng.normal(0, 5, samples)
+    columns = [np.round(rpm), np.round(rpm / 75 + rng.normal(0, 0.3, samples), 1),
+               np.round(14.7 + rng.normal(0, 0.25, samples), 2)]
+    columns += [np.round(rpm / (100 + 20 * i) + rng.normal(0, 0.5, samples), 1) for i in range(args.channels - 3)]
+    header = 'Time (ms),Engine RPM,MAP (kPa),AFR' + ''.join(f',Sensor {i}' for i in range(args.channels - 3))
+    body = np.column_stack([time_ms] + columns)
+    with io.StringIO() as text:
+        text.write(header + '\n')
+        np.savetxt(text, body, delimiter=',', fmt='%.10g')
+        data = text.getvalue().encode()
+
+    parser = DatalogParser()
+    chunks = []
+    stored_bytes = 0
+
+    def store(block):
+        nonlocal stored_bytes
+        rows, stored = chunk_rows(1, len(chunks), block, parser.channels)
+        chunks.append(rows)
+        stored_bytes += stored
+
+    started = time.perf_counter()
+    for offset in range(0, len(data), 65536):
+        for block in parser.feed(data[offset:offset + 65536]):
+            store(block)
+    for block in parser.finish():
+        store(block)
+    ingest_seconds = time.perf_counter() - started
+
+    # Channel rows by position: time, then the header's channels
+    window_start, window_end = args.minutes * 30.0, args.minutes * 30.0 + 10
+    wanted = (0, 1, 3)
+    repeat = 20
+    started = time.perf_counter()
+    for _ in range(repeat):
+        touched = [rows for rows in chunks if rows[0][4] >= window_start and rows[0][3] <= window_end]
+        for rows in touched:
+            for i in wanted:
+                decode_chunk(rows[i][1], rows[i][8])
+    window_ms = (time.perf_counter() - started) / repeat * 1000
+
+    started = time.perf_counter()
+    for rows in chunks:
+        for i in wanted:
+            decode_chunk(rows[i][1], rows[i][8])
+    full_ms = (time.perf_counter() - started) * 1000
+
+    check = np.concatenate([decode_chunk(TIME_CHANNEL, rows[0][8]) for rows in chunks])
+    raw_bytes = samples * (8 + 4 * args.channels)
+    print(f"Log: {samples:,} samples x {args.channels} channels, {len(data):,} bytes of CSV")
+    print(f"Ingest: {ingest_seconds:.2f} s ({samples / ingest_seconds:,.0f} samples/s, "
+          f"{len(data) / ingest_seconds / 1e6:.1f} MB/s) into {len(chunks)} chunks per channel")
+    print(f"Stored: {stored_bytes:,} bytes, {len(data) / stored_bytes:.1f}x smaller than CSV, "
+          f"{raw_bytes / stored_bytes:.1f}x smaller than raw float32/float64")
+    print(f"10 s window, 2 channels: {len(touched)} chunks, {window_ms:.2f} ms; every chunk {full_ms:.1f} ms")
+    print(f"Time round trip max error: {np.abs(check - time_ms / 1000).max():.2e} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Auto Specs performance benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    archive = subparsers.add_parser('snapshot-archive', help='Snapshot cold-storage archive/restore throughput')
+    archive.add_argument('--builds', type=int, default=50)
+    archive.add_argument('--snapshots', type=int, default=200, help='Snapshots per build')
+    archive.set_defaults(func=bench_snapshot_archive)
+
+    stress = subparsers.add_parser('concurrency-stress', help='Concurrent build writes, checking for lost updates')
+    stress.add_argument('--threads', type=int, default=8)
+    stress.add_argument('--writes', type=int, default=25, help='Writes per thread in each phase')
+    stress.set_defaults(func=bench_concurrency_stress)
+
+    wal = subparsers.add_parser('component-wal', help='WAL bytes per edit: builds columns vs build_components rows')
+    wal.add_argument('--edits', type=int, default=200, help='Edits per measurement')
+    wal.set_defaults(func=bench_component_wal)
+
+    plan = subparsers.add_parser('query-plan', help='EXPLAIN-check component attribute queries use their indexes')
+    plan.add_argument('--builds', type=int, default=20000)
+    plan.add_argument('--repeat', type=int, default=20, help='Timed executions per query')
+    plan.set_defaults(func=bench_query_plan)
+
+    suggest = subparsers.add_parser('parts-suggest', help='Parts prefix index typeahead latency')
+    suggest.add_argument('--parts', type=int, default=100000)
+    suggest.add_argument('--queries', type=int, default=20000)
+    suggest.set_defaults(func=bench_parts_suggest)
+
+    geometry = subparsers.add_parser('geometry', help='Vectorized engine geometry over synthetic builds')
+    geometry.add_argument('--builds', type=int, default=100000)
+    geometry.add_argument('--sample', type=int, default=5000, help='Builds computed one at a time for comparison')
+    geometry.set_defaults(func=bench_geometry)
+
+    similar = subparsers.add_parser('similar-builds', help='Similar builds index lookup latency')
+    similar.add_argument('--builds', type=int, default=100000)
+    similar.add_argument('--queries', type=int, default=2000)
+    similar.set_defaults(func=bench_similar_builds)
+
+    dyno = subparsers.add_parser('dyno-curves', help='Dyno CSV parsing, storage size and overlay resampling')
+    dyno.add_argument('--pulls', type=int, default=12)
+    dyno.add_argument('--samples', type=int, default=2000, help='Samples per pull')
+    dyno.set_defaults(func=bench_dyno_curves)
+
+    datalog = subparsers.add_parser('datalog', help='Datalog ingest throughput, compression and range reads')
+    datalog.add_argument('--minutes', type=float, default=30)
+    datalog.add_argument('--rate', type=float, default=500, help='Samples per second')
+    datalog.add_argument('--channels', type=int, default=12, help='Channels besides time (at least 3)')
+    datalog.set_defaults(func=bench_datalog)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
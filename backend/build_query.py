@@ -0,0 +1,181 @@
+"""
+Attribute filters over component documents.
+
+A filter names a path inside a component document, an operator and a value:
+
+    engine_internals_json.pistons.manufacturer=Wiseco
+    engine_internals_json.crankshaft.stroke_in>=3.4
+    transmission_json.type~tkx
+
+The first path segment is a component column (or its API name, e.g.
+engine-internals). Operators become predicates Postgres can answer from the
+indexes added in migration 013:
+
+    =              jsonpath equality, doc @@ '$."pistons"."manufacturer" == "Wiseco"',
+                   served by the GIN (jsonb_path_ops) index on the document.
+                   Numeric values also match the number ("3.400" finds 3.4), and
+                   lax jsonpath steps into arrays of sections.
+    !=             the document does not hold that value (not index-assisted)
+    > >= < <=      jsonb_numeric(doc #> path) compared to a number, served by the
+                   expression indexes for common measurements (crank stroke, rod
+                   length, bore, ...), a filtered scan for other paths
+    ~              case-insensitive substring match (jsonpath like_regex), not
+                   indexable; combine it with an indexed filter on large tables
+
+Both component storage modes are supported: in 'table' mode each filter is an
+EXISTS over build_components, which carries the same indexes.
+"""
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Tuple
+
+from fastapi import HTTPException
+
+from component_store import COLUMN_COMPONENT_MAP, COMPONENT_COLUMN_MAP, uses_component_table
+
+FILTER_PATTERN = re.compile(r'^(?P<path>[^=<>!~]+?)\s*(?P<op>>=|<=|!=|=|>|<|~)\s*(?P<value>.*)$')
+NUMBER_PATTERN = re.compile(r'^-?(\d+\.?\d*|\.\d+)$')
+RANGE_OPERATORS = ('>', '>=', '<', '<=')
+
+
+def parse_filter(expression: str) -> Dict[str, Any]:
+    """
+    Parse 'column.key.key<op>value' into its parts.
+
+    Returns:
+        {'field', 'column', 'path' (tuple of keys), 'op', 'value'}
+    """
+    match = FILTER_PATTERN.match(expression.strip())
+    if not match:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {expression}")
+
+    keys = [key.strip() for key in match.group('path').split('.')]
+    column = COMPONENT_COLUMN_MAP.get(keys[0], keys[0])
+    if column not in COLUMN_COMPONENT_MAP:
+        raise HTTPException(status_code=400, detail=f"Unknown component in filter: {keys[0]}")
+    if len(keys) < 2 or not all(keys[1:]):
+        raise HTTPException(status_code=400, detail=f"Filter needs a path inside {column}: {expression}")
+
+    op = match.group('op')
+    value = match.group('value').strip()
+    if op in RANGE_OPERATORS and _number(value) is None:
+        raise HTTPException(status_code=400, detail=f"Filter {op} needs a number: {expression}")
+
+    return {
+        'field': '.'.join([column] + keys[1:]),
+        'column': column,
+        'path': tuple(keys[1:]),
+        'op': op,
+        'value': value
+    }
+
+
+def _number(value: str):
+    """The value as a Decimal if it is written as a plain number, else None"""
+    if not NUMBER_PATTERN.match(value):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        return None
+
+
+def _jsonpath(path: Tuple[str, ...]) -> str:
+    """Quoted jsonpath accessor for a key path: $."a"."b" """
+    return '$' + ''.join('.' + json.dumps(key) for key in path)
+
+
+def _predicate(document: str, parsed: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """SQL predicate (and params) applying one filter to a document expression"""
+    accessor = _jsonpath(parsed['path'])
+    value = parsed['value']
+    op = parsed['op']
+
+    if op in ('=', '!='):
+        conditions = [f"{accessor} == {json.dumps(value)}"]
+        number = _number(value)
+        if number is not None:
+            conditions.append(f"{accessor} == {number}")
+        return f"{document} @@ %s::jsonpath", [' || '.join(conditions)]
+
+    if op == '~':
+        pattern = json.dumps(re.escape(value))
+        return f"{document} @? %s::jsonpath", [f'{accessor} ? (@ like_regex {pattern} flag "i")']
+
+    return f"jsonb_numeric({document} #> %s) {op} %s", [list(parsed['path']), _number(value)]
+
+
+def filter_conditions(filters: List[Dict[str, Any]], alias: str = 'b') -> Tuple[List[str], List[Any]]:
+    """
+    WHERE conditions matching builds (aliased `alias`) against parsed filters.
+
+    Returns:
+        (conditions to AND together, params)
+    """
+    conditions = []
+    params = []
+
+    for parsed in filters:
+        if uses_component_table():
+            predicate, predicate_params = _predicate('bc.doc', parsed)
+            condition = f"""EXISTS (
+                SELECT 1 FROM build_components bc
+                WHERE bc.build_id = {alias}.id AND bc.component = %s AND {predicate}
+            )"""
+            if parsed['op'] == '!=':
+                condition = f"NOT {condition}"
+            conditions.append(condition)
+            params.extend([COLUMN_COMPONENT_MAP[parsed['column']]] + predicate_params)
+        else:
+            predicate, predicate_params = _predicate(f"{alias}.{parsed['column']}", parsed)
+            if parsed['op'] == '!=':
+                predicate = f"NOT COALESCE({predicate}, false)"
+            conditions.append(predicate)
+            params.extend(predicate_params)
+
+    return conditions, params
+
+
+def matched_values_select(filters: List[Dict[str, Any]], alias: str = 'b') -> Tuple[str, List[Any]]:
+    """
+    Select-list entry returning each filtered path's (first) value for a build.
+
+    Returns:
+        (', jsonb_build_object(...) AS matched_values', params)
+    """
+    pairs = []
+    params = []
+
+    for parsed in filters:
+        if uses_component_table():
+            value = f"""(SELECT jsonb_path_query_first(bc.doc, %s::jsonpath) FROM build_components bc
+                         WHERE bc.build_id = {alias}.id AND bc.component = %s)"""
+            params.extend([parsed['field'], _jsonpath(parsed['path']), COLUMN_COMPONENT_MAP[parsed['column']]])
+        else:
+            value = f"jsonb_path_query_first({alias}.{parsed['column']}, %s::jsonpath)"
+            params.extend([parsed['field'], _jsonpath(parsed['path'])])
+        pairs.append(f"%s::text, {value}")
+
+    return f",\n        jsonb_build_object({', '.join(pairs)}) AS matched_values", params
+
+
+def query_page_sql(filters: List[Dict[str, Any]], after_id: int, limit: int) -> Tuple[str, List[Any]]:
+    """
+    One keyset page of builds matching all filters, ordered by id.
+
+    Returns:
+        (sql, params); the query fetches up to `limit` rows after `after_id`
+    """
+    conditions, condition_params = filter_conditions(filters, 'b')
+    values_select, values_params = matched_values_select(filters, 'b')
+
+    sql = f"""
+        SELECT b.id, b.slug, b.name, b.user_id, u.first_name, u.last_name{values_select}
+        FROM builds b
+        JOIN users u ON b.user_id = u.id
+        WHERE b.id > %s AND {' AND '.join(conditions)}
+        ORDER BY b.id
+        LIMIT %s
+    """
+    return sql, values_params + [after_id] + condition_params + [limit]
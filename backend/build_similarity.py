@@ -0,0 +1,345 @@
+"""
+In-process nearest-neighbour index for "similar builds".
+
+Every build is reduced to a short vector of engine specs: cylinders (from
+firing_order), bore, stroke, rod length, displacement, static CR, cam
+duration at .050 (parsed from the free-text camshaft_duration_* columns),
+valve lift, LSA and rev limit. Each feature is centred on the mean over
+all builds and divided by its spread (standard deviation, floored at
+SIMILARITY_FEATURES' min_scale so a feature nearly every build shares
+doesn't blow small differences up).
+
+The vectors are one float32 matrix, and the distance
+
+    distance = sqrt(sum(weight * (a - b)^2) / sum(weight))
+
+over the features both builds record expands into per-build terms stored
+alongside it (weight * a^2, weight * a, weight), so a lookup is a single
+matrix-vector product over every build. The nearest candidates are then
+re-ranked with the exact differences. Builds sharing less than
+MIN_SHARED_WEIGHT of the query's weighted features are not ranked.
+
+Like the parts prefix index, it is loaded once at startup and then kept
+current incrementally: triggers on builds (migration 021) NOTIFY
+'builds_changed' with the ids whose specs changed, and a listener thread
+re-reads just those rows. Bulk changes (or a lost listener connection)
+trigger a full reload, which also refreshes the normalization.
+
+Controlled by SIMILAR_BUILDS_INDEX (set to 0 to disable; /similar then
+ranks the DATABASE_CANDIDATES builds nearest in displacement, read from
+Postgres for each request).
+"""
+import os
+import select
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from db import DATABASE_URL, get_db_cursor
+from engine_cam import SEAT_CLOSING_OFFSET_DEG, parse_duration
+from engine_geometry import cylinder_count
+
+NOTIFY_CHANNEL = 'builds_changed'
+
+# Build columns the features are read from
+SIMILARITY_COLUMNS = (
+    'id', 'firing_order', 'bore_in', 'stroke_in', 'rod_len_in', 'displacement_ci', 'static_cr',
+    'camshaft_duration_int', 'camshaft_duration_exh', 'camshaft_lift_int', 'camshaft_lift_exh',
+    'camshaft_lsa', 'rev_limit_rpm'
+)
+
+# Feature -> (weight, smallest spread it is normalized by)
+SIMILARITY_FEATURES = {
+    'cylinders': (2.0, 1.0),
+    'bore_in': (2.0, 0.02),
+    'stroke_in': (2.0, 0.05),
+    'rod_len_in': (0.5, 0.05),
+    'displacement_ci': (1.0, 5.0),
+    'static_cr': (1.5, 0.25),
+    'cam_duration_int_050': (1.5, 2.0),
+    'cam_duration_exh_050': (1.0, 2.0),
+    'camshaft_lift_int': (1.0, 0.01),
+    'camshaft_lift_exh': (0.5, 0.01),
+    'camshaft_lsa': (1.0, 1.0),
+    'rev_limit_rpm': (0.5, 200.0),
+}
+
+# Builds read per request, nearest in displacement first, when the index
+# is disabled
+DATABASE_CANDIDATES = 2000
+
+# Share of the query's feature weight a candidate must also record
+MIN_SHARED_WEIGHT = 0.5
+
+# Candidates beyond the requested count re-ranked exactly (the expanded
+# float32 distances are only accurate to ~1e-5)
+RERANK_EXTRA = 32
+
+FEATURE_WEIGHTS = np.array([weight for weight, _ in SIMILARITY_FEATURES.values()], dtype=np.float32)
+MIN_SCALES = np.array([scale for _, scale in SIMILARITY_FEATURES.values()], dtype=np.float64)
+
+
+def duration_at_050(text: Optional[str]) -> float:
+    """.050 duration from a duration string; advertised-only specs lose the seat offset at each end"""
+    at_050, advertised = parse_duration(text)
+    return at_050 if not np.isnan(at_050) else advertised - 2 * SEAT_CLOSING_OFFSET_DEG
+
+
+def build_features(builds: Iterable[Dict]) -> np.ndarray:
+    """Raw feature matrix, one row per build in SIMILARITY_FEATURES order (NaN where not recorded)"""
+    rows = [
+        (
+            cylinder_count(build['firing_order']),
+            build['bore_in'], build['stroke_in'], build['rod_len_in'],
+            build['displacement_ci'], build['static_cr'],
+            duration_at_050(build['camshaft_duration_int']),
+            duration_at_050(build['camshaft_duration_exh']),
+            build['camshaft_lift_int'], build['camshaft_lift_exh'],
+            build['camshaft_lsa'], build['rev_limit_rpm'],
+        )
+        for build in builds
+    ]
+    return np.array(rows, dtype=np.float64).reshape(len(rows), len(SIMILARITY_FEATURES))
+
+
+class BuildSimilarityIndex:
+    """
+    Normalized feature matrix with incremental add/remove:
+
+        values   (capacity, features) float32, 0 where not recorded
+        weights  (capacity, features) float32, the feature weight where
+                 recorded and 0 where not
+        terms    (capacity, 3 * features) float32, weights * values^2,
+                 weights * values and weights: the distance expanded
+
+    Rows past count are spare capacity; a removed build's row is filled
+    with the last row, so the live rows stay contiguous.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = np.zeros((0, len(SIMILARITY_FEATURES)), dtype=np.float32)
+        self._weights = np.zeros((0, len(SIMILARITY_FEATURES)), dtype=np.float32)
+        self._terms = np.zeros((0, 3 * len(SIMILARITY_FEATURES)), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._rows = {}     # build_id -> row
+        self._count = 0
+        self._mean = np.zeros(len(SIMILARITY_FEATURES))
+        self._scale = MIN_SCALES.copy()
+        self.loaded = False
+
+    def _normalize(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        recorded = np.isfinite(features)
+        values = np.where(recorded, (features - self._mean) / self._scale, 0)
+        return values.astype(np.float32), (recorded * FEATURE_WEIGHTS).astype(np.float32)
+
+    @staticmethod
+    def _expand(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        return np.hstack([weights * values * values, weights * values, weights])
+
+    def load(self, builds: Iterable[Dict]):
+        """Replace the whole index, recomputing the normalization"""
+        builds = list(builds)
+        features = build_features(builds)
+        # Mean and standard deviation of the recorded values (0 for a feature no build records)
+        recorded = np.isfinite(features)
+        counts = np.maximum(recorded.sum(axis=0), 1)
+        mean = np.where(recorded, features, 0).sum(axis=0) / counts
+        spread = np.sqrt(np.square(np.where(recorded, features - mean, 0)).sum(axis=0) / counts)
+
+        with self._lock:
+            self._mean, self._scale = mean, np.maximum(spread, MIN_SCALES)
+            self._values, self._weights = self._normalize(features)
+            self._terms = self._expand(self._values, self._weights)
+            self._ids = np.array([build['id'] for build in builds], dtype=np.int64)
+            self._rows = {int(build_id): row for row, build_id in enumerate(self._ids)}
+            self._count = len(builds)
+            self.loaded = True
+
+    def _grow_locked(self, needed: int):
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        for name in ('_values', '_weights', '_terms', '_ids'):
+            array = getattr(self, name)
+            grown = np.zeros((capacity, *array.shape[1:]), dtype=array.dtype)
+            grown[:self._count] = array[:self._count]
+            setattr(self, name, grown)
+
+    def _remove_locked(self, build_id: int):
+        row = self._rows.pop(build_id, None)
+        if row is None:
+            return
+        last = self._count - 1
+        if row != last:
+            self._values[row] = self._values[last]
+            self._weights[row] = self._weights[last]
+            self._terms[row] = self._terms[last]
+            self._ids[row] = self._ids[last]
+            self._rows[int(self._ids[row])] = row
+        self._count = last
+
+    def upsert(self, builds: List[Dict]):
+        """Add builds, or re-index them after a change"""
+        if not builds:
+            return
+        values, weights = self._normalize(build_features(builds))
+        terms = self._expand(values, weights)
+        with self._lock:
+            for build, value, weight, term in zip(builds, values, weights, terms):
+                row = self._rows.get(build['id'])
+                if row is None:
+                    self._grow_locked(self._count + 1)
+                    row = self._count
+                    self._count += 1
+                    self._ids[row] = build['id']
+                    self._rows[build['id']] = row
+                self._values[row] = value
+                self._weights[row] = weight
+                self._terms[row] = term
+
+    def remove(self, build_ids: Iterable[int]):
+        with self._lock:
+            for build_id in build_ids:
+                self._remove_locked(build_id)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, build_id: int):
+        return build_id in self._rows
+
+    def similar(self, build_id: int, limit: int = 10) -> Optional[List[Tuple[int, float]]]:
+        """
+        The builds nearest to one in the index, nearest first.
+
+        Returns:
+            [(build_id, distance)] excluding the build itself, or None if it
+            isn't indexed. Distances are in spreads (1.0 ~ one standard
+            deviation on every shared feature).
+        """
+        with self._lock:
+            row = self._rows.get(build_id)
+            if row is None:
+                return None
+            query = self._values[row]
+            recorded = (self._weights[row] > 0).astype(np.float32)
+            if not recorded.any():
+                return []
+            limit = min(limit, self._count - 1)
+            if limit <= 0:
+                return []
+
+            # [squared distance, shared weight] for every build in one product
+            zeros = np.zeros_like(recorded)
+            products = np.stack([
+                np.concatenate([recorded, -2 * recorded * query, recorded * query * query]),
+                np.concatenate([zeros, zeros, recorded]),
+            ], axis=1)
+            squared, shared = (self._terms[:self._count] @ products).T
+            comparable = shared >= MIN_SHARED_WEIGHT * self._weights[row].sum()
+            comparable[row] = False
+            squared = np.where(comparable, squared / np.maximum(shared, 1e-9), np.inf)
+
+            candidates = min(limit + RERANK_EXTRA, self._count)
+            nearest = np.argpartition(squared, candidates - 1)[:candidates]
+            nearest = nearest[np.isfinite(squared[nearest])]
+            differences = self._values[nearest] - query
+            weights = self._weights[nearest] * recorded
+            distance = np.sqrt((weights * differences * differences).sum(axis=1) / weights.sum(axis=1))
+            order = np.lexsort((self._ids[nearest], distance))[:limit]
+            return [(int(self._ids[nearest[i]]), float(distance[i])) for i in order]
+
+similarity_index = BuildSimilarityIndex()
+
+
+def fetch_similarity_rows(cursor, ids: Optional[List[int]] = None) -> List[Dict]:
+    """SIMILARITY_COLUMNS for every build, or the given builds"""
+    if ids is None:
+        cursor.execute(f"SELECT {', '.join(SIMILARITY_COLUMNS)} FROM builds")
+    else:
+        cursor.execute(f"SELECT {', '.join(SIMILARITY_COLUMNS)} FROM builds WHERE id = ANY(%s)", (ids,))
+    return cursor.fetchall()
+
+
+def fetch_similarity_candidates(cursor, build_id: int, count: int = DATABASE_CANDIDATES) -> List[Dict]:
+    """SIMILARITY_COLUMNS for a build and the `count` builds nearest to it in displacement"""
+    columns = ', '.join(SIMILARITY_COLUMNS)
+    cursor.execute(f"""
+        SELECT {columns} FROM builds WHERE id = %(id)s
+        UNION ALL
+        (SELECT {columns} FROM builds
+         WHERE id <> %(id)s
+         ORDER BY abs(displacement_ci - (SELECT displacement_ci FROM builds WHERE id = %(id)s)) NULLS LAST, id
+         LIMIT %(count)s)
+    """, {'id': build_id, 'count': count})
+    return cursor.fetchall()
+
+
+def similarity_index_enabled() -> bool:
+    return os.getenv('SIMILAR_BUILDS_INDEX', '1') != '0'
+
+
+def reload_similarity_index():
+    """Load every build into the index"""
+    started = time.monotonic()
+    with get_db_cursor(commit=False) as cursor:
+        similarity_index.load(fetch_similarity_rows(cursor))
+    print(f"Similar builds index: {len(similarity_index)} builds loaded in {time.monotonic() - started:.2f}s")
+
+
+def apply_build_changes(ids: List[int]):
+    """Re-read changed builds and update just their rows"""
+    with get_db_cursor(commit=False) as cursor:
+        rows = fetch_similarity_rows(cursor, ids)
+    found = {row['id'] for row in rows}
+    similarity_index.upsert(rows)
+    similarity_index.remove(build_id for build_id in ids if build_id not in found)
+
+
+def start_similarity_index_listener() -> Optional[threading.Thread]:
+    """
+    Load the similar builds index and start a daemon thread that keeps it
+    current.
+
+    Controlled by SIMILAR_BUILDS_INDEX (0 disables it).
+    """
+    if not similarity_index_enabled():
+        return None
+
+    def run():
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # Anything changed while not listening is picked up here
+                reload_similarity_index()
+
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    payloads = {notify.payload for notify in conn.notifies}
+                    conn.notifies.clear()
+
+                    if '*' in payloads:
+                        reload_similarity_index()
+                    elif payloads:
+                        apply_build_changes(sorted({int(i) for p in payloads for i in p.split(',') if i}))
+            except Exception as e:
+                print(f"Similar builds index listener error: {e}")
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    thread = threading.Thread(target=run, name='similarity-index', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,249 @@
+"""
+API endpoint comparing several builds side by side.
+"""
+import json
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+
+from component_store import COLUMN_COMPONENT_MAP, COMPONENT_COLUMNS, attach_components, components_select
+from db import get_db_cursor
+from engine_cam import dynamic_compression, parse_duration, seat_closing_abdc
+from engine_geometry import compute_builds, computed_rows, input_arrays
+from json_diff import escape_pointer_token, flatten_leaves
+
+router = APIRouter()
+
+MAX_COMPARE_BUILDS = 8
+
+# builds columns not compared (identity, or shown in the header)
+BUILD_SKIP_COLUMNS = {'id', 'user_id', 'slug', 'name', 'version', 'notes', *COMPONENT_COLUMNS}
+
+# Columns of the related tables not compared
+RELATED_SKIP_COLUMNS = {'id', 'build_id', 'timestamp', 'notes'}
+
+# Section -> table whose latest row per build is compared
+LATEST_ROW_TABLES = {
+    'vehicle': 'vehicle_info',
+    'drivetrain': 'drivetrain_specs',
+    'tuning': 'build_tuning_settings',
+}
+
+# build_leaderboards columns shown as the performance section
+PERFORMANCE_COLUMNS = (
+    'best_hp', 'best_quarter_mile_et', 'best_quarter_mile_et_mph', 'best_quarter_mile_mph',
+    'hp_per_ci', 'weight_lbs', 'hp_per_ton'
+)
+
+
+def parse_build_ids(ids: str) -> List[int]:
+    """'12,7,31' -> [12, 7, 31] in the order given, without repeats"""
+    try:
+        build_ids = list(dict.fromkeys(int(i) for i in ids.split(',') if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated build ids")
+    if not 2 <= len(build_ids) <= MAX_COMPARE_BUILDS:
+        raise HTTPException(status_code=400, detail=f"Compare 2 to {MAX_COMPARE_BUILDS} builds")
+    return build_ids
+
+
+def plain(value: Any) -> Any:
+    """A column or document value as JSON (Decimal -> float)"""
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def comparison_row(section: str, field: str, values: List[Any], baseline: int) -> Dict:
+    """
+    One aligned field: its value per build, whether they differ and, for
+    numeric fields, each build's difference from the baseline build.
+    """
+    values = [plain(value) for value in values]
+    row = {
+        'section': section,
+        'field': field,
+        'values': values,
+        'differs': len({json.dumps(value, sort_keys=True, default=str) for value in values}) > 1,
+    }
+    recorded = [value for value in values if value is not None]
+    if recorded and all(is_number(value) for value in recorded):
+        base = values[baseline]
+        row['deltas'] = [
+            round(value - base, 4) if value is not None and base is not None else None
+            for value in values
+        ]
+    return row
+
+
+def document_leaves(document: Optional[Dict]) -> Dict[str, Any]:
+    """A component document's leaves by JSON Pointer (notes live in build_component_notes)"""
+    return {
+        ''.join('/' + escape_pointer_token(token) for token in path): value
+        for path, value in flatten_leaves(document or {})
+        if path and path[0] != 'notes_array'
+    }
+
+
+def latest_rows(cursor, table: str, build_ids: List[int]) -> Dict[int, Dict]:
+    """Each build's most recent row of a per-build history table"""
+    cursor.execute(f"""
+        SELECT DISTINCT ON (build_id) *
+        FROM {table}
+        WHERE build_id = ANY(%s)
+        ORDER BY build_id, timestamp DESC, id DESC
+    """, (build_ids,))
+    return {row['build_id']: row for row in cursor.fetchall()}
+
+
+def numeric(value: Any) -> float:
+    """A column or document value as a float, NaN when it isn't numeric"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def computed_metrics(builds: List[Dict]) -> Dict[str, List[Optional[float]]]:
+    """
+    Geometry and dynamic CR for every build in one vectorized pass.
+
+    The cam is read as /dynamic-cr reads a build's own cam:
+    camshaft_duration_int and camshaft_lsa, falling back to (and taking
+    advance_deg from) engine_internals_json.camshaft.
+    """
+    results = compute_builds(builds)
+    geometry = computed_rows(results)
+
+    camshafts = []
+    for build in builds:
+        camshaft = (build.get('engine_internals_json') or {}).get('camshaft')
+        camshafts.append(camshaft if isinstance(camshaft, dict) else {})
+    durations = np.array([
+        parse_duration(str(build['camshaft_duration_int'] or camshaft.get('duration_int_deg') or ''))
+        for build, camshaft in zip(builds, camshafts)
+    ], dtype=np.float64).reshape(len(builds), 2)
+    lsa = np.array([
+        numeric(build['camshaft_lsa'] if build['camshaft_lsa'] is not None else camshaft.get('lsa_deg'))
+        for build, camshaft in zip(builds, camshafts)
+    ])
+    advance = np.nan_to_num([numeric(camshaft.get('advance_deg')) for camshaft in camshafts])
+
+    inputs = input_arrays(builds)
+    ivc = seat_closing_abdc(durations[:, 0], durations[:, 1], lsa, advance)
+    _, dynamic_cr = dynamic_compression(inputs['bore_in'], inputs['stroke_in'], inputs['rod_len_in'],
+                                        results['clearance_cc'], ivc)
+    dynamic_cr = np.round(dynamic_cr, 2)
+
+    metrics = {name: [row[name] for row in geometry] for name in geometry[0]}
+    metrics['ivc_abdc_deg'] = [round(value, 1) if np.isfinite(value) else None for value in ivc.tolist()]
+    metrics['dynamic_cr'] = [value if np.isfinite(value) else None for value in dynamic_cr.tolist()]
+    return metrics
+
+
+@router.get("/api/builds/compare")
+async def compare_builds(ids: str, baseline: Optional[int] = None, differences_only: bool = False):
+    """
+    Several builds side by side (public).
+
+    Everything is read in a constant five queries however many builds are
+    compared: the builds with their component documents, the latest
+    vehicle_info, drivetrain_specs and build_tuning_settings row per build,
+    and their leaderboard results.
+
+    Args:
+        ids: Comma-separated build ids, 2 to MAX_COMPARE_BUILDS, in column order
+        baseline: Build the deltas are taken against (default: the first)
+        differences_only: Leave out fields that are the same on every build
+
+    Returns:
+        builds: the column headers (id, slug, name, version)
+        rows: one per field, aligned to builds, with section (build,
+            vehicle, drivetrain, tuning, performance, computed, or a
+            component name with the field as a JSON Pointer), values,
+            differs, and for numeric fields deltas from the baseline
+    """
+    try:
+        build_ids = parse_build_ids(ids)
+        baseline_id = baseline if baseline is not None else build_ids[0]
+        if baseline_id not in build_ids:
+            raise HTTPException(status_code=400, detail="baseline must be one of the compared builds")
+
+        with get_db_cursor(commit=False) as cursor:
+            cursor.execute(f"""
+                SELECT b.*{components_select("b")}
+                FROM builds b
+                WHERE b.id = ANY(%s)
+            """, (build_ids,))
+            found = {build['id']: dict(build) for build in cursor.fetchall()}
+            missing = [build_id for build_id in build_ids if build_id not in found]
+            if missing:
+                raise HTTPException(status_code=404, detail=f"Builds not found: {', '.join(map(str, missing))}")
+            builds = attach_components(cursor, [found[build_id] for build_id in build_ids])
+
+            related = {section: latest_rows(cursor, table, build_ids)
+                       for section, table in LATEST_ROW_TABLES.items()}
+
+            cursor.execute(f"""
+                SELECT build_id, {', '.join(PERFORMANCE_COLUMNS)}
+                FROM build_leaderboards
+                WHERE build_id = ANY(%s)
+            """, (build_ids,))
+            performance = {row['build_id']: row for row in cursor.fetchall()}
+
+        base = build_ids.index(baseline_id)
+        rows = []
+
+        columns = [column for column in builds[0] if column not in BUILD_SKIP_COLUMNS]
+        rows += [comparison_row('build', column, [build[column] for build in builds], base) for column in columns]
+
+        for section, latest in related.items():
+            columns = list(dict.fromkeys(
+                column for row in latest.values() for column in row if column not in RELATED_SKIP_COLUMNS
+            ))
+            rows += [
+                comparison_row(section, column, [(latest.get(i) or {}).get(column) for i in build_ids], base)
+                for column in columns
+            ]
+
+        rows += [
+            comparison_row('performance', column, [(performance.get(i) or {}).get(column) for i in build_ids], base)
+            for column in PERFORMANCE_COLUMNS
+        ]
+
+        rows += [
+            comparison_row('computed', name, values, base)
+            for name, values in computed_metrics(builds).items()
+        ]
+
+        # Component documents, aligned leaf by leaf
+        for column in COMPONENT_COLUMNS:
+            leaves = [document_leaves(build[column]) for build in builds]
+            paths = dict.fromkeys(path for build_leaves in leaves for path in build_leaves)
+            rows += [
+                comparison_row(COLUMN_COMPONENT_MAP[column], path, [leaf.get(path) for leaf in leaves], base)
+                for path in paths
+            ]
+
+        if differences_only:
+            rows = [row for row in rows if row['differs']]
+
+        return {
+            'success': True,
+            'builds': [
+                {'id': build['id'], 'slug': build['slug'], 'name': build['name'], 'version': build['version']}
+                for build in builds
+            ],
+            'baseline_build_id': baseline_id,
+            'rows': rows
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
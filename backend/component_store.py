@@ -0,0 +1,359 @@
+"""
+Storage for per-component build documents.
+
+A build has nine component documents (engine internals, suspension, ...).
+COMPONENT_STORAGE_MODE selects where they live:
+
+    columns  one JSONB column per component on the builds row (default)
+    table    one row per component in build_components(build_id, component, doc, version)
+
+In 'columns' mode every edit, even to a scalar like name, writes a new
+version of the whole wide builds tuple. In 'table' mode the builds row stays
+narrow and an edit only rewrites the one component row it touches.
+
+Callers always see the column layout: build dicts carry the *_json keys in
+both modes. Reads go through components_select/attach_components (or
+read_components) and writes through update_build, which also enforces the
+builds.version precondition.
+
+Switch an existing database between layouts with:
+    python component_store.py --to table|columns
+"""
+import os
+import json
+from typing import Any, Dict, List, Optional
+
+from db import get_db_cursor, jsonb_patch_expression
+
+# Map component names to database columns
+COMPONENT_COLUMN_MAP = {
+    'engine-internals': 'engine_internals_json',
+    'suspension': 'suspension_json',
+    'tires-wheels': 'tires_wheels_json',
+    'rear-differential': 'rear_differential_json',
+    'transmission': 'transmission_json',
+    'frame': 'frame_json',
+    'cab-interior': 'cab_interior_json',
+    'brakes': 'brakes_json',
+    'additional-components': 'additional_components_json'
+}
+COLUMN_COMPONENT_MAP = {column: component for component, column in COMPONENT_COLUMN_MAP.items()}
+COMPONENT_COLUMNS = list(COMPONENT_COLUMN_MAP.values())
+
+STORAGE_MODES = ('columns', 'table')
+STORAGE_MODE = os.getenv('COMPONENT_STORAGE_MODE', 'columns')
+if STORAGE_MODE not in STORAGE_MODES:
+    raise ValueError(f"COMPONENT_STORAGE_MODE must be one of {STORAGE_MODES}, got {STORAGE_MODE!r}")
+
+
+def uses_component_table() -> bool:
+    """True when component documents are stored in build_components"""
+    return STORAGE_MODE == 'table'
+
+
+def components_select(alias: str = 'builds') -> str:
+    """
+    Select-list entry that fetches a build's component documents in the
+    same statement as its builds row.
+
+    Append it to a query over builds (aliased `alias`), then pass the rows to
+    attach_components. Reading both in one statement gives them one
+    snapshot, so a build's version always matches its documents.
+    Empty in 'columns' mode, where SELECT * already includes them.
+    """
+    if not uses_component_table():
+        return ''
+    return f""",
+        (SELECT jsonb_object_agg(bc.component, bc.doc)
+         FROM build_components bc WHERE bc.build_id = {alias}.id) AS component_documents"""
+
+
+def attach_components(cursor, builds: List[Dict]) -> List[Dict]:
+    """
+    Fill the *_json keys of build dicts read with SELECT * FROM builds.
+
+    A no-op in 'columns' mode. In 'table' mode documents come from the
+    component_documents column added by components_select(), or, if the
+    query did not include it, from one query for all builds.
+
+    Args:
+        cursor: Open RealDictCursor
+        builds: Build rows as dicts (modified in place)
+
+    Returns:
+        The same list
+    """
+    if not uses_component_table() or not builds:
+        return builds
+
+    if all('component_documents' in build for build in builds):
+        documents = {
+            build['id']: {
+                COMPONENT_COLUMN_MAP[component]: doc
+                for component, doc in (build.pop('component_documents') or {}).items()
+            }
+            for build in builds
+        }
+    else:
+        cursor.execute("""
+            SELECT build_id, component, doc
+            FROM build_components
+            WHERE build_id = ANY(%s)
+        """, ([build['id'] for build in builds],))
+
+        documents = {}
+        for row in cursor.fetchall():
+            documents.setdefault(row['build_id'], {})[COMPONENT_COLUMN_MAP[row['component']]] = row['doc']
+
+    for build in builds:
+        build_documents = documents.get(build['id'], {})
+        for column in COMPONENT_COLUMNS:
+            build[column] = build_documents.get(column)
+
+    return builds
+
+
+def attach_component_notes(cursor, builds: List[Dict]) -> List[Dict]:
+    """
+    Put each build's component notes back into its *_json documents as
+    notes_array, the shape they had before notes moved to component_notes.
+    One query for all builds; call after attach_components.
+
+    Args:
+        cursor: Open RealDictCursor
+        builds: Build dicts (modified in place)
+
+    Returns:
+        The same list
+    """
+    if not builds:
+        return builds
+
+    cursor.execute("""
+        SELECT build_id, component, notes_array FROM build_component_notes
+        WHERE build_id = ANY(%s)
+    """, ([build['id'] for build in builds],))
+    by_id = {build['id']: build for build in builds}
+    for row in cursor.fetchall():
+        build = by_id[row['build_id']]
+        column = COMPONENT_COLUMN_MAP[row['component']]
+        build[column] = {**(build.get(column) or {}), 'notes_array': row['notes_array']}
+
+    return builds
+
+
+def read_components(cursor, build_id: int, columns: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Read a build's component documents.
+
+    Args:
+        cursor: Open RealDictCursor
+        build_id: Build to read
+        columns: Component columns to read (default: all nine)
+
+    Returns:
+        {column: document or None}, or None if the build does not exist
+    """
+    columns = columns or COMPONENT_COLUMNS
+
+    if not uses_component_table():
+        cursor.execute(f"SELECT {', '.join(columns)} FROM builds WHERE id = %s", (build_id,))
+        row = cursor.fetchone()
+        return {column: row[column] for column in columns} if row else None
+
+    cursor.execute("""
+        SELECT bc.component, bc.doc
+        FROM builds b
+        LEFT JOIN build_components bc
+            ON bc.build_id = b.id AND bc.component = ANY(%s)
+        WHERE b.id = %s
+    """, ([COLUMN_COMPONENT_MAP[column] for column in columns], build_id))
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+
+    documents = {column: None for column in columns}
+    for row in rows:
+        if row['component']:
+            documents[COMPONENT_COLUMN_MAP[row['component']]] = row['doc']
+    return documents
+
+
+def read_component_path(cursor, build_id: int, column: str, path: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Read one subtree of a component document, extracted in Postgres with #>.
+
+    Args:
+        cursor: Open RealDictCursor
+        build_id: Build to read
+        column: Component column
+        path: Key path (array indexes as strings); [] for the whole document
+
+    Returns:
+        {'version': build version, 'subtree': JSON text or None if the path
+        does not exist}, or None if the build does not exist
+    """
+    if uses_component_table():
+        cursor.execute("""
+            SELECT b.version, (bc.doc #> %s)::text AS subtree
+            FROM builds b
+            LEFT JOIN build_components bc ON bc.build_id = b.id AND bc.component = %s
+            WHERE b.id = %s
+        """, (path, COLUMN_COMPONENT_MAP[column], build_id))
+    else:
+        cursor.execute(f"""
+            SELECT version, ({column} #> %s)::text AS subtree
+            FROM builds
+            WHERE id = %s
+        """, (path, build_id))
+    return cursor.fetchone()
+
+
+def update_build(
+    cursor,
+    build_id: int,
+    values: Optional[Dict[str, Any]] = None,
+    documents: Optional[Dict[str, Any]] = None,
+    patches: Optional[Dict[str, List[Dict]]] = None,
+    user_id: Optional[int] = None,
+    expected_version: Optional[int] = None
+) -> Optional[int]:
+    """
+    Write scalar columns and component documents of one build.
+
+    The builds row is always updated (the version trigger bumps
+    builds.version), conditioned on ownership and the expected version.
+    Component writes only happen if that update matched.
+
+    Args:
+        cursor: Open RealDictCursor (the caller's transaction)
+        build_id: Build to update
+        values: Scalar builds columns -> new value
+        documents: Component columns -> whole replacement document (None clears it)
+        patches: Component columns -> merge_patch_operations() ops
+        user_id: Only update if the build belongs to this user
+        expected_version: Only update if builds.version still equals this
+
+    Returns:
+        The build's new version, or None if no row matched
+    """
+    values = values or {}
+    documents = documents or {}
+    patches = patches or {}
+
+    set_clauses = [f"{column} = %s" for column in values]
+    set_params = list(values.values())
+    component_writes = []  # (column, SQL expression over `doc` or None to delete, params)
+
+    for column, document in documents.items():
+        if uses_component_table():
+            if document is None:
+                component_writes.append((column, None, []))
+            else:
+                component_writes.append((column, '%s::jsonb', [json.dumps(document)]))
+        else:
+            set_clauses.append(f"{column} = %s::jsonb")
+            set_params.append(json.dumps(document) if document is not None else None)
+
+    for column, ops in patches.items():
+        if uses_component_table():
+            component_writes.append((column, *jsonb_patch_expression('doc', ops)))
+        else:
+            expression, params = jsonb_patch_expression(column, ops)
+            set_clauses.append(f"{column} = {expression}")
+            set_params.extend(params)
+
+    if not set_clauses:
+        # Component-only write: still bump the (now narrow) builds row version
+        set_clauses.append("version = version")
+
+    where = "id = %s"
+    where_params = [build_id]
+    if user_id is not None:
+        where += " AND user_id = %s"
+        where_params.append(user_id)
+    if expected_version is not None:
+        where += " AND version = %s"
+        where_params.append(expected_version)
+
+    cursor.execute(f"""
+        UPDATE builds
+        SET {', '.join(set_clauses)}
+        WHERE {where}
+        RETURNING version
+    """, set_params + where_params)
+    updated = cursor.fetchone()
+    if not updated:
+        return None
+
+    for column, expression, params in component_writes:
+        component = COLUMN_COMPONENT_MAP[column]
+        if expression is None:
+            cursor.execute("""
+                DELETE FROM build_components WHERE build_id = %s AND component = %s
+            """, (build_id, component))
+            continue
+
+        cursor.execute("""
+            INSERT INTO build_components (build_id, component)
+            VALUES (%s, %s)
+            ON CONFLICT (build_id, component) DO NOTHING
+        """, (build_id, component))
+        cursor.execute(f"""
+            UPDATE build_components
+            SET doc = {expression}, version = version + 1, updated_at = NOW()
+            WHERE build_id = %s AND component = %s
+        """, params + [build_id, component])
+
+    return updated['version']
+
+
+def move_documents(to_mode: str) -> Dict[str, int]:
+    """
+    Move every build's component documents into the given layout.
+
+    Each component is moved in its own transaction: documents are copied to
+    the destination and then cleared from the source.
+
+    Returns:
+        {component: documents moved}
+    """
+    if to_mode not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage mode: {to_mode}")
+
+    moved = {}
+    for component, column in COMPONENT_COLUMN_MAP.items():
+        with get_db_cursor() as cursor:
+            if to_mode == 'table':
+                cursor.execute(f"""
+                    INSERT INTO build_components (build_id, component, doc)
+                    SELECT id, %s, {column} FROM builds WHERE {column} IS NOT NULL
+                    ON CONFLICT (build_id, component) DO UPDATE
+                        SET doc = EXCLUDED.doc,
+                            version = build_components.version + 1,
+                            updated_at = NOW()
+                """, (component,))
+                moved[component] = cursor.rowcount
+                cursor.execute(f"UPDATE builds SET {column} = NULL WHERE {column} IS NOT NULL")
+            else:
+                cursor.execute(f"""
+                    UPDATE builds b SET {column} = bc.doc
+                    FROM build_components bc
+                    WHERE bc.build_id = b.id AND bc.component = %s
+                """, (component,))
+                moved[component] = cursor.rowcount
+                cursor.execute("DELETE FROM build_components WHERE component = %s", (component,))
+
+    return moved
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Move component documents between storage layouts')
+    parser.add_argument('--to', choices=STORAGE_MODES, required=True, dest='to_mode')
+    args = parser.parse_args()
+
+    result = move_documents(args.to_mode)
+    print(f"✅ Moved {sum(result.values())} component documents to '{args.to_mode}' storage")
+    print(f"   Set COMPONENT_STORAGE_MODE={args.to_mode} before restarting the API")
@@ -0,0 +1,110 @@
+"""
+Optimistic concurrency helpers for build writes.
+
+Builds carry a version number that the database increments on every UPDATE.
+Clients read it from the ETag header and send it back in If-Match; writers
+make the version part of the UPDATE's WHERE clause so a concurrent change
+is detected atomically instead of being silently overwritten.
+"""
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from json_diff import diff_documents, merge_patch_operations, leaf_changes
+
+# Attempts for server-side read-modify-write loops without a client precondition
+MAX_WRITE_ATTEMPTS = int(os.getenv('BUILD_WRITE_MAX_ATTEMPTS', '20'))
+
+
+def write_retry_delay(attempt: int) -> float:
+    """Jittered exponential backoff (seconds) before retrying a lost write race"""
+    return random.uniform(0, min(0.002 * 2 ** attempt, 0.25))
+
+
+def version_etag(version: int) -> str:
+    """Format a build version as a strong ETag"""
+    return f'"{version}"'
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """
+    Parse an If-Match header into the expected build version.
+
+    Returns None when no precondition was sent (or for '*').
+    """
+    if not if_match or if_match.strip() == '*':
+        return None
+
+    value = if_match.strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    value = value.strip('"')
+
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid If-Match header: {if_match}")
+
+
+def conflict_fields(current_build: Dict, changes: Dict[str, Any], replace: bool = False) -> List[Dict]:
+    """
+    Compare a rejected write against the build's current state.
+
+    Returns one entry per field path where the attempted value differs from
+    what is stored now, so the client can merge and retry.
+
+    Args:
+        current_build: Build row as currently stored
+        changes: The rejected field values
+        replace: JSON values were whole-document replacements (PUT) rather
+                 than merge patches (PATCH)
+    """
+    conflicts = []
+    for field, attempted in changes.items():
+        server_value = current_build.get(field)
+
+        if field.endswith('_json') and replace:
+            for op in diff_documents(server_value or {}, attempted):
+                conflicts.append({
+                    'field': field,
+                    'path': op['path'],
+                    'server_value': op.get('old_value'),
+                    'your_value': op.get('value')
+                })
+        elif field.endswith('_json') and isinstance(attempted, dict):
+            ops = merge_patch_operations(server_value, attempted)
+            for path, (server_leaf, attempted_leaf) in leaf_changes(ops).items():
+                conflicts.append({
+                    'field': '.'.join((field,) + path),
+                    'server_value': server_leaf,
+                    'your_value': attempted_leaf
+                })
+        elif server_value != attempted:
+            conflicts.append({
+                'field': field,
+                'server_value': server_value,
+                'your_value': attempted
+            })
+
+    return conflicts
+
+
+def raise_version_conflict(
+    current_build: Dict,
+    expected_version: int,
+    changes: Dict[str, Any],
+    replace: bool = False
+):
+    """Raise a 409 carrying the current version and a field diff of the rejected write"""
+    raise HTTPException(
+        status_code=409,
+        detail={
+            'message': 'Build was modified by another request',
+            'expected_version': expected_version,
+            'current_version': current_build['version'],
+            'conflicts': conflict_fields(current_build, changes, replace)
+        },
+        headers={'ETag': version_etag(current_build['version'])}
+    )
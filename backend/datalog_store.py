@@ -0,0 +1,269 @@
+"""
+Columnar, compressed storage for engine datalogs (wideband AFR, ECU logs).
+
+A datalog is a CSV of samples (time, RPM, MAP, AFR, timing, ...) at tens
+to hundreds of samples a second. Rows would cost a heap tuple per sample,
+so logs are stored in datalog_chunks (migration 023) as columns instead:
+each channel's samples are cut into chunks of CHUNK_SAMPLES, and every
+chunk is one row holding
+
+    data         the values, zstd-compressed (byte-shuffled when that's smaller)
+    t_start/end  the time range it covers (seconds from the start of the log)
+    min/max      the channel's range within it
+
+Chunk N covers the same samples in every channel. Byte shuffling stores
+the first byte of every value, then every second byte, and so on, so the
+slowly changing high bytes of sensor readings sit together and compress
+well; channels that hop between a few exact values (AFR to 0.01, gear,
+switches) compress better as whole values, so each chunk keeps whichever
+is smaller and says which in its first byte. Channels are float32. Time is float64 and stored as the difference
+from the previous sample, so a steady sample rate compresses to almost
+nothing.
+
+A time range query reads and decompresses only the chunks whose t_start..
+t_end overlaps it; the min/max columns give per-chunk overviews without
+decompressing anything.
+
+DatalogParser reads a CSV incrementally, so an upload is parsed and stored
+as it streams in rather than held in memory.
+"""
+import codecs
+import io
+import os
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import zstandard
+from psycopg2.extras import execute_values
+
+CHUNK_SAMPLES = int(os.getenv('DATALOG_CHUNK_SAMPLES', '4096'))
+COMPRESSION_LEVEL = int(os.getenv('DATALOG_ZSTD_LEVEL', '3'))
+
+TIME_CHANNEL = 'time_s'
+MAX_CHANNELS = 64
+
+# Header slugs taken as the time column, and those in milliseconds
+TIME_COLUMN_RE = re.compile(r'^(time|timestamp|elapsed|seconds|secs?)(_|$)')
+MILLISECONDS_RE = re.compile(r'(^|_)(ms|msec|millis\w*)($|_)')
+
+CHANNEL_DTYPES = {TIME_CHANNEL: np.dtype('<f8')}
+DEFAULT_DTYPE = np.dtype('<f4')
+
+# First byte of a stored chunk
+LAYOUT_PLAIN = 0
+LAYOUT_SHUFFLED = 1
+
+
+def channel_slug(header: str) -> str:
+    """'Engine RPM' -> 'engine_rpm', 'MAP (kPa)' -> 'map_kpa', 'AFR 1' -> 'afr_1'"""
+    return re.sub(r'[^a-z0-9]+', '_', header.strip().lower()).strip('_')[:64]
+
+
+def _shuffle(values: np.ndarray) -> bytes:
+    return values.view(np.uint8).reshape(-1, values.itemsize).T.tobytes()
+
+
+def _unshuffle(data: bytes, dtype: np.dtype) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, -1).T.copy().view(dtype).ravel()
+
+
+def encode_chunk(channel: str, values: np.ndarray) -> bytes:
+    """One chunk of a channel as stored: a layout byte, then the compressed values"""
+    dtype = CHANNEL_DTYPES.get(channel, DEFAULT_DTYPE)
+    values = np.asarray(values, dtype=dtype)
+    if channel == TIME_CHANNEL:
+        values = np.diff(values, prepend=0).astype(dtype)
+    compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL)
+    shuffled = compressor.compress(_shuffle(values))
+    plain = compressor.compress(values.tobytes())
+    return bytes([LAYOUT_SHUFFLED]) + shuffled if len(shuffled) <= len(plain) else bytes([LAYOUT_PLAIN]) + plain
+
+
+def decode_chunk(channel: str, data: bytes) -> np.ndarray:
+    """A stored chunk back to its values (float64)"""
+    dtype = CHANNEL_DTYPES.get(channel, DEFAULT_DTYPE)
+    raw = zstandard.ZstdDecompressor().decompress(data[1:])
+    values = _unshuffle(raw, dtype) if data[0] == LAYOUT_SHUFFLED else np.frombuffer(raw, dtype=dtype)
+    values = values.astype(np.float64)
+    return np.cumsum(values) if channel == TIME_CHANNEL else values
+
+
+def parse_rows(lines: List[str], columns: int) -> np.ndarray:
+    """CSV lines to a (rows, columns) float array; cells that aren't numbers are NaN"""
+    try:
+        return np.loadtxt(lines, delimiter=',', dtype=np.float64, ndmin=2).reshape(-1, columns)
+    except ValueError:
+        # Blank or text cells somewhere in the batch: the slower, lenient parser
+        data = np.genfromtxt(io.StringIO('\n'.join(lines)), delimiter=',', dtype=np.float64,
+                             usecols=range(columns), invalid_raise=False, ndmin=2)
+        return data.reshape(-1, columns)
+
+
+class DatalogParser:
+    """
+    Incremental datalog CSV parser.
+
+    feed() takes the upload as it arrives (bytes, any split) and yields
+    blocks of CHUNK_SAMPLES samples as {channel: array}, time first;
+    finish() yields the rest. The first line is the header. Time comes from
+    a time/timestamp/elapsed column (milliseconds when the header says ms),
+    or from sample_rate_hz when there is none. Samples whose time doesn't
+    advance past the last one are dropped.
+    """
+
+    def __init__(self, sample_rate_hz: Optional[float] = None, channels: Optional[List[str]] = None,
+                 after_time: float = -np.inf, after_sample: int = 0):
+        """
+        Args:
+            sample_rate_hz: Time base when the log has no time column
+            channels: The log's existing channels when appending (others are refused)
+            after_time: Time of the log's last stored sample when appending
+            after_sample: Samples already stored, for sample_rate_hz time
+        """
+        self.sample_rate_hz = sample_rate_hz
+        self.existing_channels = channels
+        self.channels: Optional[List[str]] = None
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+        self._partial = ''
+        self._lines: List[str] = []
+        self._columns = 0
+        self._time_column = None
+        self._time_scale = 1.0
+        self._last_time = after_time
+        self._sample = after_sample
+        self.raw_bytes = 0
+
+    def _read_header(self, line: str):
+        headers = [channel_slug(cell) for cell in line.split(',')]
+        self._columns = len(headers)
+        self._time_column = next((i for i, name in enumerate(headers) if TIME_COLUMN_RE.match(name)), None)
+        if self._time_column is None and not self.sample_rate_hz:
+            raise ValueError("No time column; pass sample_rate_hz")
+        if self._time_column is not None and MILLISECONDS_RE.search(headers[self._time_column]):
+            self._time_scale = 0.001
+
+        channels = []
+        for i, name in enumerate(headers):
+            if i == self._time_column:
+                continue
+            name = name or f'channel_{i + 1}'
+            while name in channels or name == TIME_CHANNEL:
+                name += '_2'
+            channels.append(name)
+        if not channels or len(channels) > MAX_CHANNELS:
+            raise ValueError(f"A datalog needs 1 to {MAX_CHANNELS} channels besides time")
+        if self.existing_channels is not None and not set(channels) <= set(self.existing_channels):
+            unknown = sorted(set(channels) - set(self.existing_channels))
+            raise ValueError(f"Channels not in this datalog: {', '.join(unknown)}")
+        self.channels = channels
+
+    def _block(self, lines: List[str]) -> Optional[Dict[str, np.ndarray]]:
+        data = parse_rows(lines, self._columns)
+        if self._time_column is None:
+            time = (self._sample + np.arange(len(data))) / self.sample_rate_hz
+        else:
+            time = data[:, self._time_column] * self._time_scale
+        self._sample += len(data)
+
+        # Keep samples that move time forward
+        previous = np.maximum.accumulate(np.concatenate([[self._last_time], np.nan_to_num(time, nan=-np.inf)]))[:-1]
+        keep = np.isfinite(time) & (time > previous)
+        if not keep.any():
+            return None
+        self._last_time = float(time[keep][-1])
+
+        values = np.delete(data, self._time_column, axis=1) if self._time_column is not None else data
+        block = {TIME_CHANNEL: time[keep]}
+        block.update({channel: values[keep, i] for i, channel in enumerate(self.channels)})
+        return block
+
+    def feed(self, piece: bytes) -> Iterator[Dict[str, np.ndarray]]:
+        self.raw_bytes += len(piece)
+        text = self._partial + self._decoder.decode(piece)
+        lines = text.split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if self.channels is None:
+                self._read_header(line)
+                continue
+            self._lines.append(line)
+            if len(self._lines) >= CHUNK_SAMPLES:
+                block = self._block(self._lines)
+                self._lines = []
+                if block:
+                    yield block
+
+    def finish(self) -> Iterator[Dict[str, np.ndarray]]:
+        yield from self.feed(b'\n')
+        if self.channels is None:
+            raise ValueError("Empty datalog: no header line")
+        if self._lines:
+            block = self._block(self._lines)
+            self._lines = []
+            if block:
+                yield block
+
+
+def chunk_rows(datalog_id: int, chunk_index: int, block: Dict[str, np.ndarray],
+               channels: List[str]) -> Tuple[List[tuple], int]:
+    """
+    datalog_chunks rows for one block, with the log's channels missing from
+    it stored as NaN.
+
+    Returns:
+        (rows, compressed bytes)
+    """
+    time = block[TIME_CHANNEL]
+    t_start, t_end = float(time[0]), float(time[-1])
+    rows, stored = [], 0
+    for channel in [TIME_CHANNEL, *channels]:
+        values = block.get(channel)
+        if values is None:
+            values = np.full(len(time), np.nan)
+        data = encode_chunk(channel, values)
+        stored += len(data)
+        finite = values[np.isfinite(values)]
+        rows.append((
+            datalog_id, channel, chunk_index, t_start, t_end, len(time),
+            float(finite.min()) if len(finite) else None, float(finite.max()) if len(finite) else None,
+            data,
+        ))
+    return rows, stored
+
+
+def insert_chunks(cursor, rows: List[tuple]):
+    execute_values(cursor, """
+        INSERT INTO datalog_chunks
+        (datalog_id, channel, chunk_index, t_start, t_end, sample_count, min_value, max_value, data)
+        VALUES %s
+    """, rows)
+
+
+def read_range(cursor, datalog_id: int, channels: List[str], start: float, end: float) -> Tuple[Dict[str, np.ndarray], int]:
+    """
+    Samples of some channels between two times, decompressing only the
+    chunks that overlap them.
+
+    Returns:
+        ({channel: values} with TIME_CHANNEL, chunks decompressed)
+    """
+    wanted = [TIME_CHANNEL, *channels]
+    cursor.execute("""
+        SELECT channel, chunk_index, data
+        FROM datalog_chunks
+        WHERE datalog_id = %s AND channel = ANY(%s) AND t_end >= %s AND t_start <= %s
+        ORDER BY chunk_index
+    """, (datalog_id, wanted, start, end))
+    rows = cursor.fetchall()
+
+    pieces = {channel: [] for channel in wanted}
+    for row in rows:
+        pieces[row['channel']].append(decode_chunk(row['channel'], bytes(row['data'])))
+    values = {channel: np.concatenate(arrays) if arrays else np.zeros(0) for channel, arrays in pieces.items()}
+
+    inside = (values[TIME_CHANNEL] >= start) & (values[TIME_CHANNEL] <= end)
+    return {channel: array[inside] for channel, array in values.items()}, len(rows)
@@ -0,0 +1,357 @@
+"""
+API endpoints for datalogs: streaming CSV ingest and time range queries.
+"""
+import os
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from auth import get_current_user
+from datalog_store import TIME_CHANNEL, DatalogParser, chunk_rows, insert_chunks, read_range
+from db import get_db_cursor
+from dyno_curves import rounded
+
+router = APIRouter()
+
+MAX_DATALOG_SIZE = int(os.getenv('MAX_DATALOG_SIZE', '536870912'))
+MAX_POINTS = 20000
+
+# datalogs columns as listed
+DATALOG_COLUMNS = (
+    'id', 'build_id', 'name', 'started_at', 'channels', 'sample_count', 'chunk_count', 'duration_s',
+    'raw_bytes', 'stored_bytes', 'status', 'created_at', 'updated_at'
+)
+
+
+def get_datalog(cursor, datalog_id: int, current_user: Optional[dict] = None) -> dict:
+    """A datalog's row; 404 when missing, 403 when current_user is given and doesn't own its build"""
+    cursor.execute(f"""
+        SELECT {', '.join('d.' + column for column in DATALOG_COLUMNS)}, b.user_id
+        FROM datalogs d JOIN builds b ON b.id = d.build_id
+        WHERE d.id = %s
+    """, (datalog_id,))
+    datalog = cursor.fetchone()
+    if not datalog:
+        raise HTTPException(status_code=404, detail="Datalog not found")
+    if current_user is not None and datalog['user_id'] != current_user['id']:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return datalog
+
+
+async def ingest(request: Request, parser: DatalogParser, datalog_id: int, first_chunk: int = 0) -> int:
+    """
+    Parse the request body as it streams in, storing each block of samples
+    as chunks in its own transaction.
+
+    Returns:
+        Samples stored
+    """
+    chunk_index, samples = first_chunk, 0
+
+    def store(block):
+        nonlocal chunk_index, samples
+        channels = parser.existing_channels or parser.channels
+        rows, stored = chunk_rows(datalog_id, chunk_index, block, channels)
+        with get_db_cursor() as cursor:
+            insert_chunks(cursor, rows)
+            cursor.execute("""
+                UPDATE datalogs
+                SET channels = %s, sample_count = sample_count + %s, chunk_count = chunk_count + 1,
+                    duration_s = %s, stored_bytes = stored_bytes + %s, updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (channels, len(block[TIME_CHANNEL]), float(block[TIME_CHANNEL][-1]), stored, datalog_id))
+        chunk_index += 1
+        samples += len(block[TIME_CHANNEL])
+
+    async for piece in request.stream():
+        if parser.raw_bytes + len(piece) > MAX_DATALOG_SIZE:
+            raise HTTPException(status_code=413, detail=f"Datalog exceeds {MAX_DATALOG_SIZE/1024/1024}MB limit")
+        for block in parser.feed(piece):
+            store(block)
+    for block in parser.finish():
+        store(block)
+    return samples
+
+
+def finish_ingest(cursor, datalog_id: int, raw_bytes: int) -> dict:
+    cursor.execute(f"""
+        UPDATE datalogs
+        SET status = 'complete', raw_bytes = raw_bytes + %s, updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s
+        RETURNING {', '.join(DATALOG_COLUMNS)}
+    """, (raw_bytes, datalog_id))
+    return dict(cursor.fetchone())
+
+
+@router.post("/api/builds/{build_id}/datalogs")
+async def upload_datalog(
+    request: Request,
+    build_id: int,
+    name: Optional[str] = None,
+    started_at: Optional[datetime] = None,
+    sample_rate_hz: Optional[float] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Upload a datalog as a raw CSV request body (owner only).
+
+    The body is parsed and stored while it streams in, so a log of any
+    length is never held in memory (see datalog_store.DatalogParser). The
+    first line names the channels; time comes from a time/timestamp/elapsed
+    column (seconds, or milliseconds when its header says ms) or from
+    sample_rate_hz.
+
+    Args:
+        name: Label for the log
+        started_at: Wall-clock time of the first sample
+        sample_rate_hz: Sample rate for logs without a time column
+
+    Returns:
+        The stored datalog
+    """
+    try:
+        if sample_rate_hz is not None and sample_rate_hz <= 0:
+            raise HTTPException(status_code=400, detail="sample_rate_hz must be positive")
+
+        with get_db_cursor() as cursor:
+            cursor.execute("SELECT user_id FROM builds WHERE id = %s", (build_id,))
+            build = cursor.fetchone()
+            if not build:
+                raise HTTPException(status_code=404, detail="Build not found")
+            if build['user_id'] != current_user['id']:
+                raise HTTPException(status_code=403, detail="Access denied")
+
+            # Channels are filled in once the header has been read
+            cursor.execute("""
+                INSERT INTO datalogs (build_id, name, started_at, channels)
+                VALUES (%s, %s, %s, '{}')
+                RETURNING id
+            """, (build_id, name, started_at))
+            datalog_id = cursor.fetchone()['id']
+
+        parser = DatalogParser(sample_rate_hz=sample_rate_hz)
+        try:
+            if not await ingest(request, parser, datalog_id):
+                raise ValueError("No samples")
+        except Exception:
+            with get_db_cursor() as cursor:
+                cursor.execute("DELETE FROM datalogs WHERE id = %s", (datalog_id,))
+            raise
+
+        with get_db_cursor() as cursor:
+            datalog = finish_ingest(cursor, datalog_id, parser.raw_bytes)
+
+        return {'success': True, 'datalog': datalog}
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Unreadable datalog: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+
+@router.post("/api/datalogs/{datalog_id}/samples")
+async def append_datalog_samples(
+    request: Request,
+    datalog_id: int,
+    sample_rate_hz: Optional[float] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Append samples to a datalog from a raw CSV request body (owner only),
+    e.g. a logger uploading as it records.
+
+    The body has its own header line naming some or all of the log's
+    channels (the others are stored as missing); samples at or before the
+    log's last time are dropped. Nothing is kept if the upload fails.
+
+    Returns:
+        The datalog and the number of samples appended
+    """
+    try:
+        with get_db_cursor() as cursor:
+            datalog = get_datalog(cursor, datalog_id, current_user)
+            # Claim the log so two appends can't interleave chunks
+            cursor.execute("""
+                UPDATE datalogs SET status = 'ingesting'
+                WHERE id = %s AND status = 'complete'
+            """, (datalog_id,))
+            if cursor.rowcount == 0:
+                raise HTTPException(status_code=409, detail="Datalog is being ingested")
+
+        parser = DatalogParser(
+            sample_rate_hz=sample_rate_hz, channels=datalog['channels'],
+            after_time=datalog['duration_s'], after_sample=datalog['sample_count']
+        )
+        try:
+            appended = await ingest(request, parser, datalog_id, datalog['chunk_count'])
+        except Exception:
+            with get_db_cursor() as cursor:
+                cursor.execute("DELETE FROM datalog_chunks WHERE datalog_id = %s AND chunk_index >= %s",
+                               (datalog_id, datalog['chunk_count']))
+                cursor.execute("""
+                    UPDATE datalogs
+                    SET sample_count = %s, chunk_count = %s, duration_s = %s, stored_bytes = %s, status = 'complete'
+                    WHERE id = %s
+                """, (datalog['sample_count'], datalog['chunk_count'], datalog['duration_s'],
+                      datalog['stored_bytes'], datalog_id))
+            raise
+
+        with get_db_cursor() as cursor:
+            datalog = finish_ingest(cursor, datalog_id, parser.raw_bytes)
+
+        return {'success': True, 'appended': appended, 'datalog': datalog}
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Unreadable datalog: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+
+@router.get("/api/builds/{build_id}/datalogs")
+async def list_datalogs(build_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """
+    A build's datalogs, newest first (public).
+
+    Args:
+        start, end: Only logs recorded (started_at to started_at + duration)
+            within this wall-clock range; logs without started_at are left out
+            when either is given
+    """
+    try:
+        with get_db_cursor(commit=False) as cursor:
+            cursor.execute("SELECT id FROM builds WHERE id = %s", (build_id,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail="Build not found")
+            cursor.execute(f"""
+                SELECT {', '.join(DATALOG_COLUMNS)}
+                FROM datalogs
+                WHERE build_id = %(build)s
+                  AND (%(start)s::timestamp IS NULL
+                       OR started_at + make_interval(secs => coalesce(duration_s, 0)) >= %(start)s)
+                  AND (%(end)s::timestamp IS NULL OR started_at <= %(end)s)
+                ORDER BY started_at DESC NULLS LAST, id DESC
+            """, {'build': build_id, 'start': start, 'end': end})
+            datalogs = cursor.fetchall()
+
+        return {'success': True, 'build_id': build_id, 'datalogs': [dict(row) for row in datalogs]}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/datalogs/{datalog_id}")
+async def get_datalog_summary(datalog_id: int):
+    """
+    A datalog and each channel's range, from the chunk statistics without
+    decompressing any samples (public).
+    """
+    try:
+        with get_db_cursor(commit=False) as cursor:
+            datalog = get_datalog(cursor, datalog_id)
+            cursor.execute("""
+                SELECT channel, min(min_value) AS min, max(max_value) AS max
+                FROM datalog_chunks
+                WHERE datalog_id = %s AND channel <> %s
+                GROUP BY channel
+            """, (datalog_id, TIME_CHANNEL))
+            ranges = {row['channel']: {'min': row['min'], 'max': row['max']} for row in cursor.fetchall()}
+
+        return {
+            'success': True,
+            **{column: datalog[column] for column in DATALOG_COLUMNS},
+            'channel_ranges': {channel: ranges.get(channel) for channel in datalog['channels']}
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/datalogs/{datalog_id}/samples")
+async def get_datalog_samples(
+    datalog_id: int,
+    channels: Optional[str] = None,
+    start: float = 0,
+    end: Optional[float] = None,
+    max_points: int = 2000
+):
+    """
+    Samples between two times, reading only the chunks that cover them (public).
+
+    Args:
+        channels: Comma-separated channel names (default: all)
+        start, end: Seconds from the start of the log (default: all of it)
+        max_points: Samples returned at most (1-20000); longer ranges are
+            thinned to every nth sample, with min/max/mean over all of them
+
+    Returns:
+        time and each channel's values (null where not recorded), the stride
+        taken, chunks read, and per-channel stats over the range
+    """
+    try:
+        max_points = max(1, min(max_points, MAX_POINTS))
+        with get_db_cursor(commit=False) as cursor:
+            datalog = get_datalog(cursor, datalog_id)
+            wanted: List[str] = list(dict.fromkeys(
+                c.strip() for c in channels.split(',') if c.strip()
+            )) if channels else list(datalog['channels'])
+            unknown = [channel for channel in wanted if channel not in datalog['channels']]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown channels: {', '.join(unknown)}")
+            end = end if end is not None else (datalog['duration_s'] or 0)
+            if end < start:
+                raise HTTPException(status_code=400, detail="end must not be before start")
+
+            values, chunks_read = read_range(cursor, datalog_id, wanted, start, end)
+
+        count = len(values[TIME_CHANNEL])
+        stride = max(1, -(-count // max_points))
+        stats = {}
+        for channel in wanted:
+            finite = values[channel][np.isfinite(values[channel])]
+            stats[channel] = {
+                'min': rounded(finite.min(), 3), 'max': rounded(finite.max(), 3), 'mean': rounded(finite.mean(), 3)
+            } if len(finite) else None
+
+        return {
+            'success': True,
+            'datalog_id': datalog_id,
+            'start': start,
+            'end': end,
+            'sample_count': count,
+            'stride': stride,
+            'chunks_read': chunks_read,
+            'time': rounded(values[TIME_CHANNEL][::stride], 4),
+            'channels': {channel: rounded(values[channel][::stride], 3) for channel in wanted},
+            'stats': stats
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/api/datalogs/{datalog_id}")
+async def delete_datalog(datalog_id: int, current_user: dict = Depends(get_current_user)):
+    """Delete a datalog and its samples (owner only)"""
+    try:
+        with get_db_cursor() as cursor:
+            get_datalog(cursor, datalog_id, current_user)
+            cursor.execute("DELETE FROM datalogs WHERE id = %s", (datalog_id,))
+
+        return {'success': True, 'id': datalog_id}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
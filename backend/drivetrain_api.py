@@ -0,0 +1,135 @@
+"""
+API endpoints for drivetrain gearing: RPM and road speed per gear.
+"""
+import math
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+
+from component_store import read_components
+from db import get_db_cursor
+from engine_drivetrain import (
+    DEFAULT_SPEEDS_MPH, corner_tire_sizes, drivetrain_table, first_value, parse_ratio, tire_diameter_in,
+    transmission_gear_ratios
+)
+
+router = APIRouter()
+
+# Builds columns the gearing is read from
+DRIVETRAIN_COLUMNS = ('rev_limit_rpm', 'transmission_gears', 'final_drive_ratio', 'tire_size_rear', 'tire_size_front')
+
+# Rev limits a table is computed for (its RPM columns run up to the limit)
+MIN_REV_LIMIT_RPM = 1000
+MAX_REV_LIMIT_RPM = 20000
+
+
+@router.get("/api/builds/{build_id}/drivetrain")
+async def get_drivetrain(
+    build_id: int,
+    tire_size: Optional[str] = None,
+    gear_ratios: Optional[str] = None,
+    final_drive: Optional[str] = None,
+    rev_limit_rpm: Optional[int] = None,
+    rpm_step: int = 500,
+    speeds: Optional[str] = None
+):
+    """
+    RPM vs road speed table for every gear (public).
+
+    Inputs come from the build, rear tire first:
+        tire        tire_size_rear, tires_wheels_json rear tires, then the fronts
+        gears       transmission_json gearset.first_gear... or gear_ratios.first...
+        final drive final_drive_ratio, the latest drivetrain_specs.rear_gear_ratio,
+                    rear_differential_json.gear_ratio,
+                    then transmission_json gear_ratios.final_drive
+        rev limit   rev_limit_rpm
+
+    Any of them can be overridden with unsaved editor values: tire_size,
+    gear_ratios ('2.66,1.78,1.30,1.00'), final_drive, rev_limit_rpm
+    (1000-20000). speeds is a comma-separated list of cruise speeds (default 30-80 mph).
+
+    Returns:
+        The resolved inputs and the tables from engine_drivetrain.drivetrain_table
+    """
+    try:
+        with get_db_cursor(commit=False) as cursor:
+            cursor.execute(f"""
+                SELECT b.id, b.version, {', '.join('b.' + column for column in DRIVETRAIN_COLUMNS)},
+                       (SELECT d.rear_gear_ratio FROM drivetrain_specs d
+                        WHERE d.build_id = b.id AND d.rear_gear_ratio IS NOT NULL
+                        ORDER BY d.timestamp DESC, d.id DESC LIMIT 1) AS rear_gear_ratio
+                FROM builds b
+                WHERE b.id = %s
+            """, (build_id,))
+            build = cursor.fetchone()
+            if not build:
+                raise HTTPException(status_code=404, detail="Build not found")
+            documents = read_components(
+                cursor, build_id, ['transmission_json', 'tires_wheels_json', 'rear_differential_json']
+            )
+
+        transmission = documents['transmission_json'] or {}
+        rear_differential = documents['rear_differential_json'] or {}
+        tires_wheels = documents['tires_wheels_json']
+
+        tire_candidates = [
+            tire_size, build['tire_size_rear'],
+            *corner_tire_sizes(tires_wheels, ['rear_left', 'rear_right']),
+            build['tire_size_front'],
+            *corner_tire_sizes(tires_wheels, ['front_left', 'front_right']),
+        ]
+        tire = next((size for size in tire_candidates if tire_diameter_in(size)), None)
+
+        if gear_ratios:
+            ratios = tuple(ratio for ratio in map(parse_ratio, gear_ratios.split(',')) if ratio)
+        else:
+            ratios = transmission_gear_ratios(transmission, build['transmission_gears'])
+
+        editor_ratios = transmission.get('gear_ratios') if isinstance(transmission, dict) else None
+        final = first_value(
+            final_drive, build['final_drive_ratio'], build['rear_gear_ratio'],
+            rear_differential.get('gear_ratio') if isinstance(rear_differential, dict) else None,
+            editor_ratios.get('final_drive') if isinstance(editor_ratios, dict) else None,
+        )
+        rev_limit = rev_limit_rpm or build['rev_limit_rpm']
+
+        missing = [name for name, value in (
+            ('tire size', tire), ('gear ratios', ratios), ('final drive ratio', final), ('rev_limit_rpm', rev_limit)
+        ) if not value]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Build has no {', '.join(missing)}; pass it as a parameter")
+
+        if not MIN_REV_LIMIT_RPM <= rev_limit <= MAX_REV_LIMIT_RPM:
+            raise HTTPException(
+                status_code=400,
+                detail=f"rev_limit_rpm must be {MIN_REV_LIMIT_RPM}-{MAX_REV_LIMIT_RPM}"
+            )
+
+        try:
+            cruise_speeds = tuple(float(s) for s in speeds.split(',')) if speeds else DEFAULT_SPEEDS_MPH
+        except ValueError:
+            raise HTTPException(status_code=400, detail="speeds must be comma-separated numbers")
+        if not all(math.isfinite(s) and s >= 0 for s in cruise_speeds):
+            raise HTTPException(status_code=400, detail="speeds must be non-negative numbers")
+        if not 50 <= rpm_step <= 5000 or len(cruise_speeds) > 50:
+            raise HTTPException(status_code=400, detail="rpm_step must be 50-5000 and at most 50 speeds")
+
+        diameter = tire_diameter_in(tire)
+        return {
+            'success': True,
+            'build_id': build['id'],
+            'version': build['version'],
+            'inputs': {
+                'tire_size': tire,
+                'tire_diameter_in': diameter,
+                'gear_ratios': list(ratios),
+                'final_drive': final,
+                'rev_limit_rpm': rev_limit,
+            },
+            **drivetrain_table(diameter, ratios, final, float(rev_limit), rpm_step, cruise_speeds)
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,333 @@
+"""
+API endpoints for dyno pull curves: CSV upload, listing and overlays.
+"""
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from psycopg2.extras import execute_values
+
+from auth import get_current_user
+from db import get_db_cursor
+from dyno_curves import from_bytes, parse_dyno_csv, peaks, resample, rounded, rpm_grid, to_bytes
+
+router = APIRouter()
+
+MAX_OVERLAY_PULLS = 12
+MAX_GRID_POINTS = 2000
+
+# dyno_pulls columns listed without the curve arrays
+PULL_SUMMARY_COLUMNS = (
+    'id', 'performance_test_id', 'build_id', 'label', 'source_filename', 'sample_count', 'rpm_min', 'rpm_max',
+    'peak_hp', 'peak_hp_rpm', 'peak_torque', 'peak_torque_rpm', 'created_at'
+)
+
+
+def pull_arrays(row: Dict) -> Dict[str, Optional[np.ndarray]]:
+    """A dyno_pulls row's stored channels as arrays"""
+    return {channel: from_bytes(row[channel]) for channel in ('rpm', 'hp', 'torque', 'afr')}
+
+
+def parse_id_list(name: str, text: Optional[str]) -> List[int]:
+    """'3,9,4' -> [3, 9, 4] without repeats"""
+    try:
+        return list(dict.fromkeys(int(i) for i in (text or '').split(',') if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be comma-separated ids")
+
+
+def refresh_test_peaks(cursor, performance_test_id: int):
+    """Set a performance test's dyno_hp/dyno_torque to the best of its pulls (left as is when it has none)"""
+    cursor.execute("""
+        UPDATE performance_tests t
+        SET dyno_hp = p.peak_hp, dyno_torque = p.peak_torque
+        FROM (
+            SELECT max(peak_hp) AS peak_hp, max(peak_torque) AS peak_torque
+            FROM dyno_pulls WHERE performance_test_id = %s
+        ) p
+        WHERE t.id = %s AND p.peak_hp IS NOT NULL
+    """, (performance_test_id, performance_test_id))
+
+
+@router.post("/api/builds/{build_id}/dyno-pulls")
+async def upload_dyno_pulls(
+    build_id: int,
+    file: UploadFile = File(...),
+    performance_test_id: Optional[int] = Form(None),
+    label: Optional[str] = Form(None),
+    dyno_type: Optional[str] = Form(None),
+    test_location: Optional[str] = Form(None),
+    weather_temp_f: Optional[float] = Form(None),
+    weather_humidity_pct: Optional[float] = Form(None),
+    elevation_ft: Optional[float] = Form(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Upload a dyno CSV export (owner only).
+
+    Every pull in the file (see dyno_curves.parse_dyno_csv) is stored
+    against performance_test_id, or against a new performance test made from
+    the dyno_type, location and weather fields (the weather is what
+    weather-corrected results are computed from). The test's dyno_hp and
+    dyno_torque become the best of its pulls.
+
+    Returns:
+        performance_test_id and each stored pull's summary
+    """
+    try:
+        file.file.seek(0, 2)
+        file_size = file.file.tell()
+        file.file.seek(0)
+        max_size = int(os.getenv('MAX_UPLOAD_SIZE', '10485760'))
+        if file_size > max_size:
+            raise HTTPException(status_code=400, detail=f"File size exceeds {max_size/1024/1024}MB limit")
+
+        try:
+            pulls = parse_dyno_csv(file.file.read().decode('utf-8-sig', errors='replace'))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Unreadable dyno CSV: {e}")
+
+        # Peaks for every pull at once, padded to the longest
+        length = max(len(pull['rpm']) for pull in pulls)
+        padded = {channel: np.full((len(pulls), length), np.nan) for channel in ('rpm', 'hp', 'torque')}
+        for i, pull in enumerate(pulls):
+            for channel in padded:
+                padded[channel][i, :len(pull['rpm'])] = pull[channel]
+        pull_peaks = peaks(padded['rpm'], padded['hp'], padded['torque'])
+
+        with get_db_cursor() as cursor:
+            cursor.execute("SELECT user_id FROM builds WHERE id = %s", (build_id,))
+            build = cursor.fetchone()
+            if not build:
+                raise HTTPException(status_code=404, detail="Build not found")
+            if build['user_id'] != current_user['id']:
+                raise HTTPException(status_code=403, detail="Access denied")
+
+            if performance_test_id is not None:
+                cursor.execute("SELECT id FROM performance_tests WHERE id = %s AND build_id = %s",
+                               (performance_test_id, build_id))
+                if not cursor.fetchone():
+                    raise HTTPException(status_code=404, detail="Performance test not found")
+                if dyno_type:
+                    cursor.execute("UPDATE performance_tests SET dyno_type = %s WHERE id = %s",
+                                   (dyno_type, performance_test_id))
+            else:
+                cursor.execute("""
+                    INSERT INTO performance_tests
+                    (build_id, test_location, weather_temp_f, weather_humidity_pct, elevation_ft, dyno_type)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                """, (build_id, test_location, weather_temp_f, weather_humidity_pct, elevation_ft, dyno_type))
+                performance_test_id = cursor.fetchone()['id']
+
+            rows = []
+            for i, pull in enumerate(pulls):
+                pull_label = label if len(pulls) == 1 else f"{label or 'Pull'} {i + 1}"
+                rows.append((
+                    performance_test_id, build_id, pull_label, file.filename, len(pull['rpm']),
+                    float(pull['rpm'][0]), float(pull['rpm'][-1]),
+                    round(float(pull_peaks['peak_hp'][i]), 2), int(pull_peaks['peak_hp_rpm'][i]),
+                    round(float(pull_peaks['peak_torque'][i]), 2), int(pull_peaks['peak_torque_rpm'][i]),
+                    to_bytes(pull['rpm']), to_bytes(pull['hp']), to_bytes(pull['torque']),
+                    to_bytes(pull['afr']) if pull['afr'] is not None else None,
+                ))
+            stored = execute_values(cursor, f"""
+                INSERT INTO dyno_pulls
+                (performance_test_id, build_id, label, source_filename, sample_count, rpm_min, rpm_max,
+                 peak_hp, peak_hp_rpm, peak_torque, peak_torque_rpm, rpm, hp, torque, afr)
+                VALUES %s
+                RETURNING {', '.join(PULL_SUMMARY_COLUMNS)}
+            """, rows, fetch=True)
+            refresh_test_peaks(cursor, performance_test_id)
+
+        return {
+            'success': True,
+            'performance_test_id': performance_test_id,
+            'pulls': [dict(row) for row in stored]
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+
+@router.get("/api/builds/{build_id}/dyno-pulls")
+async def list_dyno_pulls(build_id: int):
+    """A build's dyno pulls, newest first, without the curves (public)"""
+    try:
+        with get_db_cursor(commit=False) as cursor:
+            cursor.execute("SELECT id FROM builds WHERE id = %s", (build_id,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail="Build not found")
+            cursor.execute(f"""
+                SELECT {', '.join(PULL_SUMMARY_COLUMNS)}
+                FROM dyno_pulls
+                WHERE build_id = %s
+                ORDER BY created_at DESC, id DESC
+            """, (build_id,))
+            pulls = cursor.fetchall()
+
+        return {'success': True, 'build_id': build_id, 'pulls': [dict(row) for row in pulls]}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/dyno-pulls/overlay")
+async def overlay_dyno_pulls(
+    pulls: Optional[str] = None,
+    builds: Optional[str] = None,
+    rpm_step: int = 100,
+    rpm_min: Optional[int] = None,
+    rpm_max: Optional[int] = None,
+    baseline: Optional[int] = None,
+    corrected: bool = False
+):
+    """
+    Several pulls on one RPM grid, for overlay and delta plots (public).
+
+    Args:
+        pulls: Comma-separated pull ids
+        builds: Comma-separated build ids; each adds the build's highest-HP pull
+        rpm_step: Grid spacing (10-1000)
+        rpm_min, rpm_max: Grid range (default: every pull's range)
+        baseline: Pull the deltas are taken against (default: the first)
+        corrected: Scale HP and torque by each test's SAE correction factor
+            (pulls whose test has no weather stay uncorrected, flagged)
+
+    Returns:
+        rpm: the grid; per pull its summary, hp/torque/afr on the grid (null
+        outside the pull's range), hp_delta/torque_delta from the baseline
+        pull, and peaks over the grid
+    """
+    try:
+        pull_ids = parse_id_list('pulls', pulls)
+        build_ids = parse_id_list('builds', builds)
+        if not pull_ids and not build_ids:
+            raise HTTPException(status_code=400, detail="Pass pulls and/or builds")
+        if len(pull_ids) + len(build_ids) > MAX_OVERLAY_PULLS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_OVERLAY_PULLS} pulls per overlay")
+        rpm_step = max(10, min(rpm_step, 1000))
+
+        with get_db_cursor(commit=False) as cursor:
+            cursor.execute("""
+                SELECT p.*, t.sae_correction_factor
+                FROM dyno_pulls p
+                JOIN performance_tests t ON t.id = p.performance_test_id
+                WHERE p.id = ANY(%(pulls)s)
+                   OR p.id IN (
+                       SELECT DISTINCT ON (build_id) id FROM dyno_pulls
+                       WHERE build_id = ANY(%(builds)s)
+                       ORDER BY build_id, peak_hp DESC NULLS LAST, id
+                   )
+            """, {'pulls': pull_ids, 'builds': build_ids})
+            rows = cursor.fetchall()
+
+        by_id = {row['id']: row for row in rows}
+        # A build's best pull is the one it added unless it was also listed in pulls
+        best_by_build = {row['build_id']: row for row in rows if row['id'] not in pull_ids}
+        missing = [str(i) for i in pull_ids if i not in by_id]
+        missing += [f"build {i}" for i in build_ids if i not in {row['build_id'] for row in rows}]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"No dyno pulls for: {', '.join(missing)}")
+
+        ordered = [by_id[i] for i in pull_ids] + [best_by_build[i] for i in build_ids if i in best_by_build]
+        baseline_id = baseline if baseline is not None else ordered[0]['id']
+        ids = [row['id'] for row in ordered]
+        if baseline_id not in ids:
+            raise HTTPException(status_code=400, detail="baseline must be one of the overlaid pulls")
+
+        curves = [pull_arrays(row) for row in ordered]
+        grid = rpm_grid(curves, rpm_step, rpm_min, rpm_max)
+        if not 2 <= len(grid) <= MAX_GRID_POINTS:
+            raise HTTPException(status_code=400, detail=f"The RPM grid must have 2 to {MAX_GRID_POINTS} points")
+
+        values = resample(curves, grid, ('hp', 'torque', 'afr'))
+        factors = np.array([float(row['sae_correction_factor']) if corrected and row['sae_correction_factor']
+                            else 1.0 for row in ordered])[:, None]
+        hp, torque = values['hp'] * factors, values['torque'] * factors
+        base = ids.index(baseline_id)
+        hp_delta, torque_delta = hp - hp[base], torque - torque[base]
+        grid_peaks = peaks(grid, hp, torque)
+
+        overlays = []
+        for i, row in enumerate(ordered):
+            overlays.append({
+                **{column: row[column] for column in PULL_SUMMARY_COLUMNS},
+                'corrected': bool(corrected and row['sae_correction_factor']),
+                'hp': rounded(hp[i], 1),
+                'torque': rounded(torque[i], 1),
+                'afr': rounded(values['afr'][i], 2) if row['afr'] is not None else None,
+                'hp_delta': rounded(hp_delta[i], 1),
+                'torque_delta': rounded(torque_delta[i], 1),
+                'grid_peaks': {name: rounded(peak[i], 1) for name, peak in grid_peaks.items()},
+            })
+
+        return {
+            'success': True,
+            'rpm': grid.astype(int).tolist(),
+            'baseline_pull_id': baseline_id,
+            'pulls': overlays
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/dyno-pulls/{pull_id}")
+async def get_dyno_pull(pull_id: int):
+    """One pull with its samples as recorded (public)"""
+    try:
+        with get_db_cursor(commit=False) as cursor:
+            cursor.execute("SELECT * FROM dyno_pulls WHERE id = %s", (pull_id,))
+            row = cursor.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Dyno pull not found")
+
+        curve = pull_arrays(row)
+        return {
+            'success': True,
+            **{column: row[column] for column in PULL_SUMMARY_COLUMNS},
+            'rpm': rounded(curve['rpm'], 0),
+            'hp': rounded(curve['hp'], 1),
+            'torque': rounded(curve['torque'], 1),
+            'afr': rounded(curve['afr'], 2) if curve['afr'] is not None else None,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/api/dyno-pulls/{pull_id}")
+async def delete_dyno_pull(pull_id: int, current_user: dict = Depends(get_current_user)):
+    """Delete a pull (owner only); its test's peaks are re-taken from the pulls left"""
+    try:
+        with get_db_cursor() as cursor:
+            cursor.execute("""
+                SELECT p.performance_test_id, b.user_id
+                FROM dyno_pulls p JOIN builds b ON b.id = p.build_id
+                WHERE p.id = %s
+            """, (pull_id,))
+            pull = cursor.fetchone()
+            if not pull:
+                raise HTTPException(status_code=404, detail="Dyno pull not found")
+            if pull['user_id'] != current_user['id']:
+                raise HTTPException(status_code=403, detail="Access denied")
+
+            cursor.execute("DELETE FROM dyno_pulls WHERE id = %s", (pull_id,))
+            refresh_test_peaks(cursor, pull['performance_test_id'])
+
+        return {'success': True, 'id': pull_id}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,219 @@
+"""
+Dyno pull curves: CSV parsing, compact storage, resampling and peaks.
+
+performance_tests keeps only peak dyno_hp and dyno_torque; a dyno session
+exports the whole sweep. parse_dyno_csv() reads those exports (Dynojet,
+Mustang, SuperFlow and hand-made sheets all name their columns a little
+differently, see COLUMN_PATTERNS), splitting on a run/pull column when the
+file holds several pulls. Missing HP or torque is derived from the other:
+
+    hp = torque * rpm / 5252
+
+Each pull is stored in dyno_pulls (migration 022) as little-endian float32
+arrays, sorted by RPM with repeated RPM readings averaged: 12 bytes per
+sample instead of a row each.
+
+resample() puts any number of pulls on one RPM grid in a single np.interp
+call: every pull's RPM is offset by PULL_RPM_OFFSET times its position, so
+the concatenated samples stay increasing and one interpolation serves all
+of them. Grid points outside a pull's own RPM range are NaN rather than
+extrapolated. Peaks over the resampled matrix are one argmax along the RPM axis.
+"""
+import csv
+import io
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+HP_TORQUE_CROSSOVER_RPM = 5252.0
+
+# Separates pulls when resampling; larger than any RPM range
+PULL_RPM_OFFSET = 1.0e6
+
+MAX_PULL_SAMPLES = 50000
+MAX_PULLS_PER_FILE = 20
+
+# Channel -> header pattern (first matching column wins)
+COLUMN_PATTERNS = {
+    'rpm': re.compile(r'\b(rpm|engine speed)\b', re.IGNORECASE),
+    'hp': re.compile(r'\b(w?hp|bhp|power|horsepower)\b', re.IGNORECASE),
+    'torque': re.compile(r'\b(torque|tq|lb[- ]?ft|ft[- ]?lbs?)\b', re.IGNORECASE),
+    'afr': re.compile(r'\b(afr|a/f|air[ /]?fuel)\b', re.IGNORECASE),
+    'run': re.compile(r'\b(run|pull)\b', re.IGNORECASE),
+}
+
+# Stored curve channels; afr is optional
+CURVE_CHANNELS = ('rpm', 'hp', 'torque', 'afr')
+
+
+def to_bytes(values: np.ndarray) -> bytes:
+    """A curve channel as stored: little-endian float32"""
+    return np.asarray(values, dtype='<f4').tobytes()
+
+
+def from_bytes(data: Optional[bytes]) -> Optional[np.ndarray]:
+    """A stored curve channel as float64 (None when not recorded)"""
+    return None if data is None else np.frombuffer(data, dtype='<f4').astype(np.float64)
+
+
+def rounded(values: np.ndarray, digits: int) -> list:
+    """Rounded values (any shape) as nested lists, None for NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.array(np.round(values, digits), dtype=object)
+    result[~np.isfinite(values)] = None
+    return result.tolist()
+
+
+def header_columns(cells: List[str]) -> Dict[str, int]:
+    """Channel -> column index for a header row (channels not found are left out)"""
+    columns = {}
+    for channel, pattern in COLUMN_PATTERNS.items():
+        for i, cell in enumerate(cells):
+            if i not in columns.values() and pattern.search(cell):
+                columns[channel] = i
+                break
+    return columns
+
+
+def clean_pull(rpm: np.ndarray, hp: np.ndarray, torque: np.ndarray, afr: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    One pull's samples sorted by RPM, with repeated RPM readings averaged
+    and samples missing RPM or power dropped.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hp = np.where(np.isnan(hp), torque * rpm / HP_TORQUE_CROSSOVER_RPM, hp)
+        torque = np.where(np.isnan(torque), hp * HP_TORQUE_CROSSOVER_RPM / rpm, torque)
+    keep = np.isfinite(rpm) & (rpm > 0) & np.isfinite(hp) & np.isfinite(torque)
+    rpm, hp, torque, afr = rpm[keep], hp[keep], torque[keep], afr[keep]
+
+    unique_rpm, inverse = np.unique(rpm, return_inverse=True)
+    pull = {'rpm': unique_rpm}
+    for channel, values in (('hp', hp), ('torque', torque), ('afr', afr)):
+        recorded = np.isfinite(values)
+        sums = np.bincount(inverse, weights=np.where(recorded, values, 0), minlength=len(unique_rpm))
+        seen = np.bincount(inverse, weights=recorded, minlength=len(unique_rpm))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pull[channel] = sums / seen
+    if not np.isfinite(pull['afr']).any():
+        pull['afr'] = None
+    return pull
+
+
+def parse_dyno_csv(text: str) -> List[Dict[str, np.ndarray]]:
+    """
+    Pulls from a dyno CSV export.
+
+    The header is the first line naming an RPM column and an HP or torque
+    column; lines before it (report titles, run info) are skipped, as are
+    units lines and any other non-numeric rows after it.
+
+    Returns:
+        One dict per pull (by run/pull column when present, in file order)
+        of rpm, hp, torque and afr (None when not logged) arrays
+
+    Raises:
+        ValueError: No usable header or samples, or too many pulls/samples
+    """
+    lines = text.splitlines()
+    for header_index, line in enumerate(lines):
+        columns = header_columns(next(csv.reader([line]), []))
+        if 'rpm' in columns and ('hp' in columns or 'torque' in columns):
+            break
+    else:
+        raise ValueError("No header with an RPM column and an HP or torque column")
+
+    channels = ['rpm', 'hp', 'torque', 'afr', 'run']
+    usecols = [columns[channel] for channel in channels if channel in columns]
+    data = np.genfromtxt(
+        io.StringIO('\n'.join(lines[header_index + 1:])), delimiter=',', usecols=usecols,
+        dtype=np.float64, invalid_raise=False, ndmin=2
+    )
+    data = data.reshape(-1, len(usecols))
+    values = {
+        channel: data[:, usecols.index(columns[channel])] if channel in columns else np.full(len(data), np.nan)
+        for channel in channels
+    }
+
+    # Rows without a run number (units lines, blanks) belong to the run before them
+    runs = values['run']
+    if np.isfinite(runs).any():
+        last_numbered = np.maximum.accumulate(np.where(np.isfinite(runs), np.arange(len(runs)), 0))
+        runs = np.nan_to_num(runs[last_numbered], nan=runs[np.isfinite(runs)][0])
+        run_ids = list(dict.fromkeys(runs.tolist()))
+    else:
+        runs = np.zeros(len(data))
+        run_ids = [0.0]
+    if len(run_ids) > MAX_PULLS_PER_FILE:
+        raise ValueError(f"At most {MAX_PULLS_PER_FILE} pulls per file")
+
+    pulls = []
+    for run in run_ids:
+        selected = runs == run
+        pull = clean_pull(values['rpm'][selected], values['hp'][selected],
+                          values['torque'][selected], values['afr'][selected])
+        if len(pull['rpm']) > MAX_PULL_SAMPLES:
+            raise ValueError(f"At most {MAX_PULL_SAMPLES} samples per pull")
+        if len(pull['rpm']) >= 2:
+            pulls.append(pull)
+    if not pulls:
+        raise ValueError("No pull with at least two samples")
+    return pulls
+
+
+def peaks(rpm: np.ndarray, hp: np.ndarray, torque: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Peak HP and torque and the RPM they occur at, per curve.
+
+    Args:
+        rpm: Grid (n,) shared by every curve, or (curves, n)
+        hp, torque: (curves, n), NaN where a curve has no value
+
+    Returns:
+        peak_hp, peak_hp_rpm, peak_torque, peak_torque_rpm: (curves,) arrays,
+        NaN for curves with no values
+    """
+    hp, torque = np.atleast_2d(hp), np.atleast_2d(torque)
+    rpm = np.broadcast_to(rpm, hp.shape)
+    result = {}
+    for name, values in (('hp', hp), ('torque', torque)):
+        recorded = np.isfinite(values).any(axis=1)
+        index = np.argmax(np.where(np.isfinite(values), values, -np.inf), axis=1)
+        rows = np.arange(len(values))
+        result[f'peak_{name}'] = np.where(recorded, values[rows, index], np.nan)
+        result[f'peak_{name}_rpm'] = np.where(recorded, rpm[rows, index], np.nan)
+    return result
+
+
+def rpm_grid(pulls: List[Dict[str, np.ndarray]], step: float,
+             rpm_min: Optional[float] = None, rpm_max: Optional[float] = None) -> np.ndarray:
+    """RPM points every `step` covering the pulls (or rpm_min..rpm_max), on multiples of step"""
+    low = rpm_min if rpm_min is not None else min(pull['rpm'][0] for pull in pulls)
+    high = rpm_max if rpm_max is not None else max(pull['rpm'][-1] for pull in pulls)
+    return np.arange(np.ceil(low / step) * step, np.floor(high / step) * step + step / 2, step)
+
+
+def resample(pulls: List[Dict[str, np.ndarray]], grid: np.ndarray, channels=('hp', 'torque')) -> Dict[str, np.ndarray]:
+    """
+    Every pull's channels on a shared RPM grid in one interpolation each.
+
+    Returns:
+        channel -> (pulls, grid points) matrix, NaN outside each pull's RPM
+        range and for channels a pull doesn't have
+    """
+    offsets = np.arange(len(pulls)) * PULL_RPM_OFFSET
+    sample_rpm = np.concatenate([pull['rpm'] + offset for pull, offset in zip(pulls, offsets)])
+    query_rpm = (grid[None, :] + offsets[:, None]).ravel()
+    low = np.array([pull['rpm'][0] for pull in pulls])[:, None]
+    high = np.array([pull['rpm'][-1] for pull in pulls])[:, None]
+    inside = (grid[None, :] >= low) & (grid[None, :] <= high)
+
+    result = {}
+    for channel in channels:
+        samples = np.concatenate([
+            pull[channel] if pull.get(channel) is not None else np.full(len(pull['rpm']), np.nan)
+            for pull in pulls
+        ])
+        values = np.interp(query_rpm, sample_rpm, samples).reshape(len(pulls), len(grid))
+        result[channel] = np.where(inside, values, np.nan)
+    return result
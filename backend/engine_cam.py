@@ -0,0 +1,122 @@
+"""
+Dynamic compression ratio from camshaft timing.
+
+Static CR counts the whole stroke, but cylinder pressure only starts to build
+once the intake valve closes. Dynamic CR uses the piston's distance to TDC at
+intake valve closing (IVC) instead of the stroke, which makes it the number
+that actually matters for a cam swap on a given short block.
+
+builds.camshaft_duration_int is free text ('230', '230@.050',
+'282 adv / 230 @ .050', ...), so parse_duration() reads it into numbers.
+Timing follows the usual cam card conventions:
+    intake centerline  ICL = LSA - advance
+    IVC (deg ABDC)     ICL + duration / 2 - 180
+
+Dynamic CR needs IVC at the seat, not at .050 lift. The advertised duration
+gives it directly; without one, SEAT_CLOSING_OFFSET_DEG is added to the .050
+closing point (the common rule of thumb for hydraulic lobes).
+
+Everything numeric broadcasts, so any number of candidate cams is one pass.
+"""
+import re
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+
+from engine_geometry import CC_PER_CUBIC_INCH, bore_area, compression_ratio
+
+SEAT_CLOSING_OFFSET_DEG = 15.0
+
+# One duration, or an 'intake/exhaust' pair, optionally followed by what it
+# was measured at (which applies to the whole pair)
+_DEGREES = r'\d{3}(?:\.\d+)?\s*(?:°|deg\w*)?'
+DURATION_RE = re.compile(
+    rf'(?P<deg>{_DEGREES})(?:\s*/\s*{_DEGREES})*\s*'
+    r'(?:(?P<adv>adv\w*|seat\w*)|(?:@|at)\s*0?\.(?P<check>\d{3}))?',
+    re.IGNORECASE
+)
+_LEADING_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+# Checking heights (thousandths of an inch) that count as seat timing
+SEAT_CHECKING_HEIGHTS = ('004', '006', '008', '010')
+
+
+@lru_cache(maxsize=4096)
+def parse_duration(text: Optional[str]) -> Tuple[float, float]:
+    """
+    Read a duration string into (duration at .050, advertised duration).
+
+    A value marked 'adv'/'seat' or checked at .004-.010 is advertised; one at
+    .050 is .050. An unmarked value counts as .050 (what the column records)
+    unless a marked .050 value is also present. Where a field holds an
+    'intake/exhaust' pair, the marker after it applies to both and the
+    intake (first) value is used. NaN where not found.
+
+        '230'                           (230, nan)
+        '230@.050'                      (230, nan)
+        '282 adv / 230 @ .050'          (230, 282)
+        '230/236 @ .050'                (230, nan)
+        '274/280 adv'                   (nan, 274)
+        '224/230 @ .050, 280/286 adv'   (224, 280)
+    """
+    at_050 = advertised = unmarked = np.nan
+    for match in DURATION_RE.finditer(str(text or '')):
+        degrees = float(_LEADING_NUMBER.match(match.group('deg')).group())
+        if not 100 <= degrees <= 360:
+            continue
+        check = match.group('check')
+        if match.group('adv') or check in SEAT_CHECKING_HEIGHTS:
+            advertised = degrees if np.isnan(advertised) else advertised
+        elif check == '050':
+            at_050 = degrees if np.isnan(at_050) else at_050
+        elif check is None:
+            unmarked = degrees if np.isnan(unmarked) else unmarked
+    if np.isnan(at_050):
+        at_050 = unmarked
+    return at_050, advertised
+
+
+def intake_closing_abdc(duration, lsa, advance=0.0):
+    """Intake valve closing in degrees after BDC for a duration at one checking height"""
+    return (np.asarray(lsa, dtype=np.float64) - advance) + np.asarray(duration, dtype=np.float64) / 2 - 180
+
+
+def seat_closing_abdc(duration_050, advertised, lsa, advance=0.0):
+    """IVC at the seat: from advertised duration, else the .050 point plus SEAT_CLOSING_OFFSET_DEG"""
+    from_advertised = intake_closing_abdc(advertised, lsa, advance)
+    from_050 = intake_closing_abdc(duration_050, lsa, advance) + SEAT_CLOSING_OFFSET_DEG
+    return np.where(np.isnan(from_advertised), from_050, from_advertised)
+
+
+def piston_travel(stroke, rod, crank_deg):
+    """
+    Piston distance below TDC at a crank angle (degrees after TDC).
+
+    Uses the slider-crank geometry, so the rod angle is accounted for: the
+    piston sits lower at 90 degrees than stroke/2 by an amount that grows as
+    the rod gets shorter.
+    """
+    crank = np.radians(crank_deg)
+    radius = np.asarray(stroke, dtype=np.float64) / 2
+    rod = np.asarray(rod, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        return radius + rod - (radius * np.cos(crank) + np.sqrt(np.square(rod) - np.square(radius * np.sin(crank))))
+
+
+def dynamic_compression(bore, stroke, rod, clearance_cc, ivc_abdc):
+    """
+    Dynamic CR for intake closing points.
+
+    Args:
+        bore, stroke, rod: Inches
+        clearance_cc: Combustion volume at TDC (engine_geometry.clearance_volume_cc)
+        ivc_abdc: Seat intake closing, degrees after BDC
+
+    Returns:
+        (effective stroke in inches, dynamic CR), broadcast over the inputs
+    """
+    # Compression starts at 180 + IVC degrees after TDC; travel is symmetric about BDC
+    effective_stroke = piston_travel(stroke, rod, 180 - np.asarray(ivc_abdc, dtype=np.float64))
+    effective_cc = bore_area(bore) * effective_stroke * CC_PER_CUBIC_INCH
+    return effective_stroke, compression_ratio(effective_cc, clearance_cc)
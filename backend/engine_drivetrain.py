@@ -0,0 +1,187 @@
+"""
+Gearing: engine RPM against road speed for every gear.
+
+Everything the calculation needs is already stored, just not as numbers:
+tire sizes are strings ('35x12.50R17', 'P275/40R17'), axle ratios are
+strings ('4.10', '3.73:1') and gear ratios live in transmission_json in two
+shapes, the documented gearset.first_gear... and the editor's
+gear_ratios.first... This module turns those into numbers and computes the
+per-gear tables with NumPy.
+
+drivetrain_table() is memoized on its numeric inputs, so an editor that
+re-requests the table on every keystroke only pays for inputs it hasn't
+seen yet.
+
+    mph = rpm * tire diameter (in) * pi / (gear * final drive * 1056)
+
+(1056 = 63360 inches per mile / 60 minutes per hour.)
+"""
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+INCHES_PER_MILE_PER_MINUTE = 1056.0
+MM_PER_INCH = 25.4
+
+# Forward gears in order, as named in transmission_json
+GEAR_NAMES = ('first', 'second', 'third', 'fourth', 'fifth', 'sixth', 'seventh', 'eighth', 'ninth', 'tenth')
+
+# Cruise speeds the RPM table is given for
+DEFAULT_SPEEDS_MPH = (30, 40, 50, 60, 70, 80)
+
+# 'LT285/75R16', 'P275/40ZR17', '245/45 R 17 95W'
+METRIC_TIRE_RE = re.compile(r'(\d{3})\s*/\s*(\d{2,3})\s*[a-z]*\s*-?\s*(\d{2}(?:\.\d+)?)', re.IGNORECASE)
+# '35x12.50R17', '33X12.50-15', '28x10.5-15', '26.0 x 8.0 - 15'
+FLOTATION_TIRE_RE = re.compile(r'(\d{2}(?:\.\d+)?)\s*["”]?\s*x\s*\d', re.IGNORECASE)
+RATIO_RE = re.compile(r'\d+(?:\.\d+)?')
+
+
+@lru_cache(maxsize=1024)
+def tire_diameter_in(size: Optional[str]) -> Optional[float]:
+    """
+    Rolling diameter in inches from a tire size string, None when unreadable.
+
+    Metric sizes are rim + 2 sidewalls (width * aspect ratio); flotation and
+    drag sizes lead with the diameter. A bare number from 15 to 50 is taken
+    as the diameter.
+    """
+    text = str(size or '').strip()
+    match = METRIC_TIRE_RE.search(text)
+    if match:
+        width_mm, aspect, rim = float(match.group(1)), float(match.group(2)), float(match.group(3))
+        return round(rim + 2 * width_mm * aspect / 100 / MM_PER_INCH, 3)
+    match = FLOTATION_TIRE_RE.search(text)
+    if match:
+        return float(match.group(1))
+    match = re.fullmatch(r'(\d{2}(?:\.\d+)?)\s*(?:"|in\w*)?', text, re.IGNORECASE)
+    if match and 15 <= float(match.group(1)) <= 50:
+        return float(match.group(1))
+    return None
+
+
+def parse_ratio(value: Any) -> Optional[float]:
+    """A gear ratio from a number or text such as '4.10', '3.73:1', '2.48 (1st)'"""
+    if isinstance(value, (int, float)):
+        ratio = float(value)
+    else:
+        match = RATIO_RE.search(str(value or ''))
+        ratio = float(match.group()) if match else 0.0
+    return ratio if 0 < ratio < 50 else None
+
+
+def transmission_gear_ratios(transmission: Optional[Dict], gear_count: Optional[int] = None) -> Tuple[float, ...]:
+    """
+    Forward gear ratios, first gear first, from a transmission_json document.
+
+    Reads gearset.first_gear... (the documented layout) and, where that has
+    nothing, gear_ratios.first... (what the transmission editor saves).
+    Stops at the first missing gear; gear_count (builds.transmission_gears)
+    caps the count.
+    """
+    transmission = transmission if isinstance(transmission, dict) else {}
+    layouts = (
+        (transmission.get('gearset'), '{}_gear'),
+        (transmission.get('gear_ratios'), '{}'),
+    )
+    for section, key in layouts:
+        if not isinstance(section, dict):
+            continue
+        ratios = []
+        for name in GEAR_NAMES[:gear_count or len(GEAR_NAMES)]:
+            ratio = parse_ratio(section.get(key.format(name)))
+            if ratio is None:
+                break
+            ratios.append(ratio)
+        if ratios:
+            return tuple(ratios)
+    return ()
+
+
+def first_value(*candidates, parse=parse_ratio):
+    """The first candidate that parses, or None"""
+    for candidate in candidates:
+        value = parse(candidate) if candidate is not None else None
+        if value is not None:
+            return value
+    return None
+
+
+def corner_tire_sizes(tires_wheels: Optional[Dict], corners: List[str]) -> List[Optional[str]]:
+    """tire.size for each corner of a tires_wheels_json document"""
+    tires_wheels = tires_wheels if isinstance(tires_wheels, dict) else {}
+    sizes = []
+    for corner in corners:
+        section = tires_wheels.get(corner)
+        tire = section.get('tire') if isinstance(section, dict) else None
+        sizes.append(tire.get('size') if isinstance(tire, dict) else None)
+    return sizes
+
+
+def road_speed_mph(rpm, tire_diameter, overall_ratio):
+    """Road speed for engine RPM through an overall (gear * final drive) ratio"""
+    return np.asarray(rpm, dtype=np.float64) * tire_diameter * math.pi / (overall_ratio * INCHES_PER_MILE_PER_MINUTE)
+
+
+def engine_rpm(speed_mph, tire_diameter, overall_ratio):
+    """Engine RPM at a road speed through an overall ratio"""
+    return np.asarray(speed_mph, dtype=np.float64) * overall_ratio * INCHES_PER_MILE_PER_MINUTE / (tire_diameter * math.pi)
+
+
+@lru_cache(maxsize=int(os.getenv('DRIVETRAIN_CACHE_SIZE', '512')))
+def drivetrain_table(tire_diameter: float, ratios: Tuple[float, ...], final_drive: float, rev_limit: float,
+                     rpm_step: int = 500, speeds: Tuple[float, ...] = DEFAULT_SPEEDS_MPH) -> Dict:
+    """
+    Speed and RPM tables for every gear (memoized on the inputs).
+
+    Args:
+        tire_diameter: Rolling diameter, inches
+        ratios: Forward gear ratios, first gear first
+        final_drive: Axle / final drive ratio
+        rev_limit: Engine RPM the shift points and top speeds are taken at
+        rpm_step: Spacing of the RPM columns, up to rev_limit
+        speeds: Road speeds the RPM table is given for
+
+    Returns:
+        rpm columns, speed_mph [gear][rpm], speeds, rpm_at_speed [gear][speed]
+        (null above the rev limit), per-gear overall ratio and top speed, the
+        RPM each upshift at the rev limit drops to, and the top speed.
+        Don't mutate it: the same dict is returned for the same inputs.
+    """
+    gears = np.asarray(ratios, dtype=np.float64)[:, None]
+    overall = gears * final_drive
+    rpm = np.unique(np.append(np.arange(rpm_step, rev_limit, rpm_step), rev_limit))
+    speed = road_speed_mph(rpm, tire_diameter, overall)
+    rpm_at_speed = engine_rpm(np.asarray(speeds, dtype=np.float64), tire_diameter, overall)
+    top_speed = road_speed_mph(rev_limit, tire_diameter, overall[:, 0])
+    # Same road speed in the next gear: RPM falls by the ratio step
+    shift_rpm = rev_limit * gears[1:, 0] / gears[:-1, 0]
+    # Cruise RPM above the rev limit is unreachable in that gear
+    cruise_rpm = np.rint(rpm_at_speed).astype(np.int64).astype(object)
+    cruise_rpm[rpm_at_speed > rev_limit] = None
+
+    return {
+        'rpm': rpm.astype(int).tolist(),
+        'speed_mph': np.round(speed, 1).tolist(),
+        'speeds_mph': list(speeds),
+        'rpm_at_speed': cruise_rpm.tolist(),
+        'gears': [
+            {
+                'gear': i + 1,
+                'ratio': ratios[i],
+                'overall_ratio': round(float(overall[i, 0]), 3),
+                'top_speed_mph': round(float(top_speed[i]), 1),
+                'mph_per_1000_rpm': round(float(road_speed_mph(1000, tire_diameter, overall[i, 0])), 2),
+            }
+            for i in range(len(ratios))
+        ],
+        'shifts': [
+            {'from_gear': i + 1, 'to_gear': i + 2, 'rpm_after_shift': int(round(shift_rpm[i])),
+             'rpm_drop': int(round(rev_limit - shift_rpm[i]))}
+            for i in range(len(shift_rpm))
+        ],
+        'top_speed_mph': round(float(top_speed.max()), 1),
+    }
@@ -0,0 +1,314 @@
+"""
+Vectorized engine geometry computed from a build's raw measurements.
+
+builds stores the measured inputs (bore_in, stroke_in, rod_len_in,
+deck_clear_in, piston_cc, chamber_cc, gasket_bore_in, gasket_thickness_in)
+next to hand-entered displacement_ci, static_cr and quench_in that can drift
+from them. compute_geometry() derives the numbers from the inputs with NumPy,
+so one build and every build cost the same single pass; all functions
+broadcast, so grids of candidate values work too.
+
+Conventions:
+    piston_cc        piston dome volume, as the engine specs editor records
+                     it: dome positive (takes volume away at TDC), dish or
+                     valve reliefs negative
+    deck_clear_in    piston below the deck positive, above negative
+    gasket_bore_in   falls back to the bore when not recorded
+    cylinders        counted from firing_order, 8 when it can't be read
+
+The batch command stores the results in build_geometry (migration 018),
+recomputing only builds whose version changed:
+    python engine_geometry.py [--all] [--batch-size 5000]
+Between runs the API's listener thread (start_geometry_listener) recomputes
+builds as their measurements are edited, so build_geometry and the
+leaderboards that read it stay current.
+"""
+import math
+import os
+import re
+import select
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+
+NOTIFY_CHANNEL = 'build_geometry_inputs_changed'
+
+CC_PER_CUBIC_INCH = 16.387064
+DEFAULT_CYLINDERS = 8
+
+# Build columns the geometry is computed from
+GEOMETRY_INPUTS = (
+    'bore_in', 'stroke_in', 'rod_len_in', 'deck_clear_in', 'piston_cc', 'chamber_cc',
+    'gasket_bore_in', 'gasket_thickness_in', 'rev_limit_rpm'
+)
+
+# Computed value -> hand-entered build column it should match
+STORED_COLUMNS = {
+    'displacement_ci': 'displacement_ci',
+    'static_cr': 'static_cr',
+    'quench_in': 'quench_in',
+}
+
+# Decimal places returned per computed value
+PRECISION = {
+    'cylinders': 0,
+    'displacement_ci': 2,
+    'displacement_l': 3,
+    'swept_cc': 2,
+    'clearance_cc': 2,
+    'static_cr': 2,
+    'quench_in': 4,
+    'rod_ratio': 3,
+    'mean_piston_speed_fpm': 0,
+}
+
+
+@lru_cache(maxsize=1024)
+def cylinder_count(firing_order: Optional[str]) -> int:
+    """Cylinders from a firing order such as '1-8-4-3-6-5-7-2'"""
+    numbers = [int(n) for n in re.findall(r'\d+', firing_order or '')]
+    if numbers and sorted(numbers) == list(range(1, len(numbers) + 1)):
+        return len(numbers)
+    return DEFAULT_CYLINDERS
+
+
+def bore_area(bore):
+    """Piston area in square inches"""
+    return math.pi / 4 * np.square(bore)
+
+
+def clearance_volume_cc(bore, deck_clear, piston_cc, chamber_cc, gasket_bore, gasket_thickness):
+    """Combustion volume at TDC: chamber - piston dome + gasket + deck, in cc"""
+    gasket_bore = np.where(np.isnan(gasket_bore), bore, gasket_bore)
+    gasket_cc = bore_area(gasket_bore) * gasket_thickness * CC_PER_CUBIC_INCH
+    deck_cc = bore_area(bore) * deck_clear * CC_PER_CUBIC_INCH
+    return chamber_cc - piston_cc + gasket_cc + deck_cc
+
+
+def compression_ratio(swept_cc, clearance_cc):
+    """(swept + clearance) / clearance; NaN where clearance isn't positive"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(clearance_cc > 0, (swept_cc + clearance_cc) / clearance_cc, np.nan)
+
+
+def compute_geometry(bore, stroke, rod, deck_clear, piston_cc, chamber_cc, gasket_bore,
+                     gasket_thickness, rpm, cylinders=DEFAULT_CYLINDERS) -> Dict[str, np.ndarray]:
+    """
+    Geometry for any number of engines at once.
+
+    Args:
+        All arguments are scalars or broadcastable float arrays (NaN = not
+        recorded); lengths in inches, volumes in cc.
+
+    Returns:
+        Arrays of cylinders, displacement_ci, displacement_l, swept_cc,
+        clearance_cc, static_cr, quench_in, rod_ratio and
+        mean_piston_speed_fpm (at rpm). A value is NaN when an input it
+        depends on is missing.
+    """
+    bore, stroke, rod, deck_clear, piston_cc, chamber_cc, gasket_bore, gasket_thickness, rpm, cylinders = (
+        np.asarray(value, dtype=np.float64) for value in
+        (bore, stroke, rod, deck_clear, piston_cc, chamber_cc, gasket_bore, gasket_thickness, rpm, cylinders)
+    )
+
+    swept_ci = bore_area(bore) * stroke
+    swept_cc = swept_ci * CC_PER_CUBIC_INCH
+    clearance_cc = clearance_volume_cc(bore, deck_clear, piston_cc, chamber_cc, gasket_bore, gasket_thickness)
+    displacement_ci = swept_ci * cylinders
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rod_ratio = np.where(stroke > 0, rod / stroke, np.nan)
+
+    return {
+        'cylinders': np.broadcast_to(cylinders, displacement_ci.shape),
+        'displacement_ci': displacement_ci,
+        'displacement_l': displacement_ci * CC_PER_CUBIC_INCH / 1000,
+        'swept_cc': swept_cc,
+        'clearance_cc': clearance_cc,
+        'static_cr': compression_ratio(swept_cc, clearance_cc),
+        'quench_in': deck_clear + gasket_thickness,
+        'rod_ratio': rod_ratio,
+        # Feet per minute: two strokes per revolution
+        'mean_piston_speed_fpm': 2 * stroke * rpm / 12,
+    }
+
+
+def compression_sweep(bore, stroke, chamber_cc, gasket_thickness, gasket_bore, piston_cc,
+                      deck_clear) -> Dict[str, np.ndarray]:
+    """
+    Static CR and quench over every combination of candidate values.
+
+    Args:
+        bore, stroke, chamber_cc: The engine's fixed dimensions
+        gasket_thickness, gasket_bore, piston_cc, deck_clear: 1-D arrays of
+            candidate values (one element to hold an input fixed)
+
+    Returns:
+        static_cr shaped (gasket_thickness, gasket_bore, piston_cc,
+        deck_clear) and quench_in shaped (gasket_thickness, deck_clear);
+        quench doesn't depend on the other two axes.
+    """
+    gasket_thickness, gasket_bore, piston_cc, deck_clear = np.ix_(
+        *(np.asarray(axis, dtype=np.float64) for axis in (gasket_thickness, gasket_bore, piston_cc, deck_clear))
+    )
+    swept_cc = bore_area(bore) * stroke * CC_PER_CUBIC_INCH
+    clearance_cc = clearance_volume_cc(bore, deck_clear, piston_cc, chamber_cc, gasket_bore, gasket_thickness)
+    return {
+        'static_cr': compression_ratio(swept_cc, clearance_cc),
+        'quench_in': deck_clear[0, 0] + gasket_thickness[:, 0, 0],
+    }
+
+
+def input_arrays(builds: List[Dict]) -> Dict[str, np.ndarray]:
+    """Build rows -> one float array per input (None -> NaN)"""
+    matrix = np.array([[build.get(column) for column in GEOMETRY_INPUTS] for build in builds],
+                      dtype=np.float64).reshape(len(builds), len(GEOMETRY_INPUTS))
+    arrays = {column: matrix[:, i] for i, column in enumerate(GEOMETRY_INPUTS)}
+    arrays['cylinders'] = np.array([cylinder_count(build.get('firing_order')) for build in builds], dtype=np.float64)
+    return arrays
+
+
+def compute_builds(builds: List[Dict]) -> Dict[str, np.ndarray]:
+    """compute_geometry over build rows, one array element per build"""
+    a = input_arrays(builds)
+    return compute_geometry(
+        a['bore_in'], a['stroke_in'], a['rod_len_in'], a['deck_clear_in'], a['piston_cc'], a['chamber_cc'],
+        a['gasket_bore_in'], a['gasket_thickness_in'], a['rev_limit_rpm'], a['cylinders']
+    )
+
+
+def computed_rows(results: Dict[str, np.ndarray]) -> List[Dict]:
+    """compute_builds() output as one dict per build: rounded, None for NaN"""
+    columns = []
+    for name, digits in PRECISION.items():
+        values = np.round(results[name], digits)
+        cast = int if digits == 0 else float
+        columns.append([cast(value) if finite else None
+                        for value, finite in zip(values.tolist(), np.isfinite(values).tolist())])
+    return [dict(zip(PRECISION, values)) for values in zip(*columns)]
+
+
+def recompute_all(recompute_unchanged: bool = False, batch_size: int = 5000,
+                  build_ids: Optional[List[int]] = None) -> Dict:
+    """
+    Store computed geometry for builds in build_geometry.
+
+    Args:
+        recompute_unchanged: Also recompute builds whose version is already stored
+        batch_size: Builds fetched and computed per pass
+        build_ids: Only these builds (default: every build)
+
+    Returns:
+        Builds computed, duration and throughput
+    """
+    from psycopg2.extras import execute_values
+    from db import get_db_cursor
+
+    started = time.monotonic()
+    computed = 0
+    columns = list(PRECISION)
+    changed_filter = "" if recompute_unchanged else "AND (g.build_id IS NULL OR g.build_version <> b.version)"
+    ids_filter = "" if build_ids is None else "AND b.id = ANY(%(ids)s)"
+    after_id = 0
+
+    while True:
+        with get_db_cursor() as cursor:
+            # Keyset batches, each committed on its own
+            cursor.execute(f"""
+                SELECT b.id, b.version, b.firing_order, {', '.join('b.' + c for c in GEOMETRY_INPUTS)}
+                FROM builds b
+                LEFT JOIN build_geometry g ON g.build_id = b.id
+                WHERE b.id > %(after_id)s {changed_filter} {ids_filter}
+                ORDER BY b.id
+                LIMIT %(limit)s
+            """, {'after_id': after_id, 'limit': batch_size, 'ids': build_ids})
+            builds = cursor.fetchall()
+            if not builds:
+                break
+
+            rows = [
+                (build['id'], build['version'], *values.values())
+                for build, values in zip(builds, computed_rows(compute_builds(builds)))
+            ]
+            execute_values(cursor, f"""
+                INSERT INTO build_geometry (build_id, build_version, {', '.join(columns)})
+                VALUES %s
+                ON CONFLICT (build_id) DO UPDATE SET
+                    build_version = EXCLUDED.build_version,
+                    {', '.join(f'{c} = EXCLUDED.{c}' for c in columns)},
+                    computed_at = CURRENT_TIMESTAMP
+            """, rows, page_size=1000)
+
+        computed += len(builds)
+        after_id = builds[-1]['id']
+
+    duration = time.monotonic() - started
+    return {
+        'builds': computed,
+        'duration_seconds': round(duration, 2),
+        'builds_per_second': int(computed / duration) if duration else computed
+    }
+
+
+def start_geometry_listener() -> Optional[threading.Thread]:
+    """
+    Start a daemon thread that recomputes a build's stored geometry when its
+    measurements change (notified by migration 024's triggers).
+
+    Controlled by BUILD_GEOMETRY_LISTENER (0 disables it; run the batch
+    command on a schedule instead).
+    """
+    if os.getenv('BUILD_GEOMETRY_LISTENER', '1') == '0':
+        return None
+
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+    from db import DATABASE_URL
+
+    def run():
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # Anything changed while not listening is picked up here
+                recompute_all()
+
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    payloads = {notify.payload for notify in conn.notifies}
+                    conn.notifies.clear()
+
+                    if '*' in payloads:
+                        recompute_all()
+                    elif payloads:
+                        recompute_all(build_ids=sorted({int(i) for p in payloads for i in p.split(',') if i}))
+            except Exception as e:
+                print(f"Build geometry listener error: {e}")
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    thread = threading.Thread(target=run, name='build-geometry', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Recompute stored engine geometry for builds')
+    parser.add_argument('--all', action='store_true', help='Recompute builds whose version is already stored')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    result = recompute_all(args.all, args.batch_size)
+    print(f"✅ Computed geometry for {result['builds']} builds in {result['duration_seconds']}s "
+          f"({result['builds_per_second']} builds/s)")
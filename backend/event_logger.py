@@ -5,13 +5,31 @@ Implements event sourcing pattern for granular revision control.
 Logs field-level changes for timeline view, comparison, and rollback.
 """
 
+import copy
 import json
 import uuid
 from typing import Any, Dict, List, Optional
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal
+from psycopg2.extras import execute_values
+from component_store import attach_components, components_select
 from db import get_db_cursor
 
 
+def _json_default(value: Any):
+    """JSON encoder for database column types (NUMERIC, DATE, TIMESTAMP)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _serialize_value(value: Any) -> Optional[str]:
+    """Serialize an old/new value for storage (NULL stays NULL)"""
+    return json.dumps(value, default=_json_default) if value is not None else None
+
+
 def log_field_change(
     build_id: int,
     user_id: int,
@@ -47,8 +65,8 @@ def log_field_change(
             build_id,
             user_id,
             field_path,
-            json.dumps(old_value) if old_value is not None else None,
-            json.dumps(new_value) if new_value is not None else None,
+            _serialize_value(old_value),
+            _serialize_value(new_value),
             change_batch_id,
             change_description,
             ip_address,
@@ -80,18 +98,30 @@ def log_changes_batch(
     """
     batch_id = str(uuid.uuid4())
 
-    for field_path, (old_value, new_value) in changes.items():
-        log_field_change(
-            build_id=build_id,
-            user_id=user_id,
-            field_path=field_path,
-            old_value=old_value,
-            new_value=new_value,
-            change_batch_id=batch_id,
-            change_description=change_description,
-            ip_address=ip_address,
-            user_agent=user_agent
-        )
+    if not changes:
+        return batch_id
+
+    # One multi-row INSERT for the whole batch instead of a connection per field
+    with get_db_cursor() as cursor:
+        execute_values(cursor, """
+            INSERT INTO build_change_events
+            (build_id, user_id, field_path, old_value, new_value,
+             change_batch_id, change_description, ip_address, user_agent)
+            VALUES %s
+        """, [
+            (
+                build_id,
+                user_id,
+                field_path,
+                _serialize_value(old_value),
+                _serialize_value(new_value),
+                batch_id,
+                change_description,
+                ip_address,
+                user_agent
+            )
+            for field_path, (old_value, new_value) in changes.items()
+        ])
 
     return batch_id
 
@@ -263,12 +293,14 @@ def get_build_at_timestamp(build_id: int, timestamp: datetime) -> Dict:
     """
     # Get current build
     with get_db_cursor() as cursor:
-        cursor.execute("SELECT * FROM builds WHERE id = %s", (build_id,))
+        cursor.execute(f"SELECT *{components_select()} FROM builds WHERE id = %s", (build_id,))
         current_build = cursor.fetchone()
 
         if not current_build:
             raise ValueError(f"Build {build_id} not found")
 
+        attach_components(cursor, [current_build])
+
         # Get events after target timestamp (to undo)
         cursor.execute("""
             SELECT field_path, old_value, new_value
@@ -290,12 +322,19 @@ def get_build_at_timestamp(build_id: int, timestamp: datetime) -> Dict:
         # Restore old value
         if '.' in field_path:
             # Nested JSON field (e.g., "engine_internals_json.block.bore_size")
-            # For simplicity, we'll handle the full JSON column restoration
-            json_column = field_path.split('.')[0]
-            if json_column in historical_state:
-                # Would need deep path restoration here
-                # For now, we'll handle this in a future enhancement
-                pass
+            json_column, *keys = field_path.split('.')
+            document = copy.deepcopy(historical_state.get(json_column)) or {}
+            parent = document
+            for key in keys[:-1]:
+                if not isinstance(parent.get(key), dict):
+                    parent[key] = {}
+                parent = parent[key]
+
+            if old_value is None:
+                parent.pop(keys[-1], None)
+            else:
+                parent[keys[-1]] = old_value
+            historical_state[json_column] = document
         else:
             # Simple table column
             historical_state[field_path] = old_value
@@ -0,0 +1,339 @@
+"""
+API endpoints for engine geometry computed from a build's measurements.
+"""
+import json
+import os
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Response
+from pydantic import BaseModel
+
+from component_store import read_component_path
+from db import get_db_cursor
+from engine_cam import dynamic_compression, parse_duration, seat_closing_abdc
+from engine_geometry import GEOMETRY_INPUTS, STORED_COLUMNS, compression_sweep, compute_builds, computed_rows
+
+router = APIRouter()
+
+# Sweep axes in grid order
+SWEEP_AXES = ('gasket_thickness_in', 'gasket_bore_in', 'piston_cc', 'deck_clear_in')
+
+# Build columns a sweep holds fixed
+SWEEP_FIXED = ('bore_in', 'stroke_in', 'chamber_cc')
+
+MAX_SWEEP_CELLS = 250000
+
+MAX_CAM_CANDIDATES = 1000
+
+
+class CamCandidate(BaseModel):
+    label: Optional[str] = None
+    duration_int: Union[float, str]
+    advertised_int: Optional[Union[float, str]] = None
+    lsa: float
+    advance_deg: float = 0.0
+
+
+class DynamicCRRequest(BaseModel):
+    cams: List[CamCandidate] = []
+
+
+@router.get("/api/builds/{build_id}/computed")
+async def get_computed_geometry(build_id: int):
+    """
+    Geometry computed from a build's raw inputs (public).
+
+    Returns:
+        computed: displacement, static CR, quench, rod ratio and mean piston
+            speed at rev_limit_rpm (null where an input is missing)
+        stored: the hand-entered displacement_ci, static_cr and quench_in
+        drift: stored minus computed, for each value both sides have
+    """
+    try:
+        with get_db_cursor(commit=False) as cursor:
+            cursor.execute(f"""
+                SELECT id, version, firing_order, {', '.join(GEOMETRY_INPUTS)},
+                       {', '.join(STORED_COLUMNS.values())}
+                FROM builds
+                WHERE id = %s
+            """, (build_id,))
+            build = cursor.fetchone()
+
+        if not build:
+            raise HTTPException(status_code=404, detail="Build not found")
+
+        computed = computed_rows(compute_builds([build]))[0]
+        stored = {name: float(build[column]) if build[column] is not None else None
+                  for name, column in STORED_COLUMNS.items()}
+        drift = {
+            name: round(stored[name] - computed[name], 4)
+            for name in STORED_COLUMNS
+            if stored[name] is not None and computed[name] is not None
+        }
+
+        return {
+            'success': True,
+            'build_id': build['id'],
+            'version': build['version'],
+            'inputs': {column: build[column] for column in GEOMETRY_INPUTS},
+            'computed': computed,
+            'stored': stored,
+            'drift': drift
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def parse_sweep_range(name: str, text: str) -> Tuple[float, ...]:
+    """
+    Candidate values from 'start:stop:step' (stop included) or a single value.
+
+    Raises:
+        ValueError: Unparseable text, a non-positive step or stop < start
+    """
+    try:
+        parts = [float(part) for part in text.split(':')]
+    except ValueError:
+        raise ValueError(f"{name} must be a number or start:stop:step")
+    if not all(np.isfinite(parts)):
+        raise ValueError(f"{name} must be finite")
+    if len(parts) == 1:
+        return tuple(parts)
+    if len(parts) != 3:
+        raise ValueError(f"{name} must be a number or start:stop:step")
+
+    start, stop, step = parts
+    if step <= 0 or stop < start:
+        raise ValueError(f"{name} needs a positive step and stop >= start")
+    count = int(np.floor((stop - start) / step + 1e-9)) + 1
+    if count > MAX_SWEEP_CELLS:
+        raise ValueError(f"{name} has more than {MAX_SWEEP_CELLS} values")
+    # Multiply rather than accumulate so values don't pick up float drift
+    return tuple(np.round(start + step * np.arange(count), 6).tolist())
+
+
+def grid_json(values: np.ndarray, digits: int) -> str:
+    """
+    Rounded values as nested JSON arrays, null for NaN.
+
+    A rounded grid holds few distinct values, so each is formatted once and
+    the text is assembled by index; json.dumps on the nested lists is several
+    times slower at 10^5 cells.
+    """
+    values = np.round(values, digits)
+    distinct, index = np.unique(values.ravel(), return_inverse=True)
+    formatted = np.array([json.dumps(value) if np.isfinite(value) else 'null' for value in distinct.tolist()],
+                         dtype=object)
+    items = formatted[index].tolist()
+    for size in reversed(values.shape):
+        items = ['[' + ','.join(items[i:i + size]) + ']' for i in range(0, len(items), size)]
+    return items[0]
+
+
+@lru_cache(maxsize=int(os.getenv('CR_SWEEP_CACHE_SIZE', '32')))
+def _sweep_body(build_id: int, version: int, fixed: Tuple[float, ...], axes: Tuple[Tuple[float, ...], ...]) -> bytes:
+    """Serialized sweep response (cached by build version and axes)"""
+    grids = compression_sweep(*fixed, *axes)
+    header = json.dumps({
+        'success': True,
+        'build_id': build_id,
+        'version': version,
+        'fixed': dict(zip(SWEEP_FIXED, fixed)),
+        'axes': dict(zip(SWEEP_AXES, axes)),
+        'cells': grids['static_cr'].size,
+    }, separators=(',', ':'))
+    return (f'{header[:-1]},"static_cr":{grid_json(grids["static_cr"], 2)},'
+            f'"quench_in":{grid_json(grids["quench_in"], 4)}}}').encode()
+
+
+@router.get("/api/builds/{build_id}/cr-sweep")
+async def get_cr_sweep(
+    build_id: int,
+    gasket_thickness_in: Optional[str] = None,
+    gasket_bore_in: Optional[str] = None,
+    piston_cc: Optional[str] = None,
+    deck_clear_in: Optional[str] = None
+):
+    """
+    Static CR and quench across a grid of head gasket, piston and deck
+    choices (public).
+
+    Each axis is 'start:stop:step' (e.g. gasket_thickness_in=0.027:0.060:0.001)
+    or a single value; an omitted axis holds the build's stored value. Bore,
+    stroke and chamber volume come from the build; with no gasket bore
+    stored, the bore is used.
+
+    Returns:
+        axes with the values of each axis, static_cr nested as
+        [gasket_thickness][gasket_bore][piston_cc][deck_clear] and quench_in
+        as [gasket_thickness][deck_clear]. Responses are cached per build
+        version, so an edit to the build invalidates them.
+    """
+    try:
+        requested = dict(zip(SWEEP_AXES, (gasket_thickness_in, gasket_bore_in, piston_cc, deck_clear_in)))
+        try:
+            ranges = {name: parse_sweep_range(name, text) for name, text in requested.items() if text is not None}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        cells = int(np.prod([len(values) for values in ranges.values()]))
+        if cells > MAX_SWEEP_CELLS:
+            raise HTTPException(status_code=400, detail=f"Sweep has {cells} cells; the limit is {MAX_SWEEP_CELLS}")
+
+        with get_db_cursor(commit=False) as cursor:
+            cursor.execute(f"""
+                SELECT id, version, {', '.join(SWEEP_FIXED + SWEEP_AXES)}
+                FROM builds
+                WHERE id = %s
+            """, (build_id,))
+            build = cursor.fetchone()
+
+        if not build:
+            raise HTTPException(status_code=404, detail="Build not found")
+
+        missing = [column for column in SWEEP_FIXED if build[column] is None]
+        missing += [name for name in SWEEP_AXES
+                    if name not in ranges and name != 'gasket_bore_in' and build[name] is None]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Build has no {', '.join(missing)}; pass the axes as ranges")
+
+        fixed = tuple(float(build[column]) for column in SWEEP_FIXED)
+        stored = {name: build[name] for name in SWEEP_AXES}
+        if stored['gasket_bore_in'] is None:
+            stored['gasket_bore_in'] = build['bore_in']
+        axes = tuple(ranges.get(name) or (float(stored[name]),) for name in SWEEP_AXES)
+        body = _sweep_body(build['id'], build['version'], fixed, axes)
+
+        return Response(content=body, media_type='application/json', headers={'X-Build-Version': str(build['version'])})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def rounded_list(values: np.ndarray, digits: int) -> list:
+    """Rounded 1-D values, None for NaN"""
+    values = np.round(values, digits)
+    return [value if finite else None for value, finite in zip(values.tolist(), np.isfinite(values).tolist())]
+
+
+def _number(value) -> Optional[float]:
+    """A JSON document value as a float, None when it isn't numeric"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _advertised(value) -> float:
+    """An advertised duration field: an unmarked value here is advertised, not .050"""
+    if value is None:
+        return np.nan
+    at_050, advertised = parse_duration(str(value))
+    return at_050 if np.isnan(advertised) else advertised
+
+
+@router.post("/api/builds/{build_id}/dynamic-cr")
+async def compare_dynamic_cr(build_id: int, request: Optional[DynamicCRRequest] = None):
+    """
+    Dynamic compression ratio for the build's cam and any candidate cams (public).
+
+    Each candidate gives duration_int (text such as '230@.050' or a number at
+    .050), optionally advertised_int, and lsa plus advance_deg (intake
+    centerline = lsa - advance). The build's own cam comes from
+    camshaft_duration_int/camshaft_lsa, with advance_deg (and missing values)
+    read from engine_internals_json.camshaft. All cams are computed in one
+    vectorized pass against the build's bore, stroke, rod and clearance
+    volume.
+
+    Returns:
+        static_cr and clearance_cc from the build's geometry, the hand-entered
+        dynamic_cr, and per cam: parsed durations, intake centerline, seat IVC,
+        effective stroke and dynamic_cr (current is null when the build has
+        no usable cam data).
+    """
+    try:
+        candidates = request.cams if request else []
+        if len(candidates) > MAX_CAM_CANDIDATES:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_CAM_CANDIDATES} cams per request")
+
+        with get_db_cursor(commit=False) as cursor:
+            cursor.execute(f"""
+                SELECT id, version, firing_order, {', '.join(GEOMETRY_INPUTS)},
+                       camshaft_model, camshaft_duration_int, camshaft_lsa, dynamic_cr
+                FROM builds
+                WHERE id = %s
+            """, (build_id,))
+            build = cursor.fetchone()
+            if not build:
+                raise HTTPException(status_code=404, detail="Build not found")
+            camshaft = read_component_path(cursor, build_id, 'engine_internals_json', ['camshaft'])
+
+        camshaft = json.loads(camshaft['subtree']) if camshaft and camshaft['subtree'] else None
+        camshaft = camshaft if isinstance(camshaft, dict) else {}
+
+        geometry = compute_builds([build])
+        missing = [column for column in ('bore_in', 'stroke_in', 'rod_len_in') if build[column] is None]
+        if not np.isfinite(geometry['clearance_cc'][0]):
+            missing.append('clearance volume (chamber_cc, piston_cc, deck_clear_in, gasket_thickness_in)')
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Build has no {', '.join(missing)}")
+
+        # The build's cam first, then the candidates, as one set of arrays
+        cams = [{
+            'label': build['camshaft_model'] or 'current',
+            'duration_int': build['camshaft_duration_int'] or camshaft.get('duration_int_deg'),
+            'advertised_int': None,
+            'lsa': build['camshaft_lsa'] if build['camshaft_lsa'] is not None else camshaft.get('lsa_deg'),
+            'advance_deg': _number(camshaft.get('advance_deg')) or 0.0,
+        }] + [cam.model_dump() for cam in candidates]
+
+        durations = np.array([parse_duration(str(cam['duration_int'])) if cam['duration_int'] is not None
+                              else (np.nan, np.nan) for cam in cams], dtype=np.float64).reshape(len(cams), 2)
+        advertised = np.array([_advertised(cam['advertised_int']) for cam in cams], dtype=np.float64)
+        duration_050 = durations[:, 0]
+        advertised = np.where(np.isnan(advertised), durations[:, 1], advertised)
+        lsa = np.array([_number(cam['lsa']) if cam['lsa'] is not None else np.nan for cam in cams], dtype=np.float64)
+        advance = np.array([cam['advance_deg'] for cam in cams], dtype=np.float64)
+
+        ivc = seat_closing_abdc(duration_050, advertised, lsa, advance)
+        effective_stroke, dynamic_cr = dynamic_compression(
+            float(build['bore_in']), float(build['stroke_in']), float(build['rod_len_in']), geometry['clearance_cc'][0], ivc
+        )
+
+        columns = {
+            'duration_050': rounded_list(duration_050, 1),
+            'advertised': rounded_list(advertised, 1),
+            'lsa': rounded_list(lsa, 1),
+            'advance_deg': rounded_list(advance, 1),
+            'intake_centerline': rounded_list(lsa - advance, 1),
+            'ivc_abdc_deg': rounded_list(ivc, 1),
+            'effective_stroke_in': rounded_list(effective_stroke, 4),
+            'dynamic_cr': rounded_list(dynamic_cr, 2),
+        }
+        results = [
+            {'label': cam['label'], **{name: values[i] for name, values in columns.items()}}
+            for i, cam in enumerate(cams)
+        ]
+
+        return {
+            'success': True,
+            'build_id': build['id'],
+            'version': build['version'],
+            'static_cr': rounded_list(geometry['static_cr'], 2)[0],
+            'clearance_cc': rounded_list(geometry['clearance_cc'], 2)[0],
+            'stored_dynamic_cr': float(build['dynamic_cr']) if build['dynamic_cr'] is not None else None,
+            'current': results[0] if results[0]['dynamic_cr'] is not None else None,
+            'candidates': results[1:]
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
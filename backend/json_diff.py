@@ -0,0 +1,310 @@
+"""
+Structural diff engine for build component JSON documents.
+
+Produces path-level changes addressed by JSON Pointer (RFC 6901) that can be
+emitted directly as an RFC 6902 JSON Patch. Arrays whose elements are objects
+with a unique "id" key (e.g. notes_array) are matched by id rather than by
+position, so appending or deleting a note does not show up as a change to
+every following element.
+"""
+from typing import Any, Dict, List, Optional
+
+
+def escape_pointer_token(token: Any) -> str:
+    """Escape a single JSON Pointer reference token (RFC 6901)"""
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def join_pointer(base: str, token: Any) -> str:
+    """Append a reference token to a JSON Pointer"""
+    return f"{base}/{escape_pointer_token(token)}"
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    """
+    Split a JSON Pointer into unescaped reference tokens.
+
+    '' addresses the whole document; otherwise the pointer must start with '/'.
+    Raises ValueError for anything else.
+    """
+    if pointer == '':
+        return []
+    if not pointer.startswith('/'):
+        raise ValueError(f"JSON Pointer must start with '/': {pointer}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def json_equal(a: Any, b: Any) -> bool:
+    """
+    Equality as JSON sees it: unlike ==, 1, 1.0 and True differ, at every
+    depth of a nested document.
+    """
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(json_equal(value, b[key]) for key, value in a.items())
+    if isinstance(a, list):
+        return len(a) == len(b) and all(json_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def _id_keys(array: List[Any]) -> Optional[List[Any]]:
+    """Return element ids if every element is an object with a unique 'id', else None"""
+    ids = []
+    for element in array:
+        if not isinstance(element, dict) or 'id' not in element:
+            return None
+        ids.append(element['id'])
+    if len(set(map(repr, ids))) != len(ids):
+        return None
+    return ids
+
+
+def _diff_keyed_array(before: List[Dict], after: List[Dict], path: str,
+                      before_ids: List[Any], after_ids: List[Any]) -> Optional[List[Dict]]:
+    """
+    Diff two arrays of objects matched by id.
+
+    Operations are ordered so they apply sequentially per RFC 6902: removals
+    (highest index first), then insertions (lowest index first), then in-place
+    changes addressed by their final index. Returns None when the surviving
+    elements were reordered, in which case the caller replaces the array.
+    """
+    after_id_set = set(map(repr, after_ids))
+    before_id_set = set(map(repr, before_ids))
+
+    kept_before = [i for i in before_ids if repr(i) in after_id_set]
+    kept_after = [i for i in after_ids if repr(i) in before_id_set]
+    if list(map(repr, kept_before)) != list(map(repr, kept_after)):
+        return None
+
+    ops = []
+    for index in range(len(before) - 1, -1, -1):
+        if repr(before_ids[index]) not in after_id_set:
+            ops.append({
+                'op': 'remove',
+                'path': join_pointer(path, index),
+                'old_value': before[index]
+            })
+
+    for index, element in enumerate(after):
+        if repr(after_ids[index]) not in before_id_set:
+            ops.append({
+                'op': 'add',
+                'path': join_pointer(path, index),
+                'value': element
+            })
+
+    before_by_id = {repr(i): element for i, element in zip(before_ids, before)}
+    for index, element in enumerate(after):
+        previous = before_by_id.get(repr(after_ids[index]))
+        if previous is not None:
+            ops.extend(diff_documents(previous, element, join_pointer(path, index)))
+
+    return ops
+
+
+def _diff_positional_array(before: List[Any], after: List[Any], path: str) -> List[Dict]:
+    """Diff two arrays element-by-element, then add or trim the tail"""
+    ops = []
+    common = min(len(before), len(after))
+    for index in range(common):
+        ops.extend(diff_documents(before[index], after[index], join_pointer(path, index)))
+
+    for index in range(len(before) - 1, common - 1, -1):
+        ops.append({
+            'op': 'remove',
+            'path': join_pointer(path, index),
+            'old_value': before[index]
+        })
+
+    for index in range(common, len(after)):
+        ops.append({
+            'op': 'add',
+            'path': join_pointer(path, index),
+            'value': after[index]
+        })
+
+    return ops
+
+
+def diff_documents(before: Any, after: Any, path: str = '') -> List[Dict]:
+    """
+    Compute the path-level changes that turn `before` into `after`.
+
+    Args:
+        before: Earlier JSON value (dict, list or scalar)
+        after: Later JSON value
+        path: JSON Pointer of the values being compared ('' for the document root)
+
+    Returns:
+        List of operations: {'op', 'path', 'value'?, 'old_value'?}, in an
+        order that applies cleanly as an RFC 6902 patch once `old_value`
+        is stripped (see to_json_patch).
+    """
+    if json_equal(before, after):
+        return []
+
+    if isinstance(before, dict) and isinstance(after, dict):
+        ops = []
+        for key in before:
+            if key not in after:
+                ops.append({
+                    'op': 'remove',
+                    'path': join_pointer(path, key),
+                    'old_value': before[key]
+                })
+        for key, value in after.items():
+            if key not in before:
+                ops.append({
+                    'op': 'add',
+                    'path': join_pointer(path, key),
+                    'value': value
+                })
+            else:
+                ops.extend(diff_documents(before[key], value, join_pointer(path, key)))
+        return ops
+
+    if isinstance(before, list) and isinstance(after, list):
+        before_ids = _id_keys(before)
+        after_ids = _id_keys(after)
+        if before_ids is not None and after_ids is not None and (before or after):
+            ops = _diff_keyed_array(before, after, path, before_ids, after_ids)
+            if ops is not None:
+                return ops
+        else:
+            return _diff_positional_array(before, after, path)
+
+    return [{
+        'op': 'replace',
+        'path': path,
+        'value': after,
+        'old_value': before
+    }]
+
+
+def to_json_patch(ops: List[Dict]) -> List[Dict]:
+    """Strip diff-only metadata so the operations form a plain RFC 6902 patch"""
+    return [
+        {key: value for key, value in op.items() if key != 'old_value'}
+        for op in ops
+    ]
+
+
+def diff_columns(before: Dict, after: Dict, columns: List[str]) -> Dict[str, List[Dict]]:
+    """
+    Diff several JSON columns of two rows.
+
+    A NULL column is treated as an empty document, so populating a component
+    for the first time yields one 'add' per top-level key instead of a single
+    whole-document replacement.
+
+    Returns:
+        Dict mapping column name to its list of operations (changed columns only)
+    """
+    changes = {}
+    for column in columns:
+        before_value = before.get(column)
+        after_value = after.get(column)
+        if before_value is None and after_value is None:
+            continue
+
+        ops = diff_documents(
+            before_value if before_value is not None else {},
+            after_value if after_value is not None else {}
+        )
+        if ops:
+            changes[column] = ops
+
+    return changes
+
+
+def strip_nulls(value: Any) -> Any:
+    """Remove null members from objects recursively (RFC 7396 applied to an empty target)"""
+    if isinstance(value, dict):
+        return {key: strip_nulls(member) for key, member in value.items() if member is not None}
+    return value
+
+
+def merge_patch_operations(current: Any, patch: Dict, path: tuple = ()) -> List[Dict]:
+    """
+    Reduce a JSON Merge Patch (RFC 7396) to the minimal set of path writes.
+
+    Nested objects are descended into only where the current document already
+    has an object at that key; otherwise the (null-stripped) patch subtree is
+    written whole at the first missing key, so every resulting path can be
+    applied with jsonb_set() without creating intermediate objects. Values
+    equal to what is already stored produce no operation.
+
+    Args:
+        current: Current stored document (None if the column is NULL)
+        patch: Merge patch document
+        path: Key path of `current` within the column
+
+    Returns:
+        List of {'op': 'set'|'delete', 'path': tuple, 'value'?, 'old_value'}
+    """
+    ops = []
+    for key, value in patch.items():
+        key_path = path + (key,)
+        exists = isinstance(current, dict) and key in current
+        old_value = current[key] if exists else None
+
+        if value is None:
+            if exists:
+                ops.append({'op': 'delete', 'path': key_path, 'old_value': old_value})
+        elif isinstance(value, dict) and isinstance(old_value, dict):
+            ops.extend(merge_patch_operations(old_value, value, key_path))
+        else:
+            new_value = strip_nulls(value)
+            if not exists or not json_equal(old_value, new_value):
+                ops.append({'op': 'set', 'path': key_path, 'value': new_value, 'old_value': old_value})
+
+    return ops
+
+
+def apply_merge_patch(current: Any, patch: Any) -> Any:
+    """Apply a JSON Merge Patch (RFC 7396) in memory and return the resulting document"""
+    if not isinstance(patch, dict):
+        return patch
+
+    result = dict(current) if isinstance(current, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+
+def flatten_leaves(value: Any, path: tuple = ()):
+    """Yield (path, value) for every leaf of a JSON value; empty containers count as leaves"""
+    if isinstance(value, dict) and value:
+        for key, member in value.items():
+            yield from flatten_leaves(member, path + (key,))
+    else:
+        yield path, value
+
+
+def leaf_changes(ops: List[Dict]) -> Dict[tuple, tuple]:
+    """
+    Expand merge-patch operations into per-leaf (old_value, new_value) pairs.
+
+    Writing a whole subtree where nothing (or a scalar) existed, or deleting
+    an object, is reported leaf by leaf so each changed field is its own event.
+    """
+    changes = {}
+    for op in ops:
+        old_value = op['old_value']
+        new_value = op.get('value')
+
+        if op['op'] == 'delete' and isinstance(old_value, dict):
+            for leaf_path, leaf_value in flatten_leaves(old_value, op['path']):
+                changes[leaf_path] = (leaf_value, None)
+        elif op['op'] == 'set' and isinstance(new_value, dict) and old_value is None:
+            for leaf_path, leaf_value in flatten_leaves(new_value, op['path']):
+                changes[leaf_path] = (None, leaf_value)
+        else:
+            changes[op['path']] = (old_value, new_value)
+
+    return changes
@@ -0,0 +1,139 @@
+"""
+API endpoints for build leaderboards.
+
+Boards are read from build_leaderboards (migration 020), which triggers keep
+current as performance tests are corrected, so a page is one keyset range
+scan of the board's partial index plus the page's build and vehicle rows.
+"""
+from decimal import Decimal, InvalidOperation
+from fastapi import APIRouter, HTTPException
+from typing import Optional
+
+from db import get_db_cursor
+
+router = APIRouter()
+
+# Board name -> (build_leaderboards column, sort direction, description)
+LEADERBOARDS = {
+    'hp': ('best_hp', 'DESC', 'Best weather-corrected (SAE) dyno HP'),
+    'quarter-mile-et': ('best_quarter_mile_et', 'ASC', 'Quickest corrected quarter-mile ET'),
+    'quarter-mile-mph': ('best_quarter_mile_mph', 'DESC', 'Fastest corrected quarter-mile trap speed'),
+    'hp-per-ci': ('hp_per_ci', 'DESC', 'Corrected HP per cubic inch'),
+    'hp-per-weight': ('hp_per_ton', 'DESC', 'Corrected HP per ton of vehicle weight'),
+}
+
+
+def parse_board_cursor(after: str):
+    """'value:build_id:rank' from a previous page -> (value, build_id, rank)"""
+    try:
+        value, build_id, rank = after.split(':')
+        return Decimal(value), int(build_id), int(rank)
+    except (ValueError, InvalidOperation):
+        raise HTTPException(status_code=400, detail="Invalid cursor; pass next_cursor from the previous page")
+
+
+@router.get("/api/leaderboards")
+async def list_leaderboards():
+    """Available leaderboards (public)"""
+    return {
+        'success': True,
+        'leaderboards': [
+            {'board': board, 'order': direction.lower(), 'description': description}
+            for board, (_, direction, description) in LEADERBOARDS.items()
+        ]
+    }
+
+
+@router.get("/api/leaderboards/{board}")
+async def get_leaderboard(board: str, limit: int = 25, after: Optional[str] = None):
+    """
+    One page of a leaderboard (public).
+
+    Args:
+        board: One of LEADERBOARDS (hp, quarter-mile-et, quarter-mile-mph,
+            hp-per-ci, hp-per-weight)
+        limit: Page size (1-100)
+        after: next_cursor from the previous page
+
+    Returns:
+        Ranked entries with the build, its latest vehicle, the board value
+        and the results behind it, and next_cursor (null on the last page).
+        Ties share the order of build id.
+    """
+    try:
+        if board not in LEADERBOARDS:
+            raise HTTPException(status_code=404, detail=f"Unknown leaderboard: {board}")
+        column, direction, _ = LEADERBOARDS[board]
+        limit = max(1, min(limit, 100))
+
+        after_filter = ""
+        params = {'limit': limit + 1}
+        rank = 0
+        if after:
+            params['value'], params['build_id'], rank = parse_board_cursor(after)
+            beyond = '>' if direction == 'ASC' else '<'
+            # The first condition alone is an index range; the second breaks ties by build id
+            after_filter = f"""
+                AND l.{column} {beyond}= %(value)s
+                AND (l.{column} {beyond} %(value)s OR l.build_id > %(build_id)s)
+            """
+
+        with get_db_cursor(commit=False) as cursor:
+            cursor.execute(f"""
+                SELECT l.*, l.{column} AS value, b.slug, b.name, vi.year, vi.make, vi.model
+                FROM (
+                    SELECT * FROM build_leaderboards l
+                    WHERE l.{column} IS NOT NULL {after_filter}
+                    ORDER BY l.{column} {direction}, l.build_id
+                    LIMIT %(limit)s
+                ) l
+                JOIN builds b ON b.id = l.build_id
+                LEFT JOIN LATERAL (
+                    SELECT year, make, model FROM vehicle_info
+                    WHERE build_id = l.build_id
+                    ORDER BY timestamp DESC, id DESC LIMIT 1
+                ) vi ON true
+                ORDER BY l.{column} {direction}, l.build_id
+            """, params)
+            rows = cursor.fetchall()
+
+        entries = []
+        for row in rows[:limit]:
+            rank += 1
+            entries.append({
+                'rank': rank,
+                'build_id': row['build_id'],
+                'slug': row['slug'],
+                'name': row['name'],
+                'vehicle': {'year': row['year'], 'make': row['make'], 'model': row['model']},
+                'value': float(row['value']),
+                'best_hp': row['best_hp'],
+                'best_quarter_mile_et': row['best_quarter_mile_et'],
+                'best_quarter_mile_et_mph': row['best_quarter_mile_et_mph'],
+                'best_quarter_mile_mph': row['best_quarter_mile_mph'],
+                'displacement_ci': row['displacement_ci'],
+                'weight_lbs': row['weight_lbs'],
+                'test_ids': {
+                    'hp': row['best_hp_test_id'],
+                    'et': row['best_et_test_id'],
+                    'mph': row['best_mph_test_id'],
+                },
+            })
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = f"{last['value']}:{last['build_id']}:{rank}"
+
+        return {
+            'success': True,
+            'board': board,
+            'order': direction.lower(),
+            'entries': entries,
+            'next_cursor': next_cursor
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
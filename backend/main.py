@@ -1,10 +1,11 @@
-from fastapi import FastAPI, Request, HTTPException, Depends
+from fastapi import FastAPI, Request, Response, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from pydantic import BaseModel, EmailStr
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
+import asyncio
 import os
 from dotenv import load_dotenv
 from google.oauth2 import id_token
@@ -19,10 +20,29 @@ from auth import (
 )
 from sms import send_verification_code, verify_code
 from db import get_db_cursor, row_to_dict
+from component_schemas import validate_component
+from component_store import COLUMN_COMPONENT_MAP, attach_component_notes, attach_components, components_select, update_build
+from json_diff import apply_merge_patch, merge_patch_operations, leaf_changes
+from metrics import render_metrics
+from concurrency import MAX_WRITE_ATTEMPTS, parse_if_match, raise_version_conflict, version_etag, write_retry_delay
 
 # Import extended API routes
 from api_extensions import router as extensions_router
 from todo_api import router as todo_router
+from search_api import router as search_router
+from parts_api import router as parts_router
+from geometry_api import router as geometry_router
+from drivetrain_api import router as drivetrain_router
+from leaderboards_api import router as leaderboards_router
+from similar_api import router as similar_router
+from compare_api import router as compare_router
+from dyno_api import router as dyno_router
+from datalogs_api import router as datalogs_router
+from build_similarity import start_similarity_index_listener
+from engine_geometry import start_geometry_listener
+from parts_index import start_parts_index_listener
+from performance_corrections import start_corrections_listener
+from snapshot_retention import start_background_compactor
 
 # Load environment variables
 load_dotenv()
@@ -40,6 +60,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Build-Version"],
 )
 
 # Security Headers Middleware
@@ -62,6 +83,25 @@ app.add_middleware(SecurityHeadersMiddleware)
 # Include additional API routes
 app.include_router(extensions_router)
 app.include_router(todo_router)
+app.include_router(search_router)
+app.include_router(parts_router)
+app.include_router(geometry_router)
+app.include_router(drivetrain_router)
+app.include_router(leaderboards_router)
+app.include_router(similar_router)
+app.include_router(compare_router)
+app.include_router(dyno_router)
+app.include_router(datalogs_router)
+
+# Background jobs
+@app.on_event("startup")
+async def start_background_jobs():
+    """Start background jobs (snapshot retention compaction, parts prefix index, performance corrections, similar builds index, build geometry)"""
+    start_background_compactor()
+    start_parts_index_listener()
+    start_corrections_listener()
+    start_similarity_index_listener()
+    start_geometry_listener()
 
 # Pydantic Models
 class LoginRequest(BaseModel):
@@ -174,6 +214,9 @@ class BuildCreate(BaseModel):
     differential_fluid_type: Optional[str] = None
     coolant_type: Optional[str] = None
 
+# Build columns that cannot be changed through PATCH
+READ_ONLY_BUILD_FIELDS = {'id', 'user_id', 'slug', 'version'}
+
 # ============= Authentication Endpoints =============
 
 @app.post("/api/auth/register", response_model=TokenResponse)
@@ -394,18 +437,19 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 async def get_builds(current_user: dict = Depends(get_current_user)):
     """Get all builds (public + user's own)"""
     with get_db_cursor() as cursor:
-        cursor.execute('''
-            SELECT b.*, u.first_name, u.last_name, u.email
+        cursor.execute(f'''
+            SELECT b.*, u.first_name, u.last_name, u.email{components_select("b")}
             FROM builds b
             JOIN users u ON b.user_id = u.id
             ORDER BY b.name
         ''')
-        builds = cursor.fetchall()
+        builds = attach_components(cursor, [row_to_dict(build) for build in cursor.fetchall()])
+        attach_component_notes(cursor, builds)
 
-    return [row_to_dict(build) for build in builds]
+    return builds
 
 @app.get("/api/builds/{build_identifier}")
-async def get_build(build_identifier: str, request: Request, current_user: Optional[dict] = Depends(get_current_user_optional)):
+async def get_build(build_identifier: str, request: Request, response: Response, current_user: Optional[dict] = Depends(get_current_user_optional)):
     """Get a specific build with all related data (public read access)
 
     Args:
@@ -415,16 +459,16 @@ async def get_build(build_identifier: str, request: Request, current_user: Optio
         # Determine if identifier is a slug or ID
         if build_identifier.isdigit():
             # Backwards compatibility: numeric ID
-            cursor.execute('''
-                SELECT b.*, u.first_name, u.last_name, u.email
+            cursor.execute(f'''
+                SELECT b.*, u.first_name, u.last_name, u.email{components_select("b")}
                 FROM builds b
                 JOIN users u ON b.user_id = u.id
                 WHERE b.id = %s
             ''', (int(build_identifier),))
         else:
             # Modern approach: slug lookup
-            cursor.execute('''
-                SELECT b.*, u.first_name, u.last_name, u.email
+            cursor.execute(f'''
+                SELECT b.*, u.first_name, u.last_name, u.email{components_select("b")}
                 FROM builds b
                 JOIN users u ON b.user_id = u.id
                 WHERE b.slug = %s
@@ -436,6 +480,7 @@ async def get_build(build_identifier: str, request: Request, current_user: Optio
 
         build_dict = row_to_dict(build)
         build_id = build_dict['id']  # Get the actual build ID for related queries
+        attach_components(cursor, [build_dict])
 
         # Get related data
         cursor.execute('''
@@ -497,9 +542,15 @@ async def get_build(build_identifier: str, request: Request, current_user: Optio
         ''', (build_id,))
         performance = cursor.fetchall()
 
+        # Component notes, in the notes_array shape they used to have inside the JSON
+        attach_component_notes(cursor, [build_dict])
+
     # Check if current user is the owner
     is_owner = current_user is not None and current_user.get('id') == build_dict.get('user_id')
 
+    # Version for If-Match preconditions on subsequent writes
+    response.headers['ETag'] = version_etag(build_dict['version'])
+
     return {
         **build_dict,
         "is_owner": is_owner,
@@ -555,23 +606,30 @@ async def create_build(build: BuildCreate, current_user: dict = Depends(get_curr
         build_id = cursor.fetchone()['id']
 
         # Fetch created build
-        cursor.execute('SELECT * FROM builds WHERE id = %s', (build_id,))
-        created_build = cursor.fetchone()
+        cursor.execute(f'SELECT *{components_select()} FROM builds WHERE id = %s', (build_id,))
+        created_build = attach_components(cursor, [row_to_dict(cursor.fetchone())])[0]
 
-    return row_to_dict(created_build)
+    return created_build
 
 @app.patch("/api/builds/{build_identifier}")
 async def update_build_partial(
     build_identifier: str,
     changes: Dict[str, Any],
     request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user)
 ):
     """
     Partially update a build with field-level change tracking.
 
     Accepts only the fields being changed (not the entire build object).
-    Logs each field change to the event log for revision history.
+    Object values for *_json columns are JSON Merge Patches (RFC 7396):
+    nested keys are merged into the stored document inside Postgres with
+    jsonb_set, and a null value removes that key. Each changed leaf is
+    logged to the event log as its own field path.
+
+    Send the build's ETag in If-Match to make the update conditional on the
+    version you read; a stale version returns 409 with a field diff.
 
     Example request:
     {
@@ -580,9 +638,10 @@ async def update_build_partial(
         "engine_internals_json": {"block": {"bore_size": 4.030}}
     }
     """
-    import uuid
     from event_logger import log_changes_batch
 
+    expected_version = parse_if_match(request.headers.get('if-match'))
+
     # Get build ID from identifier
     with get_db_cursor() as cursor:
         if build_identifier.isdigit():
@@ -600,52 +659,78 @@ async def update_build_partial(
         if build['user_id'] != current_user['id']:
             raise HTTPException(status_code=403, detail="Not authorized to edit this build")
 
-        # Get current build state for comparison
-        cursor.execute("SELECT * FROM builds WHERE id = %s", (build_id,))
-        current_build = row_to_dict(cursor.fetchone())
-
-    # Separate table columns from JSONB columns
-    table_updates = {}
-    json_updates = {}
-    change_log = {}  # For event logging
-
-    for field, new_value in changes.items():
-        if field.endswith('_json'):
-            # JSONB column - need to deep merge
-            old_value = current_build.get(field) or {}
-            # For now, simple replacement (TODO: deep merge in future)
-            json_updates[field] = new_value
-            change_log[field] = (old_value, new_value)
-        else:
-            # Regular table column
+    # Read, compute the minimal update, then write conditioned on the version
+    # that was read. Without If-Match a lost race is simply recomputed.
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        with get_db_cursor() as cursor:
+            cursor.execute(f"SELECT *{components_select()} FROM builds WHERE id = %s", (build_id,))
+            current_build = attach_components(cursor, [row_to_dict(cursor.fetchone())])[0]
+
+        if expected_version is not None and current_build['version'] != expected_version:
+            raise_version_conflict(current_build, expected_version, changes)
+
+        values = {}     # Regular table columns
+        documents = {}  # Whole-document replacements of *_json columns
+        patches = {}    # Merge-patch operations on *_json columns
+        change_log = {}  # For event logging: {field_path: (old_value, new_value)}
+
+        for field, new_value in changes.items():
+            if field not in current_build or field in READ_ONLY_BUILD_FIELDS:
+                raise HTTPException(status_code=400, detail=f"Unknown or read-only field: {field}")
+
             old_value = current_build.get(field)
-            if old_value != new_value:
-                table_updates[field] = new_value
-                change_log[field] = (old_value, new_value)
 
-    if not table_updates and not json_updates:
-        return {"message": "No changes detected", "build": current_build}
+            if field.endswith('_json') and isinstance(new_value, dict):
+                # Notes live in component_notes; never write a stale copy into the document
+                new_value = {key: value for key, value in new_value.items() if key != 'notes_array'}
+                # JSONB document - merge patch applied server-side, changed paths only
+                ops = merge_patch_operations(old_value, new_value)
+                if not ops:
+                    continue
+
+                validate_component(COLUMN_COMPONENT_MAP[field], apply_merge_patch(old_value, new_value))
+                patches[field] = ops
+                for path, (old_leaf, new_leaf) in leaf_changes(ops).items():
+                    change_log['.'.join((field,) + path)] = (old_leaf, new_leaf)
+            elif field.endswith('_json'):
+                # Non-object value (e.g. null) replaces the whole document
+                if old_value != new_value:
+                    if new_value is not None:
+                        validate_component(COLUMN_COMPONENT_MAP[field], new_value)
+                    documents[field] = new_value
+                    change_log[field] = (old_value, new_value)
+            else:
+                # Regular table column
+                if old_value != new_value:
+                    values[field] = new_value
+                    change_log[field] = (old_value, new_value)
+
+        if not change_log:
+            response.headers['ETag'] = version_etag(current_build['version'])
+            return {
+                "success": True,
+                "message": "No changes detected",
+                "version": current_build['version'],
+                "changes": []
+            }
+
+        # Apply all column and JSON path updates in one transaction,
+        # conditioned on the version that was read
+        with get_db_cursor() as cursor:
+            new_version = update_build(
+                cursor, build_id,
+                values=values,
+                documents=documents,
+                patches=patches,
+                user_id=current_user['id'],
+                expected_version=current_build['version']
+            )
 
-    # Apply updates to database
-    with get_db_cursor() as cursor:
-        # Update table columns
-        if table_updates:
-            set_clauses = [f"{field} = %s" for field in table_updates.keys()]
-            values = list(table_updates.values()) + [build_id, current_user['id']]
-
-            cursor.execute(f"""
-                UPDATE builds
-                SET {', '.join(set_clauses)}
-                WHERE id = %s AND user_id = %s
-            """, values)
-
-        # Update JSONB columns
-        for json_field, json_value in json_updates.items():
-            cursor.execute(f"""
-                UPDATE builds
-                SET {json_field} = %s
-                WHERE id = %s AND user_id = %s
-            """, (json.dumps(json_value), build_id, current_user['id']))
+        if new_version is not None:
+            break
+        await asyncio.sleep(write_retry_delay(attempt))
+    else:
+        raise HTTPException(status_code=409, detail="Build is being modified concurrently, please retry")
 
     # Log changes to event log
     change_description = f"Updated {len(change_log)} field(s)"
@@ -664,16 +749,17 @@ async def update_build_partial(
         user_agent=user_agent
     )
 
-    # Fetch updated build
-    with get_db_cursor() as cursor:
-        cursor.execute("SELECT * FROM builds WHERE id = %s", (build_id,))
-        updated_build = cursor.fetchone()
+    response.headers['ETag'] = version_etag(new_version)
 
     return {
         "success": True,
         "message": f"Successfully updated {len(change_log)} field(s)",
         "batch_id": batch_id,
-        "build": row_to_dict(updated_build)
+        "version": new_version,
+        "changes": [
+            {"field": field_path, "old_value": old_value, "new_value": new_value}
+            for field_path, (old_value, new_value) in change_log.items()
+        ]
     }
 
 # Health check endpoint
@@ -682,6 +768,13 @@ async def health_check():
     """API health check"""
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
 
+# Prometheus metrics endpoint
+@app.get("/api/metrics")
+async def metrics():
+    """Prometheus metrics (text exposition format)"""
+    body, content_type = render_metrics()
+    return Response(content=body, headers={'Content-Type': content_type})
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,19 @@
+"""
+Prometheus metrics for the API process.
+
+Metrics are registered on the default prometheus_client registry and served
+in the text exposition format at GET /api/metrics.
+"""
+from prometheus_client import CONTENT_TYPE_LATEST, Histogram, generate_latest
+
+COMPONENT_VALIDATION_SECONDS = Histogram(
+    'component_validation_seconds',
+    'Time spent validating a component document against its JSON schema',
+    ['component', 'result'],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+)
+
+
+def render_metrics():
+    """Current metric values as (body, content type)"""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,50 @@
+"""Add composite snapshot index for retention compaction and history queries
+
+Revision ID: 008
+Revises: 007
+Create Date: 2025-02-03
+
+The snapshot compactor thins each build's history bucket by bucket, and the
+history timeline lists a build's snapshots newest first. Both walk
+(build_id, created_at), so index it directly.
+"""
+
+def upgrade(conn):
+    """Add (build_id, created_at) index on build_json_snapshots"""
+    cursor = conn.cursor()
+
+    print("Creating snapshot retention index...")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_snapshots_build_created
+        ON build_json_snapshots(build_id, created_at DESC)
+    """)
+
+    conn.commit()
+    print("✅ Migration 008 complete: Snapshot retention index added")
+
+
+def downgrade(conn):
+    """Remove snapshot retention index"""
+    cursor = conn.cursor()
+
+    print("Dropping snapshot retention index...")
+    cursor.execute("DROP INDEX IF EXISTS idx_snapshots_build_created")
+
+    conn.commit()
+    print("✅ Migration 008 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
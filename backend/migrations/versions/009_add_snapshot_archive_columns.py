@@ -0,0 +1,68 @@
+"""Add cold-storage archive location columns to build_json_snapshots
+
+Revision ID: 009
+Revises: 008
+Create Date: 2025-02-04
+
+Archived snapshots keep their metadata row (type, description, user,
+timestamps) but their JSON columns are cleared and the documents live in a
+zstd-compressed per-build segment file under STORAGE_PATH. These columns
+locate the snapshot's frame inside that segment.
+"""
+
+def upgrade(conn):
+    """Add archive_* columns to build_json_snapshots"""
+    cursor = conn.cursor()
+
+    print("Adding archive columns to build_json_snapshots...")
+    cursor.execute("""
+        ALTER TABLE build_json_snapshots
+        ADD COLUMN archive_segment TEXT,        -- segment path relative to STORAGE_PATH
+        ADD COLUMN archive_offset BIGINT,       -- byte offset of the snapshot frame
+        ADD COLUMN archive_length INTEGER,      -- compressed frame length in bytes
+        ADD COLUMN archived_at TIMESTAMP
+    """)
+
+    # Archiver scans for old, not-yet-archived rows of each build
+    cursor.execute("""
+        CREATE INDEX idx_snapshots_unarchived
+        ON build_json_snapshots(build_id, created_at)
+        WHERE archive_segment IS NULL
+    """)
+
+    conn.commit()
+    print("✅ Migration 009 complete: Snapshot archive columns added")
+
+
+def downgrade(conn):
+    """Remove archive columns (archived snapshots must be rehydrated first)"""
+    cursor = conn.cursor()
+
+    print("Removing archive columns from build_json_snapshots...")
+    cursor.execute("DROP INDEX IF EXISTS idx_snapshots_unarchived")
+    cursor.execute("""
+        ALTER TABLE build_json_snapshots
+        DROP COLUMN IF EXISTS archive_segment,
+        DROP COLUMN IF EXISTS archive_offset,
+        DROP COLUMN IF EXISTS archive_length,
+        DROP COLUMN IF EXISTS archived_at
+    """)
+
+    conn.commit()
+    print("✅ Migration 009 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
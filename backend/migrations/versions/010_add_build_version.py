@@ -0,0 +1,69 @@
+"""Add version column to builds for optimistic concurrency control
+
+Revision ID: 010
+Revises: 009
+Create Date: 2025-02-05
+
+Every write to a build row increments builds.version (via trigger, so no
+write path can forget). Writers that read a build and then update it pass
+the version they read as a precondition (UPDATE ... WHERE version = %s);
+zero affected rows means someone else wrote in between.
+"""
+
+def upgrade(conn):
+    """Add builds.version and the trigger that bumps it"""
+    cursor = conn.cursor()
+
+    print("Adding version column to builds table...")
+    cursor.execute("""
+        ALTER TABLE builds
+        ADD COLUMN version INTEGER NOT NULL DEFAULT 1
+    """)
+
+    print("Creating version bump trigger...")
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION bump_build_version() RETURNS trigger AS $$
+        BEGIN
+            NEW.version := OLD.version + 1;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER trg_builds_version
+        BEFORE UPDATE ON builds
+        FOR EACH ROW EXECUTE FUNCTION bump_build_version()
+    """)
+
+    conn.commit()
+    print("✅ Migration 010 complete: Build versions added")
+
+
+def downgrade(conn):
+    """Remove builds.version and its trigger"""
+    cursor = conn.cursor()
+
+    print("Removing build version column...")
+    cursor.execute("DROP TRIGGER IF EXISTS trg_builds_version ON builds")
+    cursor.execute("DROP FUNCTION IF EXISTS bump_build_version()")
+    cursor.execute("ALTER TABLE builds DROP COLUMN IF EXISTS version")
+
+    conn.commit()
+    print("✅ Migration 010 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
@@ -0,0 +1,156 @@
+"""Move component notes out of the JSONB documents into component_notes
+
+Revision ID: 011
+Revises: 010
+Create Date: 2025-02-06
+
+Notes used to live in a notes_array inside each component's *_json column,
+so adding one note rewrote (and snapshotted) the whole document. Each note
+is now a row, written with a single INSERT/UPDATE/DELETE.
+
+The build_component_notes view aggregates rows back into the old
+notes_array shape for readers that still expect it.
+"""
+
+# Component name (as used in the API) -> builds column, same as COMPONENT_COLUMN_MAP
+COMPONENT_COLUMNS = {
+    'engine-internals': 'engine_internals_json',
+    'suspension': 'suspension_json',
+    'tires-wheels': 'tires_wheels_json',
+    'rear-differential': 'rear_differential_json',
+    'transmission': 'transmission_json',
+    'frame': 'frame_json',
+    'cab-interior': 'cab_interior_json',
+    'brakes': 'brakes_json',
+    'additional-components': 'additional_components_json'
+}
+
+
+def upgrade(conn):
+    """Create component_notes, copy existing notes into it and add the compatibility views"""
+    cursor = conn.cursor()
+
+    print("Creating component_notes table...")
+    cursor.execute("""
+        CREATE TABLE component_notes (
+            id BIGSERIAL PRIMARY KEY,
+            build_id INTEGER NOT NULL REFERENCES builds(id) ON DELETE CASCADE,
+            component VARCHAR(50) NOT NULL,
+            note_key TEXT NOT NULL,             -- public note id ('note_<n>')
+            user_id INTEGER REFERENCES users(id),
+            user_name TEXT,
+            content TEXT NOT NULL,
+            action_type VARCHAR(20) NOT NULL DEFAULT 'add',
+            created_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc'),
+            last_edited TIMESTAMP
+        )
+    """)
+
+    # Listing a component's notes in order, and keyset pagination over it
+    cursor.execute("""
+        CREATE INDEX idx_component_notes_build_component
+        ON component_notes(build_id, component, id)
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_component_notes_key
+        ON component_notes(build_id, note_key)
+    """)
+
+    print("Copying notes out of component JSON documents...")
+    for component, column in COMPONENT_COLUMNS.items():
+        cursor.execute(f"""
+            INSERT INTO component_notes (
+                build_id, component, note_key, user_id, user_name, content,
+                action_type, created_at, last_edited
+            )
+            SELECT
+                b.id,
+                %s,
+                COALESCE(n.note->>'id', 'note_legacy_' || b.id || '_' || n.position),
+                (SELECT u.id FROM users u WHERE u.id = (n.note->>'user_id')::integer),
+                n.note->>'user_name',
+                COALESCE(n.note->>'content', ''),
+                COALESCE(n.note->>'action_type', 'add'),
+                COALESCE((n.note->>'timestamp')::timestamptz AT TIME ZONE 'utc', NOW() AT TIME ZONE 'utc'),
+                (n.note->>'last_edited')::timestamptz AT TIME ZONE 'utc'
+            FROM builds b
+            CROSS JOIN LATERAL jsonb_array_elements(b.{column}->'notes_array')
+                WITH ORDINALITY AS n(note, position)
+            WHERE jsonb_typeof(b.{column}->'notes_array') = 'array'
+            ORDER BY b.id, n.position
+        """, (component,))
+        if cursor.rowcount:
+            print(f"  {component}: {cursor.rowcount} notes")
+
+        cursor.execute(f"""
+            UPDATE builds SET {column} = {column} - 'notes_array'
+            WHERE {column} ? 'notes_array'
+        """)
+
+    print("Creating note compatibility views...")
+    # One note in the JSON shape the notes_array API has always returned
+    cursor.execute("""
+        CREATE VIEW component_note_documents AS
+        SELECT
+            id,
+            build_id,
+            component,
+            jsonb_strip_nulls(jsonb_build_object(
+                'id', note_key,
+                'timestamp', to_char(created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"'),
+                'user_id', user_id,
+                'user_name', user_name,
+                'content', content,
+                'action_type', action_type,
+                'last_edited', to_char(last_edited, 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"')
+            )) AS note
+        FROM component_notes
+    """)
+
+    # Per-component notes_array, as it used to be embedded in the *_json columns
+    cursor.execute("""
+        CREATE VIEW build_component_notes AS
+        SELECT build_id, component, jsonb_agg(note ORDER BY id) AS notes_array
+        FROM component_note_documents
+        GROUP BY build_id, component
+    """)
+
+    conn.commit()
+    print("✅ Migration 011 complete: Component notes table created")
+
+
+def downgrade(conn):
+    """Fold notes back into notes_array and drop the table"""
+    cursor = conn.cursor()
+
+    print("Restoring notes_array into component JSON documents...")
+    for component, column in COMPONENT_COLUMNS.items():
+        cursor.execute(f"""
+            UPDATE builds b
+            SET {column} = jsonb_set(COALESCE(b.{column}, '{{}}'::jsonb), '{{notes_array}}', n.notes_array, true)
+            FROM build_component_notes n
+            WHERE n.build_id = b.id AND n.component = %s
+        """, (component,))
+
+    cursor.execute("DROP VIEW IF EXISTS build_component_notes")
+    cursor.execute("DROP VIEW IF EXISTS component_note_documents")
+    cursor.execute("DROP TABLE IF EXISTS component_notes")
+
+    conn.commit()
+    print("✅ Migration 011 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
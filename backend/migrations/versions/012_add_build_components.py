@@ -0,0 +1,61 @@
+"""Add build_components table for per-row component document storage
+
+Revision ID: 012
+Revises: 011
+Create Date: 2025-02-07
+
+With COMPONENT_STORAGE_MODE=table each component document is its own row
+instead of a JSONB column on builds, so editing one component (or a scalar
+on builds) no longer writes a new version of the whole wide builds tuple.
+
+This migration only creates the table. Move existing documents with
+`python component_store.py --to table` when switching modes.
+"""
+
+def upgrade(conn):
+    """Create build_components"""
+    cursor = conn.cursor()
+
+    print("Creating build_components table...")
+    # fillfactor leaves room on each page so document rewrites can be HOT
+    # updates (no index entries to write, less WAL)
+    cursor.execute("""
+        CREATE TABLE build_components (
+            build_id INTEGER NOT NULL REFERENCES builds(id) ON DELETE CASCADE,
+            component VARCHAR(50) NOT NULL,
+            doc JSONB NOT NULL DEFAULT '{}'::jsonb,
+            version INTEGER NOT NULL DEFAULT 1,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (build_id, component)
+        ) WITH (fillfactor = 80)
+    """)
+
+    conn.commit()
+    print("✅ Migration 012 complete: build_components table created")
+
+
+def downgrade(conn):
+    """Drop build_components (move documents back to columns first)"""
+    cursor = conn.cursor()
+
+    print("Dropping build_components table...")
+    cursor.execute("DROP TABLE IF EXISTS build_components")
+
+    conn.commit()
+    print("✅ Migration 012 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
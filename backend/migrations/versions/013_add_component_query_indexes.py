@@ -0,0 +1,126 @@
+"""Add indexes for attribute queries over component documents
+
+Revision ID: 013
+Revises: 012
+Create Date: 2025-02-08
+
+GET /api/builds/query filters builds by values inside the component
+documents (build_query.py). Equality filters are jsonpath predicates
+(doc @@ '$.pistons.manufacturer == "Wiseco"') answered by a GIN index with
+the jsonb_path_ops opclass: smaller and faster than the default jsonb_ops,
+and it supports @>, @@ and @? which is all the query API uses.
+
+Range filters compare jsonb_numeric(doc #> path); the common measurements
+get B-tree expression indexes. Both storage layouts are indexed: the builds
+columns and build_components.doc (keyed by component).
+"""
+
+# Component name (as used in the API) -> builds column, same as COMPONENT_COLUMN_MAP
+COMPONENT_COLUMNS = {
+    'engine-internals': 'engine_internals_json',
+    'suspension': 'suspension_json',
+    'tires-wheels': 'tires_wheels_json',
+    'rear-differential': 'rear_differential_json',
+    'transmission': 'transmission_json',
+    'frame': 'frame_json',
+    'cab-interior': 'cab_interior_json',
+    'brakes': 'brakes_json',
+    'additional-components': 'additional_components_json'
+}
+
+# Numeric document paths compared with ranges often enough to index
+NUMERIC_INDEX_PATHS = [
+    ('engine-internals', 'crank_stroke', ('crankshaft', 'stroke_in')),
+    ('engine-internals', 'rod_length', ('connecting_rods', 'length_in')),
+    ('engine-internals', 'bore_size', ('block', 'bore_size')),
+    ('engine-internals', 'piston_dome', ('pistons', 'dome_cc')),
+    ('transmission', 'converter_stall', ('torque_converter', 'stall_rpm')),
+]
+
+
+def _path_literal(path):
+    return "'{" + ','.join(path) + "}'"
+
+
+def upgrade(conn):
+    """Create jsonb_numeric() and the GIN/expression indexes"""
+    cursor = conn.cursor()
+
+    print("Creating jsonb_numeric function...")
+    # Numbers, and strings written as plain numbers ("4.030"), as numeric;
+    # NULL for anything else so expression indexes never fail on free text
+    cursor.execute(r"""
+        CREATE OR REPLACE FUNCTION jsonb_numeric(value jsonb) RETURNS numeric
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT CASE
+                WHEN jsonb_typeof(value) = 'number' THEN (value #>> '{}')::numeric
+                WHEN jsonb_typeof(value) = 'string'
+                     AND btrim(value #>> '{}') ~ '^-?([0-9]+\.?[0-9]*|\.[0-9]+)$'
+                    THEN btrim(value #>> '{}')::numeric
+            END
+        $$
+    """)
+
+    print("Creating GIN jsonb_path_ops indexes...")
+    for column in COMPONENT_COLUMNS.values():
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_builds_{column}_path_ops
+            ON builds USING GIN ({column} jsonb_path_ops)
+        """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_build_components_doc_path_ops
+        ON build_components USING GIN (doc jsonb_path_ops)
+    """)
+
+    print("Creating numeric expression indexes...")
+    for component, name, path in NUMERIC_INDEX_PATHS:
+        column = COMPONENT_COLUMNS[component]
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_builds_{name}
+            ON builds (jsonb_numeric({column} #> {_path_literal(path)}))
+        """)
+        # Not a partial index: the planner only takes selectivity statistics
+        # from non-partial expression indexes
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_build_components_{name}
+            ON build_components (component, jsonb_numeric(doc #> {_path_literal(path)}))
+        """)
+
+    cursor.execute("ANALYZE builds")
+    cursor.execute("ANALYZE build_components")
+
+    conn.commit()
+    print("✅ Migration 013 complete: Component query indexes created")
+
+
+def downgrade(conn):
+    """Drop the query indexes and jsonb_numeric()"""
+    cursor = conn.cursor()
+
+    print("Dropping component query indexes...")
+    for _, name, _ in NUMERIC_INDEX_PATHS:
+        cursor.execute(f"DROP INDEX IF EXISTS idx_builds_{name}")
+        cursor.execute(f"DROP INDEX IF EXISTS idx_build_components_{name}")
+    for column in COMPONENT_COLUMNS.values():
+        cursor.execute(f"DROP INDEX IF EXISTS idx_builds_{column}_path_ops")
+    cursor.execute("DROP INDEX IF EXISTS idx_build_components_doc_path_ops")
+    cursor.execute("DROP FUNCTION IF EXISTS jsonb_numeric(jsonb)")
+
+    conn.commit()
+    print("✅ Migration 013 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
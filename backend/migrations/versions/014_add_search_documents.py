@@ -0,0 +1,150 @@
+"""Add full-text search over builds, parts, notes, maintenance and todos
+
+Revision ID: 014
+Revises: 013
+Create Date: 2025-02-09
+
+search_documents holds one row per searchable record with its weighted
+search_vector (tsvector, GIN indexed) and the text used for highlighting.
+Triggers on each source table upsert or delete that row whenever the
+record's searchable columns change, so the index is maintained incrementally
+by every write path. Keeping the vectors out of the source tables means
+SELECT * on builds, maintenance and todos is unchanged. GET /api/search
+queries it.
+"""
+
+# source -> (table, searchable columns, SELECT over NEW producing
+#            build_id, private_to, title, body, search_vector)
+SEARCH_SOURCES = {
+    'build': ('builds', ['name', 'notes'], """
+        SELECT NEW.id, NULL::integer, NEW.name, NEW.notes,
+               setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+               setweight(to_tsvector('english', coalesce(NEW.notes, '')), 'B')
+    """),
+    'part': ('parts', ['part_number', 'brand', 'name', 'category'], """
+        SELECT NULL::integer, NULL::integer,
+               concat_ws(' ', NEW.brand, NEW.name), concat_ws(' ', NEW.part_number, NEW.category),
+               setweight(to_tsvector('english', coalesce(NEW.part_number, '')), 'A') ||
+               setweight(to_tsvector('english', coalesce(NEW.brand, '')), 'A') ||
+               setweight(to_tsvector('english', coalesce(NEW.name, '')), 'B') ||
+               setweight(to_tsvector('english', coalesce(NEW.category, '')), 'C')
+    """),
+    'note': ('component_notes', ['content'], """
+        SELECT NEW.build_id, NULL::integer, NEW.component, NEW.content,
+               to_tsvector('english', coalesce(NEW.content, ''))
+    """),
+    'maintenance': ('build_maintenance', ['maintenance_type', 'item_description', 'brand', 'part_number', 'notes'], """
+        SELECT NEW.build_id, NULL::integer,
+               concat_ws(': ', NEW.maintenance_type, NEW.item_description),
+               concat_ws(' ', NEW.brand, NEW.part_number, NEW.notes),
+               setweight(to_tsvector('english', coalesce(NEW.maintenance_type, '')), 'A') ||
+               setweight(to_tsvector('english', coalesce(NEW.item_description, '')), 'A') ||
+               setweight(to_tsvector('english', concat_ws(' ', NEW.brand, NEW.part_number)), 'B') ||
+               setweight(to_tsvector('english', coalesce(NEW.notes, '')), 'C')
+    """),
+    # Todos are only visible to the build's owner
+    'todo': ('build_todos', ['title', 'description'], """
+        SELECT NEW.build_id, (SELECT user_id FROM builds WHERE id = NEW.build_id), NEW.title, NEW.description,
+               setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+               setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B')
+    """),
+}
+
+
+def upgrade(conn):
+    """Create search_documents, the maintenance triggers, and index existing rows"""
+    cursor = conn.cursor()
+
+    print("Creating search_documents table...")
+    cursor.execute("""
+        CREATE TABLE search_documents (
+            source VARCHAR(20) NOT NULL,
+            source_id BIGINT NOT NULL,
+            build_id INTEGER,
+            private_to INTEGER,                 -- user_id, NULL = public
+            title TEXT,
+            body TEXT,
+            search_vector tsvector NOT NULL,
+            PRIMARY KEY (source, source_id)
+        )
+    """)
+
+    for source, (table, columns, select) in SEARCH_SOURCES.items():
+        print(f"Creating search trigger on {table}...")
+        cursor.execute(f"""
+            CREATE OR REPLACE FUNCTION {table}_search_document() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    DELETE FROM search_documents WHERE source = '{source}' AND source_id = OLD.id;
+                    RETURN OLD;
+                END IF;
+
+                INSERT INTO search_documents (source, source_id, build_id, private_to, title, body, search_vector)
+                SELECT '{source}', NEW.id, d.*
+                FROM ({select}) AS d
+                ON CONFLICT (source, source_id) DO UPDATE SET
+                    build_id = EXCLUDED.build_id,
+                    private_to = EXCLUDED.private_to,
+                    title = EXCLUDED.title,
+                    body = EXCLUDED.body,
+                    search_vector = EXCLUDED.search_vector;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_search_document
+            AFTER INSERT OR DELETE OR UPDATE OF {', '.join(columns)} ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {table}_search_document()
+        """)
+
+        # Index existing rows with the same expression the trigger uses
+        cursor.execute(f"""
+            INSERT INTO search_documents (source, source_id, build_id, private_to, title, body, search_vector)
+            SELECT '{source}', NEW.id, d.*
+            FROM {table} AS NEW
+            CROSS JOIN LATERAL ({select}) AS d
+        """)
+        print(f"  {source}: {cursor.rowcount} rows indexed")
+
+    cursor.execute("""
+        CREATE INDEX idx_search_documents_vector
+        ON search_documents USING GIN (search_vector)
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_search_documents_build
+        ON search_documents (build_id)
+    """)
+
+    conn.commit()
+    print("✅ Migration 014 complete: Full-text search documents created")
+
+
+def downgrade(conn):
+    """Drop the search triggers and search_documents"""
+    cursor = conn.cursor()
+
+    print("Removing full-text search...")
+    for table, _, _ in SEARCH_SOURCES.values():
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_search_document ON {table}")
+        cursor.execute(f"DROP FUNCTION IF EXISTS {table}_search_document()")
+    cursor.execute("DROP TABLE IF EXISTS search_documents")
+
+    conn.commit()
+    print("✅ Migration 014 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
@@ -0,0 +1,109 @@
+"""Add trigram indexes and change notifications for parts suggestions
+
+Revision ID: 015
+Revises: 014
+Create Date: 2025-02-10
+
+/api/parts/suggest answers typeahead from an in-process prefix index
+(parts_index.py) and falls back to pg_trgm fuzzy matching for misspellings,
+served by trigram GIN indexes on part_number and name.
+
+Statement-level triggers NOTIFY 'parts_changed' with the ids a statement
+touched, so API processes update their prefix index incrementally. Large
+statements (bulk imports) send '*' to request a full reload instead of
+thousands of ids.
+"""
+
+# Beyond this many rows a statement asks listeners for a full reload
+NOTIFY_MAX_IDS = 500
+
+
+def upgrade(conn):
+    """Enable pg_trgm, index parts for fuzzy matching and add change notifications"""
+    cursor = conn.cursor()
+
+    print("Enabling pg_trgm...")
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    print("Creating trigram indexes on parts...")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_parts_part_number_trgm
+        ON parts USING GIN (part_number gin_trgm_ops)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_parts_name_trgm
+        ON parts USING GIN (name gin_trgm_ops)
+    """)
+
+    print("Creating parts change notification triggers...")
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_parts_changed() RETURNS trigger AS $$
+        DECLARE
+            changed_count integer;
+            changed_ids text;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                SELECT count(*), string_agg(id::text, ',') INTO changed_count, changed_ids FROM old_parts;
+            ELSE
+                SELECT count(*), string_agg(id::text, ',') INTO changed_count, changed_ids FROM new_parts;
+            END IF;
+
+            IF changed_count > {NOTIFY_MAX_IDS} THEN
+                PERFORM pg_notify('parts_changed', '*');
+            ELSIF changed_count > 0 THEN
+                PERFORM pg_notify('parts_changed', changed_ids);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # Transition tables allow only one event per trigger
+    cursor.execute("""
+        CREATE TRIGGER trg_parts_notify_insert
+        AFTER INSERT ON parts REFERENCING NEW TABLE AS new_parts
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_parts_changed()
+    """)
+    cursor.execute("""
+        CREATE TRIGGER trg_parts_notify_update
+        AFTER UPDATE ON parts REFERENCING NEW TABLE AS new_parts
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_parts_changed()
+    """)
+    cursor.execute("""
+        CREATE TRIGGER trg_parts_notify_delete
+        AFTER DELETE ON parts REFERENCING OLD TABLE AS old_parts
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_parts_changed()
+    """)
+
+    conn.commit()
+    print("✅ Migration 015 complete: Parts suggestion indexes added")
+
+
+def downgrade(conn):
+    """Drop the notification triggers and trigram indexes (pg_trgm stays installed)"""
+    cursor = conn.cursor()
+
+    print("Removing parts suggestion indexes...")
+    for event in ('insert', 'update', 'delete'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_parts_notify_{event} ON parts")
+    cursor.execute("DROP FUNCTION IF EXISTS notify_parts_changed()")
+    cursor.execute("DROP INDEX IF EXISTS idx_parts_part_number_trgm")
+    cursor.execute("DROP INDEX IF EXISTS idx_parts_name_trgm")
+
+    conn.commit()
+    print("✅ Migration 015 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
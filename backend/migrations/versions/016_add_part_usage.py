@@ -0,0 +1,150 @@
+"""Add part usage indexes and per-part popularity counters
+
+Revision ID: 016
+Revises: 015
+Create Date: 2025-02-11
+
+build_parts and vehicle_parts were only ever read by build, so nothing
+indexed part_id. These indexes serve GET /api/parts/usage ("who else runs
+this cam"), which walks each link table by (part_id, owner id).
+
+part_usage_counts keeps the number of build and vehicle links per part.
+Statement-level triggers on both link tables apply the net change per part
+in one upsert, so the counters stay exact without ever recounting. Updates
+that don't move a link to another part (notes, role) change nothing.
+"""
+
+# link table -> counter column
+USAGE_LINKS = {
+    'build_parts': 'build_links',
+    'vehicle_parts': 'vehicle_links',
+}
+
+# Net change in links per part for each trigger event
+DELTA_SELECTS = {
+    'INSERT': "SELECT part_id, count(*) AS delta FROM new_links WHERE part_id IS NOT NULL GROUP BY part_id",
+    'DELETE': "SELECT part_id, -count(*) AS delta FROM old_links WHERE part_id IS NOT NULL GROUP BY part_id",
+    'UPDATE': """
+        SELECT part_id, sum(delta) AS delta
+        FROM (SELECT part_id, 1 AS delta FROM new_links
+              UNION ALL
+              SELECT part_id, -1 FROM old_links) AS changes
+        WHERE part_id IS NOT NULL
+        GROUP BY part_id
+        HAVING sum(delta) <> 0
+    """,
+}
+
+# Transition tables each trigger event can reference
+TRANSITION_TABLES = {
+    'INSERT': 'NEW TABLE AS new_links',
+    'DELETE': 'OLD TABLE AS old_links',
+    'UPDATE': 'OLD TABLE AS old_links NEW TABLE AS new_links',
+}
+
+
+def upgrade(conn):
+    """Index the link tables by part and create the usage counters"""
+    cursor = conn.cursor()
+
+    print("Creating part usage indexes...")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_build_parts_part ON build_parts (part_id, build_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_build_parts_build ON build_parts (build_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_vehicle_parts_part ON vehicle_parts (part_id, vehicle_info_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_vehicle_parts_vehicle ON vehicle_parts (vehicle_info_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_parts_brand_lower ON parts (lower(brand))")
+
+    print("Creating part_usage_counts table...")
+    cursor.execute("""
+        CREATE TABLE part_usage_counts (
+            part_id INTEGER PRIMARY KEY REFERENCES parts(id) ON DELETE CASCADE,
+            build_links INTEGER NOT NULL DEFAULT 0,
+            vehicle_links INTEGER NOT NULL DEFAULT 0,
+            total_links INTEGER GENERATED ALWAYS AS (build_links + vehicle_links) STORED
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_part_usage_counts_total
+        ON part_usage_counts (total_links DESC, part_id)
+    """)
+
+    for table, column in USAGE_LINKS.items():
+        print(f"Creating usage counter triggers on {table}...")
+        branches = []
+        for event, delta_select in DELTA_SELECTS.items():
+            branches.append(f"""
+                IF TG_OP = '{event}' THEN
+                    INSERT INTO part_usage_counts (part_id, {column})
+                    SELECT part_id, delta FROM ({delta_select}) AS d
+                    ORDER BY part_id
+                    ON CONFLICT (part_id) DO UPDATE
+                    SET {column} = part_usage_counts.{column} + EXCLUDED.{column};
+                END IF;
+            """)
+        cursor.execute(f"""
+            CREATE OR REPLACE FUNCTION {table}_usage_count() RETURNS trigger AS $$
+            BEGIN
+                {''.join(branches)}
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        # Transition tables allow only one event per trigger
+        for event, transition in TRANSITION_TABLES.items():
+            cursor.execute(f"""
+                CREATE TRIGGER trg_{table}_usage_{event.lower()}
+                AFTER {event} ON {table} REFERENCING {transition}
+                FOR EACH STATEMENT EXECUTE FUNCTION {table}_usage_count()
+            """)
+
+    print("Counting existing part usage...")
+    cursor.execute("""
+        INSERT INTO part_usage_counts (part_id, build_links, vehicle_links)
+        SELECT part_id, sum(build_links), sum(vehicle_links)
+        FROM (
+            SELECT part_id, count(*) AS build_links, 0 AS vehicle_links
+            FROM build_parts WHERE part_id IS NOT NULL GROUP BY part_id
+            UNION ALL
+            SELECT part_id, 0, count(*)
+            FROM vehicle_parts GROUP BY part_id
+        ) AS links
+        GROUP BY part_id
+    """)
+    print(f"  {cursor.rowcount} parts in use")
+
+    conn.commit()
+    print("✅ Migration 016 complete: Part usage indexes and counters created")
+
+
+def downgrade(conn):
+    """Drop the usage counters and link table indexes"""
+    cursor = conn.cursor()
+
+    print("Removing part usage indexes and counters...")
+    for table in USAGE_LINKS:
+        for event in TRANSITION_TABLES:
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_usage_{event.lower()} ON {table}")
+        cursor.execute(f"DROP FUNCTION IF EXISTS {table}_usage_count()")
+    cursor.execute("DROP TABLE IF EXISTS part_usage_counts")
+    for index in ('idx_build_parts_part', 'idx_build_parts_build', 'idx_vehicle_parts_part',
+                  'idx_vehicle_parts_vehicle', 'idx_parts_brand_lower'):
+        cursor.execute(f"DROP INDEX IF EXISTS {index}")
+
+    conn.commit()
+    print("✅ Migration 016 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
@@ -0,0 +1,60 @@
+"""Add indexes for matching imported orders and order items
+
+Revision ID: 017
+Revises: 016
+Create Date: 2025-02-12
+
+parts_import.py matches orders on (order_number, vendor) and order items on
+(order, part) with set-based joins. Without these indexes every import
+would scan both tables once per merge step.
+"""
+
+
+def upgrade(conn):
+    """Index orders and order_items by their import keys"""
+    cursor = conn.cursor()
+
+    print("Creating order import indexes...")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_orders_number_vendor
+        ON orders (order_number, coalesce(vendor_id, 0))
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_order_items_order_part
+        ON order_items (order_id, part_id)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_order_items_part
+        ON order_items (part_id)
+    """)
+
+    conn.commit()
+    print("✅ Migration 017 complete: Order import indexes created")
+
+
+def downgrade(conn):
+    """Drop the order import indexes"""
+    cursor = conn.cursor()
+
+    print("Removing order import indexes...")
+    for index in ('idx_orders_number_vendor', 'idx_order_items_order_part', 'idx_order_items_part'):
+        cursor.execute(f"DROP INDEX IF EXISTS {index}")
+
+    conn.commit()
+    print("✅ Migration 017 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
@@ -0,0 +1,66 @@
+"""Add build_geometry for computed engine geometry
+
+Revision ID: 018
+Revises: 017
+Create Date: 2025-02-13
+
+One row per build with the geometry engine_geometry.py derives from the
+build's measured inputs, tagged with the build version it was computed
+from so the batch recompute only touches builds that changed. Indexed for
+ranking by displacement and compression.
+"""
+
+
+def upgrade(conn):
+    """Create build_geometry"""
+    cursor = conn.cursor()
+
+    print("Creating build_geometry table...")
+    cursor.execute("""
+        CREATE TABLE build_geometry (
+            build_id INTEGER PRIMARY KEY REFERENCES builds(id) ON DELETE CASCADE,
+            build_version INTEGER NOT NULL,
+            cylinders SMALLINT,
+            displacement_ci DOUBLE PRECISION,
+            displacement_l DOUBLE PRECISION,
+            swept_cc DOUBLE PRECISION,
+            clearance_cc DOUBLE PRECISION,
+            static_cr DOUBLE PRECISION,
+            quench_in DOUBLE PRECISION,
+            rod_ratio DOUBLE PRECISION,
+            mean_piston_speed_fpm DOUBLE PRECISION,
+            computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX idx_build_geometry_displacement ON build_geometry (displacement_ci DESC)")
+    cursor.execute("CREATE INDEX idx_build_geometry_static_cr ON build_geometry (static_cr DESC)")
+
+    conn.commit()
+    print("✅ Migration 018 complete: build_geometry created (run engine_geometry.py to fill it)")
+
+
+def downgrade(conn):
+    """Drop build_geometry"""
+    cursor = conn.cursor()
+
+    print("Removing build_geometry...")
+    cursor.execute("DROP TABLE IF EXISTS build_geometry")
+
+    conn.commit()
+    print("✅ Migration 018 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
@@ -0,0 +1,107 @@
+"""Add weather-corrected results to performance_tests
+
+Revision ID: 019
+Revises: 018
+Create Date: 2025-02-14
+
+Dyno and track results from different days only compare once they are
+corrected to standard air. performance_corrections.py computes density
+altitude, SAE J1349 and STD correction factors and the corrected HP,
+torque, ET and MPH into these columns.
+
+A row trigger clears corrections_computed_at whenever a test is inserted
+or one of its inputs changes, and notifies 'performance_tests_changed';
+the API's listener (and the backfill command) then recompute the pending
+rows in batches. Run `python performance_corrections.py` after upgrading
+to fill existing tests.
+"""
+
+# Columns the corrections are computed from
+CORRECTION_INPUTS = (
+    'weather_temp_f', 'weather_humidity_pct', 'elevation_ft', 'dyno_hp', 'dyno_torque',
+    'quarter_mile_et', 'quarter_mile_mph', 'eighth_mile_et', 'eighth_mile_mph'
+)
+
+# New column -> type
+CORRECTION_COLUMNS = {
+    'density_altitude_ft': 'DECIMAL(10,0)',
+    'sae_correction_factor': 'DECIMAL(6,4)',
+    'std_correction_factor': 'DECIMAL(6,4)',
+    'corrected_hp_sae': 'DECIMAL(10,2)',
+    'corrected_torque_sae': 'DECIMAL(10,2)',
+    'corrected_hp_std': 'DECIMAL(10,2)',
+    'corrected_torque_std': 'DECIMAL(10,2)',
+    'corrected_quarter_mile_et': 'DECIMAL(6,3)',
+    'corrected_quarter_mile_mph': 'DECIMAL(6,2)',
+    'corrected_eighth_mile_et': 'DECIMAL(6,3)',
+    'corrected_eighth_mile_mph': 'DECIMAL(6,2)',
+    'corrections_computed_at': 'TIMESTAMP',
+}
+
+
+def upgrade(conn):
+    """Add the corrected columns and the trigger that marks tests for recomputing"""
+    cursor = conn.cursor()
+
+    print("Adding correction columns to performance_tests...")
+    for column, column_type in CORRECTION_COLUMNS.items():
+        cursor.execute(f"ALTER TABLE performance_tests ADD COLUMN IF NOT EXISTS {column} {column_type}")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_performance_tests_corrections_pending
+        ON performance_tests (id) WHERE corrections_computed_at IS NULL
+    """)
+
+    print("Creating performance test change trigger...")
+    changed = ' OR '.join(f"NEW.{c} IS DISTINCT FROM OLD.{c}" for c in CORRECTION_INPUTS)
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION performance_tests_corrections_pending() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' OR {changed} THEN
+                NEW.corrections_computed_at := NULL;
+                -- Identical payloads are delivered once per transaction
+                PERFORM pg_notify('performance_tests_changed', '');
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    cursor.execute("""
+        CREATE TRIGGER trg_performance_tests_corrections
+        BEFORE INSERT OR UPDATE ON performance_tests
+        FOR EACH ROW EXECUTE FUNCTION performance_tests_corrections_pending()
+    """)
+
+    conn.commit()
+    print("✅ Migration 019 complete: performance_tests correction columns added "
+          "(run performance_corrections.py to fill them)")
+
+
+def downgrade(conn):
+    """Drop the trigger and correction columns"""
+    cursor = conn.cursor()
+
+    print("Removing performance test corrections...")
+    cursor.execute("DROP TRIGGER IF EXISTS trg_performance_tests_corrections ON performance_tests")
+    cursor.execute("DROP FUNCTION IF EXISTS performance_tests_corrections_pending()")
+    cursor.execute("DROP INDEX IF EXISTS idx_performance_tests_corrections_pending")
+    for column in CORRECTION_COLUMNS:
+        cursor.execute(f"ALTER TABLE performance_tests DROP COLUMN IF EXISTS {column}")
+
+    conn.commit()
+    print("✅ Migration 019 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
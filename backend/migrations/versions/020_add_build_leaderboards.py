@@ -0,0 +1,246 @@
+"""Add materialized build leaderboards
+
+Revision ID: 020
+Revises: 019
+Create Date: 2025-02-15
+
+build_leaderboards keeps one row per build with its best weather-corrected
+dyno HP, quarter-mile ET and MPH (performance_corrections.py) and the
+ratios derived from them: HP per cubic inch (computed displacement from
+build_geometry, else builds.displacement_ci) and HP per ton (builds
+vehicle_weight_lbs, else the latest vehicle_info weight).
+
+refresh_build_leaderboards(build ids) recomputes just those builds.
+Triggers call it for the builds a statement touched on performance_tests
+(only when a result or corrected value changed), build_geometry,
+vehicle_info and the builds weight/displacement columns, so the boards
+stay current without rescanning. Each board is read by keyset from its own
+partial index.
+"""
+
+# Board column -> sort direction (matches leaderboards_api.LEADERBOARDS)
+BOARD_INDEXES = {
+    'best_hp': 'DESC',
+    'best_quarter_mile_et': 'ASC',
+    'best_quarter_mile_mph': 'DESC',
+    'hp_per_ci': 'DESC',
+    'hp_per_ton': 'DESC',
+}
+
+# performance_tests columns a leaderboard row depends on
+RESULT_COLUMNS = ('build_id', 'corrected_hp_sae', 'corrected_quarter_mile_et', 'corrected_quarter_mile_mph')
+
+# Transition tables each trigger event can reference
+TRANSITION_TABLES = {
+    'INSERT': 'NEW TABLE AS new_rows',
+    'DELETE': 'OLD TABLE AS old_rows',
+    'UPDATE': 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+}
+
+# Builds a statement on a table affects, per trigger event
+AFFECTED_BUILDS = {
+    'INSERT': "SELECT array_agg(DISTINCT build_id) FROM new_rows",
+    'DELETE': "SELECT array_agg(DISTINCT build_id) FROM old_rows",
+    'UPDATE': """
+        SELECT array_agg(DISTINCT ids.build_id)
+        FROM new_rows n
+        JOIN old_rows o ON o.{key} = n.{key}
+        CROSS JOIN LATERAL (VALUES (n.build_id), (o.build_id)) AS ids (build_id)
+        WHERE {changed}
+    """,
+}
+
+# Tables whose statements refresh leaderboards -> (key column, columns that matter)
+SOURCE_TABLES = {
+    'performance_tests': ('id', RESULT_COLUMNS),
+    'build_geometry': ('build_id', ('displacement_ci',)),
+    'vehicle_info': ('id', ('build_id', 'weight_with_fuel_lbs', 'timestamp')),
+}
+
+
+def upgrade(conn):
+    """Create build_leaderboards, its refresh function and triggers, and fill it"""
+    cursor = conn.cursor()
+
+    print("Creating build_leaderboards table...")
+    cursor.execute("""
+        CREATE TABLE build_leaderboards (
+            build_id INTEGER PRIMARY KEY REFERENCES builds(id) ON DELETE CASCADE,
+            best_hp DECIMAL(10,2),
+            best_hp_test_id INTEGER,
+            best_quarter_mile_et DECIMAL(6,3),
+            best_quarter_mile_et_mph DECIMAL(6,2),
+            best_et_test_id INTEGER,
+            best_quarter_mile_mph DECIMAL(6,2),
+            best_mph_test_id INTEGER,
+            displacement_ci DECIMAL(10,2),
+            hp_per_ci DECIMAL(10,4),
+            weight_lbs DECIMAL(10,2),
+            hp_per_ton DECIMAL(10,2),
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    for column, direction in BOARD_INDEXES.items():
+        cursor.execute(f"""
+            CREATE INDEX idx_build_leaderboards_{column}
+            ON build_leaderboards ({column} {direction}, build_id)
+            WHERE {column} IS NOT NULL
+        """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_performance_tests_build ON performance_tests (build_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_vehicle_info_build ON vehicle_info (build_id)")
+
+    print("Creating refresh_build_leaderboards()...")
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION refresh_build_leaderboards(ids integer[]) RETURNS void AS $$
+        BEGIN
+            IF ids IS NULL THEN
+                RETURN;
+            END IF;
+
+            -- Upsert rather than delete + insert so concurrent refreshes of a build don't collide
+            INSERT INTO build_leaderboards AS l (
+                build_id, best_hp, best_hp_test_id, best_quarter_mile_et, best_quarter_mile_et_mph,
+                best_et_test_id, best_quarter_mile_mph, best_mph_test_id, displacement_ci, hp_per_ci,
+                weight_lbs, hp_per_ton, updated_at
+            )
+            SELECT b.id, hp.value, hp.id, et.value, et.mph, et.id, mph.value, mph.id,
+                   d.displacement_ci, hp.value / nullif(d.displacement_ci, 0),
+                   w.weight_lbs, hp.value * 2000 / nullif(w.weight_lbs, 0),
+                   CURRENT_TIMESTAMP
+            FROM builds b
+            LEFT JOIN LATERAL (
+                SELECT id, corrected_hp_sae AS value FROM performance_tests
+                WHERE build_id = b.id AND corrected_hp_sae IS NOT NULL
+                ORDER BY corrected_hp_sae DESC, id LIMIT 1
+            ) hp ON true
+            LEFT JOIN LATERAL (
+                SELECT id, corrected_quarter_mile_et AS value, corrected_quarter_mile_mph AS mph FROM performance_tests
+                WHERE build_id = b.id AND corrected_quarter_mile_et IS NOT NULL
+                ORDER BY corrected_quarter_mile_et, id LIMIT 1
+            ) et ON true
+            LEFT JOIN LATERAL (
+                SELECT id, corrected_quarter_mile_mph AS value FROM performance_tests
+                WHERE build_id = b.id AND corrected_quarter_mile_mph IS NOT NULL
+                ORDER BY corrected_quarter_mile_mph DESC, id LIMIT 1
+            ) mph ON true
+            LEFT JOIN LATERAL (
+                SELECT coalesce(
+                    (SELECT g.displacement_ci::numeric FROM build_geometry g WHERE g.build_id = b.id),
+                    b.displacement_ci
+                ) AS displacement_ci
+            ) d ON true
+            LEFT JOIN LATERAL (
+                SELECT coalesce(b.vehicle_weight_lbs, (
+                    SELECT vi.weight_with_fuel_lbs FROM vehicle_info vi
+                    WHERE vi.build_id = b.id AND vi.weight_with_fuel_lbs IS NOT NULL
+                    ORDER BY vi.timestamp DESC, vi.id DESC LIMIT 1
+                )) AS weight_lbs
+            ) w ON true
+            WHERE b.id = ANY(ids)
+            ORDER BY b.id
+            ON CONFLICT (build_id) DO UPDATE SET
+                best_hp = EXCLUDED.best_hp,
+                best_hp_test_id = EXCLUDED.best_hp_test_id,
+                best_quarter_mile_et = EXCLUDED.best_quarter_mile_et,
+                best_quarter_mile_et_mph = EXCLUDED.best_quarter_mile_et_mph,
+                best_et_test_id = EXCLUDED.best_et_test_id,
+                best_quarter_mile_mph = EXCLUDED.best_quarter_mile_mph,
+                best_mph_test_id = EXCLUDED.best_mph_test_id,
+                displacement_ci = EXCLUDED.displacement_ci,
+                hp_per_ci = EXCLUDED.hp_per_ci,
+                weight_lbs = EXCLUDED.weight_lbs,
+                hp_per_ton = EXCLUDED.hp_per_ton,
+                updated_at = EXCLUDED.updated_at;
+
+            -- Builds with no results don't belong on any board
+            DELETE FROM build_leaderboards
+            WHERE build_id = ANY(ids)
+              AND best_hp IS NULL AND best_quarter_mile_et IS NULL AND best_quarter_mile_mph IS NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    for table, (key, columns) in SOURCE_TABLES.items():
+        print(f"Creating leaderboard triggers on {table}...")
+        changed = ' OR '.join(f"n.{c} IS DISTINCT FROM o.{c}" for c in columns)
+        branches = ''.join(f"""
+                IF TG_OP = '{event}' THEN
+                    PERFORM refresh_build_leaderboards(({select.format(key=key, changed=changed)}));
+                END IF;
+        """ for event, select in AFFECTED_BUILDS.items())
+        cursor.execute(f"""
+            CREATE OR REPLACE FUNCTION {table}_refresh_leaderboards() RETURNS trigger AS $$
+            BEGIN
+                {branches}
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        # Transition tables allow only one event per trigger
+        for event, transition in TRANSITION_TABLES.items():
+            cursor.execute(f"""
+                CREATE TRIGGER trg_{table}_leaderboards_{event.lower()}
+                AFTER {event} ON {table} REFERENCING {transition}
+                FOR EACH STATEMENT EXECUTE FUNCTION {table}_refresh_leaderboards()
+            """)
+
+    # Column-list triggers can't have transition tables; builds are updated a row at a time
+    print("Creating leaderboard trigger on builds...")
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION builds_refresh_leaderboards() RETURNS trigger AS $$
+        BEGIN
+            PERFORM refresh_build_leaderboards(ARRAY[NEW.id]);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    cursor.execute("""
+        CREATE TRIGGER trg_builds_leaderboards
+        AFTER UPDATE OF displacement_ci, vehicle_weight_lbs ON builds
+        FOR EACH ROW
+        WHEN (NEW.displacement_ci IS DISTINCT FROM OLD.displacement_ci
+              OR NEW.vehicle_weight_lbs IS DISTINCT FROM OLD.vehicle_weight_lbs)
+        EXECUTE FUNCTION builds_refresh_leaderboards()
+    """)
+
+    print("Filling build_leaderboards...")
+    cursor.execute("SELECT refresh_build_leaderboards(array_agg(DISTINCT build_id)) FROM performance_tests")
+    cursor.execute("SELECT count(*) FROM build_leaderboards")
+    print(f"  {cursor.fetchone()[0]} builds ranked")
+
+    conn.commit()
+    print("✅ Migration 020 complete: build_leaderboards created")
+
+
+def downgrade(conn):
+    """Drop the leaderboards, triggers and refresh function"""
+    cursor = conn.cursor()
+
+    print("Removing build leaderboards...")
+    cursor.execute("DROP TRIGGER IF EXISTS trg_builds_leaderboards ON builds")
+    cursor.execute("DROP FUNCTION IF EXISTS builds_refresh_leaderboards()")
+    for table in SOURCE_TABLES:
+        for event in TRANSITION_TABLES:
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_leaderboards_{event.lower()} ON {table}")
+        cursor.execute(f"DROP FUNCTION IF EXISTS {table}_refresh_leaderboards()")
+    cursor.execute("DROP FUNCTION IF EXISTS refresh_build_leaderboards(integer[])")
+    cursor.execute("DROP TABLE IF EXISTS build_leaderboards")
+
+    conn.commit()
+    print("✅ Migration 020 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
@@ -0,0 +1,102 @@
+"""Add change notifications for the similar builds index
+
+Revision ID: 021
+Revises: 020
+Create Date: 2025-02-18
+
+The similar builds index (build_similarity.py) keeps every build's engine
+specs in memory. Statement-level triggers NOTIFY 'builds_changed' with the
+ids of builds inserted, deleted, or updated in a column the index reads, so
+API processes re-read just those builds. Edits to anything else (notes,
+components, the version bump) send nothing. Large statements send '*' to
+request a full reload instead of thousands of ids.
+"""
+
+# Beyond this many rows a statement asks listeners for a full reload
+NOTIFY_MAX_IDS = 500
+
+# builds columns the similarity index reads (build_similarity.SIMILARITY_COLUMNS)
+SIMILARITY_COLUMNS = (
+    'firing_order', 'bore_in', 'stroke_in', 'rod_len_in', 'displacement_ci', 'static_cr',
+    'camshaft_duration_int', 'camshaft_duration_exh', 'camshaft_lift_int', 'camshaft_lift_exh',
+    'camshaft_lsa', 'rev_limit_rpm'
+)
+
+# Transition tables each trigger event can reference
+TRANSITION_TABLES = {
+    'INSERT': 'NEW TABLE AS new_builds',
+    'DELETE': 'OLD TABLE AS old_builds',
+    'UPDATE': 'OLD TABLE AS old_builds NEW TABLE AS new_builds',
+}
+
+
+def upgrade(conn):
+    """Add the builds change notification triggers"""
+    cursor = conn.cursor()
+
+    print("Creating builds change notification triggers...")
+    changed = ' OR '.join(f"n.{c} IS DISTINCT FROM o.{c}" for c in SIMILARITY_COLUMNS)
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_builds_changed() RETURNS trigger AS $$
+        DECLARE
+            changed_count integer;
+            changed_ids text;
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                SELECT count(*), string_agg(id::text, ',') INTO changed_count, changed_ids FROM new_builds;
+            ELSIF TG_OP = 'DELETE' THEN
+                SELECT count(*), string_agg(id::text, ',') INTO changed_count, changed_ids FROM old_builds;
+            ELSE
+                SELECT count(*), string_agg(n.id::text, ',') INTO changed_count, changed_ids
+                FROM new_builds n JOIN old_builds o ON o.id = n.id
+                WHERE {changed};
+            END IF;
+
+            IF changed_count > {NOTIFY_MAX_IDS} THEN
+                PERFORM pg_notify('builds_changed', '*');
+            ELSIF changed_count > 0 THEN
+                PERFORM pg_notify('builds_changed', changed_ids);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # Transition tables allow only one event per trigger
+    for event, transition in TRANSITION_TABLES.items():
+        cursor.execute(f"""
+            CREATE TRIGGER trg_builds_notify_{event.lower()}
+            AFTER {event} ON builds REFERENCING {transition}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_builds_changed()
+        """)
+
+    conn.commit()
+    print("✅ Migration 021 complete: Builds change notifications added")
+
+
+def downgrade(conn):
+    """Drop the builds change notification triggers"""
+    cursor = conn.cursor()
+
+    print("Removing builds change notification triggers...")
+    for event in TRANSITION_TABLES:
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_builds_notify_{event.lower()} ON builds")
+    cursor.execute("DROP FUNCTION IF EXISTS notify_builds_changed()")
+
+    conn.commit()
+    print("✅ Migration 021 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
@@ -0,0 +1,78 @@
+"""Add dyno pull curves
+
+Revision ID: 022
+Revises: 021
+Create Date: 2025-02-21
+
+dyno_pulls stores the RPM/HP/torque sweep behind a performance test's
+peak dyno_hp and dyno_torque, one row per pull. Each channel is a bytea of
+little-endian float32 values sorted by RPM (dyno_curves.py), so a 600
+sample pull is about 7 KB in one row rather than 600 rows. The peaks are
+kept as columns so listings and per-build "best pull" lookups never decode
+the arrays.
+"""
+
+
+def upgrade(conn):
+    """Create dyno_pulls"""
+    cursor = conn.cursor()
+
+    print("Creating dyno_pulls table...")
+    cursor.execute("""
+        CREATE TABLE dyno_pulls (
+            id SERIAL PRIMARY KEY,
+            performance_test_id INTEGER NOT NULL REFERENCES performance_tests(id) ON DELETE CASCADE,
+            build_id INTEGER NOT NULL REFERENCES builds(id) ON DELETE CASCADE,
+            label VARCHAR(255),
+            source_filename VARCHAR(255),
+            sample_count INTEGER NOT NULL,
+            rpm_min REAL NOT NULL,
+            rpm_max REAL NOT NULL,
+            peak_hp DECIMAL(10,2),
+            peak_hp_rpm INTEGER,
+            peak_torque DECIMAL(10,2),
+            peak_torque_rpm INTEGER,
+            rpm BYTEA NOT NULL,
+            hp BYTEA NOT NULL,
+            torque BYTEA NOT NULL,
+            afr BYTEA,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # The arrays are already dense float32; don't spend CPU trying to compress them
+    for channel in ('rpm', 'hp', 'torque', 'afr'):
+        cursor.execute(f"ALTER TABLE dyno_pulls ALTER COLUMN {channel} SET STORAGE EXTERNAL")
+
+    print("Creating dyno_pulls indexes...")
+    cursor.execute("CREATE INDEX idx_dyno_pulls_performance_test ON dyno_pulls(performance_test_id)")
+    cursor.execute("CREATE INDEX idx_dyno_pulls_build_peak ON dyno_pulls(build_id, peak_hp DESC)")
+
+    conn.commit()
+    print("✅ Migration 022 complete: Dyno pulls added")
+
+
+def downgrade(conn):
+    """Drop dyno_pulls"""
+    cursor = conn.cursor()
+
+    print("Removing dyno_pulls...")
+    cursor.execute("DROP TABLE IF EXISTS dyno_pulls")
+
+    conn.commit()
+    print("✅ Migration 022 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
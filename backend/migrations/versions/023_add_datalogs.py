@@ -0,0 +1,88 @@
+"""Add datalog time-series storage
+
+Revision ID: 023
+Revises: 022
+Create Date: 2025-02-24
+
+datalogs holds one row per log (wideband AFR, ECU or data-acquisition
+export) and datalog_chunks its samples, stored by column: one row per
+channel per CHUNK_SAMPLES samples, the values compressed (see
+datalog_store.py). A time range query finds the chunks it touches with
+idx_datalog_chunks_range; min_value/max_value answer overviews without
+reading data.
+"""
+
+
+def upgrade(conn):
+    """Create datalogs and datalog_chunks"""
+    cursor = conn.cursor()
+
+    print("Creating datalogs table...")
+    cursor.execute("""
+        CREATE TABLE datalogs (
+            id SERIAL PRIMARY KEY,
+            build_id INTEGER NOT NULL REFERENCES builds(id) ON DELETE CASCADE,
+            name VARCHAR(255),
+            started_at TIMESTAMP,
+            channels TEXT[] NOT NULL,
+            sample_count BIGINT NOT NULL DEFAULT 0,
+            chunk_count INTEGER NOT NULL DEFAULT 0,
+            duration_s DOUBLE PRECISION,
+            raw_bytes BIGINT NOT NULL DEFAULT 0,
+            stored_bytes BIGINT NOT NULL DEFAULT 0,
+            status VARCHAR(20) NOT NULL DEFAULT 'ingesting',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX idx_datalogs_build_started ON datalogs(build_id, started_at)")
+
+    print("Creating datalog_chunks table...")
+    cursor.execute("""
+        CREATE TABLE datalog_chunks (
+            datalog_id INTEGER NOT NULL REFERENCES datalogs(id) ON DELETE CASCADE,
+            channel VARCHAR(64) NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            t_start DOUBLE PRECISION NOT NULL,
+            t_end DOUBLE PRECISION NOT NULL,
+            sample_count INTEGER NOT NULL,
+            min_value REAL,
+            max_value REAL,
+            data BYTEA NOT NULL,
+            PRIMARY KEY (datalog_id, channel, chunk_index)
+        )
+    """)
+    # Already zstd-compressed
+    cursor.execute("ALTER TABLE datalog_chunks ALTER COLUMN data SET STORAGE EXTERNAL")
+    cursor.execute("CREATE INDEX idx_datalog_chunks_range ON datalog_chunks(datalog_id, channel, t_end)")
+
+    conn.commit()
+    print("✅ Migration 023 complete: Datalogs added")
+
+
+def downgrade(conn):
+    """Drop datalog_chunks and datalogs"""
+    cursor = conn.cursor()
+
+    print("Removing datalogs...")
+    cursor.execute("DROP TABLE IF EXISTS datalog_chunks")
+    cursor.execute("DROP TABLE IF EXISTS datalogs")
+
+    conn.commit()
+    print("✅ Migration 023 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
@@ -0,0 +1,99 @@
+"""Add change notifications for stored build geometry
+
+Revision ID: 024
+Revises: 023
+Create Date: 2025-02-25
+
+build_geometry (migration 018) feeds the hp_per_ci leaderboard (migration
+020), so it has to follow edits to the measurements it is computed from.
+Statement-level triggers NOTIFY 'build_geometry_inputs_changed' with the
+ids of builds inserted or updated in a geometry input column, and the
+API's listener (engine_geometry.start_geometry_listener) recomputes just
+those builds. Large statements send '*' to recompute every stale build
+instead.
+"""
+
+# Beyond this many rows a statement asks listeners for a full recompute
+NOTIFY_MAX_IDS = 500
+
+# builds columns the geometry is computed from (engine_geometry.GEOMETRY_INPUTS + firing_order)
+GEOMETRY_COLUMNS = (
+    'bore_in', 'stroke_in', 'rod_len_in', 'deck_clear_in', 'piston_cc', 'chamber_cc',
+    'gasket_bore_in', 'gasket_thickness_in', 'rev_limit_rpm', 'firing_order'
+)
+
+# Transition tables each trigger event can reference
+TRANSITION_TABLES = {
+    'INSERT': 'NEW TABLE AS new_builds',
+    'UPDATE': 'OLD TABLE AS old_builds NEW TABLE AS new_builds',
+}
+
+
+def upgrade(conn):
+    """Add the build geometry notification triggers"""
+    cursor = conn.cursor()
+
+    print("Creating build geometry notification triggers...")
+    changed = ' OR '.join(f"n.{c} IS DISTINCT FROM o.{c}" for c in GEOMETRY_COLUMNS)
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_build_geometry_inputs_changed() RETURNS trigger AS $$
+        DECLARE
+            changed_count integer;
+            changed_ids text;
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                SELECT count(*), string_agg(id::text, ',') INTO changed_count, changed_ids FROM new_builds;
+            ELSE
+                SELECT count(*), string_agg(n.id::text, ',') INTO changed_count, changed_ids
+                FROM new_builds n JOIN old_builds o ON o.id = n.id
+                WHERE {changed};
+            END IF;
+
+            IF changed_count > {NOTIFY_MAX_IDS} THEN
+                PERFORM pg_notify('build_geometry_inputs_changed', '*');
+            ELSIF changed_count > 0 THEN
+                PERFORM pg_notify('build_geometry_inputs_changed', changed_ids);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # Transition tables allow only one event per trigger
+    for event, transition in TRANSITION_TABLES.items():
+        cursor.execute(f"""
+            CREATE TRIGGER trg_builds_geometry_notify_{event.lower()}
+            AFTER {event} ON builds REFERENCING {transition}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_build_geometry_inputs_changed()
+        """)
+
+    conn.commit()
+    print("✅ Migration 024 complete: Build geometry notifications added")
+
+
+def downgrade(conn):
+    """Drop the build geometry notification triggers"""
+    cursor = conn.cursor()
+
+    print("Removing build geometry notification triggers...")
+    for event in TRANSITION_TABLES:
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_builds_geometry_notify_{event.lower()} ON builds")
+    cursor.execute("DROP FUNCTION IF EXISTS notify_build_geometry_inputs_changed()")
+
+    conn.commit()
+    print("✅ Migration 024 downgrade complete")
+
+
+if __name__ == '__main__':
+    # For testing
+    import psycopg2
+    import os
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'postgres'),
+        database=os.getenv('POSTGRES_DB', 'auto_specs_db'),
+        user=os.getenv('POSTGRES_USER', 'auto_specs_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'auto_specs_pass')
+    )
+
+    upgrade(conn)
+    conn.close()
@@ -0,0 +1,255 @@
+"""
+API endpoints for the parts catalog: typeahead suggestions and part usage.
+"""
+from fastapi import APIRouter, HTTPException
+from typing import Dict, List, Optional
+
+from db import get_db_cursor
+from parts_index import PART_FIELDS, compact, parts_index, words
+
+router = APIRouter()
+
+
+def fuzzy_parts(query: str, limit: int, category: Optional[str] = None) -> List[Dict]:
+    """
+    Trigram (pg_trgm) matches on part number and name, best first.
+
+    Catches misspellings and transpositions the prefix index cannot, e.g.
+    'wisecco' or 'K0058X30'.
+    """
+    category_filter = "AND category = %(category)s" if category else ""
+    with get_db_cursor(commit=False) as cursor:
+        cursor.execute(f"""
+            SELECT {', '.join(PART_FIELDS)}
+            FROM parts
+            WHERE (part_number %% %(q)s OR %(q)s <%% name)
+              {category_filter}
+            ORDER BY greatest(similarity(part_number, %(q)s), word_similarity(%(q)s, name)) DESC, part_number
+            LIMIT %(limit)s
+        """, {'q': query, 'limit': limit, 'category': category})
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def prefix_parts(query: str, limit: int, category: Optional[str] = None) -> List[Dict]:
+    """
+    The prefix index's matching rules evaluated in Postgres, for when the
+    index is disabled or still loading. Scans parts, so slower, but gives
+    the same answers.
+    """
+    # Tokens are [a-z0-9]+, so safe inside LIKE and regex patterns
+    number = "regexp_replace(lower(part_number), '[^a-z0-9]', '', 'g')"
+    text = "lower(concat_ws(' ', brand, name, category))"
+    params = {'number': compact(query) + '%', 'limit': limit, 'category': category}
+    token_filters = []
+    for i, token in enumerate(words(query)):
+        params[f'prefix{i}'] = token + '%'
+        params[f'word{i}'] = '\\m' + token
+        token_filters.append(f"({number} LIKE %(prefix{i})s OR {text} ~ %(word{i})s)")
+    category_filter = "AND category = %(category)s" if category else ""
+
+    with get_db_cursor(commit=False) as cursor:
+        cursor.execute(f"""
+            SELECT {', '.join(PART_FIELDS)}
+            FROM parts
+            WHERE ({number} LIKE %(number)s OR ({' AND '.join(token_filters)}))
+              {category_filter}
+            ORDER BY {number} LIKE %(number)s DESC,
+                     CASE WHEN {number} LIKE %(number)s THEN {number} END,
+                     lower(concat_ws(' ', brand, name))
+            LIMIT %(limit)s
+        """, params)
+        return [dict(row) for row in cursor.fetchall()]
+
+
+@router.get("/api/parts/suggest")
+async def suggest_parts(q: str, limit: int = 10, category: Optional[str] = None):
+    """
+    Typeahead suggestions from the parts catalog (public).
+
+    Every word of `q` must prefix-match the part number or a word of the
+    brand, name or category; answered from the in-process prefix index (or
+    the same match in Postgres while it is disabled or loading). When that
+    finds nothing (a typo) and q has 3+ characters, falls back to
+    trigram fuzzy matching in Postgres.
+    """
+    try:
+        limit = max(1, min(limit, 50))
+        query = q.strip()
+        if not query:
+            return {'success': True, 'suggestions': [], 'source': 'prefix'}
+
+        if parts_index.loaded:
+            suggestions = parts_index.suggest(query, limit, category)
+            source = 'prefix'
+        else:
+            # Index disabled or still loading
+            suggestions = prefix_parts(query, limit, category)
+            source = 'database'
+
+        if not suggestions and len(query) >= 3:
+            suggestions = fuzzy_parts(query, limit, category)
+            source = 'fuzzy'
+
+        return {
+            'success': True,
+            'suggestions': [{field: part[field] for field in PART_FIELDS} for part in suggestions],
+            'source': source
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Parts listed in a usage response (a brand can have thousands)
+MAX_USAGE_PARTS = 100
+
+
+@router.get("/api/parts/usage")
+async def get_part_usage(
+    part_id: Optional[int] = None,
+    part_number: Optional[str] = None,
+    brand: Optional[str] = None,
+    limit: int = 50,
+    builds_after: Optional[int] = None,
+    vehicles_after: Optional[int] = None
+):
+    """
+    Builds and vehicles that use a part (public).
+
+    Args:
+        part_id, part_number, brand: Exactly one; brand matches case-insensitively
+        limit: Page size for builds and vehicles (1-200)
+        builds_after: next_builds_after from the previous page
+        vehicles_after: next_vehicles_after from the previous page
+
+    Returns:
+        The matched parts (most used first) with their link counts, totals,
+        and a page each of builds and vehicles with the matched part ids and
+        roles they use.
+    """
+    try:
+        selectors = [s for s in (part_id, part_number, brand) if s is not None]
+        if len(selectors) != 1:
+            raise HTTPException(status_code=400, detail="Pass exactly one of part_id, part_number or brand")
+        limit = max(1, min(limit, 200))
+
+        if part_id is not None:
+            parts_where, selector = "p.id = %(selector)s", part_id
+        elif part_number is not None:
+            parts_where, selector = "p.part_number = %(selector)s", part_number
+        else:
+            parts_where, selector = "lower(p.brand) = lower(%(selector)s)", brand
+        matched_ids = f"SELECT p.id FROM parts p WHERE {parts_where}"
+        params = {
+            'selector': selector,
+            'limit': limit + 1,
+            'max_parts': MAX_USAGE_PARTS,
+            'builds_after': builds_after or 0,
+            'vehicles_after': vehicles_after or 0
+        }
+
+        with get_db_cursor(commit=False) as cursor:
+            cursor.execute(f"""
+                SELECT {', '.join('p.' + field for field in PART_FIELDS)},
+                       coalesce(c.build_links, 0) AS build_links,
+                       coalesce(c.vehicle_links, 0) AS vehicle_links
+                FROM parts p
+                LEFT JOIN part_usage_counts c ON c.part_id = p.id
+                WHERE {parts_where}
+                ORDER BY coalesce(c.total_links, 0) DESC, p.id
+                LIMIT %(max_parts)s
+            """, params)
+            parts = [dict(row) for row in cursor.fetchall()]
+            if not parts:
+                raise HTTPException(status_code=404, detail="Part not found")
+
+            cursor.execute(f"""
+                SELECT count(*) AS parts,
+                       coalesce(sum(c.build_links), 0) AS build_links,
+                       coalesce(sum(c.vehicle_links), 0) AS vehicle_links
+                FROM part_usage_counts c
+                WHERE c.part_id IN ({matched_ids})
+            """, params)
+            totals = cursor.fetchone()
+
+            cursor.execute(f"""
+                SELECT b.id AS build_id, b.slug, b.name,
+                       array_agg(DISTINCT bp.part_id) AS part_ids,
+                       array_remove(array_agg(DISTINCT bp.role), NULL) AS roles
+                FROM build_parts bp
+                JOIN builds b ON b.id = bp.build_id
+                WHERE bp.part_id IN ({matched_ids})
+                  AND bp.build_id > %(builds_after)s
+                GROUP BY b.id
+                ORDER BY b.id
+                LIMIT %(limit)s
+            """, params)
+            builds = cursor.fetchall()
+
+            cursor.execute(f"""
+                SELECT vi.id AS vehicle_info_id, vi.year, vi.make, vi.model,
+                       b.id AS build_id, b.slug, b.name AS build_name,
+                       array_agg(DISTINCT vp.part_id) AS part_ids,
+                       array_remove(array_agg(DISTINCT vp.role), NULL) AS roles,
+                       array_remove(array_agg(DISTINCT vp.location), NULL) AS locations
+                FROM vehicle_parts vp
+                JOIN vehicle_info vi ON vi.id = vp.vehicle_info_id
+                JOIN builds b ON b.id = vi.build_id
+                WHERE vp.part_id IN ({matched_ids})
+                  AND vp.vehicle_info_id > %(vehicles_after)s
+                GROUP BY vi.id, b.id
+                ORDER BY vi.id
+                LIMIT %(limit)s
+            """, params)
+            vehicles = cursor.fetchall()
+
+        return {
+            'success': True,
+            'parts': parts,
+            'totals': dict(totals),
+            'builds': [dict(row) for row in builds[:limit]],
+            'next_builds_after': builds[limit - 1]['build_id'] if len(builds) > limit else None,
+            'vehicles': [dict(row) for row in vehicles[:limit]],
+            'next_vehicles_after': vehicles[limit - 1]['vehicle_info_id'] if len(vehicles) > limit else None
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/parts/popular")
+async def get_popular_parts(category: Optional[str] = None, limit: int = 20):
+    """
+    Most used parts by build and vehicle links (public).
+
+    Args:
+        category: Only parts in this category
+        limit: Number of parts (1-100)
+    """
+    try:
+        limit = max(1, min(limit, 100))
+        category_filter = "AND p.category = %(category)s" if category else ""
+
+        with get_db_cursor(commit=False) as cursor:
+            cursor.execute(f"""
+                SELECT {', '.join('p.' + field for field in PART_FIELDS)},
+                       c.build_links, c.vehicle_links
+                FROM part_usage_counts c
+                JOIN parts p ON p.id = c.part_id
+                WHERE c.total_links > 0
+                  {category_filter}
+                ORDER BY c.total_links DESC, c.part_id
+                LIMIT %(limit)s
+            """, {'category': category, 'limit': limit})
+            parts = [dict(row) for row in cursor.fetchall()]
+
+        return {'success': True, 'parts': parts}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,308 @@
+"""
+Bulk import of vendor invoice and order CSVs into vendors, parts, orders
+and order_items.
+
+Each file is streamed into a temporary staging table with COPY (the file is
+never held in memory), validated, then merged with set-based SQL in one
+transaction:
+
+    vendors       inserted by name
+    parts         upserted on part_number; repeated part numbers collapse to
+                  their last non-blank values, and blank cells never clear
+                  what the catalog already has
+    orders        matched on (vendor, order_number), inserted when new
+    order_items   one row per (order, part): lines for the same part are
+                  summed, existing rows updated, missing rows inserted
+
+Re-importing a file changes nothing. Rows without an order_number only
+update the catalog, so a plain parts list imports too; rows without a
+part_number (shipping, tax) are skipped.
+
+Recognised columns (case and punctuation are ignored, common invoice
+headings such as "SKU", "Qty" or "Unit Price" are accepted): vendor,
+order_number, order_date, ship_to, order_notes, part_number, brand, name,
+category, product_link, cost, qty, price_each, ext_price. Other columns are
+ignored.
+
+Run from the command line:
+    python parts_import.py invoices/*.csv
+"""
+import csv
+import os
+import re
+import time
+from typing import Dict, List
+
+from db import get_db_cursor
+
+IMPORT_COLUMNS = (
+    'vendor', 'order_number', 'order_date', 'ship_to', 'order_notes',
+    'part_number', 'brand', 'name', 'category', 'product_link', 'cost',
+    'qty', 'price_each', 'ext_price'
+)
+
+COLUMN_ALIASES = {
+    'supplier': 'vendor', 'vendor_name': 'vendor',
+    'order': 'order_number', 'order_no': 'order_number', 'po': 'order_number', 'po_number': 'order_number',
+    'invoice': 'order_number', 'invoice_number': 'order_number', 'invoice_no': 'order_number',
+    'date': 'order_date', 'invoice_date': 'order_date',
+    'notes': 'order_notes',
+    'part': 'part_number', 'part_no': 'part_number', 'sku': 'part_number', 'item_number': 'part_number',
+    'manufacturer': 'brand', 'mfg': 'brand', 'make': 'brand',
+    'description': 'name', 'item_description': 'name', 'part_name': 'name',
+    'url': 'product_link', 'link': 'product_link',
+    'quantity': 'qty',
+    'price': 'price_each', 'unit_price': 'price_each', 'each': 'price_each',
+    'extended_price': 'ext_price', 'ext': 'ext_price', 'amount': 'ext_price', 'total': 'ext_price',
+}
+
+# Columns that must parse as a Postgres type -> (type, cleanup expression)
+TYPED_COLUMNS = {
+    'order_date': ('date', "nullif(trim({0}), '')"),
+    'cost': ('numeric', "nullif(regexp_replace({0}, '[$,\\s]', '', 'g'), '')"),
+    'qty': ('integer', "nullif(regexp_replace({0}, '[,\\s]', '', 'g'), '')"),
+    'price_each': ('numeric', "nullif(regexp_replace({0}, '[$,\\s]', '', 'g'), '')"),
+    'ext_price': ('numeric', "nullif(regexp_replace({0}, '[$,\\s]', '', 'g'), '')"),
+}
+
+PROGRESS_INTERVAL_SECONDS = 5
+
+
+def map_header(header: List[str]) -> List[str]:
+    """Staging column for each CSV column; unrecognised ones become ignored_<n>"""
+    columns = []
+    for position, name in enumerate(header):
+        key = re.sub(r'[^a-z0-9]+', '_', name.strip().lower()).strip('_')
+        column = COLUMN_ALIASES.get(key, key)
+        if column not in IMPORT_COLUMNS or column in columns:
+            column = f'ignored_{position}'
+        columns.append(column)
+
+    if 'part_number' not in columns:
+        raise ValueError("CSV has no part_number column")
+    return columns
+
+
+class _ProgressReader:
+    """Binary file wrapper that COPY reads from, printing throughput as it goes"""
+
+    def __init__(self, f, total_bytes: int, label: str):
+        self.f = f
+        self.total_bytes = total_bytes
+        self.label = label
+        self.bytes_read = 0
+        self.started = self.reported = time.monotonic()
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.bytes_read += len(data)
+        now = time.monotonic()
+        if now - self.reported >= PROGRESS_INTERVAL_SECONDS:
+            self.reported = now
+            mb = self.bytes_read / 1024 / 1024
+            print(f"  {self.label}: {mb:.0f} MB ({self.bytes_read / max(self.total_bytes, 1):.0%}) "
+                  f"at {mb / (now - self.started):.1f} MB/s")
+        return data
+
+
+def _last_value(column: str) -> str:
+    """Aggregate: the column's last non-null value in file order"""
+    return f"(array_agg({column} ORDER BY line_no DESC) FILTER (WHERE {column} IS NOT NULL))[1]"
+
+
+def _validate(cursor, path: str, columns: List[str]):
+    """Fail with line numbers if typed columns hold unparseable values"""
+    problems = []
+    for column, (pg_type, cleanup) in TYPED_COLUMNS.items():
+        if column not in columns:
+            continue
+        value = cleanup.format(column)
+        cursor.execute(f"""
+            SELECT line_no, {column} AS value
+            FROM import_lines
+            WHERE {value} IS NOT NULL AND NOT pg_input_is_valid({value}, '{pg_type}')
+            ORDER BY line_no
+            LIMIT 5
+        """)
+        # +1 for the header line
+        problems += [f"line {row['line_no'] + 1}: {column} {row['value']!r}" for row in cursor.fetchall()]
+
+    if problems:
+        raise ValueError(f"{path}: invalid values ({'; '.join(problems)})")
+
+
+def _merge(cursor) -> Dict:
+    """Merge the typed import_rows into vendors, parts, orders and order_items"""
+    stats = {}
+
+    cursor.execute("""
+        INSERT INTO vendors (name)
+        SELECT DISTINCT vendor FROM import_rows WHERE vendor IS NOT NULL
+        ORDER BY 1
+        ON CONFLICT (name) DO NOTHING
+    """)
+    stats['vendors_inserted'] = cursor.rowcount
+
+    part_columns = ('brand', 'name', 'category', 'product_link', 'cost')
+    cursor.execute(f"""
+        WITH file_parts AS (
+            SELECT part_number, {', '.join(f'{_last_value(c)} AS {c}' for c in part_columns)}
+            FROM import_rows
+            GROUP BY part_number
+        ),
+        upserted AS (
+            INSERT INTO parts (part_number, {', '.join(part_columns)})
+            SELECT part_number, {', '.join(part_columns)} FROM file_parts
+            ORDER BY part_number
+            ON CONFLICT (part_number) DO UPDATE SET
+                {', '.join(f'{c} = coalesce(EXCLUDED.{c}, parts.{c})' for c in part_columns)}
+            WHERE ({', '.join(f'parts.{c}' for c in part_columns)})
+                IS DISTINCT FROM ({', '.join(f'coalesce(EXCLUDED.{c}, parts.{c})' for c in part_columns)})
+            RETURNING xmax = 0 AS inserted
+        )
+        SELECT count(*) FILTER (WHERE inserted) AS inserted,
+               count(*) FILTER (WHERE NOT inserted) AS updated
+        FROM upserted
+    """)
+    row = cursor.fetchone()
+    stats['parts_inserted'], stats['parts_updated'] = row['inserted'], row['updated']
+
+    # Orders have no unique key; keep concurrent imports from racing on them
+    cursor.execute("LOCK TABLE orders, order_items IN SHARE ROW EXCLUSIVE MODE")
+
+    cursor.execute(f"""
+        INSERT INTO orders (vendor_id, order_number, order_date, ship_to, notes)
+        SELECT f.vendor_id, f.order_number, f.order_date, f.ship_to, f.order_notes
+        FROM (
+            SELECT v.id AS vendor_id, r.order_number,
+                   {_last_value('r.order_date')} AS order_date,
+                   {_last_value('r.ship_to')} AS ship_to,
+                   {_last_value('r.order_notes')} AS order_notes
+            FROM import_rows r
+            LEFT JOIN vendors v ON v.name = r.vendor
+            WHERE r.order_number IS NOT NULL
+            GROUP BY v.id, r.order_number
+        ) AS f
+        WHERE NOT EXISTS (
+            SELECT 1 FROM orders o
+            WHERE o.order_number = f.order_number
+              AND coalesce(o.vendor_id, 0) = coalesce(f.vendor_id, 0)
+        )
+    """)
+    stats['orders_inserted'] = cursor.rowcount
+
+    cursor.execute(f"""
+        CREATE TEMP TABLE import_items ON COMMIT DROP AS
+        SELECT o.id AS order_id, p.id AS part_id,
+               sum(r.qty)::integer AS qty,
+               {_last_value('r.price_each')} AS price_each,
+               sum(coalesce(r.ext_price, r.qty * r.price_each)) AS ext_price
+        FROM import_rows r
+        JOIN parts p ON p.part_number = r.part_number
+        LEFT JOIN vendors v ON v.name = r.vendor
+        JOIN orders o ON o.order_number = r.order_number
+                     AND coalesce(o.vendor_id, 0) = coalesce(v.id, 0)
+        GROUP BY o.id, p.id
+    """)
+    cursor.execute("ANALYZE import_items")
+
+    cursor.execute("""
+        UPDATE order_items i
+        SET qty = n.qty, price_each = n.price_each, ext_price = n.ext_price
+        FROM import_items n
+        WHERE i.order_id = n.order_id AND i.part_id = n.part_id
+          AND (i.qty, i.price_each, i.ext_price) IS DISTINCT FROM (n.qty, n.price_each, n.ext_price)
+    """)
+    stats['order_items_updated'] = cursor.rowcount
+
+    cursor.execute("""
+        INSERT INTO order_items (order_id, part_id, qty, price_each, ext_price)
+        SELECT n.order_id, n.part_id, n.qty, n.price_each, n.ext_price
+        FROM import_items n
+        WHERE NOT EXISTS (
+            SELECT 1 FROM order_items i
+            WHERE i.order_id = n.order_id AND i.part_id = n.part_id
+        )
+        ORDER BY n.order_id, n.part_id
+    """)
+    stats['order_items_inserted'] = cursor.rowcount
+
+    return stats
+
+
+def import_csv(path: str) -> Dict:
+    """
+    Import one CSV file in a single transaction.
+
+    Args:
+        path: CSV file with a header row (UTF-8, optional BOM)
+
+    Returns:
+        Row counts for each table, lines read and skipped, and throughput
+    """
+    started = time.monotonic()
+    with open(path, 'rb') as f:
+        header_line = f.readline().decode('utf-8-sig')
+        columns = map_header(next(csv.reader([header_line])))
+
+        with get_db_cursor() as cursor:
+            staging_columns = list(IMPORT_COLUMNS) + [c for c in columns if c not in IMPORT_COLUMNS]
+            cursor.execute(f"""
+                CREATE TEMP TABLE import_lines (
+                    line_no BIGINT GENERATED ALWAYS AS IDENTITY,
+                    {', '.join(f'{c} TEXT' for c in staging_columns)}
+                ) ON COMMIT DROP
+            """)
+
+            reader = _ProgressReader(f, os.path.getsize(path), os.path.basename(path))
+            cursor.copy_expert(
+                f"COPY import_lines ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, ENCODING 'UTF8')",
+                reader
+            )
+            lines = cursor.rowcount
+            copy_seconds = time.monotonic() - started
+
+            _validate(cursor, path, columns)
+
+            text_columns = [c for c in IMPORT_COLUMNS if c not in TYPED_COLUMNS]
+            cursor.execute(f"""
+                CREATE TEMP TABLE import_rows ON COMMIT DROP AS
+                SELECT line_no,
+                       {', '.join(f"nullif(trim({c}), '') AS {c}" for c in text_columns)},
+                       {', '.join(f"{cleanup.format(c)}::{pg_type} AS {c}" for c, (pg_type, cleanup) in TYPED_COLUMNS.items())}
+                FROM import_lines
+                WHERE nullif(trim(part_number), '') IS NOT NULL
+            """)
+            rows = cursor.rowcount
+            cursor.execute("ANALYZE import_rows")
+
+            stats = _merge(cursor)
+
+    duration = time.monotonic() - started
+    return {
+        **stats,
+        'lines': lines,
+        'skipped_lines': lines - rows,
+        'copy_seconds': round(copy_seconds, 2),
+        'duration_seconds': round(duration, 2),
+        'rows_per_second': int(lines / duration) if duration else lines
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Import vendor invoice and order CSVs')
+    parser.add_argument('files', nargs='+', help='CSV files, each imported in its own transaction')
+    args = parser.parse_args()
+
+    for path in args.files:
+        result = import_csv(path)
+        print(
+            f"✅ {path}: {result['lines']} lines ({result['skipped_lines']} skipped) in "
+            f"{result['duration_seconds']}s ({result['rows_per_second']} rows/s, COPY {result['copy_seconds']}s) - "
+            f"vendors +{result['vendors_inserted']}, "
+            f"parts +{result['parts_inserted']}/~{result['parts_updated']}, "
+            f"orders +{result['orders_inserted']}, "
+            f"order items +{result['order_items_inserted']}/~{result['order_items_updated']}"
+        )
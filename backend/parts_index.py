@@ -0,0 +1,281 @@
+"""
+In-process prefix index over the parts catalog for typeahead suggestions.
+
+Every part is indexed under its normalized part number ('K0085-X30' ->
+'k0085x30') and each word of its brand, name and category. A lookup binary
+searches sorted key lists and reads forward only until the page is full,
+so a keystroke costs well under a millisecond and never touches the
+database.
+
+The index is loaded once at startup and then kept current incrementally:
+triggers on parts (migration 015) NOTIFY 'parts_changed' with the changed
+ids, and a listener thread reloads just those rows. Bulk changes (or a lost
+listener connection) trigger a full reload instead.
+
+Controlled by PARTS_PREFIX_INDEX (set to 0 to disable; /api/parts/suggest
+then queries Postgres directly).
+"""
+import bisect
+import os
+import re
+import select
+import threading
+import time
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from db import DATABASE_URL, get_db_cursor
+
+NOTIFY_CHANNEL = 'parts_changed'
+PART_FIELDS = ('id', 'part_number', 'brand', 'name', 'category')
+
+# Upper bound on index entries examined per lookup, so one-letter queries
+# stay as fast as long ones
+MAX_SCAN = 5000
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def compact(text: Optional[str]) -> str:
+    """Lowercase alphanumerics only: how part numbers are matched"""
+    return ''.join(_WORD.findall((text or '').lower()))
+
+
+def words(text: Optional[str]) -> List[str]:
+    """Lowercase alphanumeric words"""
+    return _WORD.findall((text or '').lower())
+
+
+class PartsPrefixIndex:
+    """
+    Two sorted entry lists with incremental add/remove:
+
+        numbers  [(compact part number, part_id)]
+        words    [(word, brand + name, part_id)]
+
+    Both are stored in result order, so a lookup walks forward from the
+    bisected prefix and stops as soon as it has `limit` matches.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._numbers = []
+        self._words = []
+        self._parts = {}        # part_id -> part dict
+        self._part_keys = {}    # part_id -> keys_for(part)
+        self.loaded = False
+
+    @staticmethod
+    def keys_for(part: Dict):
+        """(number key, word keys, ' number word word ...' for prefix tests)"""
+        word_keys = set()
+        for field in ('brand', 'name', 'category'):
+            word_keys.update(words(part[field]))
+        number = compact(part['part_number'])
+        return number, word_keys, ' ' + ' '.join([number, *sorted(word_keys)])
+
+    @staticmethod
+    def _sort_name(part: Dict) -> str:
+        return f"{part['brand'] or ''} {part['name'] or ''}".lower()
+
+    def _entries_for(self, part: Dict, keys):
+        number, word_keys, _ = keys
+        sort_name = self._sort_name(part)
+        numbers = [(number, part['id'])] if number else []
+        return numbers, [(word, sort_name, part['id']) for word in word_keys]
+
+    def load(self, parts: Iterable[Dict]):
+        """Replace the whole index"""
+        new_parts = {part['id']: dict(part) for part in parts}
+        new_keys = {part_id: self.keys_for(part) for part_id, part in new_parts.items()}
+        new_numbers, new_words = [], []
+        for part_id, keys in new_keys.items():
+            numbers, word_entries = self._entries_for(new_parts[part_id], keys)
+            new_numbers.extend(numbers)
+            new_words.extend(word_entries)
+        new_numbers.sort()
+        new_words.sort()
+
+        with self._lock:
+            self._parts, self._part_keys = new_parts, new_keys
+            self._numbers, self._words = new_numbers, new_words
+            self.loaded = True
+
+    @staticmethod
+    def _delete(entries: List, entry):
+        i = bisect.bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+
+    def _remove_locked(self, part_id: int):
+        part = self._parts.pop(part_id, None)
+        keys = self._part_keys.pop(part_id, None)
+        if part is None:
+            return
+        numbers, word_entries = self._entries_for(part, keys)
+        for entry in numbers:
+            self._delete(self._numbers, entry)
+        for entry in word_entries:
+            self._delete(self._words, entry)
+
+    def upsert(self, part: Dict):
+        """Add a part, or re-index it after a change"""
+        with self._lock:
+            self._remove_locked(part['id'])
+            part = dict(part)
+            keys = self.keys_for(part)
+            numbers, word_entries = self._entries_for(part, keys)
+            for entry in numbers:
+                bisect.insort(self._numbers, entry)
+            for entry in word_entries:
+                bisect.insort(self._words, entry)
+            self._parts[part['id']] = part
+            self._part_keys[part['id']] = keys
+
+    def remove(self, part_id: int):
+        with self._lock:
+            self._remove_locked(part_id)
+
+    def __len__(self):
+        return len(self._parts)
+
+    @staticmethod
+    def _prefix_range(entries: List, prefix: str):
+        return (bisect.bisect_left(entries, prefix, key=itemgetter(0)),
+                bisect.bisect_left(entries, prefix + '\uffff', key=itemgetter(0)))
+
+    def suggest(self, query: str, limit: int = 10, category: Optional[str] = None) -> List[Dict]:
+        """
+        Parts matching a typeahead query.
+
+        Part numbers starting with the query come first (by part number).
+        Then come parts where every query word prefixes the part number or a
+        brand/name/category word (so 'wiseco k0085' and 'k0085 wiseco' both
+        match), number hits of the most selective word first, then its word
+        hits, exact words first, then by brand and name.
+        """
+        tokens = words(query)
+        if not tokens:
+            return []
+        query_number = compact(query)
+
+        results = []
+        seen = set()
+
+        def accept(part_id):
+            part = self._parts[part_id]
+            if part_id in seen or (category and part['category'] != category):
+                return
+            seen.add(part_id)
+            results.append(part)
+
+        with self._lock:
+            start = bisect.bisect_left(self._numbers, query_number, key=itemgetter(0))
+            for number, part_id in self._numbers[start:start + MAX_SCAN]:
+                if len(results) >= limit or not number.startswith(query_number):
+                    break
+                accept(part_id)
+
+            # Every token must prefix the number key or a word key. Walk the
+            # entries of the most selective token; the rest are checked
+            # against each candidate's key string
+            ranges = {}
+            for token in tokens:
+                ranges[token] = (self._prefix_range(self._numbers, token),
+                                 self._prefix_range(self._words, token))
+
+            def width(token):
+                return sum(end - start for start, end in ranges[token])
+
+            lead = min(ranges, key=width)
+            if width(lead) == 0:
+                return results
+            others = [' ' + token for token in ranges if token != lead]
+            scan = MAX_SCAN
+
+            for entries, (start, end) in zip((self._numbers, self._words), ranges[lead]):
+                for entry in entries[start:min(end, start + scan)]:
+                    if len(results) >= limit:
+                        break
+                    part_id = entry[-1]
+                    text = self._part_keys[part_id][2]
+                    if all(token in text for token in others):
+                        accept(part_id)
+                scan -= min(end - start, scan)
+
+        return results
+
+
+parts_index = PartsPrefixIndex()
+
+
+def _fetch_parts(cursor, ids: Optional[List[int]] = None) -> List[Dict]:
+    if ids is None:
+        cursor.execute(f"SELECT {', '.join(PART_FIELDS)} FROM parts")
+    else:
+        cursor.execute(f"SELECT {', '.join(PART_FIELDS)} FROM parts WHERE id = ANY(%s)", (ids,))
+    return cursor.fetchall()
+
+
+def reload_parts_index():
+    """Load the full catalog into the index"""
+    started = time.monotonic()
+    with get_db_cursor(commit=False) as cursor:
+        parts_index.load(_fetch_parts(cursor))
+    print(f"Parts prefix index: {len(parts_index)} parts loaded in {time.monotonic() - started:.2f}s")
+
+
+def apply_parts_changes(ids: List[int]):
+    """Re-read changed parts and update just their index entries"""
+    with get_db_cursor(commit=False) as cursor:
+        rows = {row['id']: row for row in _fetch_parts(cursor, ids)}
+    for part_id in ids:
+        if part_id in rows:
+            parts_index.upsert(rows[part_id])
+        else:
+            parts_index.remove(part_id)
+
+
+def start_parts_index_listener() -> Optional[threading.Thread]:
+    """
+    Load the parts index and start a daemon thread that keeps it current.
+
+    Controlled by PARTS_PREFIX_INDEX (0 disables it).
+    """
+    if os.getenv('PARTS_PREFIX_INDEX', '1') == '0':
+        return None
+
+    def run():
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # Anything changed while not listening is picked up here
+                reload_parts_index()
+
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    payloads = {notify.payload for notify in conn.notifies}
+                    conn.notifies.clear()
+
+                    if '*' in payloads:
+                        reload_parts_index()
+                    elif payloads:
+                        apply_parts_changes(sorted({int(i) for p in payloads for i in p.split(',') if i}))
+            except Exception as e:
+                print(f"Parts prefix index listener error: {e}")
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    thread = threading.Thread(target=run, name='parts-index', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,248 @@
+"""
+Weather correction for dyno and drag strip results.
+
+performance_tests records dyno_hp/dyno_torque and ET/MPH with the weather
+they were made in (weather_temp_f, weather_humidity_pct, elevation_ft).
+compute_corrections() turns any number of tests into density altitude,
+SAE J1349 and STD correction factors and corrected results in one NumPy
+pass:
+
+    station pressure  standard atmosphere at elevation_ft (no barometer is recorded)
+    vapor pressure    Buck equation at weather_temp_f, times relative humidity
+    SAE J1349         1.18 * (990 hPa / dry pressure) * sqrt(T / 298 K) - 0.18
+    STD               (29.92 inHg / dry pressure) * sqrt(T / 520 R)
+    ET / MPH          power-to-weight scales ET by cf^(-1/3) and MPH by cf^(1/3)
+                      (using the SAE factor)
+
+A test needs weather_temp_f and elevation_ft; missing humidity counts as
+dry air.
+
+Migration 019's trigger marks inserted or edited tests pending and
+notifies 'performance_tests_changed'. The API's listener thread
+(start_corrections_listener) recomputes pending tests as they arrive; the
+backfill command does the same for everything pending, or every test:
+    python performance_corrections.py [--all] [--batch-size 5000]
+"""
+import os
+import select
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import psycopg2
+from psycopg2.extras import RealDictCursor, execute_values
+
+from db import DATABASE_URL, get_db_cursor
+
+NOTIFY_CHANNEL = 'performance_tests_changed'
+
+HPA_PER_INHG = 33.8639
+
+# Columns the corrections are computed from
+CORRECTION_INPUTS = (
+    'weather_temp_f', 'weather_humidity_pct', 'elevation_ft', 'dyno_hp', 'dyno_torque',
+    'quarter_mile_et', 'quarter_mile_mph', 'eighth_mile_et', 'eighth_mile_mph'
+)
+
+# Computed column -> decimal places stored
+CORRECTION_PRECISION = {
+    'density_altitude_ft': 0,
+    'sae_correction_factor': 4,
+    'std_correction_factor': 4,
+    'corrected_hp_sae': 2,
+    'corrected_torque_sae': 2,
+    'corrected_hp_std': 2,
+    'corrected_torque_std': 2,
+    'corrected_quarter_mile_et': 3,
+    'corrected_quarter_mile_mph': 2,
+    'corrected_eighth_mile_et': 3,
+    'corrected_eighth_mile_mph': 2,
+}
+
+
+def station_pressure_inhg(elevation_ft):
+    """Barometric pressure at an elevation in the standard atmosphere"""
+    return 29.921 * np.power(1 - 6.8753e-6 * np.asarray(elevation_ft, dtype=np.float64), 5.2559)
+
+
+def vapor_pressure_inhg(temp_f, humidity_pct):
+    """Water vapor partial pressure (Buck equation for saturation)"""
+    temp_c = (np.asarray(temp_f, dtype=np.float64) - 32) / 1.8
+    saturation_hpa = 6.1121 * np.exp((18.678 - temp_c / 234.5) * (temp_c / (257.14 + temp_c)))
+    return saturation_hpa * np.asarray(humidity_pct, dtype=np.float64) / 100 / HPA_PER_INHG
+
+
+def density_altitude_ft(station_inhg, temp_f, vapor_inhg):
+    """Density altitude from station pressure and virtual temperature (NWS formula)"""
+    temp_r = np.asarray(temp_f, dtype=np.float64) + 459.67
+    virtual_temp_r = temp_r / (1 - (vapor_inhg / station_inhg) * (1 - 0.622))
+    return 145442.16 * (1 - np.power(17.326 * station_inhg / virtual_temp_r, 0.235))
+
+
+def sae_j1349_factor(dry_inhg, temp_f):
+    """SAE J1349 correction to 25 C and 990 hPa dry air, with 15% friction allowance"""
+    temp_k = (np.asarray(temp_f, dtype=np.float64) - 32) / 1.8 + 273.15
+    return 1.18 * (990 / (dry_inhg * HPA_PER_INHG)) * np.sqrt(temp_k / 298) - 0.18
+
+
+def std_factor(dry_inhg, temp_f):
+    """STD (SAE J607) correction to 60 F and 29.92 inHg dry air"""
+    return (29.92 / dry_inhg) * np.sqrt((np.asarray(temp_f, dtype=np.float64) + 460) / 520)
+
+
+def compute_corrections(temp_f, humidity_pct, elevation_ft, hp, torque, quarter_et, quarter_mph,
+                        eighth_et, eighth_mph) -> Dict[str, np.ndarray]:
+    """
+    Correction factors and corrected results for any number of tests.
+
+    Args:
+        Broadcastable float arrays, NaN where not recorded
+
+    Returns:
+        An array per CORRECTION_PRECISION key; NaN where an input is missing
+    """
+    humidity_pct = np.nan_to_num(np.asarray(humidity_pct, dtype=np.float64), nan=0.0)
+    station = station_pressure_inhg(elevation_ft)
+    vapor = vapor_pressure_inhg(temp_f, humidity_pct)
+    dry = station - vapor
+    sae = sae_j1349_factor(dry, temp_f)
+    std = std_factor(dry, temp_f)
+    # ET and MPH follow power-to-weight to the 1/3 power
+    track = np.cbrt(sae)
+
+    return {
+        'density_altitude_ft': density_altitude_ft(station, temp_f, vapor),
+        'sae_correction_factor': sae,
+        'std_correction_factor': std,
+        'corrected_hp_sae': hp * sae,
+        'corrected_torque_sae': torque * sae,
+        'corrected_hp_std': hp * std,
+        'corrected_torque_std': torque * std,
+        'corrected_quarter_mile_et': quarter_et / track,
+        'corrected_quarter_mile_mph': quarter_mph * track,
+        'corrected_eighth_mile_et': eighth_et / track,
+        'corrected_eighth_mile_mph': eighth_mph * track,
+    }
+
+
+def correct_tests(tests: List[Dict]) -> List[List[Optional[float]]]:
+    """Corrected values for performance_tests rows, in CORRECTION_PRECISION order (None for NaN)"""
+    inputs = np.array([[test[column] for column in CORRECTION_INPUTS] for test in tests],
+                      dtype=np.float64).reshape(len(tests), len(CORRECTION_INPUTS))
+    results = compute_corrections(*inputs.T)
+
+    columns = []
+    for name, digits in CORRECTION_PRECISION.items():
+        values = np.round(results[name], digits)
+        columns.append([value if finite else None
+                        for value, finite in zip(values.tolist(), np.isfinite(values).tolist())])
+    return [list(row) for row in zip(*columns)]
+
+
+def correct_pending(recompute_all: bool = False, batch_size: int = 5000) -> Dict:
+    """
+    Compute corrections for pending tests (or all tests) and store them.
+
+    Each batch is locked with SKIP LOCKED, so several API processes and the
+    backfill command can run at once without doing the same rows, and an
+    edit made meanwhile waits and marks its row pending again.
+
+    Args:
+        recompute_all: Recompute tests that are already corrected
+        batch_size: Tests per transaction
+
+    Returns:
+        Tests corrected, duration and throughput
+    """
+    started = time.monotonic()
+    corrected = 0
+    pending_filter = "" if recompute_all else "AND corrections_computed_at IS NULL"
+    columns = list(CORRECTION_PRECISION)
+    after_id = 0
+
+    while True:
+        with get_db_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT id, {', '.join(CORRECTION_INPUTS)}
+                FROM performance_tests
+                WHERE id > %s {pending_filter}
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (after_id, batch_size))
+            tests = cursor.fetchall()
+            if not tests:
+                break
+
+            rows = [(test['id'], *values) for test, values in zip(tests, correct_tests(tests))]
+            execute_values(cursor, f"""
+                UPDATE performance_tests AS t SET
+                    {', '.join(f'{c} = v.{c}::numeric' for c in columns)},
+                    corrections_computed_at = CURRENT_TIMESTAMP
+                FROM (VALUES %s) AS v (id, {', '.join(columns)})
+                WHERE t.id = v.id
+            """, rows, page_size=1000)
+
+        corrected += len(tests)
+        after_id = tests[-1]['id']
+
+    duration = time.monotonic() - started
+    return {
+        'tests': corrected,
+        'duration_seconds': round(duration, 2),
+        'tests_per_second': int(corrected / duration) if duration else corrected
+    }
+
+
+def start_corrections_listener() -> Optional[threading.Thread]:
+    """
+    Start a daemon thread that corrects performance tests as they are
+    inserted or edited.
+
+    Controlled by PERFORMANCE_CORRECTIONS_LISTENER (0 disables it; run the
+    backfill command on a schedule instead).
+    """
+    if os.getenv('PERFORMANCE_CORRECTIONS_LISTENER', '1') == '0':
+        return None
+
+    def run():
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # Anything changed while not listening is picked up here
+                correct_pending()
+
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        correct_pending()
+            except Exception as e:
+                print(f"Performance corrections listener error: {e}")
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    thread = threading.Thread(target=run, name='performance-corrections', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compute weather-corrected performance test results')
+    parser.add_argument('--all', action='store_true', help='Recompute tests that are already corrected')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    result = correct_pending(args.all, args.batch_size)
+    print(f"✅ Corrected {result['tests']} performance tests in {result['duration_seconds']}s "
+          f"({result['tests_per_second']} tests/s)")
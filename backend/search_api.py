@@ -0,0 +1,123 @@
+"""
+Full-text search across builds, parts, component notes, maintenance records and todos.
+
+Searches the search_documents table (migration 014), whose weighted
+tsvectors are kept current by triggers on the source tables. Results are
+ranked with ts_rank_cd, highlighted with ts_headline (only for the returned
+page) and paginated by offset.
+"""
+import html
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from auth import get_current_user_optional
+from db import get_db_cursor
+
+router = APIRouter()
+
+SEARCH_TYPES = ('build', 'part', 'note', 'maintenance', 'todo')
+# ts_headline marks matches with control characters (removed from the source
+# text first); the text is HTML-escaped before they become <mark> tags
+HIGHLIGHT_START, HIGHLIGHT_STOP = '\x02', '\x03'
+HEADLINE_OPTIONS = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MinWords=10, MaxWords=30, MaxFragments=2'
+
+
+def highlight_html(headline: str) -> str:
+    """A ts_headline result as HTML: user text escaped, matches in <mark>"""
+    return html.escape(headline).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+
+
+@router.get("/api/search")
+async def search(
+    q: str,
+    types: Optional[str] = None,
+    build_id: Optional[int] = None,
+    limit: int = 20,
+    offset: int = 0,
+    current_user: Optional[dict] = Depends(get_current_user_optional)
+):
+    """
+    Search everything, best matches first.
+
+    Args:
+        q: Search text (web search syntax: "quoted phrases", or, -exclude)
+        types: Comma-separated subset of build,part,note,maintenance,todo
+        build_id: Only search records of this build
+        limit: Page size (1-100)
+        offset: Results to skip; pass the returned next_offset for the next page
+
+    Todos are only searched for the signed-in user's own builds. Highlights
+    are HTML: the text is escaped and matched terms wrapped in <mark>...</mark>.
+    """
+    try:
+        if not q.strip():
+            raise HTTPException(status_code=400, detail="Search text is required")
+
+        search_types = [t.strip() for t in types.split(',')] if types else list(SEARCH_TYPES)
+        unknown = [t for t in search_types if t not in SEARCH_TYPES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(unknown)}")
+
+        limit = max(1, min(limit, 100))
+        offset = max(0, offset)
+
+        build_filter = "AND d.build_id = %s" if build_id is not None else ""
+        params = [q, search_types, current_user['id'] if current_user else None]
+        if build_id is not None:
+            params.append(build_id)
+        markers = HIGHLIGHT_START + HIGHLIGHT_STOP
+        params += [limit + 1, offset, markers, HEADLINE_OPTIONS, markers, HEADLINE_OPTIONS]
+
+        with get_db_cursor() as cursor:
+            # Rank in the index scan, then highlight only the page (ts_headline
+            # re-parses the text, so it is the expensive part)
+            cursor.execute(f"""
+                WITH query AS (
+                    SELECT websearch_to_tsquery('english', %s) AS q
+                ),
+                page AS (
+                    SELECT d.source, d.source_id, d.build_id, d.title, d.body,
+                           ts_rank_cd(d.search_vector, query.q) AS rank
+                    FROM search_documents d, query
+                    WHERE d.search_vector @@ query.q
+                      AND d.source = ANY(%s)
+                      AND (d.private_to IS NULL OR d.private_to = %s)
+                      {build_filter}
+                    ORDER BY rank DESC, d.source, d.source_id
+                    LIMIT %s OFFSET %s
+                )
+                SELECT p.source, p.source_id, p.build_id, b.slug AS build_slug, b.name AS build_name,
+                       p.title, p.rank,
+                       ts_headline('english', translate(coalesce(p.title, ''), %s, ''), query.q, %s) AS title_highlight,
+                       ts_headline('english', translate(coalesce(p.body, ''), %s, ''), query.q, %s) AS highlight
+                FROM page p
+                CROSS JOIN query
+                LEFT JOIN builds b ON b.id = p.build_id
+                ORDER BY p.rank DESC, p.source, p.source_id
+            """, params)
+            rows = cursor.fetchall()
+
+        page = rows[:limit]
+        return {
+            'success': True,
+            'results': [
+                {
+                    'type': row['source'],
+                    'id': row['source_id'],
+                    'build_id': row['build_id'],
+                    'build_slug': row['build_slug'],
+                    'build_name': row['build_name'],
+                    'title': row['title'],
+                    'title_highlight': highlight_html(row['title_highlight']),
+                    'highlight': highlight_html(row['highlight']),
+                    'rank': round(row['rank'], 4)
+                }
+                for row in page
+            ],
+            'next_offset': offset + limit if len(rows) > limit else None
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
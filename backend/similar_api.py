@@ -0,0 +1,102 @@
+"""
+API endpoints for finding builds similar to a build.
+"""
+from fastapi import APIRouter, HTTPException
+
+from build_similarity import (
+    SIMILARITY_COLUMNS, SIMILARITY_FEATURES, BuildSimilarityIndex, apply_build_changes, build_features,
+    fetch_similarity_candidates, similarity_index, similarity_index_enabled
+)
+from db import get_db_cursor
+
+router = APIRouter()
+
+
+def feature_specs(features) -> dict:
+    """One build's feature row as {feature: value}, None where not recorded"""
+    return {
+        name: round(float(value), 4) if value == value else None
+        for name, value in zip(SIMILARITY_FEATURES, features)
+    }
+
+
+@router.get("/api/builds/{build_id}/similar")
+async def get_similar_builds(build_id: int, limit: int = 10):
+    """
+    The builds whose engine specs are nearest to this build's (public).
+
+    Ranked by weighted distance over normalized specs (see build_similarity):
+    cylinders, bore, stroke, rod, displacement, static CR, cam duration,
+    lift and LSA, and rev limit. Answered from the in-process index (503
+    while it is loading); when that is disabled, from the builds nearest in
+    displacement, read from Postgres.
+
+    Args:
+        limit: Number of builds (1-50)
+
+    Returns:
+        The build's specs and feature weights, and the similar builds
+        nearest first, each with its distance (in spreads) and specs
+    """
+    try:
+        limit = max(1, min(limit, 50))
+
+        if similarity_index.loaded:
+            if build_id not in similarity_index:
+                # Created since the listener last heard; index just this build
+                apply_build_changes([build_id])
+            nearest = similarity_index.similar(build_id, limit)
+            source = 'index'
+        elif similarity_index_enabled():
+            raise HTTPException(status_code=503, detail="Similar builds index is loading",
+                                headers={'Retry-After': '5'})
+        else:
+            index = BuildSimilarityIndex()
+            with get_db_cursor(commit=False) as cursor:
+                index.load(fetch_similarity_candidates(cursor, build_id))
+            nearest = index.similar(build_id, limit)
+            source = 'database'
+        if nearest is None:
+            raise HTTPException(status_code=404, detail="Build not found")
+
+        ids = [build_id] + [similar_id for similar_id, _ in nearest]
+        with get_db_cursor(commit=False) as cursor:
+            cursor.execute(f"""
+                SELECT {', '.join(SIMILARITY_COLUMNS)}, slug, name, vehicle_year, vehicle_make, vehicle_model
+                FROM builds
+                WHERE id = ANY(%s)
+            """, (ids,))
+            builds = {row['id']: row for row in cursor.fetchall()}
+        if build_id not in builds:
+            raise HTTPException(status_code=404, detail="Build not found")
+
+        # Drop builds deleted since the index last heard about them
+        nearest = [(similar_id, distance) for similar_id, distance in nearest if similar_id in builds]
+        specs = build_features([builds[i] for i in [build_id] + [similar_id for similar_id, _ in nearest]])
+
+        similar = []
+        for (similar_id, distance), features in zip(nearest, specs[1:]):
+            build = builds[similar_id]
+            similar.append({
+                'build_id': similar_id,
+                'slug': build['slug'],
+                'name': build['name'],
+                'vehicle': {'year': build['vehicle_year'], 'make': build['vehicle_make'],
+                            'model': build['vehicle_model']},
+                'distance': round(distance, 4),
+                'specs': feature_specs(features),
+            })
+
+        return {
+            'success': True,
+            'build_id': build_id,
+            'specs': feature_specs(specs[0]),
+            'weights': {name: weight for name, (weight, _) in SIMILARITY_FEATURES.items()},
+            'similar': similar,
+            'source': source
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,353 @@
+"""
+Cold-storage archiving of old build snapshots.
+
+Snapshots older than SNAPSHOT_ARCHIVE_AFTER_DAYS are moved out of Postgres
+into zstd-compressed segment files, one directory per build:
+
+    STORAGE_PATH/snapshot_archive/build_<id>/segment_<first>_<last>.zst
+
+Segment layout:
+    8 bytes   magic b'ASSEG001'
+    4 bytes   big-endian length of the base frame
+    N bytes   base frame: the first snapshot's JSON, plain zstd
+    ...       one zstd frame per snapshot, compressed against the base
+              document as a raw-content dictionary
+
+Snapshots of one build are near-identical, so using the first one as a
+dictionary gives whole-segment compression ratios while every snapshot
+stays independently readable by (offset, length). The database row keeps
+its metadata and the frame location; JSON columns are cleared.
+
+When retention deletes archived rows, reclaim_segment() removes segments
+with no frames left and rewrites those that are mostly dead frames
+(SNAPSHOT_SEGMENT_REWRITE_RATIO) under a new name, so segment files don't
+keep the frames of deleted snapshots forever.
+
+Run from the command line:
+    python snapshot_archive.py [--older-than-days 180] [--batch-size 200]
+"""
+import os
+import json
+import struct
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import zstandard
+
+from db import get_db_cursor
+
+SEGMENT_MAGIC = b'ASSEG001'
+SEGMENT_HEADER = struct.Struct('>8sI')
+COMPRESSION_LEVEL = int(os.getenv('SNAPSHOT_ARCHIVE_ZSTD_LEVEL', '10'))
+
+# Rewrite a segment once at least this share of its bytes belongs to deleted snapshots
+SEGMENT_REWRITE_RATIO = float(os.getenv('SNAPSHOT_SEGMENT_REWRITE_RATIO', '0.5'))
+
+# JSON columns moved into the archive (same set snapshot_utils captures)
+ARCHIVED_JSON_FIELDS = [
+    'engine_internals_json', 'suspension_json', 'tires_wheels_json',
+    'rear_differential_json', 'transmission_json', 'frame_json',
+    'cab_interior_json', 'brakes_json', 'additional_components_json'
+]
+
+
+def get_storage_path() -> Path:
+    """Root directory for uploaded files and snapshot archives"""
+    return Path(os.getenv('STORAGE_PATH', '/tmp/auto_spec/storage'))
+
+
+def _encode_snapshot(snapshot: Dict) -> bytes:
+    """Serialize a snapshot's JSON columns to compact UTF-8 JSON"""
+    document = {field: snapshot.get(field) for field in ARCHIVED_JSON_FIELDS}
+    document['id'] = snapshot['id']
+    return json.dumps(document, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+def write_segment(path: Path, snapshots: List[Dict]) -> List[Tuple[int, int]]:
+    """
+    Write snapshots to a new segment file.
+
+    The file is written to a temporary name, fsynced and renamed into place,
+    so a crash never leaves a partial segment under its final name.
+
+    Args:
+        path: Destination segment path
+        snapshots: Snapshot rows (must include 'id' and the JSON columns)
+
+    Returns:
+        (offset, length) of each snapshot's frame, in input order
+    """
+    encoded = [_encode_snapshot(snapshot) for snapshot in snapshots]
+    base = encoded[0]
+
+    base_frame = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(base)
+    dictionary = zstandard.ZstdCompressionDict(base, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+    compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL, dict_data=dictionary)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+
+    locations = []
+    with tmp_path.open('wb') as segment:
+        segment.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, len(base_frame)))
+        segment.write(base_frame)
+        offset = SEGMENT_HEADER.size + len(base_frame)
+
+        for data in encoded:
+            frame = compressor.compress(data)
+            segment.write(frame)
+            locations.append((offset, len(frame)))
+            offset += len(frame)
+
+        segment.flush()
+        os.fsync(segment.fileno())
+
+    os.replace(tmp_path, path)
+    return locations
+
+
+@lru_cache(maxsize=64)
+def _segment_decompressor(path: str) -> zstandard.ZstdDecompressor:
+    """Load a segment's base document and build a decompressor for its frames"""
+    with open(path, 'rb') as segment:
+        magic, base_length = SEGMENT_HEADER.unpack(segment.read(SEGMENT_HEADER.size))
+        if magic != SEGMENT_MAGIC:
+            raise ValueError(f"Not a snapshot segment: {path}")
+        base = zstandard.ZstdDecompressor().decompress(segment.read(base_length))
+
+    dictionary = zstandard.ZstdCompressionDict(base, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+    return zstandard.ZstdDecompressor(dict_data=dictionary)
+
+
+def read_segment_frame(path: Path, offset: int, length: int) -> Dict:
+    """Read and decompress a single snapshot frame from a segment file"""
+    decompressor = _segment_decompressor(str(path))
+    with open(path, 'rb') as segment:
+        segment.seek(offset)
+        frame = segment.read(length)
+    return json.loads(decompressor.decompress(frame))
+
+
+@lru_cache(maxsize=int(os.getenv('SNAPSHOT_ARCHIVE_CACHE_SIZE', '256')))
+def _load_archived_document(segment: str, offset: int, length: int) -> Dict:
+    """Cached frame reader keyed by the immutable frame location"""
+    return read_segment_frame(get_storage_path() / segment, offset, length)
+
+
+def rehydrate_snapshot(snapshot: Optional[Dict]) -> Optional[Dict]:
+    """
+    Fill an archived snapshot's JSON columns from cold storage.
+
+    Rows that were never archived are returned unchanged. Rehydrated
+    documents are cached, since archived frames never change.
+
+    Args:
+        snapshot: Snapshot row as a dict (may be None)
+
+    Returns:
+        The same dict with JSON columns populated
+    """
+    if not snapshot or not snapshot.get('archive_segment'):
+        return snapshot
+
+    document = _load_archived_document(
+        snapshot['archive_segment'],
+        snapshot['archive_offset'],
+        snapshot['archive_length']
+    )
+
+    if document.get('id') != snapshot['id']:
+        raise ValueError(f"Archive frame mismatch for snapshot {snapshot['id']}")
+
+    for field in ARCHIVED_JSON_FIELDS:
+        snapshot[field] = document.get(field)
+
+    return snapshot
+
+
+def archive_build_snapshots(build_id: int, cutoff: datetime, batch_size: int) -> Dict:
+    """
+    Archive one batch of a build's snapshots created before `cutoff`.
+
+    Returns:
+        {'rows': archived row count, 'bytes_in': JSON bytes, 'bytes_out': segment bytes}
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute(f"""
+            SELECT id, pg_column_size(s.*) AS row_bytes, {', '.join(ARCHIVED_JSON_FIELDS)}
+            FROM build_json_snapshots s
+            WHERE build_id = %s AND archive_segment IS NULL AND created_at < %s
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (build_id, cutoff, batch_size))
+        snapshots = cursor.fetchall()
+
+        if not snapshots:
+            return {'rows': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+        relative_path = (
+            f"snapshot_archive/build_{build_id}/"
+            f"segment_{snapshots[0]['id']}_{snapshots[-1]['id']}.zst"
+        )
+        segment_path = get_storage_path() / relative_path
+        locations = write_segment(segment_path, snapshots)
+
+        archived_at = datetime.utcnow()
+        cursor.executemany(f"""
+            UPDATE build_json_snapshots SET
+                {', '.join(f'{field} = NULL' for field in ARCHIVED_JSON_FIELDS)},
+                archive_segment = %s,
+                archive_offset = %s,
+                archive_length = %s,
+                archived_at = %s
+            WHERE id = %s
+        """, [
+            (relative_path, offset, length, archived_at, snapshot['id'])
+            for snapshot, (offset, length) in zip(snapshots, locations)
+        ])
+
+        return {
+            'rows': len(snapshots),
+            'bytes_in': sum(snapshot['row_bytes'] for snapshot in snapshots),
+            'bytes_out': segment_path.stat().st_size
+        }
+
+
+def reclaim_segment(build_id: int, segment: str) -> Dict:
+    """
+    Free the space of deleted snapshots' frames in one segment.
+
+    A segment with no snapshot rows left is removed. One whose remaining
+    frames take up no more than 1 - SNAPSHOT_SEGMENT_REWRITE_RATIO of the
+    file is rewritten with just those frames, under a new name so cached
+    readers never see different contents at the same path; the old file is
+    removed once the rows point at the new one.
+
+    Args:
+        build_id: Build the segment belongs to
+        segment: Segment path relative to the storage root
+
+    Returns:
+        {'bytes_freed': segment bytes released, 'removed': bool, 'rewritten': bool}
+    """
+    result = {'bytes_freed': 0, 'removed': False, 'rewritten': False}
+    segment_path = get_storage_path() / segment
+    if not segment_path.exists():
+        return result
+    size = segment_path.stat().st_size
+
+    with get_db_cursor() as cursor:
+        cursor.execute("""
+            SELECT id, archive_offset, archive_length
+            FROM build_json_snapshots
+            WHERE build_id = %s AND archive_segment = %s
+            ORDER BY id
+            FOR UPDATE
+        """, (build_id, segment))
+        remaining = cursor.fetchall()
+
+        if remaining:
+            if sum(row['archive_length'] for row in remaining) > size * (1 - SEGMENT_REWRITE_RATIO):
+                return result
+
+            documents = [read_segment_frame(segment_path, row['archive_offset'], row['archive_length'])
+                         for row in remaining]
+            relative_path = (
+                f"snapshot_archive/build_{build_id}/"
+                f"segment_{remaining[0]['id']}_{remaining[-1]['id']}_{datetime.utcnow():%Y%m%d%H%M%S%f}.zst"
+            )
+            new_path = get_storage_path() / relative_path
+            locations = write_segment(new_path, documents)
+            try:
+                cursor.executemany("""
+                    UPDATE build_json_snapshots
+                    SET archive_segment = %s, archive_offset = %s, archive_length = %s
+                    WHERE id = %s
+                """, [
+                    (relative_path, offset, length, row['id'])
+                    for row, (offset, length) in zip(remaining, locations)
+                ])
+            except Exception:
+                new_path.unlink(missing_ok=True)
+                raise
+            result['rewritten'] = True
+            result['bytes_freed'] = size - new_path.stat().st_size
+        else:
+            result['removed'] = True
+            result['bytes_freed'] = size
+
+    # Only once the rows no longer point at it
+    segment_path.unlink(missing_ok=True)
+    _segment_decompressor.cache_clear()
+    return result
+
+
+def archive_snapshots(older_than_days: Optional[int] = None, batch_size: int = 200) -> Dict:
+    """
+    Move every snapshot older than the threshold into cold storage.
+
+    Each batch is one segment file and one short transaction.
+
+    Args:
+        older_than_days: Age threshold (defaults to SNAPSHOT_ARCHIVE_AFTER_DAYS)
+        batch_size: Maximum snapshots per segment
+
+    Returns:
+        Report with row counts, byte counts and throughput
+    """
+    if older_than_days is None:
+        older_than_days = int(os.getenv('SNAPSHOT_ARCHIVE_AFTER_DAYS', '180'))
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    started = time.monotonic()
+
+    with get_db_cursor() as cursor:
+        cursor.execute("""
+            SELECT DISTINCT build_id FROM build_json_snapshots
+            WHERE archive_segment IS NULL AND created_at < %s
+            ORDER BY build_id
+        """, (cutoff,))
+        build_ids = [row['build_id'] for row in cursor.fetchall()]
+
+    report = {'builds': len(build_ids), 'segments': 0, 'rows': 0, 'bytes_in': 0, 'bytes_out': 0}
+    for build_id in build_ids:
+        while True:
+            batch = archive_build_snapshots(build_id, cutoff, batch_size)
+            if not batch['rows']:
+                break
+            report['segments'] += 1
+            for key in ('rows', 'bytes_in', 'bytes_out'):
+                report[key] += batch[key]
+            if batch['rows'] < batch_size:
+                break
+
+    if report['rows']:
+        # snapshot_utils imports this module
+        from snapshot_utils import clear_snapshot_diff_cache
+        clear_snapshot_diff_cache()
+
+    elapsed = time.monotonic() - started
+    report['duration_seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round(report['rows'] / elapsed, 1) if elapsed else 0.0
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Archive old build snapshots to compressed segment files')
+    parser.add_argument('--older-than-days', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=200)
+    args = parser.parse_args()
+
+    result = archive_snapshots(args.older_than_days, args.batch_size)
+    ratio = result['bytes_in'] / result['bytes_out'] if result['bytes_out'] else 0
+    print(
+        f"✅ Archived {result['rows']} snapshots from {result['builds']} builds into "
+        f"{result['segments']} segments ({result['bytes_in'] / 1024 / 1024:.2f} MB -> "
+        f"{result['bytes_out'] / 1024 / 1024:.2f} MB, {ratio:.1f}x) "
+        f"in {result['duration_seconds']}s ({result['rows_per_second']} rows/s)"
+    )
@@ -0,0 +1,326 @@
+"""
+Snapshot retention policy and background compaction for build_json_snapshots.
+
+The policy is a comma-separated list of "<age>:<resolution>" tiers, read from
+SNAPSHOT_RETENTION_POLICY. The default keeps every snapshot for 7 days, one
+per hour up to 90 days, and one per day after that:
+
+    SNAPSHOT_RETENTION_POLICY=7d:all,90d:hourly,*:daily
+
+Within each tier only the newest snapshot of each (build, bucket) survives.
+Maintenance-linked and restore snapshots are never removed.
+
+Run once from the command line:
+    python snapshot_retention.py [--dry-run] [--batch-size 500]
+"""
+import os
+import re
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from db import get_db_connection
+from snapshot_archive import reclaim_segment
+from snapshot_utils import clear_snapshot_diff_cache
+from psycopg2.extras import RealDictCursor
+
+DEFAULT_RETENTION_POLICY = '7d:all,90d:hourly,*:daily'
+
+# Snapshot types that are kept regardless of age
+PROTECTED_SNAPSHOT_TYPES = [
+    'initial',
+    'maintenance',
+    'maintenance_edit',
+    'before_maintenance',
+    'before_maintenance_edit',
+    'before_restore',
+    'restored'
+]
+
+# Resolution name -> date_trunc() unit (None keeps every snapshot)
+RESOLUTIONS = {
+    'all': None,
+    'hourly': 'hour',
+    'daily': 'day',
+    'weekly': 'week',
+    'monthly': 'month'
+}
+
+AGE_UNITS = {
+    'h': timedelta(hours=1),
+    'd': timedelta(days=1),
+    'w': timedelta(weeks=1)
+}
+
+# Arbitrary constant identifying the compactor's advisory lock
+COMPACTOR_LOCK_KEY = 8027
+
+
+def parse_retention_policy(policy: str) -> List[Tuple[Optional[timedelta], Optional[str]]]:
+    """
+    Parse a retention policy string into ordered tiers.
+
+    Args:
+        policy: e.g. "7d:all,90d:hourly,*:daily"
+
+    Returns:
+        List of (max_age, date_trunc unit) tuples, youngest tier first.
+        max_age is None for the final catch-all tier.
+    """
+    tiers = []
+    for entry in policy.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+
+        try:
+            age, resolution = entry.split(':')
+        except ValueError:
+            raise ValueError(f"Invalid retention tier: {entry}")
+
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Invalid retention resolution: {resolution}")
+
+        if age == '*':
+            max_age = None
+        else:
+            match = re.fullmatch(r'(\d+)([hdw])', age)
+            if not match:
+                raise ValueError(f"Invalid retention age: {age}")
+            max_age = int(match.group(1)) * AGE_UNITS[match.group(2)]
+
+        tiers.append((max_age, RESOLUTIONS[resolution]))
+
+    if not tiers:
+        raise ValueError("Retention policy has no tiers")
+
+    ages = [max_age for max_age, _ in tiers if max_age is not None]
+    if ages != sorted(ages) or any(max_age is None for max_age, _ in tiers[:-1]):
+        raise ValueError("Retention tiers must be in increasing age order with '*' last")
+
+    return tiers
+
+
+def _bucket_expression(tiers, now: datetime) -> Tuple[str, list]:
+    """
+    Build a SQL CASE expression mapping created_at to its thinning bucket.
+
+    Snapshots in a keep-everything tier map to NULL. Snapshots older than the
+    last bounded tier with no catch-all also map to NULL (kept).
+    """
+    clauses = []
+    params = []
+    for max_age, unit in tiers:
+        result = 'NULL' if unit is None else f"date_trunc('{unit}', created_at)"
+        if max_age is None:
+            clauses.append(f"ELSE {result}")
+        else:
+            clauses.append(f"WHEN created_at >= %s THEN {result}")
+            params.append(now - max_age)
+
+    if not clauses[-1].startswith('ELSE'):
+        clauses.append('ELSE NULL')
+    if len(clauses) == 1:
+        # A lone '*' tier: the same resolution at every age
+        return clauses[0][len('ELSE '):], params
+
+    return f"CASE {' '.join(clauses)} END", params
+
+
+def find_compaction_candidates(cursor, build_id: int, tiers, now: datetime, limit: int, after_id: int = 0) -> List[int]:
+    """Return up to `limit` removable snapshot IDs of a build, in ID order starting after `after_id`"""
+    bucket_sql, bucket_params = _bucket_expression(tiers, now)
+
+    cursor.execute(f"""
+        SELECT id FROM (
+            SELECT
+                id,
+                ROW_NUMBER() OVER (
+                    PARTITION BY bucket
+                    ORDER BY created_at DESC, id DESC
+                ) AS bucket_rank
+            FROM (
+                SELECT id, created_at, {bucket_sql} AS bucket
+                FROM build_json_snapshots
+                WHERE build_id = %s
+                  AND maintenance_id IS NULL
+                  AND snapshot_type <> ALL(%s)
+            ) bucketed
+            WHERE bucket IS NOT NULL
+        ) ranked
+        WHERE bucket_rank > 1 AND id > %s
+        ORDER BY id
+        LIMIT %s
+    """, (*bucket_params, build_id, PROTECTED_SNAPSHOT_TYPES, after_id, limit))
+
+    return [row['id'] for row in cursor.fetchall()]
+
+
+def compact_snapshots(
+    policy: Optional[str] = None,
+    batch_size: int = 500,
+    pause_seconds: float = 0.05,
+    dry_run: bool = False
+) -> Dict:
+    """
+    Thin old snapshots according to the retention policy.
+
+    Works one build at a time and deletes at most `batch_size` rows per
+    transaction, pausing between batches, so no lock is held for long.
+    A session advisory lock makes sure only one compactor runs at a time
+    across API workers.
+
+    Args:
+        policy: Retention policy string (defaults to SNAPSHOT_RETENTION_POLICY)
+        batch_size: Maximum rows deleted per transaction
+        pause_seconds: Sleep between batches to yield to foreground traffic
+        dry_run: Count what would be removed without deleting anything
+
+    Deleting archived snapshots also frees their frames in the archive
+    segment files (snapshot_archive.reclaim_segment), and bytes_reclaimed
+    counts the segment bytes released along with the database rows.
+
+    Returns:
+        Report with rows, bytes and segments reclaimed
+    """
+    tiers = parse_retention_policy(policy or os.getenv('SNAPSHOT_RETENTION_POLICY', DEFAULT_RETENTION_POLICY))
+    now = datetime.utcnow()
+    started = time.monotonic()
+
+    report = {
+        'dry_run': dry_run,
+        'skipped': False,
+        'builds_scanned': 0,
+        'batches': 0,
+        'rows_deleted': 0,
+        'bytes_reclaimed': 0,
+        'segments_removed': 0,
+        'segments_rewritten': 0,
+        'duration_seconds': 0.0
+    }
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cursor.execute("SELECT pg_try_advisory_lock(%s) AS locked", (COMPACTOR_LOCK_KEY,))
+            if not cursor.fetchone()['locked']:
+                report['skipped'] = True
+                return report
+
+            try:
+                cursor.execute("SELECT DISTINCT build_id FROM build_json_snapshots ORDER BY build_id")
+                build_ids = [row['build_id'] for row in cursor.fetchall()]
+                conn.commit()
+
+                for build_id in build_ids:
+                    report['builds_scanned'] += 1
+                    last_id = 0
+                    segments = set()
+
+                    while True:
+                        cursor.execute("SET LOCAL lock_timeout = '2s'")
+                        candidates = find_compaction_candidates(cursor, build_id, tiers, now, batch_size, last_id)
+                        if not candidates:
+                            conn.commit()
+                            break
+
+                        if dry_run:
+                            # Includes archived frames: an upper bound, as a segment is only rewritten once mostly dead
+                            cursor.execute("""
+                                SELECT COALESCE(SUM(pg_column_size(s.*) + COALESCE(archive_length, 0)), 0) AS bytes
+                                FROM build_json_snapshots s
+                                WHERE id = ANY(%s)
+                            """, (candidates,))
+                            report['bytes_reclaimed'] += int(cursor.fetchone()['bytes'])
+                        else:
+                            cursor.execute("""
+                                DELETE FROM build_json_snapshots s
+                                WHERE id = ANY(%s)
+                                RETURNING pg_column_size(s.*) AS bytes, archive_segment
+                            """, (candidates,))
+                            deleted = cursor.fetchall()
+                            report['bytes_reclaimed'] += sum(row['bytes'] for row in deleted)
+                            segments.update(row['archive_segment'] for row in deleted if row['archive_segment'])
+
+                        conn.commit()
+                        last_id = candidates[-1]
+                        report['batches'] += 1
+                        report['rows_deleted'] += len(candidates)
+
+                        if len(candidates) < batch_size:
+                            break
+                        if pause_seconds:
+                            time.sleep(pause_seconds)
+
+                    # Drop deleted snapshots' frames from their archive segments
+                    for segment in sorted(segments):
+                        reclaimed = reclaim_segment(build_id, segment)
+                        report['bytes_reclaimed'] += reclaimed['bytes_freed']
+                        report['segments_removed'] += reclaimed['removed']
+                        report['segments_rewritten'] += reclaimed['rewritten']
+            finally:
+                conn.rollback()
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (COMPACTOR_LOCK_KEY,))
+                conn.commit()
+        finally:
+            cursor.close()
+
+    if report['rows_deleted']:
+        clear_snapshot_diff_cache()
+    report['duration_seconds'] = round(time.monotonic() - started, 3)
+    return report
+
+
+def start_background_compactor() -> Optional[threading.Thread]:
+    """
+    Start a daemon thread that runs compact_snapshots periodically.
+
+    Controlled by SNAPSHOT_COMPACTION_INTERVAL_SECONDS (0 disables it).
+    """
+    interval = int(os.getenv('SNAPSHOT_COMPACTION_INTERVAL_SECONDS', '3600'))
+    if interval <= 0:
+        return None
+
+    batch_size = int(os.getenv('SNAPSHOT_COMPACTION_BATCH_SIZE', '500'))
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                report = compact_snapshots(batch_size=batch_size)
+                if not report['skipped'] and report['rows_deleted']:
+                    print(
+                        f"Snapshot compaction: removed {report['rows_deleted']} rows "
+                        f"({report['bytes_reclaimed']} bytes) in {report['duration_seconds']}s"
+                    )
+            except Exception as e:
+                print(f"Snapshot compaction error: {e}")
+
+    thread = threading.Thread(target=run, name='snapshot-compactor', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Thin old build snapshots according to the retention policy')
+    parser.add_argument('--policy', default=None, help=f'Retention policy (default: {DEFAULT_RETENTION_POLICY})')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between batches')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    result = compact_snapshots(args.policy, args.batch_size, args.pause, args.dry_run)
+
+    if result['skipped']:
+        print("Another compactor is already running; nothing done")
+    else:
+        verb = 'Would remove' if result['dry_run'] else 'Removed'
+        print(
+            f"✅ {verb} {result['rows_deleted']} snapshot rows "
+            f"({result['bytes_reclaimed'] / 1024 / 1024:.2f} MB) across {result['builds_scanned']} builds "
+            f"in {result['duration_seconds']}s; archive segments removed: {result['segments_removed']}, "
+            f"rewritten: {result['segments_rewritten']}"
+        )
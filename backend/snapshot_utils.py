@@ -1,11 +1,20 @@
 """
 Utility functions for managing build JSON snapshots and version history.
 """
+from component_store import COMPONENT_COLUMNS, read_components, update_build
 from db import get_db_cursor, row_to_dict
+from json_diff import diff_columns, to_json_patch
+from snapshot_archive import rehydrate_snapshot
+import copy
 import json
+import os
+from functools import lru_cache
 from typing import Optional, Dict, List
 from datetime import datetime
 
+# JSON component columns captured in every snapshot
+SNAPSHOT_JSON_FIELDS = COMPONENT_COLUMNS
+
 
 def create_snapshot(
     build_id: int,
@@ -28,63 +37,92 @@ def create_snapshot(
         snapshot_id: ID of the created snapshot
     """
     with get_db_cursor() as cursor:
-        # Get current JSON state from builds table
-        cursor.execute("""
-            SELECT
-                engine_internals_json,
-                suspension_json,
-                tires_wheels_json,
-                rear_differential_json,
-                transmission_json,
-                frame_json,
-                cab_interior_json,
-                brakes_json,
-                additional_components_json
-            FROM builds WHERE id = %s
-        """, (build_id,))
+        return write_snapshot(cursor, build_id, user_id, snapshot_type, change_description, maintenance_id)
 
-        current_state = cursor.fetchone()
 
-        if not current_state:
-            raise ValueError(f"Build {build_id} not found")
+def write_snapshot(
+    cursor,
+    build_id: int,
+    user_id: int,
+    snapshot_type: str,
+    change_description: str = None,
+    maintenance_id: int = None
+) -> int:
+    """create_snapshot() within the caller's transaction"""
+    # Get current JSON state of the build's components
+    current_state = read_components(cursor, build_id, SNAPSHOT_JSON_FIELDS)
+
+    if not current_state:
+        raise ValueError(f"Build {build_id} not found")
 
-        # Insert snapshot
-        cursor.execute("""
-            INSERT INTO build_json_snapshots (
-                build_id, maintenance_id, snapshot_type, change_description, user_id,
-                engine_internals_json, suspension_json, tires_wheels_json,
-                rear_differential_json, transmission_json, frame_json,
-                cab_interior_json, brakes_json, additional_components_json
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        """, (
+    # Insert snapshot
+    cursor.execute("""
+        INSERT INTO build_json_snapshots (
             build_id, maintenance_id, snapshot_type, change_description, user_id,
-            json.dumps(current_state['engine_internals_json']) if current_state['engine_internals_json'] else None,
-            json.dumps(current_state['suspension_json']) if current_state['suspension_json'] else None,
-            json.dumps(current_state['tires_wheels_json']) if current_state['tires_wheels_json'] else None,
-            json.dumps(current_state['rear_differential_json']) if current_state['rear_differential_json'] else None,
-            json.dumps(current_state['transmission_json']) if current_state['transmission_json'] else None,
-            json.dumps(current_state['frame_json']) if current_state['frame_json'] else None,
-            json.dumps(current_state['cab_interior_json']) if current_state['cab_interior_json'] else None,
-            json.dumps(current_state['brakes_json']) if current_state['brakes_json'] else None,
-            json.dumps(current_state['additional_components_json']) if current_state['additional_components_json'] else None
-        ))
-
-        snapshot_id = cursor.fetchone()['id']
-        return snapshot_id
-
-
-def get_snapshot_diff(snapshot_before_id: int, snapshot_after_id: int) -> Dict:
+            engine_internals_json, suspension_json, tires_wheels_json,
+            rear_differential_json, transmission_json, frame_json,
+            cab_interior_json, brakes_json, additional_components_json
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING id
+    """, (
+        build_id, maintenance_id, snapshot_type, change_description, user_id,
+        json.dumps(current_state['engine_internals_json']) if current_state['engine_internals_json'] else None,
+        json.dumps(current_state['suspension_json']) if current_state['suspension_json'] else None,
+        json.dumps(current_state['tires_wheels_json']) if current_state['tires_wheels_json'] else None,
+        json.dumps(current_state['rear_differential_json']) if current_state['rear_differential_json'] else None,
+        json.dumps(current_state['transmission_json']) if current_state['transmission_json'] else None,
+        json.dumps(current_state['frame_json']) if current_state['frame_json'] else None,
+        json.dumps(current_state['cab_interior_json']) if current_state['cab_interior_json'] else None,
+        json.dumps(current_state['brakes_json']) if current_state['brakes_json'] else None,
+        json.dumps(current_state['additional_components_json']) if current_state['additional_components_json'] else None
+    ))
+
+    snapshot_id = cursor.fetchone()['id']
+    return snapshot_id
+
+
+def get_snapshot_diff(snapshot_before_id: int, snapshot_after_id: int, format: str = 'paths') -> Dict:
     """
     Compare two snapshots and return what changed.
 
+    Only the changed paths inside each JSON column are returned, not the
+    complete before/after documents. Snapshots are immutable, so the diff for
+    a given pair is computed once and served from an in-process cache (a
+    copy of it, so callers may modify the result).
+
     Args:
         snapshot_before_id: ID of the earlier snapshot
         snapshot_after_id: ID of the later snapshot
+        format: 'paths' for path-level changes including old values,
+                'patch' for RFC 6902 JSON Patch operations per column
 
     Returns:
         Dictionary containing changes between snapshots
     """
+    if format not in ('paths', 'patch'):
+        raise ValueError(f"Invalid diff format: {format}")
+
+    diff = copy.deepcopy(_compute_snapshot_diff(snapshot_before_id, snapshot_after_id))
+
+    if format == 'patch':
+        changes = {
+            field: {'has_changes': True, 'patch': to_json_patch(change['paths'])}
+            for field, change in diff['changes'].items()
+        }
+    else:
+        changes = diff['changes']
+
+    return {
+        'snapshot_before': diff['snapshot_before'],
+        'snapshot_after': diff['snapshot_after'],
+        'format': format,
+        'changes': changes
+    }
+
+
+@lru_cache(maxsize=int(os.getenv('SNAPSHOT_DIFF_CACHE_SIZE', '512')))
+def _compute_snapshot_diff(snapshot_before_id: int, snapshot_after_id: int) -> Dict:
+    """Load a snapshot pair and diff its JSON columns (cached by snapshot pair)"""
     with get_db_cursor() as cursor:
         cursor.execute("""
             SELECT * FROM build_json_snapshots WHERE id IN (%s, %s)
@@ -92,33 +130,16 @@ def get_snapshot_diff(snapshot_before_id: int, snapshot_after_id: int) -> Dict:
 
         snapshots = cursor.fetchall()
 
-        if len(snapshots) != 2:
-            raise ValueError("One or both snapshots not found")
-
-        before = next((row_to_dict(s) for s in snapshots if s['id'] == snapshot_before_id), None)
-        after = next((row_to_dict(s) for s in snapshots if s['id'] == snapshot_after_id), None)
+        before = rehydrate_snapshot(next((row_to_dict(s) for s in snapshots if s['id'] == snapshot_before_id), None))
+        after = rehydrate_snapshot(next((row_to_dict(s) for s in snapshots if s['id'] == snapshot_after_id), None))
 
         if not before or not after:
             raise ValueError("One or both snapshots not found")
 
-    changes = {}
-    json_fields = [
-        'engine_internals_json', 'suspension_json', 'tires_wheels_json',
-        'rear_differential_json', 'transmission_json', 'frame_json',
-        'cab_interior_json', 'brakes_json', 'additional_components_json'
-    ]
-
-    for field in json_fields:
-        before_value = before.get(field)
-        after_value = after.get(field)
-
-        # Compare JSON objects (convert to string for comparison if needed)
-        if before_value != after_value:
-            changes[field] = {
-                'before': before_value,
-                'after': after_value,
-                'has_changes': True
-            }
+    changes = {
+        field: {'has_changes': True, 'paths': ops}
+        for field, ops in diff_columns(before, after, SNAPSHOT_JSON_FIELDS).items()
+    }
 
     return {
         'snapshot_before': {
@@ -137,6 +158,11 @@ def get_snapshot_diff(snapshot_before_id: int, snapshot_after_id: int) -> Dict:
     }
 
 
+def clear_snapshot_diff_cache():
+    """Drop cached diffs; called when snapshots are deleted or archived"""
+    _compute_snapshot_diff.cache_clear()
+
+
 def restore_snapshot(build_id: int, snapshot_id: int, user_id: int) -> bool:
     """
     Restore build to a previous snapshot state.
@@ -158,7 +184,7 @@ def restore_snapshot(build_id: int, snapshot_id: int, user_id: int) -> bool:
         if not snapshot:
             raise ValueError(f"Snapshot {snapshot_id} not found for build {build_id}")
 
-        snapshot_dict = row_to_dict(snapshot)
+        snapshot_dict = rehydrate_snapshot(row_to_dict(snapshot))
 
         # Create "before restore" snapshot
         before_restore_id = create_snapshot(
@@ -168,42 +194,25 @@ def restore_snapshot(build_id: int, snapshot_id: int, user_id: int) -> bool:
             f'Before restoring to snapshot {snapshot_id}'
         )
 
-        # Restore build to snapshot state
-        cursor.execute("""
-            UPDATE builds SET
-                engine_internals_json = %s,
-                suspension_json = %s,
-                tires_wheels_json = %s,
-                rear_differential_json = %s,
-                transmission_json = %s,
-                frame_json = %s,
-                cab_interior_json = %s,
-                brakes_json = %s,
-                additional_components_json = %s
-            WHERE id = %s
-        """, (
-            snapshot_dict['engine_internals_json'],
-            snapshot_dict['suspension_json'],
-            snapshot_dict['tires_wheels_json'],
-            snapshot_dict['rear_differential_json'],
-            snapshot_dict['transmission_json'],
-            snapshot_dict['frame_json'],
-            snapshot_dict['cab_interior_json'],
-            snapshot_dict['brakes_json'],
-            snapshot_dict['additional_components_json'],
-            build_id
-        ))
-
-        # Create "after restore" snapshot
-        snapshot_date = snapshot_dict['created_at'].strftime('%Y-%m-%d %H:%M') if isinstance(snapshot_dict['created_at'], datetime) else snapshot_dict['created_at']
-        after_restore_id = create_snapshot(
-            build_id,
-            user_id,
-            'restored',
-            f'Restored to snapshot from {snapshot_date}'
-        )
+        # Restore build to snapshot state. Older snapshots still embed
+        # notes_array; notes now live in component_notes and are not rolled back.
+        restored = {
+            field: {k: v for k, v in snapshot_dict[field].items() if k != 'notes_array'}
+            if isinstance(snapshot_dict[field], dict) else snapshot_dict[field]
+            for field in SNAPSHOT_JSON_FIELDS
+        }
+        update_build(cursor, build_id, documents=restored)
+
+    # Create "after restore" snapshot once the restore has committed
+    snapshot_date = snapshot_dict['created_at'].strftime('%Y-%m-%d %H:%M') if isinstance(snapshot_dict['created_at'], datetime) else snapshot_dict['created_at']
+    after_restore_id = create_snapshot(
+        build_id,
+        user_id,
+        'restored',
+        f'Restored to snapshot from {snapshot_date}'
+    )
 
-        return True
+    return True
 
 
 def get_build_snapshot_history(build_id: int) -> List[Dict]:
@@ -250,6 +259,7 @@ def get_build_snapshot_history(build_id: int) -> List[Dict]:
 def get_snapshot_by_id(snapshot_id: int) -> Optional[Dict]:
     """
     Get a specific snapshot by ID.
+    Archived snapshots are rehydrated from cold storage.
 
     Args:
         snapshot_id: ID of the snapshot
@@ -275,7 +285,7 @@ def get_snapshot_by_id(snapshot_id: int) -> Optional[Dict]:
         if not snapshot:
             return None
 
-        snapshot_dict = row_to_dict(snapshot)
+        snapshot_dict = rehydrate_snapshot(row_to_dict(snapshot))
 
         # Format datetime
         if isinstance(snapshot_dict.get('created_at'), datetime):
@@ -307,7 +317,7 @@ def get_latest_snapshot(build_id: int) -> Optional[Dict]:
         if not snapshot:
             return None
 
-        snapshot_dict = row_to_dict(snapshot)
+        snapshot_dict = rehydrate_snapshot(row_to_dict(snapshot))
 
         if isinstance(snapshot_dict.get('created_at'), datetime):
             snapshot_dict['created_at'] = snapshot_dict['created_at'].isoformat()
@@ -0,0 +1,468 @@
+"""
+Streaming migration of the legacy SQLite database (engine_build_normalized.db)
+into Postgres.
+
+Every SQLite table is read in id order, one chunk at a time. Each chunk is
+loaded with COPY into a temporary staging table and inserted into its
+Postgres table with set-based SQL. Postgres assigns new ids from the
+table's sequence; legacy_id_map records legacy id -> new id and is used to
+rewrite the foreign keys of later tables, so a legacy database can be merged
+into one that already has data. Rows whose natural key already exists
+(users.email, parts.part_number, vendors.name), in Postgres or earlier in
+the same chunk, are mapped onto that row instead of duplicated. Rows that reference a parent missing from the
+legacy data (SQLite never enforced its foreign keys) are skipped and counted.
+
+maintenance_events and maintenance_parts (add_maintenance_tables.py) become
+build_maintenance rows: one per part used in an event, or a single row for
+an event without parts.
+
+Tables are migrated in parallel, each as soon as every table it references
+is done. A chunk commits together with its id mappings and a checkpoint in
+legacy_migration_progress, so an interrupted run resumes where it stopped
+and re-running a finished migration does nothing.
+
+Run from the command line:
+    python sqlite_migrate.py [--sqlite ../engine_build_normalized.db] [--chunk-size 5000] [--workers 4]
+"""
+import io
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from db import DATABASE_URL
+
+# Existing Postgres rows legacy rows are matched on
+NATURAL_KEYS = {
+    'users': 'email',
+    'parts': 'part_number',
+    'vendors': 'name',
+}
+
+# Short-lived or replaced data that is not worth carrying over
+SKIP_TABLES = {'sms_verification_codes'}
+
+MAINTENANCE_SOURCE = 'maintenance_events'
+
+# Legacy maintenance events joined with the parts they used, one chunk of
+# events at a time
+MAINTENANCE_QUERY = """
+    SELECT e.id AS id, e.build_id, e.event_date AS timestamp, e.event_type AS maintenance_type,
+           coalesce(mp.part_description, p.name, e.description) AS item_description,
+           mp.qty AS quantity,
+           CASE WHEN mp.id IS NOT NULL THEN 'pcs' END AS unit,
+           e.engine_hours, e.odometer AS odometer_miles,
+           p.brand, coalesce(mp.part_number, p.part_number) AS part_number,
+           nullif(trim(coalesce(e.notes, '') || char(10) || coalesce(mp.notes, '')), '') AS notes
+    FROM (SELECT * FROM maintenance_events WHERE id > ? ORDER BY id LIMIT ?) AS e
+    LEFT JOIN maintenance_parts mp ON mp.event_id = e.id
+    LEFT JOIN parts p ON p.id = mp.part_id
+    ORDER BY e.id, mp.id
+"""
+
+PROGRESS_INTERVAL_SECONDS = 5
+
+_print_lock = threading.Lock()
+
+
+def _log(message: str):
+    with _print_lock:
+        print(message, flush=True)
+
+
+def _build_slug(row: Dict) -> Dict:
+    """Legacy builds predate slugs; generate one the way POST /api/builds does"""
+    if row.get('slug'):
+        return row
+    sanitized_name = re.sub(r'[^a-zA-Z0-9\s-]', '', row.get('name') or 'build')
+    sanitized_name = re.sub(r'\s+', '-', sanitized_name).lower()[:50]
+    random_hash = secrets.token_urlsafe(12)
+    row['slug'] = f"{random_hash}-{sanitized_name}" if sanitized_name else random_hash
+    return row
+
+
+def _maintenance_type(row: Dict) -> Dict:
+    """'oil_change' -> 'Oil Change', matching the maintenance form's values"""
+    if row.get('maintenance_type'):
+        row['maintenance_type'] = row['maintenance_type'].replace('_', ' ').title()
+    return row
+
+
+ROW_TRANSFORMS: Dict[str, Callable[[Dict], Dict]] = {
+    'builds': _build_slug,
+    MAINTENANCE_SOURCE: _maintenance_type,
+}
+
+
+class Source:
+    """One legacy table (or the maintenance join) and the Postgres table it fills"""
+
+    def __init__(self, name: str, target: str, columns: List[str], select: str):
+        self.name = name
+        self.target = target
+        self.columns = columns          # target columns filled from SQLite (besides id)
+        self.select = select            # SQLite query: (last id, limit) -> rows ordered by id
+        self.foreign_keys: Dict[str, str] = {}  # column -> referenced source
+        self.types: Dict[str, str] = {}
+        self.sequence: Optional[str] = None
+        self.total = 0
+
+
+def _quote(column: str) -> str:
+    return f'"{column}"'
+
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _copy_value(value) -> str:
+    """Encode a value for COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', errors='replace')
+    if isinstance(value, str):
+        return value.translate(_COPY_ESCAPES)
+    return str(value)
+
+
+def _cast(column: str, pg_type: str) -> str:
+    """Staged text -> target type (SQLite may store 6200.0 in an INTEGER column)"""
+    if pg_type in ('integer', 'bigint', 'smallint'):
+        return f"round(s.{_quote(column)}::numeric)::{pg_type}"
+    return f"s.{_quote(column)}::{pg_type}"
+
+
+def discover_sources(sqlite_conn, pg_cursor) -> Dict[str, Source]:
+    """Legacy tables that have a Postgres counterpart, with their column and foreign key mapping"""
+    tables = [row[0] for row in sqlite_conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )]
+
+    def target_columns(table: str) -> Dict[str, Dict]:
+        pg_cursor.execute("""
+            SELECT a.attname AS name, format_type(a.atttypid, a.atttypmod) AS type, a.attnotnull AS not_null
+            FROM pg_attribute a
+            WHERE a.attrelid = to_regclass(%s) AND a.attnum > 0
+              AND NOT a.attisdropped AND a.attgenerated = ''
+        """, (table,))
+        return {row['name']: row for row in pg_cursor.fetchall()}
+
+    sources = {}
+    for table in tables:
+        if table in SKIP_TABLES or table in ('maintenance_parts', MAINTENANCE_SOURCE):
+            continue
+        target = target_columns(table)
+        if not target:
+            _log(f"  {table}: no Postgres table, skipped")
+            continue
+        legacy = [row[1] for row in sqlite_conn.execute(f'PRAGMA table_info("{table}")')]
+        if 'id' not in legacy:
+            _log(f"  {table}: no id column, skipped")
+            continue
+
+        transform_columns = ['slug'] if table == 'builds' and 'slug' not in legacy else []
+        columns = [c for c in legacy + transform_columns if c != 'id' and c in target]
+        dropped = [c for c in legacy if c != 'id' and c not in target]
+        if dropped:
+            _log(f"  {table}: legacy columns without a Postgres column: {', '.join(dropped)}")
+
+        legacy_columns = ['id'] + [c for c in columns if c not in transform_columns]
+        select = f'SELECT {", ".join(map(_quote, legacy_columns))} FROM "{table}" WHERE id > ? ORDER BY id LIMIT ?'
+        source = Source(table, table, columns, select)
+        source.types = {c: target[c]['type'] for c in columns}
+        source.total = sqlite_conn.execute(f'SELECT count(*) FROM "{table}"').fetchone()[0]
+        sources[table] = source
+
+    if MAINTENANCE_SOURCE in tables and 'maintenance_parts' in tables:
+        target = target_columns('build_maintenance')
+        columns = ['build_id', 'timestamp', 'maintenance_type', 'item_description', 'quantity', 'unit',
+                   'engine_hours', 'odometer_miles', 'brand', 'part_number', 'notes']
+        source = Source(MAINTENANCE_SOURCE, 'build_maintenance', columns, MAINTENANCE_QUERY)
+        source.types = {c: target[c]['type'] for c in columns}
+        source.total = sqlite_conn.execute(f"""
+            SELECT count(*) FROM {MAINTENANCE_SOURCE} e LEFT JOIN maintenance_parts mp ON mp.event_id = e.id
+        """).fetchone()[0]
+        sources[MAINTENANCE_SOURCE] = source
+
+    for source in sources.values():
+        pg_cursor.execute("""
+            SELECT a.attname AS column_name, c.confrelid::regclass::text AS referenced
+            FROM pg_constraint c
+            JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+            WHERE c.conrelid = to_regclass(%s) AND c.contype = 'f' AND cardinality(c.conkey) = 1
+        """, (source.target,))
+        for row in pg_cursor.fetchall():
+            # References to tables that aren't migrated keep their values
+            if row['column_name'] in source.columns and row['referenced'] in sources:
+                source.foreign_keys[row['column_name']] = row['referenced']
+
+        pg_cursor.execute("SELECT pg_get_serial_sequence(%s, 'id') AS sequence", (source.target,))
+        source.sequence = pg_cursor.fetchone()['sequence']
+
+    for name in [name for name, source in sources.items() if not source.sequence]:
+        _log(f"  {name}: {sources.pop(name).target}.id has no sequence, skipped")
+
+    return sources
+
+
+def ensure_state_tables(pg_cursor):
+    """Id mappings and per-table checkpoints"""
+    pg_cursor.execute("""
+        CREATE TABLE IF NOT EXISTS legacy_id_map (
+            source_table VARCHAR(64) NOT NULL,
+            legacy_id BIGINT NOT NULL,
+            new_id BIGINT NOT NULL,
+            PRIMARY KEY (source_table, legacy_id)
+        )
+    """)
+    pg_cursor.execute("""
+        CREATE TABLE IF NOT EXISTS legacy_migration_progress (
+            source_table VARCHAR(64) PRIMARY KEY,
+            last_legacy_id BIGINT NOT NULL DEFAULT 0,
+            rows_read BIGINT NOT NULL DEFAULT 0,
+            rows_inserted BIGINT NOT NULL DEFAULT 0,
+            rows_matched BIGINT NOT NULL DEFAULT 0,
+            rows_skipped BIGINT NOT NULL DEFAULT 0,
+            completed_at TIMESTAMP
+        )
+    """)
+
+
+def _load_chunk(cursor, source: Source, rows: List[Dict]) -> Dict:
+    """COPY one chunk into staging and insert it; returns row counts"""
+    cursor.execute(f"""
+        CREATE TEMP TABLE stage (
+            legacy_id BIGINT,
+            {', '.join(f'{_quote(c)} TEXT' for c in source.columns)}
+        ) ON COMMIT DROP
+    """)
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(row.get(c)) for c in ['id'] + source.columns))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY stage (legacy_id, {', '.join(map(_quote, source.columns))}) FROM STDIN",
+        buffer
+    )
+
+    selects, joins, orphan_checks = [], [], []
+    for column in source.columns:
+        referenced = source.foreign_keys.get(column)
+        if referenced:
+            alias = f"m_{column}"
+            joins.append(f"LEFT JOIN legacy_id_map {alias} ON {alias}.source_table = '{referenced}' "
+                         f"AND {alias}.legacy_id = round(s.{_quote(column)}::numeric)::bigint")
+            selects.append(f"{alias}.new_id::{source.types[column]} AS {_quote(column)}")
+            orphan_checks.append(f"(s.{_quote(column)} IS NOT NULL AND {alias}.new_id IS NULL)")
+        else:
+            selects.append(f"{_cast(column, source.types[column])} AS {_quote(column)}")
+
+    natural_key = NATURAL_KEYS.get(source.name)
+    if natural_key:
+        # Only the first row (by legacy id) of each natural key in the chunk
+        # is inserted; the rest map onto it below. NULL keys never collide.
+        key = f"s.{_quote(natural_key)}"
+        staged = (f"(SELECT DISTINCT ON ({key}, CASE WHEN {key} IS NULL THEN s.legacy_id END) * "
+                  f"FROM stage s ORDER BY {key}, CASE WHEN {key} IS NULL THEN s.legacy_id END, s.legacy_id) s")
+        joins.append(f"LEFT JOIN {source.target} existing ON existing.{natural_key} = s.{natural_key}")
+        new_id = f"coalesce(existing.id, nextval('{source.sequence}'))"
+        matched = "existing.id IS NOT NULL"
+    else:
+        staged = "stage s"
+        new_id = f"nextval('{source.sequence}')"
+        matched = "false"
+
+    cursor.execute(f"""
+        CREATE TEMP TABLE mapped ON COMMIT DROP AS
+        SELECT s.legacy_id,
+               {' OR '.join(orphan_checks) or 'false'} AS orphan,
+               CASE WHEN {' OR '.join(orphan_checks) or 'false'} THEN NULL ELSE {new_id} END AS new_id,
+               {matched} AS matched,
+               {', '.join(selects)}
+        FROM {staged}
+        {' '.join(joins)}
+    """)
+    if natural_key:
+        cursor.execute(f"""
+            INSERT INTO mapped (legacy_id, orphan, new_id, matched)
+            SELECT s.legacy_id, m.orphan, m.new_id, NOT m.orphan
+            FROM stage s
+            JOIN mapped m ON m.{_quote(natural_key)} = s.{_quote(natural_key)}
+            WHERE s.legacy_id <> m.legacy_id
+        """)
+    column_list = ', '.join(map(_quote, source.columns))
+    cursor.execute(f"""
+        INSERT INTO {source.target} (id, {column_list})
+        SELECT new_id, {column_list} FROM mapped
+        WHERE NOT orphan AND NOT matched
+        ORDER BY new_id
+    """)
+    inserted = cursor.rowcount
+
+    # One legacy maintenance event can become several rows; map it to the first
+    cursor.execute("""
+        INSERT INTO legacy_id_map (source_table, legacy_id, new_id)
+        SELECT %s, legacy_id, min(new_id) FROM mapped
+        WHERE NOT orphan
+        GROUP BY legacy_id
+        ON CONFLICT DO NOTHING
+    """, (source.name,))
+
+    cursor.execute("""
+        SELECT count(*) FILTER (WHERE matched) AS matched, count(*) FILTER (WHERE orphan) AS skipped
+        FROM mapped
+    """)
+    counts = cursor.fetchone()
+    return {'inserted': inserted, 'matched': counts['matched'], 'skipped': counts['skipped']}
+
+
+def migrate_source(sqlite_path: str, source: Source, chunk_size: int) -> Dict:
+    """Stream one source into Postgres, chunk by chunk, from its last checkpoint"""
+    sqlite_conn = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+    sqlite_conn.row_factory = sqlite3.Row
+    pg_conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    transform = ROW_TRANSFORMS.get(source.name)
+
+    try:
+        cursor = pg_conn.cursor()
+        cursor.execute("""
+            INSERT INTO legacy_migration_progress (source_table) VALUES (%s)
+            ON CONFLICT (source_table) DO NOTHING
+        """, (source.name,))
+        cursor.execute("SELECT * FROM legacy_migration_progress WHERE source_table = %s", (source.name,))
+        progress = dict(cursor.fetchone())
+        pg_conn.commit()
+
+        started = reported = time.monotonic()
+        read_this_run = 0
+        while True:
+            # SQLite rows keep the legacy id; the maintenance join yields several rows per id
+            rows = [dict(row) for row in sqlite_conn.execute(source.select, (progress['last_legacy_id'], chunk_size))]
+            if not rows:
+                break
+            if transform:
+                rows = [transform(row) for row in rows]
+
+            counts = _load_chunk(cursor, source, rows)
+            progress['last_legacy_id'] = rows[-1]['id']
+            progress['rows_read'] += len(rows)
+            progress['rows_inserted'] += counts['inserted']
+            progress['rows_matched'] += counts['matched']
+            progress['rows_skipped'] += counts['skipped']
+            cursor.execute("""
+                UPDATE legacy_migration_progress
+                SET last_legacy_id = %(last_legacy_id)s, rows_read = %(rows_read)s,
+                    rows_inserted = %(rows_inserted)s, rows_matched = %(rows_matched)s,
+                    rows_skipped = %(rows_skipped)s
+                WHERE source_table = %(source_table)s
+            """, progress)
+            pg_conn.commit()
+
+            read_this_run += len(rows)
+            now = time.monotonic()
+            if now - reported >= PROGRESS_INTERVAL_SECONDS:
+                reported = now
+                _log(f"  {source.name}: {progress['rows_read']:,}/{source.total:,} rows "
+                     f"({read_this_run / (now - started):,.0f} rows/s)")
+
+        cursor.execute("""
+            UPDATE legacy_migration_progress SET completed_at = CURRENT_TIMESTAMP
+            WHERE source_table = %s
+        """, (source.name,))
+        pg_conn.commit()
+
+        duration = time.monotonic() - started
+        progress['rows_this_run'] = read_this_run
+        progress['duration_seconds'] = round(duration, 2)
+        progress['rows_per_second'] = int(read_this_run / duration) if duration else read_this_run
+        return progress
+    finally:
+        pg_conn.close()
+        sqlite_conn.close()
+
+
+def migrate(sqlite_path: str, chunk_size: int = 5000, workers: int = 4) -> Dict[str, Dict]:
+    """
+    Migrate every legacy table, running independent tables in parallel.
+
+    Args:
+        sqlite_path: Legacy SQLite database file
+        chunk_size: Legacy rows per COPY/commit
+        workers: Tables migrated at the same time
+
+    Returns:
+        Final progress per source table
+    """
+    sqlite_conn = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+    pg_conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    try:
+        cursor = pg_conn.cursor()
+        ensure_state_tables(cursor)
+        sources = discover_sources(sqlite_conn, cursor)
+        cursor.execute("SELECT source_table FROM legacy_migration_progress WHERE completed_at IS NOT NULL")
+        done = {row['source_table'] for row in cursor.fetchall()} & set(sources)
+        pg_conn.commit()
+    finally:
+        pg_conn.close()
+        sqlite_conn.close()
+
+    depends_on = {
+        name: {ref for ref in source.foreign_keys.values() if ref != name}
+        for name, source in sources.items()
+    }
+    # Maintenance rows reference builds through the event, parts only by number
+    if MAINTENANCE_SOURCE in sources:
+        depends_on[MAINTENANCE_SOURCE] = {'builds'} & set(sources)
+
+    results = {}
+    pending = [name for name in sources if name not in done]
+    for name in done:
+        _log(f"  {name}: already migrated")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {}
+        while pending or running:
+            for name in list(pending):
+                if depends_on[name] <= done:
+                    pending.remove(name)
+                    _log(f"  {name}: started ({sources[name].total:,} legacy rows)")
+                    running[executor.submit(migrate_source, sqlite_path, sources[name], chunk_size)] = name
+            if not running:
+                raise RuntimeError(f"Circular foreign keys between {', '.join(pending)}")
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                results[name] = result = future.result()
+                done.add(name)
+                _log(f"  {name}: done - {result['rows_inserted']:,} inserted, {result['rows_matched']:,} matched "
+                     f"existing, {result['rows_skipped']:,} skipped in {result['duration_seconds']}s "
+                     f"({result['rows_per_second']:,} rows/s)")
+
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description='Migrate the legacy SQLite database into Postgres')
+    parser.add_argument('--sqlite', default=os.path.join(os.path.dirname(__file__), '..', 'engine_build_normalized.db'))
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    results = migrate(args.sqlite, args.chunk_size, args.workers)
+    duration = time.monotonic() - started
+    rows = sum(result['rows_this_run'] for result in results.values())
+    print(f"✅ Migrated {len(results)} tables, {rows:,} rows in {duration:.2f}s "
+          f"({rows / duration if duration else rows:,.0f} rows/s)")
@@ -0,0 +1,70 @@
+import json
+import re
+from pathlib import Path
+
+import fastjsonschema
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+SCHEMA_DIR = BACKEND_DIR / 'schemas'
+DOCS = ('JSONB_SCHEMAS.md', 'ENGINE_INTERNALS_SCHEMA.md')
+
+# component_schemas.py needs a database (through db.py) to import, so the
+# schemas are merged the same way here
+COMMON = json.loads((SCHEMA_DIR / 'common.json').read_text())
+COMPONENTS = sorted(path.stem for path in SCHEMA_DIR.glob('*.json') if path.stem != 'common')
+COLUMNS = {component.replace('-', '_') + '_json': component for component in COMPONENTS}
+
+BLOCK_RE = re.compile(r'^(#+ [^\n]*)$|^```json\n(.*?)^```', re.MULTILINE | re.DOTALL)
+COLUMN_RE = re.compile('|'.join(COLUMNS))
+
+
+def validator(component):
+    schema = json.loads((SCHEMA_DIR / f'{component}.json').read_text())
+    schema['definitions'] = {**COMMON['definitions'], **schema.get('definitions', {})}
+    return fastjsonschema.compile(schema)
+
+
+VALIDATORS = {component: validator(component) for component in COMPONENTS}
+
+
+def doc_examples():
+    """
+    (doc, heading, components, document) for every ```json block.
+
+    A block is checked against the component column named in its heading or
+    the text before it ('Complete suspension_json with ...'), engine
+    internals in ENGINE_INTERNALS_SCHEMA.md, else every component (generic
+    snippets). '{...}' placeholders and // comments are dropped.
+    """
+    examples = []
+    for doc in DOCS:
+        text = (BACKEND_DIR / doc).read_text()
+        heading, heading_end = None, 0
+        for match in BLOCK_RE.finditer(text):
+            if match.group(1):
+                heading, heading_end = match.group(1), match.end()
+                continue
+            named = COLUMN_RE.findall(text[heading_end - len(heading):match.start()])
+            if named:
+                components = [COLUMNS[named[-1]]]
+            elif doc == 'ENGINE_INTERNALS_SCHEMA.md':
+                components = ['engine-internals']
+            else:
+                components = COMPONENTS
+            source = re.sub(r'\s*//[^\n]*', '', match.group(2)).replace('{...}', '{}')
+            examples.append((doc, heading, components, json.loads(source)))
+    return examples
+
+
+@pytest.mark.parametrize('doc, heading, components, document', doc_examples(),
+                         ids=lambda value: value if isinstance(value, str) and value.startswith('#') else '')
+def test_documented_examples_validate(doc, heading, components, document):
+    for component in components:
+        VALIDATORS[component](document)
+
+
+def test_measurement_lists_validate():
+    VALIDATORS['brakes']({'front': {'calipers': {'piston_sizes_in': [1.75, '1.38', None]}}})
+    with pytest.raises(fastjsonschema.JsonSchemaValueException):
+        VALIDATORS['brakes']({'front': {'calipers': {'piston_sizes_in': [{'size': 1.75}]}}})
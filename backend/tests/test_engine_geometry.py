@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from engine_geometry import compression_sweep, compute_geometry
+
+# The 347 in populate_database.py: 4.03 bore, 3.4 stroke, 5.4 rod, .005 deck,
+# 53 cc chambers, 4.155 x .042 gasket
+SAMPLE = dict(bore=4.03, stroke=3.4, rod=5.4, deck_clear=0.005, chamber_cc=53.0,
+              gasket_bore=4.155, gasket_thickness=0.042, rpm=6200)
+
+
+def static_cr(piston_cc):
+    return float(compute_geometry(piston_cc=piston_cc, **SAMPLE)['static_cr'])
+
+
+def test_piston_dome_is_positive():
+    # The engine specs editor records a dome as positive, a dish as negative
+    assert static_cr(5.0) == pytest.approx(13.17, abs=0.01)
+    assert static_cr(-5.0) == pytest.approx(11.39, abs=0.01)
+    assert static_cr(5.0) > static_cr(0.0) > static_cr(-5.0)
+
+
+def test_sweep_matches_compute_geometry():
+    sweep = compression_sweep(4.03, 3.4, 53.0, [0.042], [4.155], [-5.0, 0.0, 5.0], [0.005])
+    expected = [static_cr(piston_cc) for piston_cc in (-5.0, 0.0, 5.0)]
+    np.testing.assert_allclose(sweep['static_cr'][0, 0, :, 0], expected)
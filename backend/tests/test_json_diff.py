@@ -0,0 +1,22 @@
+import pytest
+
+from json_diff import diff_documents, merge_patch_operations
+
+
+@pytest.mark.parametrize('before, after, path, old_value, value', [
+    ({'a': {'x': 1}}, {'a': {'x': True}}, '/a/x', 1, True),
+    ({'a': {'x': 1}}, {'a': {'x': 1.0}}, '/a/x', 1, 1.0),
+    ({'a': [0]}, {'a': [False]}, '/a/0', 0, False),
+])
+def test_nested_type_changes_are_changes(before, after, path, old_value, value):
+    assert diff_documents(before, after) == [
+        {'op': 'replace', 'path': path, 'value': value, 'old_value': old_value}
+    ]
+    # The write path reports the same change
+    assert merge_patch_operations(before, after)
+
+
+def test_equal_documents_have_no_changes():
+    document = {'a': {'x': 1, 'y': [1.5, {'id': 'n1', 'content': 'ok'}]}}
+    assert diff_documents(document, {'a': {'x': 1, 'y': [1.5, {'id': 'n1', 'content': 'ok'}]}}) == []
+    assert merge_patch_operations(document, document) == []
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { snapshotsAPI, Snapshot, SnapshotDiff } from '../services/api';
+import { snapshotsAPI, Snapshot, SnapshotPathsDiff } from '../services/api';
 
 interface VersionHistoryTimelineProps {
   buildId: number;
@@ -13,7 +13,7 @@ export const VersionHistoryTimeline: React.FC<VersionHistoryTimelineProps> = ({
   const [snapshots, setSnapshots] = useState<Snapshot[]>([]);
   const [selectedSnapshot, setSelectedSnapshot] = useState<number | null>(null);
   const [compareSnapshot, setCompareSnapshot] = useState<number | null>(null);
-  const [diff, setDiff] = useState<SnapshotDiff | null>(null);
+  const [diff, setDiff] = useState<SnapshotPathsDiff | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [isRestoring, setIsRestoring] = useState(false);
@@ -202,16 +202,21 @@ export const VersionHistoryTimeline: React.FC<VersionHistoryTimelineProps> = ({
                     return (
                       <div key={key} className="change-item">
                         <div className="change-field">{key.replace(/_/g, ' ')}</div>
-                        <div className="change-values">
-                          <div className="change-before">
-                            <span className="label">Before:</span>
-                            <code>{JSON.stringify(change.before, null, 2)}</code>
+                        {change.paths.map((pathChange, index) => (
+                          <div key={`${pathChange.path}-${index}`} className="change-path">
+                            <div className="change-path-name">{pathChange.path || '/'}</div>
+                            <div className="change-values">
+                              <div className="change-before">
+                                <span className="label">Before:</span>
+                                <code>{JSON.stringify(pathChange.old_value ?? null, null, 2)}</code>
+                              </div>
+                              <div className="change-after">
+                                <span className="label">After:</span>
+                                <code>{JSON.stringify(pathChange.value ?? null, null, 2)}</code>
+                              </div>
+                            </div>
                           </div>
-                          <div className="change-after">
-                            <span className="label">After:</span>
-                            <code>{JSON.stringify(change.after, null, 2)}</code>
-                          </div>
-                        </div>
+                        ))}
                       </div>
                     );
                   })}
@@ -486,6 +491,17 @@ export const VersionHistoryTimeline: React.FC<VersionHistoryTimelineProps> = ({
           text-transform: capitalize;
         }
 
+        .change-path {
+          margin-bottom: 12px;
+        }
+
+        .change-path-name {
+          font-family: monospace;
+          font-size: 13px;
+          color: #4a5568;
+          margin-bottom: 6px;
+        }
+
         .change-values {
           display: grid;
           grid-template-columns: 1fr 1fr;
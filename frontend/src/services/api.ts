@@ -166,7 +166,7 @@ export interface Snapshot {
   maintenance_type?: string;
 }
 
-export interface SnapshotDiff {
+interface SnapshotDiffBase {
   snapshot_before: {
     id: number;
     created_at: string;
@@ -179,15 +179,40 @@ export interface SnapshotDiff {
     snapshot_type: string;
     change_description?: string;
   };
+}
+
+export interface SnapshotPathsDiff extends SnapshotDiffBase {
+  format: 'paths';
+  changes: {
+    [key: string]: {
+      has_changes: boolean;
+      paths: SnapshotPathChange[];
+    };
+  };
+}
+
+export interface SnapshotPatchDiff extends SnapshotDiffBase {
+  format: 'patch';
   changes: {
     [key: string]: {
-      before: any;
-      after: any;
       has_changes: boolean;
+      patch: JsonPatchOperation[];
     };
   };
 }
 
+export type SnapshotDiff = SnapshotPathsDiff | SnapshotPatchDiff;
+
+export interface SnapshotPathChange {
+  op: 'add' | 'remove' | 'replace';
+  path: string;
+  value?: any;
+  old_value?: any;
+}
+
+// RFC 6902 operation, as returned by format=patch
+export type JsonPatchOperation = Omit<SnapshotPathChange, 'old_value'>;
+
 // Subscription interfaces
 export interface SubscriptionStatus {
   tier: 'default' | 'premier';
@@ -253,6 +278,337 @@ export type ComponentType =
   | 'brakes'
   | 'additional-components';
 
+export type SearchResultType = 'build' | 'part' | 'note' | 'maintenance' | 'todo';
+
+export interface SearchResult {
+  type: SearchResultType;
+  id: number;
+  build_id: number | null;
+  build_slug: string | null;
+  build_name: string | null;
+  title: string | null;
+  title_highlight: string;  // HTML: escaped text, matched terms wrapped in <mark>
+  highlight: string;
+  rank: number;
+}
+
+export interface SearchResponse {
+  results: SearchResult[];
+  next_offset: number | null;
+}
+
+export interface PartSuggestion {
+  id: number;
+  part_number: string;
+  brand: string | null;
+  name: string | null;
+  category: string | null;
+}
+
+export interface PartSuggestResponse {
+  suggestions: PartSuggestion[];
+  source: 'prefix' | 'fuzzy' | 'database';
+}
+
+export interface PartUsageCounts extends PartSuggestion {
+  build_links: number;
+  vehicle_links: number;
+}
+
+export interface PartUsageResponse {
+  parts: PartUsageCounts[];
+  totals: { parts: number; build_links: number; vehicle_links: number };
+  builds: { build_id: number; slug: string; name: string; part_ids: number[]; roles: string[] }[];
+  next_builds_after: number | null;
+  vehicles: {
+    vehicle_info_id: number;
+    year: number | null;
+    make: string | null;
+    model: string | null;
+    build_id: number;
+    slug: string;
+    build_name: string;
+    part_ids: number[];
+    roles: string[];
+    locations: string[];
+  }[];
+  next_vehicles_after: number | null;
+}
+
+export interface EngineGeometry {
+  cylinders: number;
+  displacement_ci: number | null;
+  displacement_l: number | null;
+  swept_cc: number | null;
+  clearance_cc: number | null;
+  static_cr: number | null;
+  quench_in: number | null;
+  rod_ratio: number | null;
+  mean_piston_speed_fpm: number | null;
+}
+
+export interface ComputedGeometryResponse {
+  build_id: number;
+  version: number;
+  inputs: Record<string, number | null>;
+  computed: EngineGeometry;
+  stored: { displacement_ci: number | null; static_cr: number | null; quench_in: number | null };
+  // stored minus computed
+  drift: { displacement_ci?: number; static_cr?: number; quench_in?: number };
+}
+
+// Each axis is 'start:stop:step' or a single value; omitted axes use the build's value
+export interface CRSweepRanges {
+  gasket_thickness_in?: string;
+  gasket_bore_in?: string;
+  piston_cc?: string;
+  deck_clear_in?: string;
+}
+
+export interface CRSweepResponse {
+  build_id: number;
+  version: number;
+  fixed: { bore_in: number; stroke_in: number; chamber_cc: number };
+  axes: { gasket_thickness_in: number[]; gasket_bore_in: number[]; piston_cc: number[]; deck_clear_in: number[] };
+  cells: number;
+  // [gasket_thickness][gasket_bore][piston_cc][deck_clear]
+  static_cr: (number | null)[][][][];
+  // [gasket_thickness][deck_clear]
+  quench_in: number[][];
+}
+
+// duration_int is cam card text ('230@.050', '282 adv / 230 @ .050') or degrees at .050
+export interface CamCandidate {
+  label?: string;
+  duration_int: string | number;
+  advertised_int?: string | number;
+  lsa: number;
+  advance_deg?: number;
+}
+
+export interface DynamicCRResult {
+  label: string | null;
+  duration_050: number | null;
+  advertised: number | null;
+  lsa: number | null;
+  advance_deg: number | null;
+  intake_centerline: number | null;
+  ivc_abdc_deg: number | null;
+  effective_stroke_in: number | null;
+  dynamic_cr: number | null;
+}
+
+export interface DynamicCRResponse {
+  build_id: number;
+  version: number;
+  static_cr: number;
+  clearance_cc: number;
+  stored_dynamic_cr: number | null;
+  current: DynamicCRResult | null;
+  candidates: DynamicCRResult[];
+}
+
+// Unsaved editor values that replace the build's stored drivetrain inputs
+export interface DrivetrainOverrides {
+  tire_size?: string;
+  gear_ratios?: string; // comma-separated, first gear first
+  final_drive?: string;
+  rev_limit_rpm?: number;
+  rpm_step?: number;
+  speeds?: string;
+}
+
+export interface DrivetrainResponse {
+  build_id: number;
+  version: number;
+  inputs: {
+    tire_size: string;
+    tire_diameter_in: number;
+    gear_ratios: number[];
+    final_drive: number;
+    rev_limit_rpm: number;
+  };
+  rpm: number[];
+  speed_mph: number[][]; // [gear][rpm]
+  speeds_mph: number[];
+  rpm_at_speed: (number | null)[][]; // [gear][speed], null above the rev limit
+  gears: { gear: number; ratio: number; overall_ratio: number; top_speed_mph: number; mph_per_1000_rpm: number }[];
+  shifts: { from_gear: number; to_gear: number; rpm_after_shift: number; rpm_drop: number }[];
+  top_speed_mph: number;
+}
+
+export type LeaderboardName = 'hp' | 'quarter-mile-et' | 'quarter-mile-mph' | 'hp-per-ci' | 'hp-per-weight';
+
+export interface LeaderboardEntry {
+  rank: number;
+  build_id: number;
+  slug: string;
+  name: string;
+  vehicle: { year: number | null; make: string | null; model: string | null };
+  value: number;
+  best_hp: number | null;
+  best_quarter_mile_et: number | null;
+  best_quarter_mile_et_mph: number | null;
+  best_quarter_mile_mph: number | null;
+  displacement_ci: number | null;
+  weight_lbs: number | null;
+  test_ids: { hp: number | null; et: number | null; mph: number | null };
+}
+
+export interface LeaderboardResponse {
+  success: boolean;
+  board: LeaderboardName;
+  order: 'asc' | 'desc';
+  entries: LeaderboardEntry[];
+  next_cursor: string | null;
+}
+
+// Engine specs compared by /similar; null where the build doesn't record one
+export type SimilaritySpecs = Record<
+  | 'cylinders' | 'bore_in' | 'stroke_in' | 'rod_len_in' | 'displacement_ci' | 'static_cr'
+  | 'cam_duration_int_050' | 'cam_duration_exh_050' | 'camshaft_lift_int' | 'camshaft_lift_exh'
+  | 'camshaft_lsa' | 'rev_limit_rpm',
+  number | null
+>;
+
+export interface SimilarBuild {
+  build_id: number;
+  slug: string;
+  name: string;
+  vehicle: { year: number | null; make: string | null; model: string | null };
+  distance: number; // in spreads; 0 = identical specs
+  specs: SimilaritySpecs;
+}
+
+export interface SimilarBuildsResponse {
+  success: boolean;
+  build_id: number;
+  specs: SimilaritySpecs;
+  weights: Record<keyof SimilaritySpecs, number>;
+  similar: SimilarBuild[];
+  source: 'index' | 'database';
+}
+
+export interface BuildComparisonRow {
+  section: string; // build, vehicle, drivetrain, tuning, performance, computed, or a component
+  field: string; // column name, or a JSON Pointer within the component document
+  values: any[]; // one per compared build, in column order
+  differs: boolean;
+  deltas?: (number | null)[]; // numeric fields: each value minus the baseline build's
+}
+
+export interface BuildComparison {
+  success: boolean;
+  builds: { id: number; slug: string; name: string; version: number }[];
+  baseline_build_id: number;
+  rows: BuildComparisonRow[];
+}
+
+export interface DynoPullSummary {
+  id: number;
+  performance_test_id: number;
+  build_id: number;
+  label: string | null;
+  source_filename: string | null;
+  sample_count: number;
+  rpm_min: number;
+  rpm_max: number;
+  peak_hp: number | null;
+  peak_hp_rpm: number | null;
+  peak_torque: number | null;
+  peak_torque_rpm: number | null;
+  created_at: string;
+}
+
+export interface DynoPull extends DynoPullSummary {
+  rpm: number[];
+  hp: number[];
+  torque: number[];
+  afr: (number | null)[] | null;
+}
+
+export interface DynoUploadFields {
+  performance_test_id?: number; // omit to create a new performance test
+  label?: string;
+  dyno_type?: string;
+  test_location?: string;
+  weather_temp_f?: number;
+  weather_humidity_pct?: number;
+  elevation_ft?: number;
+}
+
+export interface DynoOverlayOptions {
+  pulls?: number[];
+  builds?: number[]; // each adds the build's highest-HP pull
+  rpm_step?: number;
+  rpm_min?: number;
+  rpm_max?: number;
+  baseline?: number;
+  corrected?: boolean;
+}
+
+export interface DynoOverlayResponse {
+  success: boolean;
+  rpm: number[];
+  baseline_pull_id: number;
+  pulls: (DynoPullSummary & {
+    corrected: boolean;
+    hp: (number | null)[]; // null outside the pull's RPM range
+    torque: (number | null)[];
+    afr: (number | null)[] | null;
+    hp_delta: (number | null)[];
+    torque_delta: (number | null)[];
+    grid_peaks: { peak_hp: number | null; peak_hp_rpm: number | null; peak_torque: number | null; peak_torque_rpm: number | null };
+  })[];
+}
+
+export interface Datalog {
+  id: number;
+  build_id: number;
+  name: string | null;
+  started_at: string | null;
+  channels: string[];
+  sample_count: number;
+  chunk_count: number;
+  duration_s: number | null;
+  raw_bytes: number;
+  stored_bytes: number;
+  status: 'ingesting' | 'complete';
+  created_at: string;
+  updated_at: string;
+}
+
+export interface DatalogSummary extends Datalog {
+  // From chunk statistics; null for channels never recorded
+  channel_ranges: Record<string, { min: number | null; max: number | null } | null>;
+}
+
+export interface DatalogUploadOptions {
+  name?: string;
+  started_at?: string;
+  sample_rate_hz?: number; // for logs without a time column
+}
+
+export interface DatalogSamplesOptions {
+  channels?: string[];
+  start?: number; // seconds from the start of the log
+  end?: number;
+  max_points?: number;
+}
+
+export interface DatalogSamples {
+  success: boolean;
+  datalog_id: number;
+  start: number;
+  end: number;
+  sample_count: number;
+  stride: number;
+  chunks_read: number;
+  time: number[];
+  channels: Record<string, (number | null)[]>;
+  stats: Record<string, { min: number; max: number; mean: number } | null>;
+}
+
 // Auth API
 export const authAPI = {
   login: async (data: LoginRequest): Promise<TokenResponse> => {
@@ -298,6 +654,29 @@ export const buildsAPI = {
     return response.data;
   },
 
+  // Component sub-document read by JSON Pointer, e.g. '/connecting_rods/bolts' ('' = whole document)
+  getComponentPath: async (id: number, component: ComponentType, path: string = ''): Promise<any> => {
+    const response = await api.get(`/api/builds/${id}/${component}`, { params: { path } });
+    return response.data;
+  },
+
+  // 2-8 builds aligned field by field, with deltas from the baseline (default: the first id)
+  compare: async (
+    ids: number[],
+    options: { baseline?: number; differencesOnly?: boolean } = {}
+  ): Promise<BuildComparison> => {
+    const response = await api.get('/api/builds/compare', {
+      params: { ids: ids.join(','), baseline: options.baseline, differences_only: options.differencesOnly },
+    });
+    return response.data;
+  },
+
+  // Builds with the nearest engine specs, nearest first
+  getSimilar: async (id: number, limit: number = 10): Promise<SimilarBuildsResponse> => {
+    const response = await api.get(`/api/builds/${id}/similar`, { params: { limit } });
+    return response.data;
+  },
+
   // Component JSON updates
   updateEngineInternals: async (id: number, data: any) => {
     const response = await api.put(`/api/builds/${id}/engine-internals`, data);
@@ -358,8 +737,14 @@ export const snapshotsAPI = {
     return response.data;
   },
 
-  compareDiff: async (snapshotId: number, compareToId: number): Promise<SnapshotDiff> => {
-    const response = await api.get(`/api/snapshots/${snapshotId}/diff/${compareToId}`);
+  compareDiff: async <F extends SnapshotDiff['format'] = 'paths'>(
+    snapshotId: number,
+    compareToId: number,
+    format?: F
+  ): Promise<Extract<SnapshotDiff, { format: F }>> => {
+    const response = await api.get(`/api/snapshots/${snapshotId}/diff/${compareToId}`, {
+      params: format ? { format } : undefined,
+    });
     return response.data;
   },
 
@@ -420,8 +805,18 @@ export const maintenanceAPI = {
 // Component Notes API
 export const componentNotesAPI = {
   getAll: async (buildId: number, component: ComponentType): Promise<ComponentNote[]> => {
-    const response = await api.get(`/api/builds/${buildId}/${component}/notes`);
-    return response.data.notes;
+    // Notes are paginated; follow next_cursor until the last page
+    const notes: ComponentNote[] = [];
+    let cursor: string | null = null;
+    do {
+      const response: { data: { notes: ComponentNote[]; next_cursor: string | null } } = await api.get(
+        `/api/builds/${buildId}/${component}/notes`,
+        { params: { limit: 200, ...(cursor ? { cursor } : {}) } }
+      );
+      notes.push(...response.data.notes);
+      cursor = response.data.next_cursor;
+    } while (cursor);
+    return notes;
   },
 
   add: async (buildId: number, component: ComponentType, content: string): Promise<ComponentNote> => {
@@ -439,4 +834,171 @@ export const componentNotesAPI = {
   },
 };
 
+export const searchAPI = {
+  search: async (
+    q: string,
+    options: { types?: SearchResultType[]; buildId?: number; limit?: number; offset?: number } = {}
+  ): Promise<SearchResponse> => {
+    const response = await api.get('/api/search', {
+      params: {
+        q,
+        types: options.types?.join(','),
+        build_id: options.buildId,
+        limit: options.limit,
+        offset: options.offset,
+      },
+    });
+    return response.data;
+  },
+};
+
+export const partsAPI = {
+  suggest: async (q: string, options: { limit?: number; category?: string } = {}): Promise<PartSuggestResponse> => {
+    const response = await api.get('/api/parts/suggest', {
+      params: { q, limit: options.limit, category: options.category },
+    });
+    return response.data;
+  },
+
+  usage: async (
+    part: { partId?: number; partNumber?: string; brand?: string },
+    options: { limit?: number; buildsAfter?: number; vehiclesAfter?: number } = {}
+  ): Promise<PartUsageResponse> => {
+    const response = await api.get('/api/parts/usage', {
+      params: {
+        part_id: part.partId,
+        part_number: part.partNumber,
+        brand: part.brand,
+        limit: options.limit,
+        builds_after: options.buildsAfter,
+        vehicles_after: options.vehiclesAfter,
+      },
+    });
+    return response.data;
+  },
+
+  popular: async (options: { category?: string; limit?: number } = {}): Promise<PartUsageCounts[]> => {
+    const response = await api.get('/api/parts/popular', { params: options });
+    return response.data.parts;
+  },
+};
+
+export const geometryAPI = {
+  // Geometry computed from the build's measurements, next to the hand-entered values
+  getComputed: async (buildId: number): Promise<ComputedGeometryResponse> => {
+    const response = await api.get(`/api/builds/${buildId}/computed`);
+    return response.data;
+  },
+
+  crSweep: async (buildId: number, ranges: CRSweepRanges): Promise<CRSweepResponse> => {
+    const response = await api.get(`/api/builds/${buildId}/cr-sweep`, { params: ranges });
+    return response.data;
+  },
+
+  // Dynamic CR of the build's cam and each candidate, computed in one pass
+  dynamicCR: async (buildId: number, cams: CamCandidate[] = []): Promise<DynamicCRResponse> => {
+    const response = await api.post(`/api/builds/${buildId}/dynamic-cr`, { cams });
+    return response.data;
+  },
+};
+
+export const drivetrainAPI = {
+  // RPM vs road speed per gear; cheap to call on every editor change
+  get: async (buildId: number, overrides: DrivetrainOverrides = {}): Promise<DrivetrainResponse> => {
+    const response = await api.get(`/api/builds/${buildId}/drivetrain`, { params: overrides });
+    return response.data;
+  },
+};
+
+export const leaderboardsAPI = {
+  list: async (): Promise<{ board: LeaderboardName; order: 'asc' | 'desc'; description: string }[]> => {
+    const response = await api.get('/api/leaderboards');
+    return response.data.leaderboards;
+  },
+
+  // Pass next_cursor from the previous page as `after`
+  get: async (board: LeaderboardName, options: { limit?: number; after?: string } = {}): Promise<LeaderboardResponse> => {
+    const response = await api.get(`/api/leaderboards/${board}`, { params: options });
+    return response.data;
+  },
+};
+
+export const dynoAPI = {
+  // CSV export from the dyno; every pull in the file is stored
+  upload: async (buildId: number, file: File, fields: DynoUploadFields = {}) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    Object.entries(fields).forEach(([key, value]) => {
+      if (value !== undefined) formData.append(key, String(value));
+    });
+    const response = await api.post(`/api/builds/${buildId}/dyno-pulls`, formData, {
+      headers: { 'Content-Type': 'multipart/form-data' }
+    });
+    return response.data as { success: boolean; performance_test_id: number; pulls: DynoPullSummary[] };
+  },
+
+  list: async (buildId: number): Promise<DynoPullSummary[]> => {
+    const response = await api.get(`/api/builds/${buildId}/dyno-pulls`);
+    return response.data.pulls;
+  },
+
+  get: async (pullId: number): Promise<DynoPull> => {
+    const response = await api.get(`/api/dyno-pulls/${pullId}`);
+    return response.data;
+  },
+
+  overlay: async (options: DynoOverlayOptions): Promise<DynoOverlayResponse> => {
+    const response = await api.get('/api/dyno-pulls/overlay', {
+      params: { ...options, pulls: options.pulls?.join(','), builds: options.builds?.join(',') },
+    });
+    return response.data;
+  },
+
+  delete: async (pullId: number) => {
+    const response = await api.delete(`/api/dyno-pulls/${pullId}`);
+    return response.data;
+  },
+};
+
+export const datalogAPI = {
+  // Raw CSV body; the server stores it as it streams in
+  upload: async (buildId: number, file: Blob, options: DatalogUploadOptions = {}): Promise<Datalog> => {
+    const response = await api.post(`/api/builds/${buildId}/datalogs`, file, {
+      params: options,
+      headers: { 'Content-Type': 'text/csv' }
+    });
+    return response.data.datalog;
+  },
+
+  append: async (datalogId: number, csv: Blob | string, sampleRateHz?: number) => {
+    const response = await api.post(`/api/datalogs/${datalogId}/samples`, csv, {
+      params: { sample_rate_hz: sampleRateHz },
+      headers: { 'Content-Type': 'text/csv' }
+    });
+    return response.data as { success: boolean; appended: number; datalog: Datalog };
+  },
+
+  list: async (buildId: number, range: { start?: string; end?: string } = {}): Promise<Datalog[]> => {
+    const response = await api.get(`/api/builds/${buildId}/datalogs`, { params: range });
+    return response.data.datalogs;
+  },
+
+  get: async (datalogId: number): Promise<DatalogSummary> => {
+    const response = await api.get(`/api/datalogs/${datalogId}`);
+    return response.data;
+  },
+
+  samples: async (datalogId: number, options: DatalogSamplesOptions = {}): Promise<DatalogSamples> => {
+    const response = await api.get(`/api/datalogs/${datalogId}/samples`, {
+      params: { ...options, channels: options.channels?.join(',') },
+    });
+    return response.data;
+  },
+
+  delete: async (datalogId: number) => {
+    const response = await api.delete(`/api/datalogs/${datalogId}`);
+    return response.data;
+  },
+};
+
 export default api;